@@ -6,6 +6,14 @@ import matplotlib.pyplot as plt
 import matplotlib
 import numpy as np
 from datetime import datetime
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(__file__)))
+from src.data_fetch.data_gaps import scan_all_gaps
+from src.spread_stats import stream_spread_distribution
+from src.data_fetch.history_query import load_history
 
 matplotlib.use('TkAgg')
 
@@ -63,19 +71,12 @@ def analyze_unmatched_timestamp():
     """
     该函数用于分析收集的历史数据集中在相同时间Segments下不匹配的时间戳
     """
-    okx_file_path = './data/candles/okx_BTC_USDT_SWAP_1m.csv'  # OKX 资金费率数据文件路径
-    bin_file_path = './data/candles/bin_BTCUSDT_1m.csv'  # Binance 资金费率数据文件路径
-    hl_file_path = './data/candles/hl_BTC_1m.csv'  # Hyperliquid 资金费率数据文件路径
-
-    # 读取三个CSV文件
-    okx_data = pd.read_csv(okx_file_path)
-    bin_data = pd.read_csv(bin_file_path)
-    hl_data = pd.read_csv(hl_file_path)
-    
-    # 提取每个文件的时间戳列
-    okx_timestamps = set(okx_data['timestamp'])
-    bin_timestamps = set(bin_data['timestamp'])
-    hl_timestamps = set(hl_data['timestamp'])
+    # 只从本地存储读取三个交易所BTC K线的timestamp列
+    series = load_history(['BTC'], ['okx', 'bin', 'hl'], fields=[], layout='arrays')
+    empty = {'timestamp': []}
+    okx_timestamps = set(series.get(('BTC', 'okx'), empty)['timestamp'])
+    bin_timestamps = set(series.get(('BTC', 'bin'), empty)['timestamp'])
+    hl_timestamps = set(series.get(('BTC', 'hl'), empty)['timestamp'])
 
     print("okx 共有记录数：", len(okx_timestamps))
     print("bin 共有记录数：", len(bin_timestamps))
@@ -121,5 +122,43 @@ def analyze_unmatched_timestamp():
     print(f"不匹配的时间戳占比: {(total_unique_timestamps - common_timestamps) / total_unique_timestamps:.2%}")
 
 
+def analyze_data_gaps():
+    """
+    扫描 data/candles 与 data/fundingRates 下的所有文件与分区存储序列，按 ticker × 交易所 汇总缺失情况
+    """
+    gap_table, summary = scan_all_gaps()
+    if len(summary) == 0:
+        print("没有可分析的数据文件")
+        return gap_table
+
+    # 每个 ticker 各交易所的缺失记录数，便于横向对比
+    pivot = summary.pivot_table(index=['kind', 'ticker'], columns='venue', values='missing', aggfunc='sum')
+    print("各交易所缺失记录数:")
+    print(pivot)
+
+    # 只打印缺失最多的若干段区间
+    if len(gap_table) > 0:
+        top = gap_table.nlargest(10, 'missing').copy()
+        top['gap_start'] = pd.to_datetime(top['gap_start'], unit='ms')
+        top['gap_end'] = pd.to_datetime(top['gap_end'], unit='ms')
+        print("\n缺失最多的区间:")
+        print(top[['kind', 'venue', 'ticker', 'gap_start', 'gap_end', 'missing']].to_string(index=False))
+    return gap_table
+
+
+def analyze_spread_distribution(memory_budget_mb=64):
+    """
+    统计全部历史资金费率文件中各交易所对的资金费率差分布，
+    与 max_analyze_funding_rate 的单快照最大值互补，显示套利空间集中在哪些交易所对
+    """
+    summary, per_ticker, _ = stream_spread_distribution(memory_budget_mb=memory_budget_mb)
+    print("各交易所对资金费率差分布:")
+    print(summary.to_string(index=False))
+    if len(per_ticker) > 0:
+        print("\n超过手续费阈值频率最高的 ticker × 交易所对:")
+        print(per_ticker.sort_values('above_fee_freq', ascending=False).head(10).to_string(index=False))
+    return summary, per_ticker
+
+
 if __name__ == '__main__':
     max_analyze_funding_rate()
@@ -26,6 +26,13 @@ import numpy as np
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import os
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(__file__)))
+from src.run_store import save_run
+from src.backtest_kernels import prepare_kernel_inputs, run_hysteresis, EVENT_OPEN, EVENT_CLOSE
 
 class FundingRateArbitrageBacktest:
     def __init__(self, initial_capital=10000, commission_rate=0.0005, slippage=0.0002):
@@ -44,6 +51,13 @@ class FundingRateArbitrageBacktest:
         self.positions = {}  # 持仓情况
         self.trades = []     # 交易记录
         self.equity_curve = []  # 资金曲线
+        # 回测参数，随结果一同保存到运行索引中
+        self.params = {
+            'strategy': type(self).__name__,
+            'initial_capital': initial_capital,
+            'commission_rate': commission_rate,
+            'slippage': slippage,
+        }
         
     def load_data(self, funding_rate_file, price_data_file):
         """
@@ -110,38 +124,40 @@ class FundingRateArbitrageBacktest:
         """
         if not hasattr(self, 'funding_spreads'):
             self.calculate_funding_rate_spread()
+        self.params['threshold'] = threshold
             
-        signals = []
-        
-        for _, row in self.funding_spreads.iterrows():
-            if row['spread'] > threshold:
-                # 当资金费率差异超过阈值时生成信号
-                signals.append({
-                    'timestamp': row['timestamp'],
-                    'action': 'OPEN',
-                    'long_exchange': row['long_exchange'],
-                    'short_exchange': row['short_exchange'],
-                    'spread': row['spread']
-                })
-            elif row['spread'] < threshold * 0.5:  # 当差异缩小到阈值一半以下时平仓
-                signals.append({
-                    'timestamp': row['timestamp'],
-                    'action': 'CLOSE',
-                    'spread': row['spread']
-                })
-                
-        self.signals = pd.DataFrame(signals)
+        spreads = self.funding_spreads
+        if len(spreads) == 0:
+            self.signals = pd.DataFrame()
+            return self.signals
+
+        # 资金费率差异超过阈值时生成开仓信号，缩小到阈值一半以下时生成平仓信号
+        open_mask = spreads['spread'] > threshold
+        close_mask = spreads['spread'] < threshold * 0.5
+        signal_mask = open_mask | close_mask
+
+        signals = spreads.loc[signal_mask, ['timestamp', 'long_exchange', 'short_exchange', 'spread']].copy()
+        signals.insert(1, 'action', np.where(open_mask[signal_mask], 'OPEN', 'CLOSE'))
+        signals.loc[signals['action'] == 'CLOSE', ['long_exchange', 'short_exchange']] = np.nan
+
+        self.signals = signals.reset_index(drop=True)
         return self.signals
     
-    def execute_backtest(self, position_size=0.2):
+    def execute_backtest(self, position_size=0.2, use_kernel=False, engine='auto'):
         """
         执行回测
         
         参数:
         position_size: 每次交易使用的资金比例
+        use_kernel: 是否使用 backtest_kernels 中的类型化数组状态机，而非逐行遍历信号
+        engine: 状态机引擎，'auto' 在 numba 可用时使用JIT，否则使用 NumPy 向量化实现
         """
         if not hasattr(self, 'signals'):
             self.generate_signals()
+        self.params['position_size'] = position_size
+
+        if use_kernel:
+            return self._execute_backtest_kernel(position_size, engine)
             
         self.capital = self.initial_capital
         self.positions = {}
@@ -228,8 +244,8 @@ class FundingRateArbitrageBacktest:
                     'holding_period': (exit_time - entry_time).total_seconds() / 3600  # 小时
                 })
                 
-                # 更新资金
-                self.capital += self.positions['amount'] + total_profit
+                # 更新资金 (开仓时未扣除仓位金额，平仓时只计入收益)
+                self.capital += total_profit
                 
                 # 清空持仓
                 self.positions = {}
@@ -246,6 +262,57 @@ class FundingRateArbitrageBacktest:
         
         return self.equity_curve, self.trades
     
+    def _execute_backtest_kernel(self, position_size, engine):
+        """
+        使用 backtest_kernels 执行与 execute_backtest 相同的开平仓与复利逻辑
+        """
+        threshold = self.params['threshold']
+        spreads = self.funding_spreads.reset_index(drop=True)
+        inputs = prepare_kernel_inputs(spreads, self.funding_rates)
+        cost_rate = self.commission_rate * 2 + self.slippage * 2  # 两边交易的手续费与滑点
+        event, amount, cost, funding, capital = run_hysteresis(
+            inputs, threshold, self.initial_capital, position_size, cost_rate, engine=engine
+        )
+
+        open_rows = np.flatnonzero(event == EVENT_OPEN)
+        close_rows = np.flatnonzero(event == EVENT_CLOSE)
+        timestamps = spreads['timestamp']
+
+        open_trades = pd.DataFrame({
+            '_row': open_rows,
+            'timestamp': timestamps.iloc[open_rows].to_numpy(),
+            'action': 'OPEN',
+            'long_exchange': spreads['long_exchange'].iloc[open_rows].to_numpy(),
+            'short_exchange': spreads['short_exchange'].iloc[open_rows].to_numpy(),
+            'amount': amount[open_rows],
+            'cost': cost[open_rows],
+            'spread': inputs['spread'][open_rows],
+        })
+        entry_times = timestamps.iloc[open_rows[:len(close_rows)]].to_numpy()
+        exit_times = timestamps.iloc[close_rows].to_numpy()
+        close_trades = pd.DataFrame({
+            '_row': close_rows,
+            'timestamp': exit_times,
+            'action': 'CLOSE',
+            'profit': funding[close_rows] - cost[close_rows],
+            'funding_profit': funding[close_rows],
+            'cost': cost[close_rows],
+            'holding_period': (exit_times - entry_times) / np.timedelta64(1, 'h'),  # 小时
+        })
+        trades = pd.concat([open_trades, close_trades], ignore_index=True)
+        self.trades = trades.sort_values('_row', kind='stable').drop(columns='_row').reset_index(drop=True)
+
+        # 与逐行遍历一致：每个信号点记录一次资金
+        signal_mask = (inputs['spread'] > threshold) | (inputs['spread'] < threshold * 0.5)
+        self.equity_curve = pd.concat([
+            pd.DataFrame({'timestamp': [self.price_data['timestamp'].iloc[0]], 'equity': [self.initial_capital]}),
+            pd.DataFrame({'timestamp': timestamps[signal_mask].to_numpy(), 'equity': capital[signal_mask]}),
+        ], ignore_index=True)
+        self.capital = float(capital[-1]) if len(capital) > 0 else self.initial_capital
+        self.positions = {}
+
+        return self.equity_curve, self.trades
+
     def calculate_metrics(self):
         """计算回测绩效指标"""
         if len(self.trades) == 0:
@@ -331,29 +398,25 @@ class FundingRateArbitrageBacktest:
         plt.savefig(os.path.join(output_dir, f'backtest_result_{datetime.now().strftime("%Y%m%d_%H%M%S")}.png'))
         
     def save_results(self):
-        """保存回测结果到CSV文件"""
+        """
+        保存回测结果：资金曲线、交易记录、资金费率差异、绩效指标和参数写入同一个压缩文件，
+        并在 results/runs_index.jsonl 中追加索引，见 run_store
+
+        返回:
+        run_id: 本次运行的ID
+        """
         output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'results')
-        os.makedirs(output_dir, exist_ok=True)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # 保存资金曲线
-        if hasattr(self, 'equity_curve'):
-            self.equity_curve.to_csv(os.path.join(output_dir, f'equity_curve_{timestamp}.csv'), index=False)
-        
-        # 保存交易记录
-        if hasattr(self, 'trades'):
-            self.trades.to_csv(os.path.join(output_dir, f'trades_{timestamp}.csv'), index=False)
-        
-        # 保存资金费率差异
-        if hasattr(self, 'funding_spreads'):
-            self.funding_spreads.to_csv(os.path.join(output_dir, f'funding_spreads_{timestamp}.csv'), index=False)
-        
-        # 保存绩效指标
+
+        tables = {
+            'equity_curve': self.equity_curve if hasattr(self, 'equity_curve') else None,
+            'trades': self.trades if hasattr(self, 'trades') else None,
+            'funding_spreads': self.funding_spreads if hasattr(self, 'funding_spreads') else None,
+        }
         metrics = self.calculate_metrics()
-        pd.DataFrame([metrics]).to_csv(os.path.join(output_dir, f'metrics_{timestamp}.csv'), index=False)
-        
-        print(f"回测结果已保存到 {output_dir} 目录")
+        run_id = save_run(tables, metrics, self.params, results_dir=output_dir)
+
+        print(f"回测结果已保存到 {output_dir} 目录, run_id: {run_id}")
+        return run_id
 
 
 # 使用示例
@@ -1,13 +1,6 @@
 """
 Binance 历史数据获取脚本
 """
-import requests
-import json
-import pandas as pd
-import os
-import time
-from datetime import datetime
-from collections import deque
 from sys import path as sys_path
 from os import path as os_path
 
@@ -15,369 +8,124 @@ from os import path as os_path
 sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
 # 导入日志模块
 from src.logger import setup_logger
-from src.utils import genearate_history_moments
+from src.time_grid import floor_to_minute
+from src.data_fetch.history_engine import VenueAdapter, FetchAbort, run_history_fetch
 
 # 获取logger实例
 logger = setup_logger('BinanceHistoryDataFetching')
 
 BASE_URL = "https://fapi.binance.com"
 
+# 币对不存在的错误代码
+ERROR_INVALID_SYMBOL = -1121
 
-def bin_fetch_history_funding_rates(symbol, segments, ticker, save_to_csv=True, csv_dir=None):
-    """
-    获取历史资金费率数据并与K线数据合并
-    
-    Args:
-        symbol: 交易对，如'BTC-USDT-SWAP'
-        segments: 时间Segments
-        save_to_csv: 是否保存到CSV文件
-        csv_dir: CSV文件保存目录，默认为项目根目录下的data/candles目录
-    
-    Return:
-        合并了资金费率的K线数据
-    """
-
-    # 设置CSV文件保存路径
-    if csv_dir is None:
-        # 默认保存到项目根目录下的data/candles目录
-        csv_dir = os.path.join(os_path.dirname(os_path.dirname(os_path.dirname(__file__))), 'data', 'fundingRates')
-    
-    # 确保目录存在
-    os.makedirs(csv_dir, exist_ok=True)
-    
-    # CSV文件名：bin_symbol_1m.csv
-    csv_filename = f"bin_{ticker}_fr.csv"
-    csv_path = os.path.join(csv_dir, csv_filename)
-    
-    # 读取现有K线CSV文件(如果存在)
-    existing_data = None
-    if os.path.exists(csv_path):
-        try:
-            existing_data = pd.read_csv(csv_path)
-            logger.info(f"读取现有资金费率CSV文件: {csv_path}, 包含 {len(existing_data)} 条记录")
-        except Exception as e:
-            logger.error(f"读取CSV文件失败: {str(e)}")
-            return None
 
-    method = 'GET'
+class BinanceFundingAdapter(VenueAdapter):
+    """GET /fapi/v1/fundingRate"""
+    venue = 'bin'
+    kind = 'fr'
+    base_url = BASE_URL
     request_path = '/fapi/v1/fundingRate'
-    url = BASE_URL + request_path
-    
-    funding_rates_data = []  # 存储所有资金费率数据
-    
-    # 实现限速控制 - 使用滑动窗口跟踪最近的请求时间
-    request_times = deque(maxlen=20)  # 最多保存20个请求时间
-    
-    for i in range(len(segments)):
-        start = segments[i][0]
-        end = segments[i][1]
-        body = {
+    page_limit = 1000
+    columns = ['timestamp', 'binFR']
+    # 与 /fapi/v1/fundingInfo 共享 500次/5分钟/IP 的限制
+    bucket_key = 'bin_funding'
+    bucket_rate = 500 / 300
+    bucket_capacity = 10
+
+    def build_request(self, symbol, start, end):
+        return {'params': {
+            'symbol': symbol,
+            'endTime': end,
+            'startTime': start,
+            'limit': str(self.page_limit),
+        }}
+
+    def parse_response(self, payload):
+        # 将时间戳调整为分钟级别（去除秒和毫秒部分）
+        return [[floor_to_minute(item['fundingTime']), float(item['fundingRate'])] for item in payload or []]
+
+
+class BinanceKlineAdapter(VenueAdapter):
+    """GET /fapi/v1/klines"""
+    venue = 'bin'
+    kind = 'candles'
+    base_url = BASE_URL
+    request_path = '/fapi/v1/klines'
+    # 接口上限为1500条(权重10)，499条权重仅为2: 同样的权重预算下每秒获取的K线最多
+    page_limit = 499
+    columns = ['timestamp', 'binOpen', 'binHigh', 'binLow', 'binClose', 'binVolume']
+    # 2400权重/分钟/IP
+    bucket_key = 'bin'
+    bucket_rate = 2400 / 60
+    bucket_capacity = 40
+
+    def request_weight(self):
+        # 权重随limit变化: [1,100) 1; [100,500) 2; [500,1000] 5; >1000 10
+        if self.page_limit < 100:
+            return 1
+        if self.page_limit < 500:
+            return 2
+        return 5 if self.page_limit <= 1000 else 10
+
+    def build_request(self, symbol, start, end):
+        return {'params': {
             'symbol': symbol,
             'endTime': end,
             'startTime': start,
-            'limit': '24',
-        }
+            'interval': '1m',
+            'limit': str(self.page_limit),
+        }}
 
-        if i == 0:
-            logger.info(f"数据采集始于: {datetime.fromtimestamp(end / 1000.0)}")
-        elif i == len(segments)-2:
-            logger.info(f"数据采集止于: {datetime.fromtimestamp(start / 1000.0)}")
-        
-        # 限速控制 - 如果已经有20个请求在最近2秒内发出，则等待
-        current_time = time.time()
-        if len(request_times) == 20:
-            oldest_request_time = request_times[0]
-            time_diff = current_time - oldest_request_time
-            if time_diff < 2.0:
-                # 需要等待的时间
-                wait_time = 2.0 - time_diff + 0.05  # 额外增加50ms的缓冲
-                logger.info(f"达到限速阈值，等待 {wait_time:.2f} 秒")
-                time.sleep(wait_time)
-                current_time = time.time()  # 更新当前时间
-        
-        # 记录本次请求时间
-        request_times.append(current_time)
-        
-        # 发送请求
-        try:
-            res = requests.get(
-                url,
-                params=body,
-                timeout=10  # 设置超时时间
-            )
-            
-            if res.status_code == 200:
-                data = res.json()
-               
-                if data and len(data) > 0:
-                    # 将数据添加到列表中
-                    for item in data:
-                        # 正确处理毫秒时间戳
-                        funding_time_ms = int(item['fundingTime'])
-                        # 将时间戳调整为分钟级别（去除秒和毫秒部分）
-                        adjusted_timestamp = funding_time_ms - (funding_time_ms % 60000)
-                        
-                        funding_rates_data.append({
-                            'timestamp': adjusted_timestamp,  # 使用调整后的时间戳
-                            'binFR': float(item['fundingRate'])
-                        })
-                else:
-                    logger.warning(f"该时间段未获取到数据")
-            else:
-                # 如果是429错误(Too Many Requests)，增加等待时间
-                if res.status_code == 429:
-                    logger.warning("收到限速响应，等待5秒后继续")
-                    time.sleep(5)
-                    i -= 1  # 重试当前请求
-                    continue
-                logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
-        except Exception as e:
-            logger.error(f"请求异常: {str(e)}")
-            # 出现异常时等待一段时间后重试
-            time.sleep(2)
-            i -= 1  # 重试当前请求
-            continue
-    
-    # 如果获取到了资金费率数据
-    if funding_rates_data:
-        # 将资金费率数据转换为DataFrame
-        funding_df = pd.DataFrame(funding_rates_data)
-        
-        logger.info(f"共获取到 {len(funding_df)} 条资金费率记录")
-        
-        # 将timestamp转换为datetime格式，方便排序和查看
-        funding_df['datetime'] = pd.to_datetime(funding_df['timestamp'], unit='ms')
-        
-        # 如果存在现有数据，合并新旧数据
-        if existing_data is not None:
-            # 确保现有数据也有datetime列
-            if 'datetime' not in existing_data.columns:
-                existing_data['datetime'] = pd.to_datetime(existing_data['timestamp'], unit='ms')
+    def parse_response(self, payload):
+        # 只保留前6个元素（开盘时间到成交量）
+        return [[int(item[0])] + item[1:6] for item in payload or []]
 
-            # 合并数据
-            combined_df = pd.concat([existing_data, funding_df])
-            
-            # 删除重复数据（基于timestamp）
-            combined_df = combined_df.drop_duplicates(subset=['timestamp'])
-            
-            # 按时间排序
-            combined_df = combined_df.sort_values('timestamp')
-            
-            # 重置索引
-            combined_df = combined_df.reset_index(drop=True)
-            
-            logger.info(f"合并后共有 {len(combined_df)} 条记录")
-            
-            # 保存到CSV
-            if save_to_csv:
-                combined_df.to_csv(csv_path, index=False)
-                logger.info(f"数据已保存到: {csv_path}")
-            
-            return combined_df
-        else:
-            # 如果没有现有数据，直接保存新数据
-            # 按时间排序
-            funding_df = funding_df.sort_values('timestamp')
-            # 重置索引
-            funding_df = funding_df.reset_index(drop=True)
-            
-            logger.info(f"共获取到 {len(funding_df)} 条新记录")
-            
-            # 保存到CSV
-            if save_to_csv:
-                funding_df.to_csv(csv_path, index=False)
-                logger.info(f"数据已保存到: {csv_path}")
-            
-            return funding_df
-    else:
-        logger.warning("未获取到任何资金费率数据")
-        return existing_data
+    def check_error(self, status, payload):
+        if isinstance(payload, dict) and payload.get('code') == ERROR_INVALID_SYMBOL:
+            raise FetchAbort("当前交易所没有该币对！")
+
+
+def bin_fetch_history_funding_rates(symbol, segments, ticker, save_to_csv=True, csv_dir=None):
+    """
+    获取历史资金费率数据并追加到分区存储
+
+    Args:
+        symbol: 交易对，如'BTCUSDT'
+        segments: 时间Segments
+        ticker: 币种名称，用于存储分区
+        save_to_csv: 是否写入存储
+        csv_dir: 存储根目录，默认为项目根目录下的data/fundingRates目录
+
+    Return:
+        请求时间范围内的资金费率数据，读取旧版CSV文件失败时返回None
+    """
+    return run_history_fetch(BinanceFundingAdapter(), symbol, segments, ticker, save_to_csv, csv_dir)
 
 
 def bin_fetch_history_mark_price_candles(symbol, segments, ticker, save_to_csv=True, csv_dir=None):
     """
-    获取历史K线数据并保存到CSV文件
-    
+    获取历史K线数据并追加到分区存储
+
     参数:
-        symbol: 交易对，如'BTC-USDT-SWAP'
-        save_to_csv: 是否保存到CSV文件
-        csv_dir: CSV文件保存目录，默认为项目根目录下的data/candles目录
-    
+        symbol: 交易对，如'BTCUSDT'
+        segments: 时间Segments
+        ticker: 币种名称，用于存储分区
+        save_to_csv: 是否写入存储
+        csv_dir: 存储根目录，默认为项目根目录下的data/candles目录
+
     返回:
-        最新获取的K线数据
+        请求时间范围内的K线数据
     """
-    # 设置CSV文件保存路径
-    if csv_dir is None:
-        # 默认保存到项目根目录下的data/candles目录
-        csv_dir = os.path.join(os_path.dirname(os_path.dirname(os_path.dirname(__file__))), 'data', 'candles')
-    
-    # 确保目录存在
-    os.makedirs(csv_dir, exist_ok=True)
-    
-    # CSV文件名：bin_symbol_1m.csv
-    csv_filename = f"bin_{ticker}_1m.csv"
-    csv_path = os.path.join(csv_dir, csv_filename)
-    
-    # 定义列名
-    columns = ['timestamp', 'binOpen', 'binHigh', 'binLow', 'binClose', 'binVolume']
-    
-    # 读取现有CSV文件(如果存在)
-    existing_data = None
-    if os.path.exists(csv_path):
-        try:
-            existing_data = pd.read_csv(csv_path)
-            logger.info(f"读取现有CSV文件: {csv_path}, 包含 {len(existing_data)} 条记录")
-        except Exception as e:
-            logger.error(f"读取CSV文件失败: {str(e)}")
-    
-    # GET /api/v5/market/history-mark-price-candles
-    method = 'GET'
-    request_path = '/fapi/v1/klines'
-    url = BASE_URL + request_path
-    
-    all_new_data = []  # 存储所有新获取的数据
-    
-    # 实现限速控制 - 使用滑动窗口跟踪最近的请求时间
-    request_times = deque(maxlen=20)  # 最多保存20个请求时间
-    
-    for i in range(len(segments)):
-        start = segments[i][0]
-        end = segments[i][1]
-        body = {
-            'symbol': symbol,
-            'endTime': end,
-            'startTime': start,
-            'interval': '1m',
-            'limit': '60',
-        }
-        if i == 0:
-            logger.info(f"数据采集始于: {datetime.fromtimestamp(end / 1000.0)}")
-        elif i == len(segments)-2:
-            logger.info(f"数据采集止于: {datetime.fromtimestamp(start / 1000.0)}")
-        
-        # 限速控制 - 如果已经有20个请求在最近2秒内发出，则等待
-        current_time = time.time()
-        if len(request_times) == 20:
-            oldest_request_time = request_times[0]
-            time_diff = current_time - oldest_request_time
-            if time_diff < 2.0:
-                # 需要等待的时间
-                wait_time = 2.0 - time_diff + 0.05  # 额外增加50ms的缓冲
-                logger.info(f"达到限速阈值，等待 {wait_time:.2f} 秒")
-                time.sleep(wait_time)
-                current_time = time.time()  # 更新当前时间
-        
-        # 记录本次请求时间
-        request_times.append(current_time)
-        
-        # 发送请求
-        try:
-            res = requests.get(
-                url,
-                params=body,
-                timeout=10  # 设置超时时间
-            )
-            
-            if res.status_code == 200:
-                data = res.json()
-                
-                if data and len(data) > 0:
-                    # 将数据添加到列表中，同时只保留前6个元素（开盘时间到成交量）
-                    for item in data:
-                        # 只保留前6个元素
-                        truncated_item = item[:6]
-                        truncated_item[0] = int(truncated_item[0])  # 转换timestamp列为int
-                        all_new_data.append(truncated_item)
-                else:
-                    logger.warning(f"该时间段未获取到数据: start={start}, end={end}")
-            else:
-                # 如果是429错误(Too Many Requests)，增加等待时间
-                status_code = res.status_code
-                error_code = res.json().get('code', 'Unknown')
-                logger.error(f"API请求失败: 状态码 {status_code}, 错误代码: {error_code}, 响应: {res.text}")
-                if status_code == 429:
-                    logger.warning("收到限速响应，等待5秒后继续")
-                    time.sleep(5)
-                    i -= 1  # 重试当前请求
-                    continue
-                
-                if error_code == -1121:
-                    logger.error(f"当前交易所没有该币对！")
-                    break
-        except Exception as e:
-            logger.error(f"请求异常: {str(e)}")
-            # 出现异常时等待一段时间后重试
-            time.sleep(2)
-            i -= 1  # 重试当前请求
-            continue
-    
-    # 如果获取到了新数据
-    if all_new_data:
-        # 将新数据转换为DataFrame
-        new_df = pd.DataFrame(all_new_data, columns=columns)
-        
-        # 将timestamp转换为datetime格式，方便排序和查看
-        new_df['datetime'] = pd.to_datetime(new_df['timestamp'], unit='ms')
-        
-        # 如果存在现有数据，合并新旧数据
-        if existing_data is not None:
-            # 确保列名匹配
-            if set(existing_data.columns) != set(columns + ['datetime']):
-                # 如果列名不匹配，可能是旧版本数据，只保留需要的列
-                if set(columns).issubset(set(existing_data.columns)):
-                    existing_data = existing_data[columns]
-                    # 重新添加datetime列
-                    existing_data['datetime'] = pd.to_datetime(existing_data['timestamp'], unit='ms')
-            
-            # 确保现有数据也有datetime列
-            if 'datetime' not in existing_data.columns:
-                existing_data['datetime'] = pd.to_datetime(existing_data['timestamp'], unit='ms')
-            
-            # 合并数据
-            combined_df = pd.concat([existing_data, new_df])
-            
-            # 删除重复数据（基于timestamp）
-            combined_df = combined_df.drop_duplicates(subset=['timestamp'])
-            
-            # 按时间排序
-            combined_df = combined_df.sort_values('timestamp')
-            
-            # 重置索引
-            combined_df = combined_df.reset_index(drop=True)
-            
-            logger.info(f"合并后共有 {len(combined_df)} 条记录")
-            
-            # 保存到CSV
-            if save_to_csv:
-                combined_df.to_csv(csv_path, index=False)
-                logger.info(f"数据已保存到: {csv_path}")
-            
-            return combined_df
-        else:
-            # 如果没有现有数据，直接保存新数据
-            # 按时间排序
-            new_df = new_df.sort_values('timestamp')
-            
-            # 重置索引
-            new_df = new_df.reset_index(drop=True)
-            
-            logger.info(f"共获取到 {len(new_df)} 条新记录")
-            
-            # 保存到CSV
-            if save_to_csv:
-                new_df.to_csv(csv_path, index=False)
-                logger.info(f"数据已保存到: {csv_path}")
-            
-            return new_df
-    else:
-        logger.warning("未获取到任何新数据")
-        return existing_data if existing_data is not None else pd.DataFrame(columns=columns)
+    return run_history_fetch(BinanceKlineAdapter(), symbol, segments, ticker, save_to_csv, csv_dir)
 
 
 if __name__ == "__main__":
+    from src.data_fetch.segment_planner import plan_recent
+
     symbol = "BTCUSDT"
-    segments = genearate_history_moments(interval=1, batch=60, days=3)
-    data = bin_fetch_history_mark_price_candles(symbol, segments)
+    segments = plan_recent(BinanceKlineAdapter(), 'BTC', days=3)
+    data = bin_fetch_history_mark_price_candles(symbol, segments, ticker='BTC')
 
-    # fr_segments = genearate_history_moments(interval=60, batch=24, days=3)
-    # bin_fetch_history_funding_rates(symbol=symbol, segments=fr_segments)
\ No newline at end of file
+    # fr_segments = plan_recent(BinanceFundingAdapter(), 'BTC', days=3)
+    # bin_fetch_history_funding_rates(symbol=symbol, segments=fr_segments, ticker='BTC')
@@ -0,0 +1,280 @@
+"""
+历史数据缺口检测
+
+扫描 data/candles 与 data/fundingRates 下的所有CSV文件(单交易所文件与 merge_exchange_data 的合并文件)
+以及分区存储(partition_store)中的各 交易所 × ticker 序列，
+对每个 交易所 × ticker 的时间戳序列用 np.diff 做游程编码，得到连续缺失的时间区间。
+多个文件/序列并行处理，输出紧凑的缺口表，历史数据获取脚本可直接据此补齐缺失区间。
+"""
+import re
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
+# 导入日志模块
+from src.logger import setup_logger
+
+# 获取logger实例
+logger = setup_logger('DataGaps')
+
+DATA_DIR = os.path.join(os_path.dirname(os_path.dirname(os_path.dirname(__file__))), 'data')
+CANDLES_DIR = os.path.join(DATA_DIR, 'candles')
+FUNDING_DIR = os.path.join(DATA_DIR, 'fundingRates')
+GAP_TABLE_PATH = os.path.join(DATA_DIR, 'gaps.csv')
+
+VENUES = ['hl', 'bin', 'okx', 'bybit']
+CANDLE_INTERVAL_MS = 60 * 1000
+
+# 单交易所文件: bin_BTC_1m.csv / okx_BTC_fr.csv；合并文件: BTC_candles.csv / BTC_fr.csv
+VENUE_FILE_PATTERN = re.compile(r'^(hl|bin|okx|bybit)_(.+)_(1m|fr)\.csv$')
+MERGED_FILE_PATTERN = re.compile(r'^(.+)_(candles|fr)\.csv$')
+
+GAP_COLUMNS = ['kind', 'venue', 'ticker', 'interval_ms', 'gap_start', 'gap_end', 'missing', 'file']
+SUMMARY_COLUMNS = ['kind', 'venue', 'ticker', 'interval_ms', 'rows', 'first', 'last', 'gaps', 'missing', 'file']
+
+
+def infer_interval(timestamps):
+    """
+    推断时间序列的采样间隔：相邻时间戳差值的众数
+
+    Args:
+        timestamps (np.ndarray): 已排序去重的毫秒时间戳
+
+    Returns:
+        int: 间隔(毫秒)，无法推断时返回0
+    """
+    if len(timestamps) < 2:
+        return 0
+    values, counts = np.unique(np.diff(timestamps), return_counts=True)
+    return int(values[np.argmax(counts)])
+
+
+def find_gaps(timestamps, interval_ms):
+    """
+    检测时间序列中的缺失区间
+
+    相邻时间戳差值超过采样间隔的位置即为一段连续缺失(游程)，
+    缺失区间为 [前一个时间戳+间隔, 后一个时间戳-间隔]。
+
+    Args:
+        timestamps (np.ndarray): 毫秒时间戳
+        interval_ms (int): 采样间隔(毫秒)
+
+    Returns:
+        tuple: (gap_start, gap_end, missing) 三个等长的int64数组
+    """
+    ts = np.unique(np.asarray(timestamps, dtype=np.int64))
+    if len(ts) < 2 or interval_ms <= 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+    diff = np.diff(ts)
+    idx = np.flatnonzero(diff > interval_ms)
+    gap_start = ts[idx] + interval_ms
+    gap_end = ts[idx + 1] - interval_ms
+    missing = diff[idx] // interval_ms - 1
+    return gap_start, gap_end, missing
+
+
+def classify_file(filename):
+    """
+    根据文件名识别数据类型、交易所与ticker
+
+    Returns:
+        tuple or None: (kind, venue, ticker)，kind 为 'candles' 或 'fr'，合并文件的venue为None
+    """
+    match = VENUE_FILE_PATTERN.match(filename)
+    if match:
+        venue, ticker, suffix = match.groups()
+        return ('candles' if suffix == '1m' else 'fr'), venue, ticker
+    match = MERGED_FILE_PATTERN.match(filename)
+    if match:
+        ticker, kind = match.groups()
+        return kind, None, ticker
+    return None
+
+
+def _venue_columns(kind, venue):
+    """该交易所在文件中用于判断是否有数据的列"""
+    return [f'{venue}FR'] if kind == 'fr' else [f'{venue}Open', f'{venue}Close']
+
+
+def summarize_frame(df, kind, venue, ticker, source=None):
+    """
+    计算DataFrame中每个交易所时间序列的缺口与概要
+
+    Args:
+        df (DataFrame): 含timestamp列的数据
+        kind (str): 'candles' 或 'fr'
+        venue (str): 交易所前缀，合并文件传None，按各交易所的列分别统计
+        ticker (str): 如 'BTC'
+        source (str): 数据来源文件，写入结果中
+
+    Returns:
+        tuple: (缺口记录列表, 概要记录列表)
+    """
+    venues = [venue] if venue else [v for v in VENUES if all(c in df.columns for c in _venue_columns(kind, v))]
+    all_ts = pd.to_numeric(df['timestamp'], errors='coerce').to_numpy(dtype=np.float64)
+
+    gaps, summaries = [], []
+    for v in venues:
+        if venue:
+            mask = np.isfinite(all_ts)
+        else:
+            mask = np.isfinite(all_ts) & df[_venue_columns(kind, v)].notna().all(axis=1).to_numpy()
+        ts = np.unique(all_ts[mask].astype(np.int64))
+        interval = CANDLE_INTERVAL_MS if kind == 'candles' else infer_interval(ts)
+        gap_start, gap_end, missing = find_gaps(ts, interval)
+
+        for start, end, count in zip(gap_start, gap_end, missing):
+            gaps.append([kind, v, ticker, interval, int(start), int(end), int(count), source])
+        summaries.append([
+            kind, v, ticker, interval, len(ts),
+            int(ts[0]) if len(ts) else None, int(ts[-1]) if len(ts) else None,
+            len(gap_start), int(missing.sum()), source
+        ])
+    return gaps, summaries
+
+
+def scan_file(file_path):
+    """
+    扫描单个文件，返回其中每个交易所时间序列的缺口与概要
+
+    Args:
+        file_path (str): CSV文件路径
+
+    Returns:
+        tuple: (缺口记录列表, 概要记录列表)
+    """
+    info = classify_file(os.path.basename(file_path))
+    if info is None:
+        return [], []
+    kind, venue, ticker = info
+
+    header = pd.read_csv(file_path, nrows=0).columns
+    if 'timestamp' not in header:
+        return [], []
+
+    # 单交易所文件只读取timestamp列；合并文件按各交易所的列判断该时刻是否有数据
+    venues = [venue] if venue else [v for v in VENUES if all(c in header for c in _venue_columns(kind, v))]
+    usecols = ['timestamp'] + ([] if venue else [c for v in venues for c in _venue_columns(kind, v)])
+    df = pd.read_csv(file_path, usecols=usecols)
+    return summarize_frame(df, kind, venue, ticker, source=file_path)
+
+
+def scan_series(kind, venue, ticker, root=None):
+    """
+    扫描分区存储中的单个序列，逐个分区只读取timestamp列
+
+    Returns:
+        tuple: (缺口记录列表, 概要记录列表)
+    """
+    # partition_store 依赖本模块的目录常量，在函数内导入避免循环导入
+    from src.data_fetch.partition_store import iter_series, series_dir
+    ts = [df['timestamp'].to_numpy(dtype=np.int64)
+          for df in iter_series(kind, venue, ticker, columns=['timestamp'], root=root)]
+    df = pd.DataFrame({'timestamp': np.concatenate(ts) if ts else np.array([], dtype=np.int64)})
+    return summarize_frame(df, kind, venue, ticker, source=series_dir(kind, venue, ticker, root))
+
+
+def _scan_source(source):
+    """进程池任务: CSV文件路径或分区存储序列 (kind, venue, ticker, root)"""
+    return scan_file(source) if isinstance(source, str) else scan_series(*source)
+
+
+def list_data_files(dirs=None):
+    """列出需要扫描的所有CSV文件"""
+    dirs = dirs or [CANDLES_DIR, FUNDING_DIR]
+    files = []
+    for d in dirs:
+        if os.path.isdir(d):
+            files.extend(os.path.join(d, f) for f in sorted(os.listdir(d)) if f.endswith('.csv'))
+    return files
+
+
+def list_data_series(dirs=None):
+    """
+    列出各目录下分区存储中的所有序列
+
+    数据类型由序列的列判断(资金费率序列含 {venue}FR 列)，目录可以是任意的存储根目录。
+
+    Returns:
+        list: [(kind, venue, ticker, root), ...]
+    """
+    from src.data_fetch.partition_store import list_series, series_columns
+    dirs = dirs or [CANDLES_DIR, FUNDING_DIR]
+    series = []
+    for d in dirs:
+        default_kind = 'fr' if os.path.abspath(d) == os.path.abspath(FUNDING_DIR) else 'candles'
+        for venue, ticker in list_series(default_kind, root=d):
+            columns = series_columns(default_kind, venue, ticker, root=d)
+            if not columns:
+                continue
+            kind = 'fr' if f'{venue}FR' in columns else 'candles'
+            series.append((kind, venue, ticker, d))
+    return series
+
+
+def scan_all_gaps(dirs=None, workers=None, save=True, gap_table_path=None):
+    """
+    并行扫描所有数据文件，生成缺口表与概要表
+
+    Args:
+        dirs (list): 需要扫描的目录(其中的CSV文件与分区存储序列)，默认为 data/candles 与 data/fundingRates
+        workers (int): 进程数，默认为CPU核数
+        save (bool): 是否将缺口表保存到 data/gaps.csv
+        gap_table_path (str): 缺口表保存路径
+
+    Returns:
+        tuple: (gap_table, summary) 两个DataFrame
+    """
+    files = list_data_files(dirs)
+    series = list_data_series(dirs)
+    logger.info(f"共发现 {len(files)} 个数据文件, {len(series)} 个分区存储序列")
+
+    sources = files + series
+    if len(sources) > 1 and (workers is None or workers > 1):
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_scan_source, sources))
+    else:
+        results = [_scan_source(s) for s in sources]
+
+    gap_table = pd.DataFrame([g for gaps, _ in results for g in gaps], columns=GAP_COLUMNS)
+    summary = pd.DataFrame([s for _, summaries in results for s in summaries], columns=SUMMARY_COLUMNS)
+    logger.info(f"共检测到 {len(gap_table)} 段缺失，涉及 {summary['gaps'].gt(0).sum()} 个时间序列")
+
+    if save:
+        gap_table_path = gap_table_path or GAP_TABLE_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(gap_table_path)), exist_ok=True)
+        gap_table.to_csv(gap_table_path, index=False)
+        logger.info(f"缺口表已保存到: {gap_table_path}")
+
+    return gap_table, summary
+
+
+def missing_segments(gap_table, venue, ticker, kind):
+    """
+    将缺口表中某个 交易所 × ticker 的缺失区间转换为获取脚本使用的segments格式
+
+    Args:
+        gap_table (DataFrame): scan_all_gaps 的输出或读取的 data/gaps.csv
+        venue (str): 交易所前缀，如 'bin'
+        ticker (str): 如 'BTC'
+        kind (str): 'candles' 或 'fr'
+
+    Returns:
+        list: [(start_ms, end_ms), ...]
+    """
+    rows = gap_table[(gap_table['venue'] == venue) & (gap_table['ticker'] == ticker) & (gap_table['kind'] == kind)]
+    rows = rows.drop_duplicates(subset=['gap_start', 'gap_end'])
+    return list(zip(rows['gap_start'].astype(int), rows['gap_end'].astype(int)))
+
+
+if __name__ == '__main__':
+    gap_table, summary = scan_all_gaps()
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(summary.drop(columns=['file']))
@@ -1,25 +1,103 @@
 """
 调用子模块采集历史数据并进行合并
 """
-from okx_history_fetch import okx_fetch_history_mark_price_candles, okx_fetch_history_funding_rates
-from bin_history_fetch import bin_fetch_history_mark_price_candles, bin_fetch_history_funding_rates
-from hl_history_fetch import hl_fetch_history_mark_price_candles, hl_fetch_history_funding_rates
-from bybit_history_fetch import bybit_fetch_history_mark_price_candles, bybit_fetch_history_funding_rates
+from okx_history_fetch import OKXKlineAdapter, OKXFundingAdapter
+from bin_history_fetch import BinanceKlineAdapter, BinanceFundingAdapter
+from hl_history_fetch import HyperliquidKlineAdapter, HyperliquidFundingAdapter
+from bybit_history_fetch import BybitKlineAdapter, BybitFundingAdapter
 from sys import path as sys_path
 from os import path as os_path
 # 添加项目根目录到系统路径，确保可以导入src目录下的模块
 sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
 # 导入日志模块
 from src.logger import setup_logger
-from src.utils import genearate_history_moments
+from src.data_fetch.manifest import update_manifest, StreamSummary
+from src.data_fetch.partition_store import iter_series, series_coverage
+from src.data_fetch.segment_planner import plan_recent
+from src.data_fetch.history_engine import HistoryEngine, fetch_history_async, import_legacy_csv
+from src.data_fetch.http_cache import ResponseCache
+import numpy as np
 import pandas as pd
 import os
+import time
+import asyncio
 
 logger = setup_logger('data_merge')
 
+COLLECT_CONCURRENCY = 64  # 全部ticker共享的在途请求数上限
+
+
+def kway_merge(sources):
+    """
+    按timestamp对多个已排序的数据流做k路归并(外连接)
+
+    每个数据流按块产出按timestamp升序、互不重叠的DataFrame(如分区存储的单日分区)。
+    每轮只输出不超过所有未结束数据流当前块末尾时间戳的行，因此每个数据流在内存中最多保留一块，
+    与历史长度无关。
+
+    Args:
+        sources (list): 数据流列表，每个元素为产出DataFrame的可迭代对象，均含timestamp列
+
+    Yields:
+        DataFrame: timestamp 与各数据流的列按顺序拼接，某数据流在该时刻没有数据时为NaN
+    """
+    iterators = [iter(source) for source in sources]
+    buffers = [None] * len(iterators)
+    live = [True] * len(iterators)
+
+    while True:
+        # 未结束的数据流保证缓冲区非空
+        for i, it in enumerate(iterators):
+            while live[i] and (buffers[i] is None or len(buffers[i]) == 0):
+                chunk = next(it, None)
+                if chunk is None:
+                    live[i] = False
+                else:
+                    buffers[i] = chunk
+
+        ends = [buf['timestamp'].iloc[-1] for buf, alive in zip(buffers, live) if alive]
+        if not any(buf is not None and len(buf) for buf in buffers):
+            return
+        # 已结束的数据流不再约束输出边界
+        bound = min(ends) if ends else None
+
+        taken = []
+        for i, buf in enumerate(buffers):
+            if buf is None:
+                continue
+            cut = len(buf) if bound is None else int(buf['timestamp'].searchsorted(bound, side='right'))
+            taken.append(buf.iloc[:cut])
+            buffers[i] = buf.iloc[cut:]
+
+        timestamps = pd.Index(np.unique(np.concatenate([t['timestamp'].to_numpy(dtype=np.int64) for t in taken])),
+                              name='timestamp')
+        yield pd.concat([t.set_index('timestamp').reindex(timestamps) for t in taken], axis=1).reset_index()
+
+
+def _trim_ends(chunks):
+    """去除数据流的第一行与最后一行，总行数不足3行时原样输出"""
+    pending = None
+    started = False
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        pending = chunk if pending is None else pd.concat([pending, chunk], ignore_index=True)
+        if not started:
+            if len(pending) < 3:
+                continue
+            pending = pending.iloc[1:]
+            started = True
+        # 最后一行留到下一块，数据流结束时丢弃
+        yield pending.iloc[:-1]
+        pending = pending.iloc[-1:]
+    if not started and pending is not None:
+        logger.warning(f"数据行数不足，无法去除首尾数据，当前行数: {len(pending)}")
+        yield pending
+
+
 def merge_exchange_data(ticker, flag):
     """
-    合并四个交易所的数据文件
+    合并四个交易所的数据: 分区存储中的序列与旧版单交易所CSV文件
     
     Args:
         ticker (str): 交易对标识，如'BTC'
@@ -29,82 +107,53 @@ def merge_exchange_data(ticker, flag):
         bool: 合并是否成功
     """
     try:
-        # 定义四个交易所的文件路径
+        # 四个交易所的接口适配器，用于定位并导入旧版单交易所文件
         if flag:
             data_dir = os.path.join(os.path.dirname(os.path.dirname(os_path.dirname(__file__))), "data/fundingRates")
-            okx_file = os.path.join(data_dir, f"okx_{ticker}_fr.csv")
-            bin_file = os.path.join(data_dir, f"bin_{ticker}_fr.csv")
-            hl_file = os.path.join(data_dir, f"hl_{ticker}_fr.csv")
-            bybit_file = os.path.join(data_dir, f"bybit_{ticker}_fr.csv")
+            adapters = [HyperliquidFundingAdapter(), BinanceFundingAdapter(), OKXFundingAdapter(), BybitFundingAdapter()]
             output_path = os.path.join(data_dir, f"{ticker}_fr.csv")  # 保存路径
         else:
             data_dir = os.path.join(os.path.dirname(os.path.dirname(os_path.dirname(__file__))), "data/candles")
-            okx_file = os.path.join(data_dir, f"okx_{ticker}_1m.csv")
-            bin_file = os.path.join(data_dir, f"bin_{ticker}_1m.csv")
-            hl_file = os.path.join(data_dir, f"hl_{ticker}_1m.csv")
-            bybit_file = os.path.join(data_dir, f"bybit_{ticker}_1m.csv")
+            adapters = [HyperliquidKlineAdapter(), BinanceKlineAdapter(), OKXKlineAdapter(), BybitKlineAdapter()]
             output_path = os.path.join(data_dir, f"{ticker}_candles.csv")
         
-        # 检查文件是否存在
-        files = [hl_file, bin_file, okx_file, bybit_file]
-        exchanges = ['hl', 'bin', 'okx', 'bybit']
-        
-        dfs = []
-        for i, file_path in enumerate(files):
-            if os.path.exists(file_path):
-                try:
-                    # 读取CSV文件
-                    df = pd.read_csv(file_path)
-                    
-                    # 确保timestamp列存在
-                    if 'timestamp' not in df.columns:
-                        logger.warning(f"文件 {file_path} 中没有timestamp列，跳过")
-                        continue
-                    
-                    dfs.append(df)
-                    logger.info(f"成功读取 {file_path}")
-                except Exception as e:
-                    logger.error(f"处理文件 {file_path} 时出错: {e}")
-            else:
-                logger.warning(f"文件不存在: {file_path}")
+        kind = 'fr' if flag else 'candles'
+        sources = []
+        for adapter in adapters:
+            exchange = adapter.venue
+            # 旧版单交易所文件先导入分区存储，与获取脚本使用同一导入流程(列转换为数值，导入后删除原文件)
+            if not import_legacy_csv(adapter, ticker):
+                logger.warning(f"导入 {adapter.csv_path(ticker)} 失败，只合并分区存储中已有的数据")
+
+            rows = sum(rows for _, _, rows in series_coverage(kind, exchange, ticker))
+            if rows == 0:
+                logger.warning(f"没有 {exchange} {ticker} 的数据")
+                continue
+            logger.info(f"读取 {exchange} {ticker}: {rows} 条记录")
+            # 合并文件不再保存datetime列，读取时使用 schema.read_merged
+            sources.append(iter_series(kind, exchange, ticker))
         
-        if not dfs:
+        if not sources:
             logger.warning("没有有效的数据可以合并")
             return False
         
-        # 按timestamp合并所有数据框
-        merged_df = dfs[0]
-        for i, df in enumerate(dfs[1:]):
-            # 如果不是第一个数据框且包含datetime列，则在合并前删除
-            if 'datetime' in df.columns and 'datetime' in merged_df.columns:
-                df = df.drop(columns=['datetime'])
-                logger.info(f"从 {exchanges[i+1]} 数据中删除重复的datetime列")
-            
-            merged_df = pd.merge(merged_df, df, on='timestamp', how='outer')
+        # 按timestamp逐块归并，去除首尾数据后写入临时文件，完成后替换
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        summary = StreamSummary(kind)
+        written = 0
+        with open(tmp_path, 'w', newline='') as f:
+            for chunk in _trim_ends(kway_merge(sources)):
+                chunk.to_csv(f, index=False, header=written == 0)
+                summary.update(chunk)
+                written += len(chunk)
+        os.replace(tmp_path, output_path)
         
-        # 按timestamp排序
-        merged_df = merged_df.sort_values('timestamp')
-        
-        # 去除首尾数据
-        if len(merged_df) > 2:  # 确保数据框至少有3行，才能去除首尾
-            merged_df = merged_df.iloc[1:-1]
-            logger.info(f"已去除首尾数据，剩余数据行数: {len(merged_df)}")
-        else:
-            logger.warning(f"数据行数不足，无法去除首尾数据，当前行数: {len(merged_df)}")
+        logger.info(f"已去除首尾数据，剩余数据行数: {written}")
         
         # 保存合并后的数据
-        merged_df.to_csv(output_path, index=False)
+        update_manifest(output_path, summary=summary)
         logger.info(f"合并数据已保存至: {output_path}")
         
-        # 删除原始数据文件
-        for file_path in files:
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                    logger.info(f"已删除原始数据文件: {file_path}")
-                except Exception as e:
-                    logger.warning(f"删除文件 {file_path} 时出错: {e}")
-        
         return True
     
     except Exception as e:
@@ -112,38 +161,105 @@ def merge_exchange_data(ticker, flag):
         return False
 
 
-def fetch_ticker_data(ticker, k_segments, fr_segments):
+def ticker_adapters(ticker):
     """
-    从四个交易所获取历史数据
-
-    Args:
-        ticker (str): 交易对标识，如'BTC'
-        k_segments (list): K线数据的时间段
-        fr_segments (list): 资金费率数据的时间段
+    一个ticker在四个交易所的K线与资金费率获取任务
 
     Returns:
-        bool: 数据获取是否成功
+        list: [(adapter, symbol), ...]
     """
     # 定义四个交易所的symbol
     okx_symbol = f'{ticker}-USDT-SWAP'  # OKX symbol
     bin_symbol = f'{ticker}USDT'  # Binance symbol
     bybit_symbol = f'{ticker}USDT'  # 要采集的symbol
 
-    # 获取历史K线数据
-    okx_fetch_history_mark_price_candles(symbol=okx_symbol, segments=k_history_segments, ticker=ticker)
-    hl_fetch_history_mark_price_candles(symbol=ticker, segments=k_history_segments, ticker=ticker)
-    bin_fetch_history_mark_price_candles(symbol=bin_symbol, segments=k_history_segments, ticker=ticker)
-    bybit_fetch_history_mark_price_candles(symbol=bybit_symbol, segments=k_history_segments, ticker=ticker)
-   
-    # # 获取历史资金费率数据
-    bin_fetch_history_funding_rates(symbol=bin_symbol, segments=fr_segments, ticker=ticker)
-    okx_fetch_history_funding_rates(symbol=okx_symbol, segments=fr_segments, ticker=ticker)
-    bybit_fetch_history_funding_rates(symbol=bybit_symbol, segments=fr_segments, ticker=ticker)
-    hl_fetch_history_funding_rates(symbol=ticker, segments=fr_segments, ticker=ticker)
+    return [
+        # 历史K线数据
+        (OKXKlineAdapter(), okx_symbol),
+        (HyperliquidKlineAdapter(), ticker),
+        (BinanceKlineAdapter(), bin_symbol),
+        (BybitKlineAdapter(), bybit_symbol),
+        # 历史资金费率数据
+        (BinanceFundingAdapter(), bin_symbol),
+        (OKXFundingAdapter(), okx_symbol),
+        (BybitFundingAdapter(), bybit_symbol),
+        (HyperliquidFundingAdapter(), ticker),
+    ]
+
+
+async def collect_tickers_async(tickers, days=1, k_segments=None, fr_segments=None,
+                                concurrency=COLLECT_CONCURRENCY, base_urls=None, merge=True, use_cache=True):
+    """
+    并发采集所有ticker在四个交易所的历史数据
+
+    所有ticker共用一个引擎，每个交易所(接口组)只有一个全局令牌桶，
+    总耗时由限速最严格的交易所决定，而不是所有请求时间之和。
+
+    Args:
+        tickers (list): ticker列表，如 ['BTC', 'ETH']
+        days (int): 规划时间段时回溯的天数
+        k_segments (list): 指定K线时间段，为None时按本地覆盖范围规划
+        fr_segments (list): 指定资金费率时间段，为None时同上
+        concurrency (int): 同时在途的请求数上限
+        base_urls (dict): 交易所前缀 -> 基础URL 的覆盖
+        merge (bool): 每个ticker采集完成后是否合并数据
+        use_cache (bool): 是否使用已结束时间窗口的响应缓存
+
+    Returns:
+        dict: ticker -> 是否成功
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+
+    cache = ResponseCache() if use_cache else None
+    async with HistoryEngine(concurrency=concurrency, base_urls=base_urls, cache=cache) as engine:
+        async def collect_one(ticker):
+            jobs = []
+            for adapter, symbol in ticker_adapters(ticker):
+                segments = k_segments if adapter.kind == 'candles' else fr_segments
+                if segments is None:
+                    segments = plan_recent(adapter, ticker, days)
+                if segments:
+                    jobs.append(fetch_history_async(engine, adapter, symbol, segments, ticker, return_data=False))
+            await asyncio.gather(*jobs)
+            if merge:
+                # 合并在线程中执行，不阻塞其他ticker的采集
+                await loop.run_in_executor(None, merge_exchange_data, ticker, True)
+                await loop.run_in_executor(None, merge_exchange_data, ticker, False)
+            logger.info(f"ticker {ticker} 处理完成")
+
+        results = await asyncio.gather(*(collect_one(t) for t in tickers), return_exceptions=True)
+
+    status = {}
+    for ticker, result in zip(tickers, results):
+        status[ticker] = not isinstance(result, Exception)
+        if isinstance(result, Exception):
+            logger.error(f"处理ticker {ticker} 时发生错误: {result}")
+    logger.info(f"共处理 {len(tickers)} 个ticker, 成功 {sum(status.values())} 个, 耗时 {time.perf_counter() - start:.1f} 秒")
+    return status
 
-    # 合并数据
-    merge_exchange_data(ticker, True)
-    merge_exchange_data(ticker, False)
+
+def collect_tickers(tickers, days=1, k_segments=None, fr_segments=None, concurrency=COLLECT_CONCURRENCY, base_urls=None,
+                    use_cache=True):
+    """collect_tickers_async 的同步入口"""
+    return asyncio.run(collect_tickers_async(tickers, days, k_segments, fr_segments, concurrency, base_urls,
+                                             use_cache=use_cache))
+
+
+def fetch_ticker_data(ticker, k_segments=None, fr_segments=None, days=1):
+    """
+    从四个交易所获取历史数据
+
+    Args:
+        ticker (str): 交易对标识，如'BTC'
+        k_segments (list): K线数据的时间段，为None时按本地覆盖范围只规划缺失的时间段
+        fr_segments (list): 资金费率数据的时间段，为None时同上
+        days (int): 规划时间段时回溯的天数
+
+    Returns:
+        bool: 数据获取是否成功
+    """
+    return collect_tickers([ticker], days, k_segments, fr_segments)[ticker]
 
 
 if __name__ == '__main__':
@@ -163,14 +279,8 @@ if __name__ == '__main__':
                 tickers = tickers_df['ticker'].unique().tolist()
                 logger.info(f"从CSV文件中读取到{len(tickers)}个ticker: {tickers}")
                 
-                # 为每个ticker生成时间段
-                k_history_segments = genearate_history_moments(interval=1, batch=60, days=days)  # K线数据的时间段
-                fr_segments = genearate_history_moments(interval=60, batch=24, days=days)  # 资金费率数据的时间段
-                
-                # 为每个ticker调用函数
-                for ticker in tickers:
-                    logger.info(f"开始处理ticker: {ticker}")
-                    # fetch_ticker_data(ticker, k_history_segments, fr_segments)
+                # 所有ticker并发采集，时间段按本地已有数据规划，只请求缺失部分
+                collect_tickers(tickers, days=days)
         else:
             logger.warning(f"CSV文件不存在: {csv_path}")
     except Exception as e:
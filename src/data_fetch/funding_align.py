@@ -0,0 +1,205 @@
+"""
+资金费率结算周期归一化与跨交易所对齐
+
+Hyper Liquid 每小时结算，Binance / OKX / Bybit 按币种每1、4或8小时结算(同一币种的周期也可能调整)。
+merge_exchange_data 按timestamp外连接后，各交易所的列在大部分行上为NaN，且费率不可直接比较。
+本模块对每个交易所向量化地:
+
+    1. 由相邻结算时间差检测每次结算覆盖的周期(数据缺口处沿用上一个有效周期)
+    2. 换算为每小时费率: rate × 1h / 周期
+    3. 对齐到统一的整点网格，两种方式:
+       - 'last'(默认): 网格时刻 g 取 T <= g 的最近一次已结算 T 的每小时费率，g 时刻只用到已公布的数据，
+         可直接作为信号/回测的输入
+       - 'accrual': 网格时刻 g 取满足 T - 周期 < g <= T 的结算 T 的每小时费率，即每次结算的费用均摊到
+         它覆盖的各小时上，网格上按小时求和等于实际支付的资金费。g 时刻用到了之后才结算的费率，
+         只能用于事后的资金费盈亏核算，不能作为信号
+
+输出为 网格时刻 × 交易所 的稠密矩阵，下游无需逐行判断各交易所是否在该时刻结算。
+"""
+import numpy as np
+import pandas as pd
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
+# 导入日志模块
+from src.logger import setup_logger
+from src.data_fetch.data_gaps import VENUES
+from src.data_fetch.partition_store import read_series
+from src.time_grid import HOUR_MS, grid as time_grid
+
+# 获取logger实例
+logger = setup_logger('FundingAlign')
+
+SETTLEMENT_HOURS = np.array([1, 2, 4, 8])  # 各交易所使用的结算周期(小时)
+DEFAULT_GRID_MS = HOUR_MS
+ALIGN_MODES = ('last', 'accrual')
+
+
+def settlement_intervals(timestamps):
+    """
+    每次结算覆盖的周期
+
+    相邻结算时间差按小时取整后属于 SETTLEMENT_HOURS 的视为有效周期；
+    其余(数据缺口)沿用前一个有效周期，序列开头沿用第一个有效周期。
+
+    Args:
+        timestamps (np.ndarray): 已排序的结算时间戳(毫秒)
+
+    Returns:
+        np.ndarray: 与 timestamps 等长的周期(毫秒)，无法判断时为0
+    """
+    ts = np.asarray(timestamps, dtype=np.int64)
+    if len(ts) < 2:
+        return np.zeros(len(ts), dtype=np.int64)
+    hours = np.rint(np.diff(ts) / HOUR_MS).astype(np.int64)
+    valid = np.isin(hours, SETTLEMENT_HOURS)
+    if not valid.any():
+        return np.zeros(len(ts), dtype=np.int64)
+
+    # 第i次结算(i>=1)覆盖 (ts[i-1], ts[i]]；无效处取之前最近的有效位置
+    last_valid = np.maximum.accumulate(np.where(valid, np.arange(len(hours)), -1))
+    filled = np.where(last_valid >= 0, hours[np.maximum(last_valid, 0)], hours[np.argmax(valid)])
+    return np.r_[filled[0], filled] * HOUR_MS
+
+
+def hourly_rates(rates, intervals_ms):
+    """每次结算的费率换算为每小时费率，周期未知时为NaN"""
+    rates = np.asarray(rates, dtype=np.float64)
+    intervals_ms = np.asarray(intervals_ms, dtype=np.int64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(intervals_ms > 0, rates * HOUR_MS / intervals_ms, np.nan)
+
+
+def align_to_grid(timestamps, rates, grid, intervals_ms=None, mode='last'):
+    """
+    单个交易所的结算对齐到网格
+
+    Args:
+        timestamps (np.ndarray): 已排序的结算时间戳
+        rates (np.ndarray): 对应的结算费率
+        grid (np.ndarray): 网格时刻(毫秒)
+        intervals_ms (np.ndarray): 结算周期，默认由 settlement_intervals 检测
+        mode (str): 'last' 取网格时刻及之前最近一次已结算的费率(无前视，默认)；
+                    'accrual' 取覆盖网格时刻的那次结算的费率(均摊视角，含前视，仅用于资金费盈亏核算)
+
+    Returns:
+        tuple: (每小时费率, 结算周期) 两个与grid等长的数组，无法对齐时为 NaN / 0。
+               'last' 模式下距上次结算超过最长结算周期(数据缺口)视为无法对齐
+    """
+    if mode not in ALIGN_MODES:
+        raise ValueError(f"未知的对齐方式: {mode}，可选 {ALIGN_MODES}")
+    ts = np.asarray(timestamps, dtype=np.int64)
+    rates = np.asarray(rates, dtype=np.float64)
+    keep = np.isfinite(rates)
+    ts, rates = ts[keep], rates[keep]
+    intervals_ms = settlement_intervals(ts) if intervals_ms is None else np.asarray(intervals_ms)[keep]
+    grid = np.asarray(grid, dtype=np.int64)
+    if len(ts) == 0:
+        return np.full(len(grid), np.nan), np.zeros(len(grid), dtype=np.int64)
+
+    if mode == 'last':
+        # 网格时刻之前(含)的最近一次结算
+        idx = np.searchsorted(ts, grid, side='right') - 1
+        inside = idx >= 0
+        idx = np.maximum(idx, 0)
+        inside &= grid - ts[idx] < int(SETTLEMENT_HOURS.max()) * HOUR_MS
+    else:
+        # 网格时刻之后(含)的第一次结算
+        idx = np.searchsorted(ts, grid, side='left')
+        inside = idx < len(ts)
+        idx = np.minimum(idx, len(ts) - 1)
+        inside &= ts[idx] - intervals_ms[idx] < grid
+    aligned = np.where(inside, hourly_rates(rates, intervals_ms)[idx], np.nan)
+    aligned_intervals = np.where(inside, intervals_ms[idx], 0)
+    return aligned, aligned_intervals
+
+
+def align_funding(series, start_ms=None, end_ms=None, grid_ms=DEFAULT_GRID_MS, mode='last'):
+    """
+    多个交易所的资金费率对齐到统一网格
+
+    Args:
+        series (dict): 交易所前缀 -> (timestamps, rates)
+        start_ms, end_ms (int): 网格范围，默认为所有交易所数据的共同覆盖范围
+        grid_ms (int): 网格间隔，默认1小时
+        mode (str): 对齐方式，见 align_to_grid
+
+    Returns:
+        tuple: (grid, rates, intervals)
+            grid (np.ndarray): 网格时刻
+            rates (np.ndarray): (len(grid), len(series)) 每小时费率，列顺序与series一致
+            intervals (np.ndarray): 同形状的结算周期(毫秒)
+    """
+    series = {v: (np.asarray(ts, dtype=np.int64), np.asarray(r, dtype=np.float64))
+              for v, (ts, r) in series.items() if len(ts)}
+    if not series:
+        return np.array([], dtype=np.int64), np.empty((0, 0)), np.empty((0, 0), dtype=np.int64)
+    if start_ms is None:
+        start_ms = max(ts[0] for ts, _ in series.values())
+    if end_ms is None:
+        end_ms = min(ts[-1] for ts, _ in series.values())
+
+    grid = time_grid(start_ms, end_ms, grid_ms)
+    columns = [align_to_grid(ts, r, grid, mode=mode) for ts, r in series.values()]
+    return grid, np.column_stack([c[0] for c in columns]), np.column_stack([c[1] for c in columns])
+
+
+def _aligned_frame(venues, grid, rates, intervals):
+    """对齐结果 -> DataFrame: timestamp + {venue}FR + {venue}Interval(小时)"""
+    result = {'timestamp': grid}
+    for i, v in enumerate(venues):
+        result[f'{v}FR'] = rates[:, i]
+        result[f'{v}Interval'] = (intervals[:, i] // HOUR_MS).astype(np.int8)
+    return pd.DataFrame(result)
+
+
+def align_merged_frame(df, venues=VENUES, grid_ms=DEFAULT_GRID_MS, mode='last'):
+    """
+    merge_exchange_data 生成的稀疏合并资金费率(timestamp + {venue}FR) -> 稠密的每小时费率
+
+    mode 默认 'last'(无前视)；'accrual' 仅用于资金费盈亏核算，见 align_to_grid
+
+    Returns:
+        DataFrame: timestamp + 各交易所的 {venue}FR(每小时费率) 与 {venue}Interval(结算周期, 小时)
+    """
+    ts = df['timestamp'].to_numpy(dtype=np.int64)
+    series = {}
+    for v in venues:
+        column = f'{v}FR'
+        if column in df.columns:
+            rates = df[column].to_numpy(dtype=np.float64)
+            mask = np.isfinite(rates)
+            series[v] = (ts[mask], rates[mask])
+    return _aligned_frame(list(series), *align_funding(series, grid_ms=grid_ms, mode=mode))
+
+
+def load_aligned_funding(ticker, venues=VENUES, start_ms=None, end_ms=None, grid_ms=DEFAULT_GRID_MS, root=None,
+                         mode='last'):
+    """
+    从分区存储读取一个ticker各交易所的资金费率并对齐，不经过外连接的合并文件
+
+    mode 默认 'last'(无前视)；'accrual' 仅用于资金费盈亏核算，见 align_to_grid
+
+    Returns:
+        DataFrame: 同 align_merged_frame
+    """
+    # 窗口两端各多读一个最长周期，保证边界所在的结算周期可以判断
+    margin = int(SETTLEMENT_HOURS.max()) * HOUR_MS
+    start = None if start_ms is None else start_ms - margin
+    end = None if end_ms is None else end_ms + margin
+    series = {}
+    for v in venues:
+        df = read_series('fr', v, ticker, start=start, end=end, columns=[f'{v}FR'], root=root)
+        if len(df):
+            series[v] = (df['timestamp'].to_numpy(dtype=np.int64), df[f'{v}FR'].to_numpy(dtype=np.float64))
+        else:
+            logger.warning(f"没有 {v} {ticker} 的资金费率数据")
+    return _aligned_frame(list(series), *align_funding(series, start_ms, end_ms, grid_ms, mode))
+
+
+if __name__ == '__main__':
+    aligned = load_aligned_funding('BTC')
+    logger.info(f"BTC 对齐后 {len(aligned)} 个整点")
+    print(aligned.tail())
@@ -0,0 +1,542 @@
+"""
+历史数据获取引擎
+
+bin/okx/bybit/hl 四个历史数据获取脚本原先各自用阻塞的 for 循环逐段请求，
+用 deque(maxlen=20) 的滑动窗口 sleep 限速，吞吐量受单次请求延迟限制。
+本模块将共同部分抽出:
+    - VenueAdapter: 各交易所的请求构造、响应解析与限速参数，定义在各自的获取脚本中
+    - TokenBucket: 按交易所(接口组)共享的令牌桶，以请求权重计数
+    - HistoryEngine: 基于 asyncio 并发请求所有时间段，吞吐量接近交易所的限速上限；
+      失败的时间段由 segment_queue 按退避策略重试，进度持久化，中断后可继续；
+      已结束时间窗口的响应由 http_cache 缓存，重复运行不再请求交易所
+    - store_history: 将一批新数据追加到按 交易所/ticker/日期 分区的存储(partition_store)，
+      获取过程中由 segment_queue 分批调用，不必等全部时间段完成
+HTTP请求使用引擎内共享的 aiohttp.ClientSession，连接池上限与并发数一致；
+响应缓存的磁盘读写在有界线程池中执行。
+"""
+import os
+import json
+import time
+import asyncio
+import aiohttp
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
+# 导入日志模块
+from src.logger import setup_logger
+from src.utils import resolve_rest_url
+from src.time_grid import MINUTE_MS
+from src.data_fetch.manifest import remove_manifest_entry
+from src.data_fetch.partition_store import append_rows, read_series, series_dir
+from src.data_fetch.data_gaps import CANDLES_DIR, FUNDING_DIR
+from src.data_fetch.segment_queue import SegmentQueue, QUEUE_DIR, retry_after_seconds
+from src.data_fetch.http_cache import ResponseCache, cache_key
+
+# 获取logger实例
+logger = setup_logger('HistoryEngine')
+
+DEFAULT_CONCURRENCY = 16  # 同时在途的请求数上限
+REQUEST_TIMEOUT = 10  # 单次请求超时(秒)
+
+# 各交易所接口单次请求允许返回的最大条数，(venue, kind) -> 条数
+MAX_PAGE_LIMITS = {
+    ('bin', 'candles'): 1500,  # GET /fapi/v1/klines
+    ('bin', 'fr'): 1000,  # GET /fapi/v1/fundingRate
+    ('bybit', 'candles'): 1000,  # GET /v5/market/kline
+    ('bybit', 'fr'): 200,  # GET /v5/market/funding/history
+    ('okx', 'candles'): 100,  # GET /api/v5/market/history-candles
+    ('okx', 'fr'): 100,  # GET /api/v5/public/funding-rate-history
+    ('hl', 'candles'): 5000,  # POST /info candleSnapshot
+    ('hl', 'fr'): 500,  # POST /info fundingHistory
+}
+
+
+class FetchAbort(Exception):
+    """交易所返回不可恢复的错误(如币对不存在)，终止整个获取任务"""
+
+
+class SegmentError(Exception):
+    """单个时间段的请求被交易所拒绝；retryable 为 True 时(如限速错误码)重新入队"""
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class TokenBucket:
+    """
+    异步令牌桶限速器
+
+    令牌以 rate 个/秒 的速度补充，最多累积 capacity 个；每次请求按其权重消耗令牌。
+    同一交易所(接口组)的所有请求共享一个令牌桶。
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds):
+        """交易所要求等待(Retry-After)时，暂停该桶的所有请求并清空令牌"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    async def acquire(self, tokens=1):
+        """等待直到有足够的令牌，然后消耗"""
+        tokens = min(float(tokens), self.capacity)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # 按到达顺序排队，避免大权重请求被饿死
+        async with self._lock:
+            while time.monotonic() < self.paused_until:
+                await asyncio.sleep(self.paused_until - time.monotonic())
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+
+class VenueAdapter:
+    """
+    交易所历史数据接口适配器
+
+    子类需要设置类属性并实现 build_request 与 parse_response:
+        venue: 交易所前缀(hl/bin/okx/bybit)，也是CSV文件名与列名的前缀
+        kind: 'candles' 或 'fr'
+        base_url / request_path / method: 接口地址
+        page_limit: 每次请求的条数，不超过 MAX_PAGE_LIMITS 中该接口的上限
+        columns: 输出列名，首列为timestamp
+        bucket_key / bucket_rate / bucket_capacity: 令牌桶分组与参数(按请求权重计)
+    """
+    venue = None
+    kind = None
+    base_url = None
+    request_path = None
+    method = 'GET'
+    page_limit = 60
+    columns = None
+    bucket_key = None
+    bucket_rate = 10.0
+    bucket_capacity = 20.0
+
+    def request_weight(self):
+        """单次请求消耗的令牌数"""
+        return 1
+
+    def build_request(self, symbol, start, end):
+        """
+        构造单个时间段的请求，[start, end] 为闭区间
+
+        Returns:
+            dict: 传给 aiohttp.ClientSession.request 的关键字参数(params 或 json)
+        """
+        raise NotImplementedError
+
+    def parse_response(self, payload):
+        """
+        解析状态码为200的响应
+
+        Returns:
+            list: 与 columns 对应的行
+
+        Raises:
+            SegmentError: 交易所在响应体中返回了错误，限速类错误应设置 retryable=True
+        """
+        raise NotImplementedError
+
+    def check_error(self, status, payload):
+        """
+        处理非200的响应，需要终止整个任务时抛出 FetchAbort
+        """
+        return None
+
+    @property
+    def max_page_limit(self):
+        """接口允许的单次最大条数"""
+        return MAX_PAGE_LIMITS.get((self.venue, self.kind), self.page_limit)
+
+    @property
+    def interval_ms(self):
+        """最细的采样间隔: K线1分钟，资金费率按1小时(各交易所最短的结算间隔)"""
+        return MINUTE_MS if self.kind == 'candles' else 60 * MINUTE_MS
+
+    @property
+    def file_suffix(self):
+        return '1m' if self.kind == 'candles' else 'fr'
+
+    @property
+    def default_dir(self):
+        return CANDLES_DIR if self.kind == 'candles' else FUNDING_DIR
+
+    def csv_path(self, ticker, csv_dir=None):
+        """单交易所数据文件路径: {venue}_{ticker}_1m.csv / {venue}_{ticker}_fr.csv"""
+        return os.path.join(csv_dir or self.default_dir, f"{self.venue}_{ticker}_{self.file_suffix}.csv")
+
+
+class HistoryEngine:
+    """
+    并发历史数据获取引擎
+
+    用法:
+        async with HistoryEngine() as engine:
+            df = await engine.fetch(adapter, symbol, segments)
+    多个获取任务可以共用同一个引擎，从而共享连接池与各交易所的令牌桶。
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, base_urls=None, buckets=None, cache=None):
+        """
+        Args:
+            concurrency (int): 同时在途的请求数上限
+            base_urls (dict): 交易所前缀 -> 基础URL，覆盖适配器的默认地址(如本地测试服务器)
+            buckets (dict): bucket_key -> TokenBucket，传入时与其他引擎共享限速
+            cache (ResponseCache): 已结束时间窗口的响应缓存，None 表示不缓存
+        """
+        self.concurrency = concurrency
+        self.base_urls = base_urls or {}
+        self.buckets = buckets if buckets is not None else {}
+        self.cache = cache
+        self._session = None
+        self._executor = None
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60),
+        )
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='history-cache')
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.cache is not None and (self.cache.hits or self.cache.misses):
+            logger.info(f"响应缓存: {self.cache.stats()}")
+        self._executor.shutdown(wait=True)
+        await self._session.close()
+        self._session = None
+        self._executor = None
+
+    def bucket_for(self, adapter):
+        """获取适配器所属的令牌桶，同一 bucket_key 共享"""
+        key = adapter.bucket_key or adapter.venue
+        if key not in self.buckets:
+            self.buckets[key] = TokenBucket(adapter.bucket_rate, adapter.bucket_capacity)
+        return self.buckets[key]
+
+    async def _send(self, method, url, kwargs):
+        """在共享会话上发送请求，非JSON响应返回原始文本"""
+        async with self._session.request(method, url, **kwargs) as res:
+            text = await res.text()
+            try:
+                payload = json.loads(text)
+            except ValueError:
+                payload = text
+            return res.status, payload, res.headers
+
+    def url_for(self, adapter):
+        # 优先使用构造时传入的 base_urls，其次是环境变量(本地替身服务)，最后是适配器的默认地址
+        base_url = self.base_urls.get(adapter.venue) or resolve_rest_url(adapter.venue, adapter.base_url)
+        return base_url + adapter.request_path
+
+    def cache_key_for(self, adapter, symbol, start, end):
+        """
+        时间段的缓存键；未启用缓存或窗口尚未结束时返回None
+        """
+        if self.cache is None or not self.cache.is_closed(end + adapter.interval_ms):
+            return None
+        # 键中包含完整URL，本地测试服务器的响应不会与真实接口混用
+        return cache_key(adapter.venue, adapter.method, self.url_for(adapter), adapter.build_request(symbol, start, end))
+
+    async def request(self, adapter, symbol, start, end):
+        """
+        发送单个时间段的请求(已包含限速)
+
+        Returns:
+            tuple: (status_code, payload, headers)
+        """
+        await self.bucket_for(adapter).acquire(adapter.request_weight())
+        url = self.url_for(adapter)
+        kwargs = adapter.build_request(symbol, start, end)
+        return await self._send(adapter.method, url, kwargs)
+
+    async def fetch(self, adapter, symbol, segments, queue=None):
+        """
+        并发获取所有时间段的数据，失败的时间段按退避策略重新入队
+
+        Args:
+            adapter (VenueAdapter): 交易所接口适配器
+            symbol (str): 交易所的交易对名称
+            segments (list): [(start_ms, end_ms), ...]
+            queue (SegmentQueue): 任务队列，传入时跳过已完成的时间段、持久化进度并分批写入存储；
+                默认只在内存中记录
+
+        Returns:
+            DataFrame: 队列缓冲区中尚未写入存储的数据(默认队列为全部数据)
+        """
+        if queue is None:
+            queue = SegmentQueue(f"{adapter.venue}_{symbol}_{adapter.file_suffix}", segments, adapter.columns,
+                                 state_dir=None)
+        pending = queue.pending
+        if not pending:
+            return queue.frame()
+        logger.info(f"{adapter.venue} {symbol} {adapter.kind}: 共 {len(pending)} 个时间段, "
+                    f"数据采集始于: {datetime.fromtimestamp(max(e for _, e in pending) / 1000.0)}, "
+                    f"止于: {datetime.fromtimestamp(min(s for s, _ in pending) / 1000.0)}")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        aborted = asyncio.Event()
+        bucket = self.bucket_for(adapter)
+
+        async def attempt(start, end):
+            """
+            请求一次
+
+            Returns:
+                tuple: (rows, retry, retry_after)，rows 为 None 表示本次失败
+            """
+            loop = asyncio.get_running_loop()
+            key = self.cache_key_for(adapter, symbol, start, end)
+            if key is not None:
+                # 缓存读写是磁盘I/O，在线程池中执行
+                payload = await loop.run_in_executor(self._executor, self.cache.get, key)
+                if payload is not None:
+                    return adapter.parse_response(payload), False, None
+            async with semaphore:
+                if aborted.is_set():
+                    return None, False, None
+                try:
+                    status, payload, headers = await self.request(adapter, symbol, start, end)
+                except Exception as e:
+                    logger.warning(f"请求异常: start={start}, end={end}, {str(e)}")
+                    return None, True, None
+            retry_after = retry_after_seconds(headers)
+            try:
+                if status in (418, 429) or status >= 500:
+                    logger.warning(f"收到状态码 {status}: start={start}, end={end}, Retry-After={retry_after}")
+                    if retry_after is not None:
+                        bucket.pause(retry_after)
+                    return None, True, retry_after
+                if status != 200:
+                    adapter.check_error(status, payload)
+                    logger.error(f"API请求失败: 状态码 {status}, 响应: {payload}")
+                    return None, False, None
+                rows = adapter.parse_response(payload)
+                if key is not None and rows:
+                    await loop.run_in_executor(self._executor, self.cache.put, key, payload)
+                return rows, False, None
+            except FetchAbort as e:
+                # 在途的其他请求可能返回同样的错误，只记录一次
+                if not aborted.is_set():
+                    logger.error(f"终止获取 {adapter.venue} {symbol}: {str(e)}")
+                aborted.set()
+                return None, False, None
+            except SegmentError as e:
+                logger.warning(f"API请求失败: start={start}, end={end}, {str(e)}")
+                if e.retryable and retry_after is not None:
+                    bucket.pause(retry_after)
+                return None, e.retryable, retry_after
+
+        async def worker(start, end):
+            for n in range(1, queue.policy.max_attempts + 1):
+                rows, retry, retry_after = await attempt(start, end)
+                if rows is not None:
+                    if not rows:
+                        logger.warning(f"该时间段未获取到数据: start={start}, end={end}")
+                    await queue.mark_done((start, end), rows)
+                    return
+                if not retry or aborted.is_set():
+                    break
+                if n < queue.policy.max_attempts:
+                    await asyncio.sleep(queue.policy.delay(n, retry_after))
+            if not aborted.is_set():
+                queue.mark_failed((start, end))
+
+        await asyncio.gather(*(worker(start, end) for start, end in pending))
+        return queue.frame()
+
+
+def frame_from_rows(adapter, rows):
+    """将数据行转换为DataFrame: timestamp为int64，其余列转换为数值"""
+    df = pd.DataFrame(rows, columns=adapter.columns)
+    df['timestamp'] = df['timestamp'].astype('int64')
+    for column in adapter.columns[1:]:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df
+
+
+def import_legacy_csv(adapter, ticker, csv_dir=None):
+    """
+    将旧版的单交易所CSV文件({venue}_{ticker}_1m.csv / _fr.csv)导入分区存储后删除
+
+    Returns:
+        bool: 无旧文件或导入成功返回True，读取失败返回False
+    """
+    csv_path = adapter.csv_path(ticker, csv_dir)
+    if not os.path.exists(csv_path):
+        return True
+    try:
+        legacy = pd.read_csv(csv_path)
+        logger.info(f"读取现有CSV文件: {csv_path}, 包含 {len(legacy)} 条记录")
+    except Exception as e:
+        logger.error(f"读取CSV文件失败: {str(e)}")
+        return False
+    if 'timestamp' in legacy.columns:
+        legacy = legacy.dropna(subset=['timestamp']).reindex(columns=adapter.columns)
+        append_rows(adapter.kind, adapter.venue, ticker, frame_from_rows(adapter, legacy.to_numpy().tolist()), csv_dir)
+    os.remove(csv_path)
+    remove_manifest_entry(csv_path)
+    logger.info(f"已将 {csv_path} 导入分区存储")
+    return True
+
+
+def store_history(adapter, df, ticker, csv_dir=None):
+    """
+    将一批新数据追加到按日期分区的存储中，不读取或重写已有历史
+
+    Args:
+        adapter (VenueAdapter): 交易所接口适配器
+        df (DataFrame): 新数据(RecordBuffer.frame 的结果)
+        ticker (str): 如 'BTC'
+        csv_dir (str): 存储根目录，默认按数据类型选择 data/candles 或 data/fundingRates
+
+    Returns:
+        int: 新写入的行数
+    """
+    if len(df) == 0:
+        return 0
+    written = append_rows(adapter.kind, adapter.venue, ticker, df, csv_dir)
+    logger.info(f"写入 {len(df)} 条记录, 新增 {written} 条: {series_dir(adapter.kind, adapter.venue, ticker, csv_dir)}")
+    return written
+
+
+async def fetch_history_async(engine, adapter, symbol, segments, ticker, save_to_csv=True, csv_dir=None,
+                              state_dir=QUEUE_DIR, return_data=True):
+    """
+    在已有引擎上获取一个 交易所 × ticker 的历史数据并追加到分区存储
+
+    保存时数据按 FLUSH_SEGMENTS / FLUSH_ROWS 分批写入存储，进度与检查点持久化到 state_dir，
+    中断后重新运行会从中断处继续。
+
+    Args:
+        return_data (bool): 是否返回数据；批量采集时传False，避免把整个时间窗口读回内存
+
+    Returns:
+        DataFrame or bool or None: 请求时间范围内的数据(按时间排序，含datetime列)；
+            return_data 为 False 时返回True；读取旧版CSV文件失败时返回None
+    """
+    if save_to_csv and not import_legacy_csv(adapter, ticker, csv_dir):
+        return None
+    sink = (lambda df: store_history(adapter, df, ticker, csv_dir)) if save_to_csv else None
+    queue = SegmentQueue(f"{adapter.venue}_{ticker}_{adapter.file_suffix}", segments, adapter.columns,
+                         state_dir=state_dir if save_to_csv else None, sink=sink)
+    result = await engine.fetch(adapter, symbol, segments, queue=queue)
+    await queue.finish()
+    if not return_data:
+        return True
+
+    if save_to_csv and segments:
+        # 数据已分批写入存储，从存储中读回本次请求的时间范围
+        result = read_series(adapter.kind, adapter.venue, ticker, start=min(s for s, _ in segments),
+                             end=max(e for _, e in segments), root=csv_dir)
+    if len(result) == 0:
+        logger.warning("未获取到任何新数据")
+    # 将timestamp转换为datetime格式，方便排序和查看
+    result['datetime'] = pd.to_datetime(result['timestamp'], unit='ms')
+    return result
+
+
+def run_history_fetch(adapter, symbol, segments, ticker, save_to_csv=True, csv_dir=None,
+                      concurrency=DEFAULT_CONCURRENCY, base_urls=None, use_cache=True):
+    """
+    同步入口：各获取脚本的 *_fetch_history_* 函数通过它调用引擎
+
+    Args:
+        adapter (VenueAdapter): 交易所接口适配器
+        symbol (str): 交易所的交易对名称
+        segments (list): [(start_ms, end_ms), ...]
+        ticker (str): 如 'BTC'，用于文件名
+        save_to_csv (bool): 是否保存到CSV文件
+        csv_dir (str): 存储根目录，默认按数据类型选择 data/candles 或 data/fundingRates
+        concurrency (int): 同时在途的请求数上限
+        base_urls (dict): 交易所前缀 -> 基础URL 的覆盖
+        use_cache (bool): 是否使用已结束时间窗口的响应缓存
+
+    Returns:
+        DataFrame or None
+    """
+    async def _run():
+        cache = ResponseCache() if use_cache else None
+        async with HistoryEngine(concurrency=concurrency, base_urls=base_urls, cache=cache) as engine:
+            return await fetch_history_async(engine, adapter, symbol, segments, ticker, save_to_csv, csv_dir)
+
+    return asyncio.run(_run())
+
+
+# 基准测试: python src/data_fetch/history_engine.py
+# 在本地启动一个带固定延迟的 Binance K线接口桩服务，对比逐段阻塞请求与引擎的吞吐量
+if __name__ == '__main__':
+    import requests
+    import threading
+    from urllib.parse import urlparse, parse_qs
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from src.data_fetch.bin_history_fetch import BinanceKlineAdapter
+
+    LATENCY = 0.1  # 模拟的单次请求往返延迟(秒)
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            start, end = int(query['startTime'][0]), int(query['endTime'][0])
+            time.sleep(LATENCY)
+            body = json.dumps([[t, '1', '2', '0.5', '1.5', '10', t + 59999, '0', 1, '0', '0', '0']
+                               for t in range(start, end, MINUTE_MS)]).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    adapter = BinanceKlineAdapter()
+    base = 1_700_000_000_000 - 1_700_000_000_000 % MINUTE_MS
+    segments = [(base + i * 60 * MINUTE_MS, base + (i + 1) * 60 * MINUTE_MS) for i in range(400)]
+    limit_rps = adapter.bucket_rate / adapter.request_weight()
+
+    # 原实现: 逐段阻塞请求
+    n_serial = 20
+    with requests.Session() as session:
+        t0 = time.perf_counter()
+        for start, end in segments[:n_serial]:
+            session.get(stub_url + adapter.request_path, params=adapter.build_request('BTCUSDT', start, end)['params'],
+                        timeout=REQUEST_TIMEOUT).json()
+        serial_rps = n_serial / (time.perf_counter() - t0)
+
+    async def _bench():
+        async with HistoryEngine(concurrency=32, base_urls={'bin': stub_url}) as engine:
+            t0 = time.perf_counter()
+            df = await engine.fetch(adapter, 'BTCUSDT', segments)
+            return df, time.perf_counter() - t0
+
+    df, elapsed = asyncio.run(_bench())
+    server.shutdown()
+    print(f"接口延迟 {LATENCY * 1000:.0f} ms, 限速 {limit_rps:.0f} 次/秒 (令牌桶容量 {adapter.bucket_capacity:.0f})")
+    print(f"  逐段请求: {serial_rps:7.1f} 次/秒")
+    print(f"  引擎并发: {len(segments) / elapsed:7.1f} 次/秒  ({len(segments)} 个时间段, {len(df)} 行, {elapsed:.2f} 秒)")
@@ -0,0 +1,123 @@
+"""
+本地历史数据查询
+
+back_test、analyze 等使用方以往打开整个CSV文件再在pandas中过滤。
+load_history 直接查询分区存储，把筛选条件下推到读取阶段:
+
+    - ticker / 交易所: 只打开对应的 venue=/ticker= 目录
+    - 时间范围: 按 _index.json 跳过范围外的日期分区，Parquet 分片按行组过滤
+    - 字段: 只读取需要的列
+
+    load_history(['BTC', 'ETH'], ['bin', 'hl'], start, end, fields=['open', 'close'])
+
+字段名不带交易所前缀(open、close、volume、fr 等)，结果为紧凑列类型(见 schema)。
+"""
+import numpy as np
+import pandas as pd
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
+# 导入日志模块
+from src.logger import setup_logger
+from src.data_fetch.data_gaps import VENUES
+from src.data_fetch.partition_store import read_series, series_columns
+from src.data_fetch.schema import split_column, venue_column, to_long
+
+# 获取logger实例
+logger = setup_logger('HistoryQuery')
+
+LAYOUTS = ('wide', 'arrays', 'long')
+
+
+def _query_columns(kind, venue, ticker, fields, root):
+    """字段名 -> 该序列中实际存在的列名；fields 为None时返回全部数据列"""
+    stored = [c for c in series_columns(kind, venue, ticker, root) if c != 'timestamp']
+    if fields is None:
+        return stored
+    wanted = [venue_column(venue, f) for f in fields]
+    missing = [c for c in wanted if c not in stored]
+    if stored and missing:
+        logger.warning(f"{venue} {ticker} {kind} 没有字段: {missing}")
+    return [c for c in wanted if c in stored]
+
+
+def load_history(tickers, venues=VENUES, start=None, end=None, fields=None, kind=None, layout='wide', root=None):
+    """
+    查询本地存储的历史K线或资金费率
+
+    Args:
+        tickers (list or str): 如 ['BTC', 'ETH']
+        venues (list): 交易所前缀，默认全部
+        start (int): 起始时间戳(毫秒, 含)，None 表示不限
+        end (int): 结束时间戳(毫秒, 含)，None 表示不限
+        fields (list): 字段名，如 ['open', 'close']；[] 表示只读取timestamp；None 表示全部字段
+        kind (str): 'candles' 或 'fr'，默认 fields 为 ['fr'] 时查询资金费率，否则查询K线
+        layout (str):
+            'wide'   按timestamp外连接对齐的DataFrame，索引为timestamp，列为 (ticker, venue, field) 多级索引
+            'arrays' {(ticker, venue): {'timestamp': ndarray, field: ndarray, ...}}
+            'long'   长表 ['timestamp', 'venue', 'ticker', field, ...]，venue/ticker 为分类类型
+        root (str): 存储根目录，默认按kind选择
+
+    Returns:
+        DataFrame or dict: 参数错误时返回None
+    """
+    if layout not in LAYOUTS:
+        logger.error(f"不支持的结果格式: {layout}，可选 {LAYOUTS}")
+        return None
+    tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+    if kind is None:
+        kind = 'fr' if fields is not None and len(fields) and set(fields) == {'fr'} else 'candles'
+
+    frames = {}
+    for ticker in tickers:
+        for venue in venues:
+            columns = _query_columns(kind, venue, ticker, fields, root)
+            df = read_series(kind, venue, ticker, start=start, end=end, columns=columns, root=root)
+            if len(df):
+                frames[(ticker, venue)] = df
+
+    if layout == 'arrays':
+        return {key: {('timestamp' if c == 'timestamp' else split_column(c)[1]): df[c].to_numpy() for c in df.columns}
+                for key, df in frames.items()}
+
+    if layout == 'long':
+        parts = [to_long(df, venue, ticker, tickers) for (ticker, venue), df in frames.items()]
+        if not parts:
+            return pd.DataFrame(columns=['timestamp', 'venue', 'ticker'] + list(fields or []))
+        return pd.concat(parts, ignore_index=True).sort_values(['timestamp', 'ticker', 'venue'], kind='stable',
+                                                               ignore_index=True)
+
+    parts = []
+    for (ticker, venue), df in frames.items():
+        df = df.set_index('timestamp')
+        df.columns = pd.MultiIndex.from_tuples([(ticker, venue, split_column(c)[1]) for c in df.columns],
+                                               names=['ticker', 'venue', 'field'])
+        parts.append(df)
+    if not parts:
+        return pd.DataFrame(index=pd.Index([], dtype=np.int64, name='timestamp'))
+    wide = pd.concat(parts, axis=1, join='outer').sort_index()
+    wide.index.name = 'timestamp'
+    return wide
+
+
+def venue_matrix(tickers, venues, field, start=None, end=None, kind=None, root=None):
+    """
+    单个字段在 时间 × 交易所 上的对齐矩阵，便于向量化计算
+
+    Returns:
+        tuple: (timestamps, matrix, columns) matrix 形状为 (len(timestamps), len(columns))，
+            columns 为 [(ticker, venue), ...]，缺失处为NaN
+    """
+    wide = load_history(tickers, venues, start, end, fields=[field], kind=kind, root=root)
+    if wide.empty:
+        return np.array([], dtype=np.int64), np.empty((0, 0), dtype=np.float32), []
+    wide = wide.droplevel('field', axis=1)
+    return wide.index.to_numpy(dtype=np.int64), wide.to_numpy(), list(wide.columns)
+
+
+if __name__ == '__main__':
+    closes = load_history(['BTC'], fields=['close'])
+    logger.info(f"BTC 收盘价: {closes.shape}")
+    print(closes.tail())
@@ -0,0 +1,174 @@
+"""
+已结束时间窗口的HTTP响应缓存
+
+已经结束的历史时间窗口(K线、资金费率历史)不会再变化，但每次重新运行 data_merge 或获取脚本
+都会重新请求。本模块按 交易所 + 接口 + 规范化的请求参数 的哈希将响应体保存到磁盘:
+
+    data/http_cache/3f/3fa2...e1.json.gz
+
+    - 只缓存窗口终点早于 当前时间 - 安全边际 的成功响应，未结束的窗口总是重新请求
+    - 命中缓存的请求不消耗交易所的限速令牌
+    - 缓存总大小超过上限时按最近访问时间淘汰(LRU)，访问时间记录在文件的修改时间上，跨进程有效
+"""
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
+# 导入日志模块
+from src.logger import setup_logger
+from src.data_fetch.data_gaps import DATA_DIR
+
+# 获取logger实例
+logger = setup_logger('HttpCache')
+
+CACHE_DIR = os.path.join(DATA_DIR, 'http_cache')
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # 缓存总大小上限
+SAFETY_MARGIN_MS = 10 * 60 * 1000  # 窗口结束后多久才视为不再变化(交易所数据可能延迟修正)
+CACHE_SUFFIX = '.json.gz'
+
+
+def cache_key(venue, method, path, request):
+    """
+    请求的规范化键: 参数按键排序、数值统一转为字符串后取SHA-256
+
+    Args:
+        venue (str): 交易所前缀
+        method (str): 'GET' 或 'POST'
+        path (str): 接口路径，如 '/fapi/v1/klines'
+        request (dict): 传给 requests 的关键字参数(params 或 json)
+
+    Returns:
+        str: 十六进制哈希
+    """
+    def canonical(value):
+        if isinstance(value, dict):
+            return {str(k): canonical(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [canonical(v) for v in value]
+        return str(value)
+
+    text = json.dumps([venue, method.upper(), path, canonical(request)], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    磁盘响应缓存，按总大小做LRU淘汰
+
+    get/put 可以在多个线程中调用。
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, safety_margin_ms=SAFETY_MARGIN_MS):
+        """
+        Args:
+            cache_dir (str): 缓存目录
+            max_bytes (int): 缓存总大小上限(字节)
+            safety_margin_ms (int): 窗口终点需要早于 当前时间 - safety_margin_ms 才会被缓存
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.safety_margin_ms = safety_margin_ms
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = None  # key -> 文件大小，按最近访问排序
+        self._total = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + CACHE_SUFFIX)
+
+    def _load_entries(self):
+        """首次使用时扫描缓存目录，按文件修改时间(最近访问时间)排序"""
+        if self._entries is not None:
+            return
+        found = []
+        if os.path.isdir(self.cache_dir):
+            for sub in os.scandir(self.cache_dir):
+                if not sub.is_dir():
+                    continue
+                for entry in os.scandir(sub.path):
+                    if entry.name.endswith(CACHE_SUFFIX):
+                        stat = entry.stat()
+                        found.append((stat.st_mtime, entry.name[:-len(CACHE_SUFFIX)], stat.st_size))
+        self._entries = OrderedDict((key, size) for _, key, size in sorted(found))
+        self._total = sum(self._entries.values())
+
+    def is_closed(self, window_end_ms, now_ms=None):
+        """时间窗口是否已经结束足够久，可以缓存"""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        return window_end_ms < now_ms - self.safety_margin_ms
+
+    def get(self, key):
+        """
+        读取缓存的响应体
+
+        Returns:
+            响应体(已解析的JSON)，未命中时返回None
+        """
+        with self._lock:
+            self._load_entries()
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    payload = json.load(f)
+                os.utime(path)
+            except (OSError, EOFError, json.JSONDecodeError) as e:
+                logger.warning(f"读取缓存失败，将重新请求: {path}, {e}")
+                self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload):
+        """写入响应体，超过大小上限时淘汰最久未访问的条目"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump(payload, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"写入缓存失败: {path}, {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            self._load_entries()
+            self._total += size - self._entries.get(key, 0)
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        """删除一个条目(调用方持有锁)"""
+        self._total -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self):
+        """
+        Returns:
+            dict: 命中数、未命中数、条目数与总大小
+        """
+        with self._lock:
+            self._load_entries()
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'bytes': self._total}
@@ -0,0 +1,445 @@
+"""
+历史数据文件清单(manifest)
+
+在 data/candles 与 data/fundingRates 目录下各维护一个 manifest.json，
+记录每个数据文件的时间范围、行数、缺口数、字段结构、文件大小与内容哈希。
+merge_exchange_data 在写合并文件时同步更新清单；各交易所的序列存放在分区存储(partition_store)中，
+每次写入分区后由其 _index.json 的行数与边界生成条目，键为索引文件的相对路径(如 venue=bin/ticker=BTC/_index.json)。
+覆盖范围查询与缓存失效判断只需读取清单，无需重新解析整个CSV文件。
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
+# 导入日志模块
+from src.logger import setup_logger
+from src.data_fetch.data_gaps import classify_file, summarize_frame, _venue_columns, CANDLES_DIR, FUNDING_DIR, \
+    VENUES, CANDLE_INTERVAL_MS
+
+INDEX_FILENAME = '_index.json'
+
+# 获取logger实例
+logger = setup_logger('DataManifest')
+
+MANIFEST_FILENAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+_manifest_lock = threading.Lock()
+
+
+def manifest_path(data_dir):
+    """数据目录对应的清单文件路径"""
+    return os.path.join(data_dir, MANIFEST_FILENAME)
+
+
+def load_manifest(data_dir):
+    """
+    读取数据目录的清单
+
+    Args:
+        data_dir (str): 数据目录，如 data/candles
+
+    Returns:
+        dict: 文件名 -> 文件信息，清单不存在时返回空字典
+    """
+    path = manifest_path(data_dir)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get('files', {})
+    except (json.JSONDecodeError, OSError) as e:
+        logger.warning(f"读取清单失败，将重新生成: {path}, {e}")
+        return {}
+
+
+def _save_manifest(data_dir, files):
+    """原子写入清单：先写临时文件再替换"""
+    path = manifest_path(data_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': files}, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_hash(file_path, chunk_size=1024 * 1024):
+    """按块计算文件内容的SHA-256哈希"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StreamSummary:
+    """
+    分块写入文件时逐块累积清单统计
+
+    每个交易所只保留首尾时间戳、行数与相邻时间戳差值的直方图，
+    内存占用与历史长度无关；缺口数与缺失条数由直方图计算，与 summarize_frame 的结果一致。
+    各块须按timestamp升序且块与块之间不重叠。
+    """
+
+    def __init__(self, kind):
+        self.kind = kind  # 'candles' 或 'fr'
+        self.rows = 0
+        self.min_ts = None
+        self.max_ts = None
+        self.schema = None
+        self.venues = {}  # venue -> {'rows', 'first', 'last', 'diffs': {差值: 次数}}
+
+    def update(self, chunk):
+        """累积一个数据块"""
+        if self.schema is None:
+            self.schema = {str(c): str(t) for c, t in chunk.dtypes.items()}
+        if len(chunk) == 0:
+            return
+        self.rows += len(chunk)
+        all_ts = chunk['timestamp'].to_numpy(dtype=np.int64)
+        self.min_ts = int(all_ts[0]) if self.min_ts is None else self.min_ts
+        self.max_ts = int(all_ts[-1])
+
+        for v in VENUES:
+            columns = _venue_columns(self.kind, v)
+            if not all(c in chunk.columns for c in columns):
+                continue
+            ts = all_ts[chunk[columns].notna().all(axis=1).to_numpy()]
+            if len(ts) == 0:
+                continue
+            stats = self.venues.setdefault(v, {'rows': 0, 'first': int(ts[0]), 'last': None, 'diffs': {}})
+            if stats['last'] is not None:
+                ts = np.r_[stats['last'], ts]
+                stats['rows'] -= 1
+            values, counts = np.unique(np.diff(ts), return_counts=True)
+            for value, count in zip(values.tolist(), counts.tolist()):
+                stats['diffs'][value] = stats['diffs'].get(value, 0) + count
+            stats['rows'] += len(ts)
+            stats['last'] = int(ts[-1])
+
+    def series(self):
+        """各交易所序列的概要，格式与清单条目中的 series 相同"""
+        result = []
+        for v, stats in self.venues.items():
+            diffs = stats['diffs']
+            if self.kind == 'candles':
+                interval = CANDLE_INTERVAL_MS
+            else:
+                # 与 infer_interval 一致: 出现次数最多的差值，次数相同时取较小者
+                interval = min(diffs, key=lambda d: (-diffs[d], d)) if diffs else 0
+            gaps = {d: c for d, c in diffs.items() if interval > 0 and d > interval}
+            result.append({
+                'venue': v, 'interval_ms': int(interval), 'rows': int(stats['rows']),
+                'first': stats['first'], 'last': stats['last'], 'gaps': int(sum(gaps.values())),
+                'missing': int(sum(c * (d // interval - 1) for d, c in gaps.items())),
+            })
+        return result
+
+
+def describe_file(file_path, df=None, summary=None):
+    """
+    生成单个数据文件的清单条目
+
+    Args:
+        file_path (str): 数据文件路径
+        df (DataFrame): 刚写入该文件的数据，传入时直接统计，避免重新解析文件
+        summary (StreamSummary): 分块写入时累积的统计，传入时不需要df
+
+    Returns:
+        dict: 清单条目
+    """
+    if summary is not None:
+        return _describe_stream(file_path, summary)
+    if df is None:
+        df = pd.read_csv(file_path)
+
+    stat = os.stat(file_path)
+    entry = {
+        'rows': int(len(df)),
+        'min_ts': None,
+        'max_ts': None,
+        'gaps': 0,
+        'schema': {str(c): str(t) for c, t in df.dtypes.items()},
+        'bytes': int(stat.st_size),
+        'mtime': stat.st_mtime,
+        'sha256': file_hash(file_path),
+        'updated_at': int(time.time() * 1000),
+        'series': [],
+    }
+
+    info = classify_file(os.path.basename(file_path))
+    if info is not None and 'timestamp' in df.columns and len(df) > 0:
+        kind, venue, ticker = info
+        entry.update({'kind': kind, 'venue': venue, 'ticker': ticker})
+        ts = pd.to_numeric(df['timestamp'], errors='coerce')
+        entry['min_ts'] = int(ts.min())
+        entry['max_ts'] = int(ts.max())
+
+        _, summaries = summarize_frame(df, kind, venue, ticker)
+        for s_kind, s_venue, _, interval, rows, first, last, gaps, missing, _ in summaries:
+            entry['series'].append({
+                'venue': s_venue, 'interval_ms': int(interval), 'rows': int(rows),
+                'first': first, 'last': last, 'gaps': int(gaps), 'missing': int(missing),
+            })
+        entry['gaps'] = int(sum(s['gaps'] for s in entry['series']))
+    return entry
+
+
+def _describe_stream(file_path, summary):
+    """由 StreamSummary 生成清单条目"""
+    stat = os.stat(file_path)
+    entry = {
+        'rows': int(summary.rows),
+        'min_ts': summary.min_ts,
+        'max_ts': summary.max_ts,
+        'gaps': 0,
+        'schema': summary.schema or {},
+        'bytes': int(stat.st_size),
+        'mtime': stat.st_mtime,
+        'sha256': file_hash(file_path),
+        'updated_at': int(time.time() * 1000),
+        'series': [],
+    }
+    info = classify_file(os.path.basename(file_path))
+    if info is not None and summary.rows > 0:
+        kind, venue, ticker = info
+        entry.update({'kind': kind, 'venue': venue, 'ticker': ticker})
+        entry['series'] = summary.series()
+        entry['gaps'] = int(sum(s['gaps'] for s in entry['series']))
+    return entry
+
+
+def update_manifest(file_path, df=None, summary=None):
+    """
+    文件写入后更新其清单条目
+
+    Args:
+        file_path (str): 刚写入的数据文件
+        df (DataFrame): 写入的数据，可选
+        summary (StreamSummary): 分块写入时累积的统计，可选
+
+    Returns:
+        dict or None: 更新后的条目，失败时返回None
+    """
+    try:
+        entry = describe_file(file_path, df, summary)
+        data_dir = os.path.dirname(os.path.abspath(file_path))
+        with _manifest_lock:
+            files = load_manifest(data_dir)
+            files[os.path.basename(file_path)] = entry
+            _save_manifest(data_dir, files)
+        return entry
+    except Exception as e:
+        logger.error(f"更新清单失败: {file_path}, {e}")
+        return None
+
+
+def describe_series(index_path, kind, venue, ticker, index, schema=None):
+    """
+    由分区索引生成单个 交易所 × ticker 序列的清单条目，不读取数据分片
+
+    行数与首尾时间戳直接取自索引；缺失条数由各分区的行数与边界按采样间隔推算
+    (分区内 (hwm - min_ts) / 间隔 + 1 与行数之差，加上相邻分区之间的空档)。
+    K线间隔固定为1分钟，资金费率取各分区平均间隔的最小值。
+    缺口数为有缺失的分区数与分区间空档数之和，是实际缺口段数的下限。
+
+    Args:
+        index_path (str): _index.json 路径
+        kind (str): 'candles' 或 'fr'
+        index (dict): 分区索引(load_index 的结果)
+        schema (dict): 列名 -> 类型，None 时为空
+
+    Returns:
+        dict: 清单条目
+    """
+    days = [e for _, e in sorted(index.items()) if e['rows'] and e['hwm'] is not None]
+    stat = os.stat(index_path)
+    entry = {
+        'rows': int(sum(e['rows'] for e in days)),
+        'min_ts': days[0]['min_ts'] if days else None,
+        'max_ts': days[-1]['hwm'] if days else None,
+        'gaps': 0,
+        'schema': schema or {},
+        'bytes': int(stat.st_size),
+        'mtime': stat.st_mtime,
+        'sha256': file_hash(index_path),
+        'updated_at': int(time.time() * 1000),
+        'kind': kind, 'venue': venue, 'ticker': ticker,
+        'partitions': len(days),
+        'series': [],
+    }
+    if not days:
+        return entry
+
+    if kind == 'candles':
+        interval = CANDLE_INTERVAL_MS
+    else:
+        spans = [(e['hwm'] - e['min_ts']) / (e['rows'] - 1) for e in days if e['rows'] > 1]
+        interval = int(round(min(spans))) if spans else 0
+    gaps = missing = 0
+    if interval > 0:
+        for i, e in enumerate(days):
+            inside = (e['hwm'] - e['min_ts']) // interval + 1 - e['rows']
+            gaps += inside > 0
+            missing += max(inside, 0)
+            if i and e['min_ts'] - days[i - 1]['hwm'] > interval:
+                gaps += 1
+                missing += (e['min_ts'] - days[i - 1]['hwm']) // interval - 1
+    entry['series'].append({
+        'venue': venue, 'interval_ms': int(interval), 'rows': entry['rows'],
+        'first': entry['min_ts'], 'last': entry['max_ts'], 'gaps': int(gaps), 'missing': int(missing),
+    })
+    entry['gaps'] = int(gaps)
+    return entry
+
+
+def update_series_manifest(index_path, kind, venue, ticker, index, schema=None):
+    """
+    分区存储写入后更新该序列的清单条目(清单位于 data/candles 或 data/fundingRates)
+
+    Returns:
+        dict or None: 更新后的条目，失败时返回None
+    """
+    try:
+        entry = describe_series(index_path, kind, venue, ticker, index, schema)
+        data_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(index_path))))
+        name = os.path.relpath(os.path.abspath(index_path), data_dir).replace(os.sep, '/')
+        with _manifest_lock:
+            files = load_manifest(data_dir)
+            if schema is None and name in files:
+                entry['schema'] = files[name].get('schema', {})
+            files[name] = entry
+            _save_manifest(data_dir, files)
+        return entry
+    except Exception as e:
+        logger.error(f"更新清单失败: {index_path}, {e}")
+        return None
+
+
+def _series_indexes(data_dir):
+    """
+    数据目录下分区存储的序列索引
+
+    Returns:
+        dict: 清单键(索引文件相对路径) -> (venue, ticker)
+    """
+    result = {}
+    if not os.path.isdir(data_dir):
+        return result
+    for venue_dir in os.listdir(data_dir):
+        if not venue_dir.startswith('venue=') or not os.path.isdir(os.path.join(data_dir, venue_dir)):
+            continue
+        for ticker_dir in os.listdir(os.path.join(data_dir, venue_dir)):
+            if ticker_dir.startswith('ticker=') and \
+                    os.path.exists(os.path.join(data_dir, venue_dir, ticker_dir, INDEX_FILENAME)):
+                name = f"{venue_dir}/{ticker_dir}/{INDEX_FILENAME}"
+                result[name] = (venue_dir[len('venue='):], ticker_dir[len('ticker='):])
+    return result
+
+
+def remove_manifest_entry(file_path):
+    """文件删除后移除其清单条目"""
+    data_dir = os.path.dirname(os.path.abspath(file_path))
+    with _manifest_lock:
+        files = load_manifest(data_dir)
+        if files.pop(os.path.basename(file_path), None) is not None:
+            _save_manifest(data_dir, files)
+
+
+def is_fresh(file_path, entry=None):
+    """
+    判断清单条目是否仍与磁盘上的文件一致(大小与修改时间)，用于缓存失效判断
+
+    Returns:
+        bool: 一致返回True
+    """
+    if entry is None:
+        entry = load_manifest(os.path.dirname(os.path.abspath(file_path))).get(os.path.basename(file_path))
+    if entry is None or not os.path.exists(file_path):
+        return False
+    stat = os.stat(file_path)
+    return entry.get('bytes') == stat.st_size and entry.get('mtime') == stat.st_mtime
+
+
+def refresh_manifest(data_dir):
+    """
+    重新扫描目录(CSV文件与分区存储的序列索引)，只为新增或变化的文件重新生成条目，并移除已不存在的文件
+
+    Returns:
+        dict: 更新后的清单
+    """
+    files = load_manifest(data_dir)
+    names = {f for f in os.listdir(data_dir) if f.endswith('.csv')} if os.path.isdir(data_dir) else set()
+    indexes = _series_indexes(data_dir)
+    # 新发现的序列没有条目时按目录判断数据类型
+    default_kind = 'fr' if os.path.abspath(data_dir) == os.path.abspath(FUNDING_DIR) else 'candles'
+
+    changed = False
+    for name in sorted(names):
+        path = os.path.join(data_dir, name)
+        if not is_fresh(path, files.get(name)):
+            try:
+                files[name] = describe_file(path)
+                changed = True
+                logger.info(f"清单已更新: {name}")
+            except Exception as e:
+                logger.error(f"生成清单条目失败: {path}, {e}")
+    for name, (venue, ticker) in sorted(indexes.items()):
+        path = os.path.join(data_dir, name)
+        old = files.get(name)
+        if not is_fresh(path, old):
+            old = old or {}
+            try:
+                with open(path, encoding='utf-8') as f:
+                    index = json.load(f)
+                files[name] = describe_series(path, old.get('kind', default_kind), venue, ticker, index,
+                                              old.get('schema'))
+                changed = True
+                logger.info(f"清单已更新: {name}")
+            except Exception as e:
+                logger.error(f"生成清单条目失败: {path}, {e}")
+    for name in set(files) - names - set(indexes):
+        del files[name]
+        changed = True
+
+    if changed:
+        with _manifest_lock:
+            _save_manifest(data_dir, files)
+    return files
+
+
+def coverage(kind, venue, ticker, data_dir=None):
+    """
+    查询某个 交易所 × ticker 的本地数据覆盖范围，只读取清单
+
+    Args:
+        kind (str): 'candles' 或 'fr'
+        venue (str): 交易所前缀，如 'bin'
+        ticker (str): 如 'BTC'
+        data_dir (str): 数据目录，默认按kind选择 data/candles 或 data/fundingRates
+
+    Returns:
+        list: 覆盖该序列的条目 [{'file', 'first', 'last', 'rows', 'gaps', 'interval_ms'}, ...]
+    """
+    data_dir = data_dir or (CANDLES_DIR if kind == 'candles' else FUNDING_DIR)
+    result = []
+    for name, entry in load_manifest(data_dir).items():
+        if entry.get('kind') != kind or entry.get('ticker') != ticker:
+            continue
+        for series in entry.get('series', []):
+            if series['venue'] == venue and series['rows'] > 0:
+                result.append({'file': name, **{k: series[k] for k in ('first', 'last', 'rows', 'gaps', 'interval_ms')}})
+    return result
+
+
+if __name__ == '__main__':
+    for directory in (CANDLES_DIR, FUNDING_DIR):
+        manifest = refresh_manifest(directory)
+        logger.info(f"{directory}: 清单共 {len(manifest)} 个文件")
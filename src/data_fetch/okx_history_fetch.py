@@ -1,13 +1,6 @@
 """
 OKX 历史数据获取脚本
 """
-import requests
-import json
-import pandas as pd
-import os
-import time
-from datetime import datetime
-from collections import deque
 from sys import path as sys_path
 from os import path as os_path
 
@@ -15,367 +8,134 @@ from os import path as os_path
 sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
 # 导入日志模块
 from src.logger import setup_logger
-from src.utils import genearate_history_moments
+from src.time_grid import floor_to_minute
+from src.data_fetch.history_engine import VenueAdapter, SegmentError, run_history_fetch
 
 # 获取logger实例
 logger = setup_logger('OKXHistoryDataFetching')
 
 BASE_URL = "https://www.okx.com"
 
-# 流动性数据
+# 可重试的错误代码: 服务暂不可用 / 请求过于频繁 / 系统繁忙
+RETRYABLE_CODES = ('50001', '50011', '50013')
+
+# 流动性数据(由 orderbook_recorder 订阅深度数据流记录)
 # - timestamp
 # - side (bid & ask)
-# - price 
+# - price
 # - volume
 
 # 资金费率数据
 # - timestamp
 # - funding_rate
-def okx_fetch_history_funding_rates(symbol, segments, ticker, save_to_csv=True, csv_dir=None):
-    """
-    获取历史资金费率数据并与K线数据合并
-    
-    参数:
-        symbol: 交易对，如'BTC-USDT-SWAP'
-        save_to_csv: 是否保存到CSV文件
-        csv_dir: CSV文件保存目录，默认为项目根目录下的data/candles目录
-    
-    返回:
-        合并了资金费率的K线数据
-    """
 
-    # 设置CSV文件保存路径
-    if csv_dir is None:
-        # 默认保存到项目根目录下的data/candles目录
-        csv_dir = os.path.join(os_path.dirname(os_path.dirname(os_path.dirname(__file__))), 'data', 'fundingRates')
-    
-    # 确保目录存在
-    os.makedirs(csv_dir, exist_ok=True)
-    
-    # CSV文件名：okx_symbol_1m.csv
-    csv_filename = f"okx_{ticker}_fr.csv"
-    csv_path = os.path.join(csv_dir, csv_filename)
-    
-    # 读取现有K线CSV文件(如果存在)
-    existing_data = None
-    if os.path.exists(csv_path):
-        try:
-            existing_data = pd.read_csv(csv_path)
-            logger.info(f"读取现有资金费率CSV文件: {csv_path}, 包含 {len(existing_data)} 条记录")
-        except Exception as e:
-            logger.error(f"读取CSV文件失败: {str(e)}")
-            return None
 
-    # GET /api/v5/public/funding-rate-history
-    method = 'GET'
+def _okx_data(payload):
+    """取出响应中的data字段，code不为'0'时视为该时间段请求失败"""
+    code = payload.get('code', '0')
+    if code != '0':
+        raise SegmentError(f"{code}: {payload.get('msg')}", retryable=code in RETRYABLE_CODES)
+    return payload.get('data') or []
+
+
+class OKXFundingAdapter(VenueAdapter):
+    """GET /api/v5/public/funding-rate-history"""
+    venue = 'okx'
+    kind = 'fr'
+    base_url = BASE_URL
     request_path = '/api/v5/public/funding-rate-history'
-    url = BASE_URL + request_path
-    
-    funding_rates_data = []  # 存储所有资金费率数据
-    
-    # 实现限速控制 - 使用滑动窗口跟踪最近的请求时间
-    request_times = deque(maxlen=20)  # 最多保存20个请求时间
-    
-    for i in range(len(segments)):
-        start = segments[i][0]
-        end = segments[i][1]
-        body = {
+    page_limit = 100
+    columns = ['timestamp', 'okxFR']
+    # 10次/2秒/IP
+    bucket_key = 'okx_funding'
+    bucket_rate = 5
+    bucket_capacity = 10
+
+    def build_request(self, symbol, start, end):
+        return {'params': {
             'instId': symbol,
-            'after': end,
-            'before': start,
-            'limit': '24',
-        }
+            # after/before 为开区间，各扩展1毫秒使 [start, end] 两端都被包含
+            'after': end + 1,
+            'before': start - 1,
+            'limit': str(self.page_limit),
+        }}
 
-        if i == 0:
-            logger.info(f"数据采集始于: {datetime.fromtimestamp(end / 1000.0)}")
-        elif i == len(segments)-2:
-            logger.info(f"数据采集止于: {datetime.fromtimestamp(start / 1000.0)}")
-        
-        # 限速控制 - 如果已经有20个请求在最近2秒内发出，则等待
-        current_time = time.time()
-        if len(request_times) == 20:
-            oldest_request_time = request_times[0]
-            time_diff = current_time - oldest_request_time
-            if time_diff < 2.0:
-                # 需要等待的时间
-                wait_time = 2.0 - time_diff + 0.05  # 额外增加50ms的缓冲
-                logger.info(f"达到限速阈值，等待 {wait_time:.2f} 秒")
-                time.sleep(wait_time)
-                current_time = time.time()  # 更新当前时间
-        
-        # 记录本次请求时间
-        request_times.append(current_time)
-        
-        # 发送请求
-        try:
-            res = requests.get(
-                url,
-                params=body,
-                timeout=10  # 设置超时时间
-            )
-            
-            if res.status_code == 200:
-                msg = res.json()
-                data = msg['data']
-                if data and len(data) > 0:
-                    # 将数据添加到列表中
-                    for item in data:
-                        # 正确处理毫秒时间戳
-                        funding_time_ms = int(item['fundingTime'])
-                        # 将时间戳调整为分钟级别（去除秒和毫秒部分）
-                        adjusted_timestamp = funding_time_ms - (funding_time_ms % 60000)
-                        
-                        funding_rates_data.append({
-                            'timestamp': adjusted_timestamp,  # 使用调整后的时间戳
-                            'okxFR': float(item['fundingRate'])
-                        })
-                else:
-                    logger.warning(f"该时间段未获取到数据")
-            else:
-                # 如果是429错误(Too Many Requests)，增加等待时间
-                if res.status_code == 429:
-                    logger.warning("收到限速响应，等待5秒后继续")
-                    time.sleep(5)
-                    i -= 1  # 重试当前请求
-                    continue
-                logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
-        except Exception as e:
-            logger.error(f"请求异常: {str(e)}")
-            # 出现异常时等待一段时间后重试
-            time.sleep(2)
-            i -= 1  # 重试当前请求
-            continue
-    
-    # 如果获取到了资金费率数据
-    if funding_rates_data:
-        # 将资金费率数据转换为DataFrame
-        funding_df = pd.DataFrame(funding_rates_data)
-        
-        logger.info(f"共获取到 {len(funding_df)} 条资金费率记录")
+    def parse_response(self, payload):
+        # 将时间戳调整为分钟级别（去除秒和毫秒部分）
+        return [[floor_to_minute(item['fundingTime']), float(item['fundingRate'])] for item in _okx_data(payload)]
 
-        # 将timestamp转换为datetime格式，方便排序和查看
-        funding_df['datetime'] = pd.to_datetime(funding_df['timestamp'], unit='ms')
-        
-        # 如果存在现有数据，合并新旧数据
-        if existing_data is not None:
-            # 确保现有数据也有datetime列
-            if 'datetime' not in existing_data.columns:
-                existing_data['datetime'] = pd.to_datetime(existing_data['timestamp'], unit='ms')
-            
-            # 合并数据
-            combined_df = pd.concat([existing_data, funding_df])
-            
-            # 删除重复数据（基于timestamp）
-            combined_df = combined_df.drop_duplicates(subset=['timestamp'])
-            
-            # 按时间排序
-            combined_df = combined_df.sort_values('timestamp')
-            
-            # 重置索引
-            combined_df = combined_df.reset_index(drop=True)
-            
-            logger.info(f"合并后共有 {len(combined_df)} 条记录")
-            
-            # 保存到CSV
-            if save_to_csv:
-                combined_df.to_csv(csv_path, index=False)
-                logger.info(f"数据已保存到: {csv_path}")
-            
-            return combined_df
-        else:
-            # 如果没有现有数据，直接保存新数据
-            # 按时间排序
-            funding_df = funding_df.sort_values('timestamp')
-            # 重置索引
-            funding_df = funding_df.reset_index(drop=True)
-            
-            logger.info(f"共获取到 {len(funding_df)} 条新记录")
-            
-            # 保存到CSV
-            if save_to_csv:
-                funding_df.to_csv(csv_path, index=False)
-                logger.info(f"数据已保存到: {csv_path}")
-            
-            return funding_df
-    else:
-        logger.warning("未获取到任何资金费率数据")
-        return existing_data
 
+class OKXKlineAdapter(VenueAdapter):
+    """GET /api/v5/market/history-candles"""
+    venue = 'okx'
+    kind = 'candles'
+    base_url = BASE_URL
+    request_path = '/api/v5/market/history-candles'
+    page_limit = 100
+    columns = ['timestamp', 'okxOpen', 'okxHigh', 'okxLow', 'okxClose', 'okxVolume', 'okxVolCcy', 'okxVolCcyQuote', 'confirm']
+    # 20次/2秒/IP
+    bucket_key = 'okx_candles'
+    bucket_rate = 10
+    bucket_capacity = 20
 
-def okx_fetch_history_mark_price_candles(symbol, segments, ticker, save_to_csv=True, csv_dir=None):
+    def build_request(self, symbol, start, end):
+        return {'params': {
+            'instId': symbol,
+            # after/before 为开区间，各扩展1毫秒使 [start, end] 两端都被包含
+            'after': end + 1,
+            'before': start - 1,
+            'bar': '1m',
+            'limit': str(self.page_limit),
+        }}
+
+    def parse_response(self, payload):
+        # 返回数组顺序：[ts,o,h,l,c,vol,volCcy,volCcyQuote,confirm]
+        return [[int(item[0])] + item[1:] for item in _okx_data(payload)]
+
+
+def okx_fetch_history_funding_rates(symbol, segments, ticker, save_to_csv=True, csv_dir=None):
     """
-    获取历史mark price数据并保存到CSV文件
-    
+    获取历史资金费率数据并追加到分区存储
+
     参数:
         symbol: 交易对，如'BTC-USDT-SWAP'
-        save_to_csv: 是否保存到CSV文件
-        csv_dir: CSV文件保存目录，默认为项目根目录下的data/candles目录
-    
+        segments: 时间Segments
+        ticker: 币种名称，用于存储分区
+        save_to_csv: 是否写入存储
+        csv_dir: 存储根目录，默认为项目根目录下的data/fundingRates目录
+
     返回:
-        最新获取的K线数据
+        请求时间范围内的资金费率数据，读取旧版CSV文件失败时返回None
     """
-    # 设置CSV文件保存路径
-    if csv_dir is None:
-        # 默认保存到项目根目录下的data/candles目录
-        csv_dir = os.path.join(os_path.dirname(os_path.dirname(os_path.dirname(__file__))), 'data', 'candles')
-    
-    # 确保目录存在
-    os.makedirs(csv_dir, exist_ok=True)
-    
-    # CSV文件名：okx_symbol_1m.csv
-    csv_filename = f"okx_{ticker}_1m.csv"
-    csv_path = os.path.join(csv_dir, csv_filename)
-    
-    # 定义列名
-    columns = ['timestamp', 'okxOpen', 'okxHigh', 'okxLow', 'okxClose', 'okxVolume', 'okxVolCcy', 'okxVolCcyQuote', 'confirm']
-    
-    # 读取现有CSV文件(如果存在)
-    existing_data = None
-    if os.path.exists(csv_path):
-        try:
-            existing_data = pd.read_csv(csv_path)
-            logger.info(f"读取现有CSV文件: {csv_path}, 包含 {len(existing_data)} 条记录")
-        except Exception as e:
-            logger.error(f"读取CSV文件失败: {str(e)}")
-    
-    # GET /api/v5/market/history-mark-price-candles
-    method = 'GET'
-    request_path = '/api/v5/market/history-candles'
-    url = BASE_URL + request_path
-    
-    all_new_data = []  # 存储所有新获取的数据
-    
-    # 实现限速控制 - 使用滑动窗口跟踪最近的请求时间
-    request_times = deque(maxlen=20)  # 最多保存20个请求时间
-    
-    for i in range(len(segments)):
-        start = segments[i][0]
-        end = segments[i][1]
-        body = {
-            'instId': symbol,
-            'after': end,
-            'before': start,
-            'bar': '1m',
-            'limit': '60',
-        }
+    return run_history_fetch(OKXFundingAdapter(), symbol, segments, ticker, save_to_csv, csv_dir)
 
-        if i == 0:
-            logger.info(f"数据采集始于: {datetime.fromtimestamp(end / 1000.0)}")
-        elif i == len(segments)-1:
-            logger.info(f"数据采集止于: {datetime.fromtimestamp(start / 1000.0)}")
-        
-        # 限速控制 - 如果已经有20个请求在最近2秒内发出，则等待
-        current_time = time.time()
-        if len(request_times) == 20:
-            oldest_request_time = request_times[0]
-            time_diff = current_time - oldest_request_time
-            if time_diff < 2.0:
-                # 需要等待的时间
-                wait_time = 2.0 - time_diff + 0.05  # 额外增加50ms的缓冲
-                logger.info(f"达到限速阈值，等待 {wait_time:.2f} 秒")
-                time.sleep(wait_time)
-                current_time = time.time()  # 更新当前时间
-        
-        # 记录本次请求时间
-        request_times.append(current_time)
-        
-        # 发送请求
-        try:
-            res = requests.get(
-                url,
-                params=body,
-                timeout=10  # 设置超时时间
-            )
-            
-            if res.status_code == 200:
-                msg = res.json()
-                data = msg['data']
-                # 返回数组顺序：[ts,o,h,l,c,vol,volCcy,volCcyQuote,confirm]
-                
-                if data and len(data) > 0:
-                    # 将数据添加到列表中，同时转换timestamp为int类型
-                    for item in data:
-                        item[0] = int(item[0])  # 转换timestamp列为int
-                    all_new_data.extend(data)
-                else:
-                    logger.warning(f"该时间段未获取到数据: start={start}, end={end}")
-            else:
-                # 如果是429错误(Too Many Requests)，增加等待时间
-                if res.status_code == 429:
-                    logger.warning("收到限速响应，等待5秒后继续")
-                    time.sleep(5)
-                    i -= 1  # 重试当前请求
-                    continue
-                logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
-        except Exception as e:
-            logger.error(f"请求异常: {str(e)}")
-            # 出现异常时等待一段时间后重试
-            time.sleep(2)
-            i -= 1  # 重试当前请求
-            continue
-    
-    # 如果获取到了新数据
-    if all_new_data:
-        # 将新数据转换为DataFrame
-        new_df = pd.DataFrame(all_new_data, columns=columns)
-        
-        # 将timestamp转换为datetime格式，方便排序和查看
-        new_df['datetime'] = pd.to_datetime(new_df['timestamp'], unit='ms')
-        
-        # 如果存在现有数据，合并新旧数据
-        if existing_data is not None:
-            # 确保现有数据也有datetime列
-            if 'datetime' not in existing_data.columns:
-                existing_data['datetime'] = pd.to_datetime(existing_data['timestamp'], unit='ms')
-            
-            # 合并数据
-            combined_df = pd.concat([existing_data, new_df])
-            
-            # 删除重复数据（基于timestamp）
-            combined_df = combined_df.drop_duplicates(subset=['timestamp'])
-            
-            # 按时间排序
-            combined_df = combined_df.sort_values('timestamp')
-            
-            # 重置索引
-            combined_df = combined_df.reset_index(drop=True)
-            
-            logger.info(f"合并后共有 {len(combined_df)} 条记录")
-            
-            # 保存到CSV
-            if save_to_csv:
-                combined_df.to_csv(csv_path, index=False)
-                logger.info(f"数据已保存到: {csv_path}")
-            
-            return combined_df
-        else:
-            # 如果没有现有数据，直接保存新数据
-            # 按时间排序
-            new_df = new_df.sort_values('timestamp')
-            # 重置索引
-            new_df = new_df.reset_index(drop=True)
-            
-            logger.info(f"共获取到 {len(new_df)} 条新记录")
-            
-            # 保存到CSV
-            if save_to_csv:
-                new_df.to_csv(csv_path, index=False)
-                logger.info(f"数据已保存到: {csv_path}")
-            
-            return new_df
-    else:
-        logger.warning("未获取到任何新数据")
-        return existing_data if existing_data is not None else pd.DataFrame(columns=columns)
+
+def okx_fetch_history_mark_price_candles(symbol, segments, ticker, save_to_csv=True, csv_dir=None):
+    """
+    获取历史K线数据并追加到分区存储
+
+    参数:
+        symbol: 交易对，如'BTC-USDT-SWAP'
+        segments: 时间Segments
+        ticker: 币种名称，用于存储分区
+        save_to_csv: 是否写入存储
+        csv_dir: 存储根目录，默认为项目根目录下的data/candles目录
+
+    返回:
+        请求时间范围内的K线数据
+    """
+    return run_history_fetch(OKXKlineAdapter(), symbol, segments, ticker, save_to_csv, csv_dir)
 
 
 if __name__ == '__main__':
     print("开始采集数据")
     days = 1  # 要收集的天数
     symbol = 'BTC-USDT-SWAP'  # 要采集的symbol
-    
-    k_history_segments = genearate_history_moments(interval=1, batch=60, days=days)
-    okx_fetch_history_mark_price_candles(symbol=symbol, segments=k_history_segments)
+    from src.data_fetch.segment_planner import plan_recent
+
+    k_history_segments = plan_recent(OKXKlineAdapter(), 'BTC', days)
+    okx_fetch_history_mark_price_candles(symbol=symbol, segments=k_history_segments, ticker='BTC')
 
-    # fr_segments = genearate_history_moments(interval=60, batch=24, days=days)
+    # fr_segments = plan_recent(OKXFundingAdapter(), 'BTC', days)
     # logger.info(f"共获取到 {len(fr_segments)} 个时间片段: {fr_segments}")
-    # okx_fetch_histroy_funding_rates(symbol=symbol, segments=fr_segments)
\ No newline at end of file
+    # okx_fetch_history_funding_rates(symbol=symbol, segments=fr_segments, ticker='BTC')
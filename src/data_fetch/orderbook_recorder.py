@@ -0,0 +1,718 @@
+"""
+L2 订单簿记录器
+
+订阅 Hyper Liquid / Binance / OKX / Bybit 的深度数据流，将快照与增量写入紧凑的二进制追加文件:
+
+    data/orderbook/venue=bin/2024-01-01T08.obk      当前小时，追加写入
+    data/orderbook/venue=bin/2024-01-01T07.obk.gz   已结束的小时，在后台线程中压缩
+
+文件格式(小端):
+    文件头: b'OBK2' + uint32 头长度 + JSON {'venue', 'symbols', 'created'}，symbols 的下标即记录中的 symbol_id
+    记录:   RECORD_HEADER(事件时间ms, 本地接收时间ms, 首个更新ID, 最后更新ID, symbol_id, 标志位, 买档数, 卖档数)
+            + (买档数 + 卖档数) 个 (price float64, size float64)，先买后卖；size 为0表示删除该价位
+    更新ID: Binance 增量为 U/u、快照为 lastUpdateId；OKX 为 prevSeqId/seqId；Bybit 为 u；HL 为0。
+    旧的 b'OBK1' 文件(无更新ID)仍可读取，更新ID按0处理。
+
+单核处理数百个交易对:
+    - 每个连接的读取协程只记录接收时间并放入有界队列，不做解析
+    - 单个写入协程批量解析、编码，写入内存缓冲区，按大小或时间刷盘
+    - 压缩在线程池中进行，不阻塞事件循环
+队列满时丢弃并计数，序列号不连续时计数并重新同步(OKX/Bybit 重新订阅，Binance 重新获取REST快照)，
+Binance 按官方流程同步: 等待快照期间缓冲该symbol的增量，快照返回后丢弃 u < lastUpdateId 的增量，
+第一条保留的增量须满足 U <= lastUpdateId <= u，否则重新获取快照；快照请求按IP权重预算(TokenBucket)排队，
+各交易所的接收数、写入数、丢弃数、序列缺口、重连次数、延迟与队列深度定期写入日志。
+"""
+import os
+import gzip
+import json
+import time
+import struct
+import asyncio
+import requests
+import numpy as np
+import pandas as pd
+import websockets
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
+from sys import path as sys_path
+from os import path as os_path
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
+# 导入日志模块
+from src.logger import setup_logger
+from src.utils import resolve_ws_url, rebase_url
+from src.instrument_registry import venue_symbols
+from src.data_fetch.data_gaps import DATA_DIR, VENUES
+from src.data_fetch.history_engine import TokenBucket
+from src.data_fetch.segment_queue import retry_after_seconds
+
+# 获取logger实例
+logger = setup_logger('OrderBookRecorder')
+
+ORDERBOOK_DIR = os.path.join(DATA_DIR, 'orderbook')
+MAGIC = b'OBK2'
+RECORD_HEADER = struct.Struct('<qqqqHBII')
+LEGACY_HEADERS = {b'OBK1': struct.Struct('<qqHBII')}  # 旧格式，记录中没有更新ID
+LEVEL_DTYPE = np.dtype([('price', '<f8'), ('size', '<f8')])
+FLAG_SNAPSHOT = 1
+ROTATE_MS = 60 * 60 * 1000  # 每小时换一个文件，旧文件压缩
+QUEUE_SIZE = 200_000  # 待写入消息队列的容量，满时丢弃并计数
+BATCH_SIZE = 2000  # 写入协程每轮最多处理的消息数
+FLUSH_BYTES = 4 * 1024 * 1024
+FLUSH_INTERVAL = 1.0  # 秒
+HEARTBEAT_INTERVAL = 20  # 秒
+STATS_INTERVAL = 30  # 秒
+RECONNECT_DELAYS = [1, 2, 5, 10, 30]  # 重连等待(秒)，超过次数后一直使用最后一个
+BUFFER_LIMIT = 10_000  # 等待快照期间每个symbol最多缓冲的增量条数，超出时丢弃最早的
+
+BookEvent = namedtuple('BookEvent', ['symbol', 'event_ts', 'snapshot', 'bids', 'asks', 'first_id', 'last_id'],
+                       defaults=(0, 0))
+
+
+def _levels(rows):
+    """[[price, size, ...], ...] (字符串或数值) -> LEVEL_DTYPE 数组"""
+    if not rows:
+        return np.empty(0, dtype=LEVEL_DTYPE)
+    values = np.array([row[:2] for row in rows], dtype=np.float64)
+    return values.view(LEVEL_DTYPE).reshape(-1)
+
+
+class DepthFeed:
+    """
+    交易所深度数据流适配器
+
+    子类提供连接地址、订阅消息、心跳与消息解析，记录器本身与交易所无关。
+    """
+    venue = None
+    default_ws_url = None
+    symbols_per_connection = 100
+    snapshot_weight_rate = None  # REST快照的权重预算(每秒)，None 表示不需要REST快照
+    snapshot_weight_capacity = None
+
+    def __init__(self):
+        self.sequences = {}  # symbol -> 最后一条消息的序列号，用于检测缺口
+        self.pending_snapshots = set()  # 需要通过REST获取快照的symbol
+        self.buffers = {}  # symbol -> 等待快照期间缓冲的增量 deque[(上一条ID, 接收时间ms, BookEvent)]
+
+    @property
+    def ws_url(self):
+        return resolve_ws_url(self.venue, self.default_ws_url)
+
+    def symbol(self, ticker):
+        """ticker(Hyper Liquid名称) -> 交易所的交易对名称，如 ('bin', 'kPEPE') -> '1000PEPEUSDT'"""
+        return venue_symbols(self.venue, ticker)[0]
+
+    def connection_url(self, symbols):
+        return self.ws_url
+
+    def subscribe_messages(self, symbols):
+        """连接建立后发送的订阅消息"""
+        return []
+
+    def resync_messages(self, symbol):
+        """序列号出现缺口后重新同步该symbol需要发送的消息"""
+        return []
+
+    def heartbeat(self):
+        """应用层心跳消息，None 表示不需要"""
+        return None
+
+    def reset(self, symbols):
+        """连接断开后清除这些symbol的序列状态"""
+        for s in symbols:
+            self.sequences.pop(s, None)
+
+    def parse(self, message, recv_ms):
+        """
+        解析一条消息
+
+        Args:
+            message (dict): 解码后的消息
+            recv_ms (int): 本地接收时间，缓冲的增量随快照一起写入时使用
+
+        Returns:
+            tuple: (events, gaps) 订单簿事件列表与出现序列缺口的symbol列表
+        """
+        raise NotImplementedError
+
+    def snapshot_weight(self):
+        """单次REST快照请求的权重"""
+        return 1
+
+    def snapshot(self, symbol):
+        """通过REST获取快照(同步，在线程池中调用)，不支持时返回None"""
+        return None
+
+    def apply_snapshot(self, event, recv_ms):
+        """
+        快照返回后(在事件循环中调用)，确定需要写入的事件
+
+        Returns:
+            list: [(BookEvent, recv_ms), ...] 快照及其后缓冲的增量，快照不可用时为空列表
+        """
+        return [(event, recv_ms)]
+
+
+class BinanceDepthFeed(DepthFeed):
+    venue = 'bin'
+    default_ws_url = 'wss://fstream.binance.com'
+    symbols_per_connection = 200  # 单个连接最多订阅200个数据流
+    depth_url = 'https://fapi.binance.com/fapi/v1/depth'
+    snapshot_limit = 1000
+    # IP限速为每分钟2400权重，与同一IP上的历史数据获取/交易共用，快照最多使用一半
+    snapshot_weight_rate = 1200 / 60
+    snapshot_weight_capacity = 40
+
+    def __init__(self):
+        super().__init__()
+        self.snapshot_ids = {}  # symbol -> 最近一次写入的快照的 lastUpdateId
+
+    def connection_url(self, symbols):
+        streams = '/'.join(f"{s.lower()}@depth@100ms" for s in symbols)
+        return f"{self.ws_url}/stream?streams={streams}"
+
+    def _await_snapshot(self, symbol, items=()):
+        """开始缓冲该symbol的增量，等待REST快照"""
+        self.buffers[symbol] = deque(items, maxlen=BUFFER_LIMIT)
+        self.sequences.pop(symbol, None)
+        self.pending_snapshots.add(symbol)
+
+    def reset(self, symbols):
+        super().reset(symbols)
+        # 增量数据流不包含快照，重连后需要重新获取
+        for s in symbols:
+            self.snapshot_ids.pop(s, None)
+            self._await_snapshot(s)
+
+    def parse(self, message, recv_ms):
+        data = message.get('data')
+        if not data or data.get('e') != 'depthUpdate':
+            return [], []
+        symbol = data['s']
+        event = BookEvent(symbol, data['E'], False, _levels(data['b']), _levels(data['a']), data['U'], data['u'])
+        buffer = self.buffers.get(symbol)
+        if buffer is not None:
+            buffer.append((data['pu'], recv_ms, event))
+            return [], []
+        floor = self.snapshot_ids.get(symbol)
+        if floor is not None and data['u'] < floor:
+            # 已包含在快照中的增量
+            return [], []
+        last = self.sequences.get(symbol)
+        if last is not None:
+            in_sequence = data['pu'] == last
+        else:
+            # 快照之后的第一条增量须满足 U <= lastUpdateId <= u
+            in_sequence = floor is not None and data['U'] <= floor
+        if not in_sequence:
+            self._await_snapshot(symbol, [(data['pu'], recv_ms, event)])
+            return [], [symbol]
+        self.sequences[symbol] = data['u']
+        return [event], []
+
+    def snapshot_weight(self):
+        # 合约深度接口权重: limit 5~50 为2，100 为5，500 为10，1000 为20
+        for limit, weight in ((50, 2), (100, 5), (500, 10)):
+            if self.snapshot_limit <= limit:
+                return weight
+        return 20
+
+    def snapshot(self, symbol):
+        res = requests.get(rebase_url(self.venue, self.depth_url),
+                           params={'symbol': symbol, 'limit': self.snapshot_limit}, timeout=10)
+        res.raise_for_status()
+        data = res.json()
+        update_id = data['lastUpdateId']
+        return BookEvent(symbol, data.get('E', int(time.time() * 1000)), True,
+                         _levels(data['bids']), _levels(data['asks']), update_id, update_id)
+
+    def apply_snapshot(self, event, recv_ms):
+        symbol = event.symbol
+        if symbol not in self.buffers:
+            # 等待期间已由另一次快照完成同步
+            return []
+        update_id = event.last_id
+        buffered = [item for item in self.buffers.pop(symbol) if item[2].last_id >= update_id]
+        last = None
+        for i, (prev_id, _, delta) in enumerate(buffered):
+            in_sequence = delta.first_id <= update_id if last is None else prev_id == last
+            if not in_sequence:
+                # 快照早于缓冲中最早的增量，或缓冲中有缺口(超出 BUFFER_LIMIT): 从这里开始重新等待快照
+                logger.warning(f"{self.venue} {symbol} 快照(lastUpdateId={update_id})与缓冲的增量不连续，重新获取")
+                self._await_snapshot(symbol, buffered[i:])
+                return []
+            last = delta.last_id
+        self.pending_snapshots.discard(symbol)
+        self.snapshot_ids[symbol] = update_id
+        if last is not None:
+            self.sequences[symbol] = last
+        return [(event, recv_ms)] + [(delta, delta_recv_ms) for _, delta_recv_ms, delta in buffered]
+
+
+class OKXDepthFeed(DepthFeed):
+    venue = 'okx'
+    default_ws_url = 'wss://ws.okx.com:8443/ws/v5'
+
+    def connection_url(self, symbols):
+        return self.ws_url + '/public'
+
+    def subscribe_messages(self, symbols):
+        return [json.dumps({'op': 'subscribe', 'args': [{'channel': 'books', 'instId': s} for s in symbols]})]
+
+    def resync_messages(self, symbol):
+        # 重新订阅后交易所会先推送一次快照
+        arg = [{'channel': 'books', 'instId': symbol}]
+        return [json.dumps({'op': 'unsubscribe', 'args': arg}), json.dumps({'op': 'subscribe', 'args': arg})]
+
+    def heartbeat(self):
+        return 'ping'
+
+    def parse(self, message, recv_ms):
+        if 'data' not in message:
+            return [], []
+        symbol = message['arg']['instId']
+        snapshot = message.get('action') == 'snapshot'
+        events, gaps = [], []
+        for book in message['data']:
+            last = self.sequences.get(symbol)
+            if not snapshot and last is not None and book.get('prevSeqId') != last:
+                gaps.append(symbol)
+            self.sequences[symbol] = book.get('seqId')
+            events.append(BookEvent(symbol, int(book['ts']), snapshot, _levels(book['bids']), _levels(book['asks']),
+                                    book.get('prevSeqId') or 0, book.get('seqId') or 0))
+        return events, gaps
+
+
+class BybitDepthFeed(DepthFeed):
+    venue = 'bybit'
+    default_ws_url = 'wss://stream.bybit.com/v5'
+    depth = 200
+    args_per_message = 10  # 单条订阅消息最多10个主题
+
+    def connection_url(self, symbols):
+        return self.ws_url + '/public/linear'
+
+    def subscribe_messages(self, symbols):
+        topics = [f"orderbook.{self.depth}.{s}" for s in symbols]
+        return [json.dumps({'op': 'subscribe', 'args': topics[i:i + self.args_per_message]})
+                for i in range(0, len(topics), self.args_per_message)]
+
+    def resync_messages(self, symbol):
+        args = [f"orderbook.{self.depth}.{symbol}"]
+        return [json.dumps({'op': 'unsubscribe', 'args': args}), json.dumps({'op': 'subscribe', 'args': args})]
+
+    def heartbeat(self):
+        return json.dumps({'op': 'ping'})
+
+    def parse(self, message, recv_ms):
+        topic = message.get('topic', '')
+        if not topic.startswith('orderbook.'):
+            return [], []
+        data = message['data']
+        symbol = data['s']
+        # u == 1 表示交易所重启服务后重新推送的快照
+        snapshot = message.get('type') == 'snapshot' or data.get('u') == 1
+        gaps = []
+        last = self.sequences.get(symbol)
+        if not snapshot and last is not None and data['u'] != last + 1:
+            gaps.append(symbol)
+        self.sequences[symbol] = data['u']
+        return [BookEvent(symbol, int(message.get('cts') or message['ts']), snapshot,
+                          _levels(data['b']), _levels(data['a']), data['u'], data['u'])], gaps
+
+
+class HyperliquidDepthFeed(DepthFeed):
+    venue = 'hl'
+    default_ws_url = 'wss://api.hyperliquid.xyz/ws'
+
+    def subscribe_messages(self, symbols):
+        return [json.dumps({'method': 'subscribe', 'subscription': {'type': 'l2Book', 'coin': s}}) for s in symbols]
+
+    def heartbeat(self):
+        return json.dumps({'method': 'ping'})
+
+    def parse(self, message, recv_ms):
+        if message.get('channel') != 'l2Book':
+            return [], []
+        data = message['data']
+        bids, asks = data['levels']
+        # 每条推送都是完整的前若干档，按快照记录
+        return [BookEvent(data['coin'], int(data['time']), True,
+                          _levels([(l['px'], l['sz']) for l in bids]), _levels([(l['px'], l['sz']) for l in asks]))], []
+
+
+DEPTH_FEEDS = {'hl': HyperliquidDepthFeed, 'bin': BinanceDepthFeed, 'okx': OKXDepthFeed, 'bybit': BybitDepthFeed}
+
+
+class VenueStats:
+    """单个交易所的计数器"""
+
+    def __init__(self):
+        self.received = 0
+        self.written = 0
+        self.dropped = 0
+        self.gaps = 0
+        self.reconnects = 0
+        self.bytes = 0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.lag_ewma = 0.0
+
+    def record_lag(self, lag_ms):
+        self.lag_last = lag_ms
+        self.lag_max = max(self.lag_max, lag_ms)
+        self.lag_ewma = lag_ms if self.lag_ewma == 0 else 0.95 * self.lag_ewma + 0.05 * lag_ms
+
+    def as_dict(self):
+        return {k: (round(v, 1) if isinstance(v, float) else v) for k, v in vars(self).items()}
+
+
+def compress_file(path):
+    """将已结束的文件压缩为 .gz 后删除原文件(在线程池中运行)"""
+    tmp_path = path + '.gz.tmp'
+    try:
+        with open(path, 'rb') as src, gzip.open(tmp_path, 'wb', compresslevel=6) as dst:
+            while True:
+                block = src.read(FLUSH_BYTES)
+                if not block:
+                    break
+                dst.write(block)
+        os.replace(tmp_path, path + '.gz')
+        os.remove(path)
+        logger.info(f"已压缩: {path}.gz")
+    except OSError as e:
+        logger.error(f"压缩失败: {path}, {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class BookWriter:
+    """单个交易所的追加写入器，按小时换文件"""
+
+    def __init__(self, venue, symbols, out_dir, compressor):
+        self.venue = venue
+        self.symbol_ids = {s: i for i, s in enumerate(symbols)}
+        self.directory = os.path.join(out_dir, f"venue={venue}")
+        self.compressor = compressor
+        self.buffer = bytearray()
+        self.file = None
+        self.path = None
+        self.hour = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _open(self, hour):
+        label = str(np.datetime64(hour * ROTATE_MS, 'ms').astype('datetime64[h]')).replace(':', '')
+        self.path = os.path.join(self.directory, f"{label}.obk")
+        exists = os.path.exists(self.path)
+        self.file = open(self.path, 'ab')
+        if not exists:
+            header = json.dumps({'venue': self.venue, 'symbols': list(self.symbol_ids),
+                                 'created': int(time.time() * 1000)}).encode('utf-8')
+            self.file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self.hour = hour
+
+    def append(self, event, recv_ms):
+        """
+        编码一条事件
+
+        Returns:
+            int: 编码后的字节数
+        """
+        hour = recv_ms // ROTATE_MS
+        if self.file is None:
+            self._open(hour)
+        elif hour > self.hour:
+            self.rotate(hour)
+        # 接收时间早于当前文件的记录(快照后释放的缓冲增量、队列积压)写入当前文件，不回退到已结束的小时
+        record = RECORD_HEADER.pack(int(event.event_ts), int(recv_ms), int(event.first_id), int(event.last_id),
+                                    self.symbol_ids[event.symbol], FLAG_SNAPSHOT if event.snapshot else 0,
+                                    len(event.bids), len(event.asks))
+        self.buffer += record
+        self.buffer += event.bids.tobytes()
+        self.buffer += event.asks.tobytes()
+        if len(self.buffer) >= FLUSH_BYTES:
+            self.flush()
+        return len(record) + (len(event.bids) + len(event.asks)) * LEVEL_DTYPE.itemsize
+
+    def flush(self):
+        if self.buffer and self.file is not None:
+            self.file.write(self.buffer)
+            self.file.flush()
+            self.buffer.clear()
+
+    def rotate(self, hour=None):
+        """写完当前文件并交给线程池压缩，hour 不为None时打开新文件"""
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.compressor.submit(compress_file, self.path)
+            self.file = None
+        if hour is not None:
+            self._open(hour)
+
+    def close(self):
+        """停止记录: 刷盘但不压缩当前小时的文件，下次运行继续追加"""
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class OrderBookRecorder:
+    """
+    多交易所订单簿记录器
+
+    用法:
+        recorder = OrderBookRecorder(['BTC', 'ETH'])
+        asyncio.run(recorder.run(duration=3600))
+    """
+
+    def __init__(self, tickers, venues=VENUES, out_dir=ORDERBOOK_DIR, queue_size=QUEUE_SIZE):
+        """
+        Args:
+            tickers (list): 如 ['BTC', 'ETH']
+            venues (list): 交易所前缀
+            out_dir (str): 输出目录
+            queue_size (int): 待写入消息队列的容量
+        """
+        self.feeds = {v: DEPTH_FEEDS[v]() for v in venues}
+        self.symbols = {v: [feed.symbol(t) for t in tickers] for v, feed in self.feeds.items()}
+        self.stats = {v: VenueStats() for v in venues}
+        self.out_dir = out_dir
+        self.queue_size = queue_size
+        self.queue = None
+        self.writers = {}
+        self.compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='obk-compress')
+
+    async def run(self, duration=None):
+        """
+        开始记录，duration 秒后停止(None 表示一直运行直到被取消)
+        """
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.writers = {v: BookWriter(v, self.symbols[v], self.out_dir, self.compressor) for v in self.feeds}
+        tasks = [asyncio.create_task(self._consume()), asyncio.create_task(self._report()),
+                 asyncio.create_task(self._snapshots())]
+        for venue, feed in self.feeds.items():
+            symbols = self.symbols[venue]
+            for i in range(0, len(symbols), feed.symbols_per_connection):
+                tasks.append(asyncio.create_task(self._connection(feed, symbols[i:i + feed.symbols_per_connection])))
+        logger.info(f"开始记录订单簿: {len(tasks) - 3} 个连接, {sum(map(len, self.symbols.values()))} 个交易对")
+        try:
+            if duration is None:
+                await asyncio.gather(*tasks)
+            else:
+                await asyncio.sleep(duration)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._drain()
+            for writer in self.writers.values():
+                writer.close()
+            self.compressor.shutdown(wait=True)
+            self._log_stats()
+
+    async def _connection(self, feed, symbols):
+        """单个连接: 订阅、心跳、接收；断开后按退避时间重连"""
+        stats = self.stats[feed.venue]
+        attempt = 0
+        while True:
+            heartbeat = None
+            try:
+                async with websockets.connect(feed.connection_url(symbols), max_size=None) as ws:
+                    feed.reset(symbols)
+                    for message in feed.subscribe_messages(symbols):
+                        await ws.send(message)
+                    if feed.heartbeat() is not None:
+                        heartbeat = asyncio.create_task(self._heartbeat(ws, feed.heartbeat()))
+                    attempt = 0
+                    async for raw in ws:
+                        stats.received += 1
+                        try:
+                            self.queue.put_nowait((feed, ws, int(time.time() * 1000), raw))
+                        except asyncio.QueueFull:
+                            stats.dropped += 1
+            except asyncio.CancelledError:
+                raise
+            except (websockets.WebSocketException, OSError) as e:
+                logger.warning(f"{feed.venue} 连接断开: {e}")
+            finally:
+                if heartbeat is not None:
+                    heartbeat.cancel()
+            stats.reconnects += 1
+            await asyncio.sleep(RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)])
+            attempt += 1
+
+    @staticmethod
+    async def _heartbeat(ws, message):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            await ws.send(message)
+
+    def _write(self, venue, event, recv_ms):
+        stats = self.stats[venue]
+        stats.bytes += self.writers[venue].append(event, recv_ms)
+        stats.written += 1
+        stats.record_lag(recv_ms - event.event_ts)
+
+    def _handle(self, feed, ws, recv_ms, raw):
+        """解析并编码一条消息"""
+        if raw in ('pong', b'pong'):
+            return
+        stats = self.stats[feed.venue]
+        try:
+            events, gaps = feed.parse(_loads(raw), recv_ms)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"{feed.venue} 无法解析的消息: {e}")
+            return
+        for event in events:
+            self._write(feed.venue, event, recv_ms)
+        for symbol in gaps:
+            stats.gaps += 1
+            for message in feed.resync_messages(symbol):
+                asyncio.ensure_future(ws.send(message))
+
+    async def _consume(self):
+        """写入协程: 批量取出消息处理，每轮之间让出事件循环"""
+        last_flush = time.monotonic()
+        while True:
+            self._handle(*await self.queue.get())
+            for _ in range(BATCH_SIZE - 1):
+                try:
+                    self._handle(*self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            if time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                for writer in self.writers.values():
+                    writer.flush()
+                last_flush = time.monotonic()
+            await asyncio.sleep(0)
+
+    def _drain(self):
+        """停止时写完队列中剩余的消息"""
+        while not self.queue.empty():
+            self._handle(*self.queue.get_nowait())
+
+    async def _snapshots(self):
+        """
+        依次获取需要REST快照的symbol(Binance)，快照与缓冲的增量写入同一文件
+
+        请求按交易所的权重预算(TokenBucket)排队: 重连后数百个symbol同时需要快照时
+        (200个 x 权重20 = 4000)，分摊到约3分钟内完成，不会超过每分钟2400的IP限速。
+        """
+        loop = asyncio.get_running_loop()
+        buckets = {venue: TokenBucket(feed.snapshot_weight_rate, feed.snapshot_weight_capacity)
+                   for venue, feed in self.feeds.items() if feed.snapshot_weight_rate}
+        while True:
+            for venue, bucket in buckets.items():
+                feed = self.feeds[venue]
+                while feed.pending_snapshots:
+                    symbol = feed.pending_snapshots.pop()
+                    if symbol not in feed.buffers:
+                        continue
+                    await bucket.acquire(feed.snapshot_weight())
+                    try:
+                        event = await loop.run_in_executor(None, feed.snapshot, symbol)
+                    except (requests.RequestException, ValueError, KeyError) as e:
+                        logger.warning(f"{venue} {symbol} 获取快照失败: {e}")
+                        feed.pending_snapshots.add(symbol)
+                        response = getattr(e, 'response', None)
+                        if response is not None and response.status_code in (418, 429):
+                            # 超过权重限制: 按 Retry-After 暂停该交易所的所有快照请求
+                            bucket.pause(retry_after_seconds(response.headers) or 60)
+                        else:
+                            await asyncio.sleep(RECONNECT_DELAYS[0])
+                        continue
+                    if event is not None:
+                        for item in feed.apply_snapshot(event, int(time.time() * 1000)):
+                            self._write(venue, *item)
+            await asyncio.sleep(0.5)
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            self._log_stats()
+
+    def _log_stats(self):
+        depth = self.queue.qsize() if self.queue is not None else 0
+        for venue, stats in self.stats.items():
+            logger.info(f"{venue}: {stats.as_dict()}, 队列深度 {depth}")
+
+
+def iter_records(path):
+    """
+    读取记录文件(.obk 或 .obk.gz)
+
+    Yields:
+        BookEvent 与本地接收时间: (event, recv_ms)
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        data = f.read()
+    legacy = LEGACY_HEADERS.get(data[:4])
+    if data[:4] != MAGIC and legacy is None:
+        raise ValueError(f"不是订单簿记录文件: {path}")
+    record_header = legacy or RECORD_HEADER
+    header_len = struct.unpack_from('<I', data, 4)[0]
+    symbols = json.loads(data[8:8 + header_len])['symbols']
+    offset = 8 + header_len
+    first_id = last_id = 0
+    while offset + record_header.size <= len(data):
+        if legacy is None:
+            event_ts, recv_ms, first_id, last_id, symbol_id, flags, n_bids, n_asks = \
+                record_header.unpack_from(data, offset)
+        else:
+            event_ts, recv_ms, symbol_id, flags, n_bids, n_asks = record_header.unpack_from(data, offset)
+        offset += record_header.size
+        end = offset + (n_bids + n_asks) * LEVEL_DTYPE.itemsize
+        if end > len(data):
+            logger.warning(f"文件末尾的记录不完整，已忽略: {path}")
+            break
+        levels = np.frombuffer(data, dtype=LEVEL_DTYPE, count=n_bids + n_asks, offset=offset)
+        offset = end
+        yield BookEvent(symbols[symbol_id], event_ts, bool(flags & FLAG_SNAPSHOT),
+                        levels[:n_bids], levels[n_bids:], first_id, last_id), recv_ms
+
+
+def read_book(path):
+    """
+    记录文件 -> 逐价位的DataFrame
+
+    Returns:
+        DataFrame: timestamp, recv_ts, symbol, snapshot, first_update_id, last_update_id,
+                   side('bid'/'ask'), price, volume
+    """
+    parts = []
+    for event, recv_ms in iter_records(path):
+        for side, levels in (('bid', event.bids), ('ask', event.asks)):
+            if len(levels):
+                parts.append((event.event_ts, recv_ms, event.symbol, event.snapshot, event.first_id, event.last_id,
+                               side, levels))
+    if not parts:
+        return pd.DataFrame(columns=['timestamp', 'recv_ts', 'symbol', 'snapshot', 'first_update_id',
+                                     'last_update_id', 'side', 'price', 'volume'])
+    counts = np.array([len(p[7]) for p in parts])
+    levels = np.concatenate([p[7] for p in parts])
+    return pd.DataFrame({
+        'timestamp': np.repeat([p[0] for p in parts], counts).astype(np.int64),
+        'recv_ts': np.repeat([p[1] for p in parts], counts).astype(np.int64),
+        'symbol': pd.Categorical(np.repeat([p[2] for p in parts], counts)),
+        'snapshot': np.repeat([p[3] for p in parts], counts),
+        'first_update_id': np.repeat([p[4] for p in parts], counts).astype(np.int64),
+        'last_update_id': np.repeat([p[5] for p in parts], counts).astype(np.int64),
+        'side': pd.Categorical(np.repeat([p[6] for p in parts], counts), categories=['bid', 'ask']),
+        'price': levels['price'],
+        'volume': levels['size'],
+    })
+
+
+if __name__ == '__main__':
+    tickers = ['BTC', 'ETH', 'SOL']
+    asyncio.run(OrderBookRecorder(tickers).run(duration=60))
@@ -0,0 +1,343 @@
+"""
+按 交易所/ticker/日期 分区的追加式历史数据存储
+
+原获取脚本每次运行都读取整个CSV、拼接新数据、drop_duplicates、sort_values 后重写整个文件，
+开销随历史总量增长。本模块将每个 交易所 × ticker 的序列按UTC日期分区:
+
+    data/candles/venue=bin/ticker=BTC/date=2024-01-01/part-00000.parquet
+    data/candles/venue=bin/ticker=BTC/_index.json
+
+_index.json 记录每个分区的高水位(已写入的最大时间戳)、最小时间戳、行数与分片文件。
+    - 新数据全部高于分区高水位时，直接追加一个分片文件，不读取旧数据
+    - 低于高水位的回补数据只重写该日分区(开销以单日数据量为上限)
+    - 分片在该日结束或分片数超过阈值时才合并(延迟压缩)
+每次写入后由索引的行数与边界更新数据清单(manifest)中该序列的条目，不读取数据分片。
+写入与读取均使用 schema.compact_frame 的紧凑列类型(int64 timestamp、精度允许时float32数值)。
+pyarrow/fastparquet 可用时使用 Parquet，否则退回CSV分片，读取时两种格式均可识别。
+"""
+import os
+import json
+import numpy as np
+import pandas as pd
+from sys import path as sys_path
+from os import path as os_path
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    try:
+        import fastparquet  # noqa: F401
+        PARQUET_AVAILABLE = True
+    except ImportError:
+        PARQUET_AVAILABLE = False
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
+# 导入日志模块
+from src.logger import setup_logger
+from src.data_fetch.data_gaps import CANDLES_DIR, FUNDING_DIR
+from src.data_fetch.schema import compact_frame
+from src.data_fetch.manifest import update_series_manifest, INDEX_FILENAME
+from src.time_grid import DAY_MS
+
+# 获取logger实例
+logger = setup_logger('PartitionStore')
+
+PART_EXT = 'parquet' if PARQUET_AVAILABLE else 'csv'
+COMPACTED_NAME = 'data'
+COMPACT_MAX_PARTS = 8  # 未结束的分区分片数超过该值时也进行合并
+
+
+def store_root(kind):
+    """数据类型对应的存储根目录: data/candles 或 data/fundingRates"""
+    return CANDLES_DIR if kind == 'candles' else FUNDING_DIR
+
+
+def series_dir(kind, venue, ticker, root=None):
+    """单个 交易所 × ticker 序列的目录"""
+    return os.path.join(root or store_root(kind), f"venue={venue}", f"ticker={ticker}")
+
+
+def day_label(day):
+    """分区编号(自1970-01-01起的天数) -> 'YYYY-MM-DD'"""
+    return str(np.datetime64(int(day), 'D'))
+
+
+def _write_part(df, path):
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def _read_part(path, columns=None, start=None, end=None):
+    """读取分片；Parquet 分片的时间范围条件下推到读取阶段，只解码命中的行组"""
+    if path.endswith('.parquet'):
+        filters = [('timestamp', '>=', start)] if start is not None else []
+        filters += [('timestamp', '<=', end)] if end is not None else []
+        return pd.read_parquet(path, columns=columns, filters=filters or None)
+    return pd.read_csv(path, usecols=columns)
+
+
+def load_index(kind, venue, ticker, root=None):
+    """
+    读取序列的分区索引
+
+    Returns:
+        dict: 'YYYY-MM-DD' -> {'day', 'min_ts', 'hwm', 'rows', 'parts'}
+    """
+    path = os.path.join(series_dir(kind, venue, ticker, root), INDEX_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logger.error(f"读取分区索引失败: {path}, {e}")
+        return {}
+
+
+def _save_index(directory, index):
+    """原子写入分区索引"""
+    path = os.path.join(directory, INDEX_FILENAME)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _next_part_name(entry):
+    seq = len(entry['parts'])
+    while True:
+        name = f"part-{seq:05d}.{PART_EXT}"
+        if name not in entry['parts']:
+            return name
+        seq += 1
+
+
+def _read_partition(directory, entry, columns=None, start=None, end=None):
+    frames = [_read_part(os.path.join(directory, name), columns, start, end) for name in entry['parts']]
+    frames = [f for f in frames if len(f)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+def _rewrite_partition(directory, entry, df):
+    """
+    将分区重写为单个合并文件
+
+    旧分片不在这里删除: 调用方保存索引后再用 _remove_parts 删除。
+    顺序为 替换合并文件 -> 保存索引 -> 删除旧分片，任一步之后中断，索引指向的文件都存在
+    (中断在保存索引之前时旧分片与合并文件的重复行在读取时去重)。
+
+    Returns:
+        list: 需要在保存索引后删除的旧分片路径
+    """
+    df = compact_frame(df.drop_duplicates(subset=['timestamp'], keep='last').sort_values('timestamp'))
+    name = f"{COMPACTED_NAME}.{PART_EXT}"
+    tmp_path = os.path.join(directory, f".tmp-{name}")
+    _write_part(df, tmp_path)
+    os.replace(tmp_path, os.path.join(directory, name))
+    stale = [os.path.join(directory, old) for old in entry['parts'] if old != name]
+    ts = df['timestamp'].to_numpy(dtype=np.int64)
+    entry.update({'parts': [name], 'rows': int(len(df)),
+                  'min_ts': int(ts.min()) if len(ts) else None, 'hwm': int(ts.max()) if len(ts) else None})
+    return stale
+
+
+def _remove_parts(paths):
+    """删除已不在索引中的旧分片"""
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def append_rows(kind, venue, ticker, df, root=None):
+    """
+    追加新数据，只写入受影响的日期分区
+
+    Args:
+        kind (str): 'candles' 或 'fr'
+        venue (str): 交易所前缀
+        ticker (str): 如 'BTC'
+        df (DataFrame): 含int64 timestamp列的新数据(不含datetime列)
+        root (str): 存储根目录，默认按kind选择
+
+    Returns:
+        int: 实际写入的新行数
+    """
+    if df is None or len(df) == 0:
+        return 0
+    directory = series_dir(kind, venue, ticker, root)
+    os.makedirs(directory, exist_ok=True)
+    index = load_index(kind, venue, ticker, root)
+
+    df = compact_frame(df.drop_duplicates(subset=['timestamp'], keep='last').sort_values('timestamp'))
+    ts = df['timestamp'].to_numpy(dtype=np.int64)
+    days = ts // DAY_MS
+    latest_day = int(days.max())
+    starts = np.r_[0, np.flatnonzero(np.diff(days)) + 1]
+    ends = np.r_[starts[1:], len(df)]
+
+    written = 0
+    stale = []
+    for lo, hi in zip(starts, ends):
+        day_df, day = df.iloc[lo:hi], days[lo]
+        label = day_label(day)
+        part_dir = os.path.join(directory, f"date={label}")
+        os.makedirs(part_dir, exist_ok=True)
+        entry = index.setdefault(label, {'day': int(day), 'min_ts': None, 'hwm': None, 'rows': 0, 'parts': []})
+        day_ts = day_df['timestamp'].to_numpy(dtype=np.int64)
+
+        if entry['hwm'] is None or day_ts.min() > entry['hwm']:
+            # 全部高于高水位: 直接追加分片
+            name = _next_part_name(entry)
+            _write_part(day_df, os.path.join(part_dir, name))
+            entry['parts'].append(name)
+            entry['rows'] += len(day_df)
+            entry['min_ts'] = int(day_ts.min()) if entry['min_ts'] is None else min(entry['min_ts'], int(day_ts.min()))
+            entry['hwm'] = int(day_ts.max())
+            written += len(day_df)
+        else:
+            # 回补数据: 只重写当日分区
+            existing = _read_partition(part_dir, entry)
+            # 只统计分区中原先没有的时间戳，重叠的行视为覆盖而不是新增
+            written += len(np.setdiff1d(day_ts, existing['timestamp'].to_numpy(dtype=np.int64)))
+            stale += _rewrite_partition(part_dir, entry, pd.concat([existing, day_df], ignore_index=True))
+
+    # 延迟压缩: 分区对应的日期已结束(已有更晚的数据)或分片过多时才合并
+    for label, entry in index.items():
+        if len(entry['parts']) > 1 and (entry['day'] < latest_day or len(entry['parts']) > COMPACT_MAX_PARTS):
+            part_dir = os.path.join(directory, f"date={label}")
+            stale += _rewrite_partition(part_dir, entry, _read_partition(part_dir, entry))
+
+    _save_index(directory, index)
+    _remove_parts(stale)
+    update_series_manifest(os.path.join(directory, INDEX_FILENAME), kind, venue, ticker, index,
+                           {str(c): str(t) for c, t in df.dtypes.items()})
+    return written
+
+
+def iter_series(kind, venue, ticker, start=None, end=None, columns=None, root=None):
+    """
+    按日期顺序逐个分区读取序列，每次只在内存中保留一个分区
+
+    Args:
+        start (int): 起始时间戳(毫秒, 含)，None 表示不限
+        end (int): 结束时间戳(毫秒, 含)，None 表示不限
+        columns (list): 只读取的列，None 表示全部
+
+    Yields:
+        DataFrame: 单个分区内按timestamp排序、去重后的数据(紧凑列类型)
+    """
+    directory = series_dir(kind, venue, ticker, root)
+    index = load_index(kind, venue, ticker, root)
+    if columns is not None and 'timestamp' not in columns:
+        columns = ['timestamp'] + list(columns)
+
+    for label in sorted(index):
+        entry = index[label]
+        if not entry['parts'] or entry['hwm'] is None:
+            continue
+        if (start is not None and entry['hwm'] < start) or (end is not None and entry['min_ts'] > end):
+            continue
+        # 完全落在时间范围内的分区不需要按行过滤
+        lo = start if start is not None and entry['min_ts'] < start else None
+        hi = end if end is not None and entry['hwm'] > end else None
+        df = _read_partition(os.path.join(directory, f"date={label}"), entry, columns, lo, hi)
+        if start is not None:
+            df = df[df['timestamp'] >= start]
+        if end is not None:
+            df = df[df['timestamp'] <= end]
+        if len(df):
+            # 未压缩的分区由多个分片组成，分片之间可能重叠
+            yield compact_frame(df.sort_values('timestamp', kind='stable').drop_duplicates(
+                subset=['timestamp'], keep='last'))
+
+
+def series_columns(kind, venue, ticker, root=None):
+    """
+    序列中存储的列名，只读取一个分片的表头
+
+    Returns:
+        list: 列名，序列不存在时返回空列表
+    """
+    directory = series_dir(kind, venue, ticker, root)
+    for label, entry in sorted(load_index(kind, venue, ticker, root).items()):
+        if entry['parts']:
+            path = os.path.join(directory, f"date={label}", entry['parts'][0])
+            if path.endswith('.parquet'):
+                try:
+                    import pyarrow.parquet as pq
+                    return list(pq.read_schema(path).names)
+                except ImportError:
+                    return list(pd.read_parquet(path).columns)
+            return list(pd.read_csv(path, nrows=0).columns)
+    return []
+
+
+def read_series(kind, venue, ticker, start=None, end=None, columns=None, root=None):
+    """
+    读取一个序列，按索引跳过时间范围外的分区
+
+    Args:
+        start (int): 起始时间戳(毫秒, 含)，None 表示不限
+        end (int): 结束时间戳(毫秒, 含)，None 表示不限
+        columns (list): 只读取的列，None 表示全部
+
+    Returns:
+        DataFrame: 按timestamp排序的数据(紧凑列类型)
+    """
+    frames = list(iter_series(kind, venue, ticker, start, end, columns, root))
+    if not frames:
+        if columns is not None and 'timestamp' not in columns:
+            columns = ['timestamp'] + list(columns)
+        return pd.DataFrame(columns=columns)
+    # 不同日期的分区可能分别为float32/float64，合并后重新确定列类型
+    return compact_frame(pd.concat(frames, ignore_index=True))
+
+
+def compact_series(kind, venue, ticker, root=None):
+    """将序列中所有多分片的分区合并为单个文件"""
+    directory = series_dir(kind, venue, ticker, root)
+    index = load_index(kind, venue, ticker, root)
+    stale = []
+    for label, entry in index.items():
+        if len(entry['parts']) > 1:
+            part_dir = os.path.join(directory, f"date={label}")
+            stale += _rewrite_partition(part_dir, entry, _read_partition(part_dir, entry))
+    if stale:
+        _save_index(directory, index)
+        _remove_parts(stale)
+        update_series_manifest(os.path.join(directory, INDEX_FILENAME), kind, venue, ticker, index)
+
+
+def list_series(kind, root=None):
+    """
+    列出存储中的所有序列
+
+    Returns:
+        list: [(venue, ticker), ...]
+    """
+    root = root or store_root(kind)
+    result = []
+    if not os.path.isdir(root):
+        return result
+    for venue_dir in sorted(os.listdir(root)):
+        if not venue_dir.startswith('venue='):
+            continue
+        for ticker_dir in sorted(os.listdir(os.path.join(root, venue_dir))):
+            if ticker_dir.startswith('ticker='):
+                result.append((venue_dir[len('venue='):], ticker_dir[len('ticker='):]))
+    return result
+
+
+def series_coverage(kind, venue, ticker, root=None):
+    """
+    序列的逐日覆盖情况，只读取索引
+
+    Returns:
+        list: [(min_ts, hwm, rows), ...] 按日期排序
+    """
+    index = load_index(kind, venue, ticker, root)
+    return [(e['min_ts'], e['hwm'], e['rows']) for _, e in sorted(index.items()) if e['rows']]
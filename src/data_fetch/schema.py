@@ -0,0 +1,158 @@
+"""
+历史K线与资金费率的紧凑列类型
+
+CSV中的数值读入后默认为float64，合并文件还带有冗余的datetime字符串列(object类型，每个值数十字节)。
+统一的紧凑结构:
+
+    - timestamp: int64 毫秒时间戳，不保存datetime列(需要时由timestamp即时生成)
+    - 价格等数值列: 在交易所报价的小数位数下float32能精确还原时使用float32，否则保留float64
+    - 长表中的 venue / ticker: 分类类型(category)，每行只占1~2字节
+
+分区存储写入时即按此结构保存，读取函数(partition_store.read_series / iter_series、read_merged)直接返回该结构。
+单个ticker一年的1分钟合并K线(四个交易所)读入内存后约为原来的三分之一。
+"""
+import re
+import numpy as np
+import pandas as pd
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
+from src.data_fetch.data_gaps import VENUES
+
+TIMESTAMP_DTYPE = np.int64
+MAX_QUOTE_DECIMALS = 10  # 交易所报价的最大小数位数，超过时视为计算值，保留float64
+VENUE_DTYPE = pd.CategoricalDtype(VENUES)
+DROPPED_COLUMNS = ['datetime']
+
+# 宽表列名: 交易所前缀 + 字段名，如 binOpen、okxVolCcyQuote、hlFR
+_COLUMN_PATTERN = re.compile(r'^({})([A-Z].*)$'.format('|'.join(VENUES)))
+
+
+def quote_decimals(values, max_decimals=MAX_QUOTE_DECIMALS):
+    """
+    数值的最少小数位数: 所有有限值按该位数四舍五入后不变
+
+    Returns:
+        int or None: 超过 max_decimals 时返回None
+    """
+    values = values[np.isfinite(values)]
+    for decimals in range(max_decimals + 1):
+        if np.allclose(np.round(values, decimals), values, rtol=1e-12, atol=0):
+            return decimals
+    return None
+
+
+def fits_float32(values):
+    """
+    float32 能否在报价精度下还原全部数值(误差小于最后一位小数的一半)
+
+    Args:
+        values (np.ndarray): float64 数值
+
+    Returns:
+        bool
+    """
+    values = np.asarray(values, dtype=np.float64)
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return True
+    if np.abs(finite).max() > np.finfo(np.float32).max:
+        return False
+    decimals = quote_decimals(finite)
+    if decimals is None:
+        return False
+    error = np.abs(finite.astype(np.float32).astype(np.float64) - finite)
+    return bool(error.max() < 0.5 * 10.0 ** -decimals)
+
+
+def compact_frame(df):
+    """
+    转换为紧凑结构: 去掉datetime列，timestamp为int64，数值列尽可能使用float32
+
+    Args:
+        df (DataFrame): 含timestamp列的数据(宽表或单交易所数据)
+
+    Returns:
+        DataFrame: 新的数据，不修改传入的df
+    """
+    df = df.drop(columns=[c for c in DROPPED_COLUMNS if c in df.columns])
+    columns = {}
+    for name in df.columns:
+        col = df[name]
+        if name == 'timestamp':
+            columns[name] = col.to_numpy(dtype=TIMESTAMP_DTYPE)
+        elif col.dtype == np.float32 or not pd.api.types.is_numeric_dtype(col.dtype):
+            # 已是float32，或分类、字符串等非数值列: 保持原样
+            columns[name] = col.array
+        else:
+            values = pd.to_numeric(col, errors='coerce').to_numpy(dtype=np.float64)
+            columns[name] = values.astype(np.float32) if fits_float32(values) else values
+    return pd.DataFrame(columns, index=pd.RangeIndex(len(df)))
+
+
+def split_column(column):
+    """
+    宽表列名 -> (交易所前缀, 字段名)
+
+    'binOpen' -> ('bin', 'open')，'hlFR' -> ('hl', 'fr')，'confirm' -> (None, 'confirm')
+    """
+    match = _COLUMN_PATTERN.match(column)
+    if match is None:
+        return None, column
+    venue, field = match.groups()
+    return venue, field.lower() if field.isupper() else field[0].lower() + field[1:]
+
+
+def venue_column(venue, field):
+    """
+    (交易所前缀, 字段名) -> 宽表列名，split_column 的逆运算
+
+    ('bin', 'open') -> 'binOpen'，('hl', 'fr') -> 'hlFR'
+    """
+    if field == 'fr':
+        return f'{venue}FR'
+    return f'{venue}{field[0].upper()}{field[1:]}'
+
+
+def to_long(df, venue, ticker, tickers=None):
+    """
+    单交易所数据 -> 长表: 去掉列名中的交易所前缀，并加入分类类型的 venue / ticker 列
+
+    Args:
+        df (DataFrame): 分区存储中的单交易所数据，如 ['timestamp', 'binOpen', ...]
+        venue (str): 交易所前缀
+        ticker (str): 如 'BTC'
+        tickers (list): ticker 分类的全部取值，多个长表拼接时需一致，默认只含 ticker
+
+    Returns:
+        DataFrame: ['timestamp', 'venue', 'ticker', 'open', ...]
+    """
+    df = compact_frame(df)
+    df.columns = [c if c == 'timestamp' else split_column(c)[1] for c in df.columns]
+    ticker_dtype = pd.CategoricalDtype(tickers or [ticker])
+    df.insert(1, 'venue', pd.Categorical([venue] * len(df), dtype=VENUE_DTYPE))
+    df.insert(2, 'ticker', pd.Categorical([ticker] * len(df), dtype=ticker_dtype))
+    return df
+
+
+def read_merged(file_path, columns=None, chunksize=None):
+    """
+    以紧凑结构读取 merge_exchange_data 生成的合并文件({ticker}_candles.csv / {ticker}_fr.csv)
+
+    Args:
+        file_path (str): 合并文件路径
+        columns (list): 只读取的列(timestamp总会读取)，None 表示全部
+        chunksize (int): 分块读取的行数，None 表示一次读完
+
+    Returns:
+        DataFrame，或 chunksize 不为None时返回逐块产出紧凑DataFrame的迭代器
+    """
+    header = pd.read_csv(file_path, nrows=0).columns
+    usecols = [c for c in header if c not in DROPPED_COLUMNS and (columns is None or c in columns or c == 'timestamp')]
+    dtype = {c: np.float64 for c in usecols if c != 'timestamp'}
+    dtype['timestamp'] = TIMESTAMP_DTYPE
+    if chunksize is None:
+        return compact_frame(pd.read_csv(file_path, usecols=usecols, dtype=dtype))
+    return (compact_frame(chunk) for chunk in pd.read_csv(file_path, usecols=usecols, dtype=dtype, chunksize=chunksize))
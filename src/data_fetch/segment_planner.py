@@ -0,0 +1,189 @@
+"""
+基于本地覆盖范围的时间段规划
+
+utils.genearate_history_moments 总是以 datetime.now() 为终点生成最近N天的全部时间段，
+重复运行会重新下载已有的数据。本模块将请求窗口与分区存储中该 交易所 × ticker 的
+已有数据求差，只输出缺失的区间，合并相邻区间后按该交易所单次请求允许的最大条数分页
+(history_engine.MAX_PAGE_LIMITS，各适配器的 page_limit)。
+资金费率的分页间隔使用已有数据推断出的结算周期，没有已有数据时按适配器的1小时网格。
+每日增量更新只需要少量请求。
+
+时间段统一为闭区间 (start_ms, end_ms)，各适配器按此语义构造请求。
+"""
+import time
+import numpy as np
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
+# 导入日志模块
+from src.logger import setup_logger
+from src.data_fetch.data_gaps import infer_interval
+from src.data_fetch.partition_store import load_index, read_series
+from src.time_grid import DAY_MS, ceil_ms, floor_ms, page_ranges
+
+# 获取logger实例
+logger = setup_logger('SegmentPlanner')
+
+
+def covered_intervals(kind, venue, ticker, interval_ms, start_ms, end_ms, root=None):
+    """
+    计算 [start_ms, end_ms] 内本地已有数据覆盖的区间
+
+    K线分区在索引中行数与 [min_ts, hwm] 的长度一致时视为连续，直接用索引得到覆盖范围；
+    其余分区(中间有缺口)与资金费率才读取timestamp列。每个时间戳覆盖 [t, t+interval)。
+
+    Returns:
+        tuple: (starts, ends, interval_ms) 半开区间数组，以及实际使用的采样间隔
+    """
+    index = load_index(kind, venue, ticker, root)
+    entries = [e for e in index.values()
+               if e['rows'] and e['hwm'] is not None and e['hwm'] >= start_ms and e['min_ts'] <= end_ms]
+    if not entries:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, interval_ms
+
+    starts, ends, sparse_days = [], [], []
+    for e in entries:
+        contiguous = kind == 'candles' and e['rows'] == (e['hwm'] - e['min_ts']) // interval_ms + 1
+        if contiguous:
+            starts.append(e['min_ts'])
+            ends.append(e['hwm'] + interval_ms)
+        else:
+            sparse_days.append(e['day'])
+
+    if sparse_days:
+        ts_parts = []
+        for day in sorted(sparse_days):
+            day_start = max(start_ms, day * DAY_MS)
+            ts_parts.append(read_series(kind, venue, ticker, start=day_start, end=(day + 1) * DAY_MS - 1,
+                                        columns=['timestamp'], root=root)['timestamp'].to_numpy(dtype=np.int64))
+        ts = np.unique(np.concatenate(ts_parts))
+        if kind != 'candles':
+            # 资金费率结算间隔因交易所与币种而异(1h/4h/8h)，按已有数据推断
+            interval_ms = max(interval_ms, infer_interval(ts))
+        if len(ts):
+            breaks = np.flatnonzero(np.diff(ts) > interval_ms) + 1
+            run_starts = ts[np.r_[0, breaks]]
+            run_ends = ts[np.r_[breaks - 1, len(ts) - 1]] + interval_ms
+            starts.extend(run_starts.tolist())
+            ends.extend(run_ends.tolist())
+
+    order = np.argsort(starts, kind='stable')
+    return np.asarray(starts, dtype=np.int64)[order], np.asarray(ends, dtype=np.int64)[order], interval_ms
+
+
+def missing_ranges(start_ms, end_ms, interval_ms, cov_starts, cov_ends):
+    """
+    求 [start_ms, end_ms] 在采样网格上未被覆盖的闭区间
+
+    Args:
+        start_ms (int): 窗口起点(向上对齐到网格)
+        end_ms (int): 窗口终点(向下对齐到网格)
+        interval_ms (int): 采样间隔
+        cov_starts, cov_ends (np.ndarray): 已排序的已覆盖半开区间
+
+    Returns:
+        list: [(gap_start, gap_end), ...] 闭区间，按时间升序
+    """
+    start_ms = ceil_ms(start_ms, interval_ms)
+    end_ms = floor_ms(end_ms, interval_ms)
+    if end_ms < start_ms:
+        return []
+    if len(cov_starts) == 0:
+        return [(start_ms, end_ms)]
+
+    # 合并重叠的已覆盖区间: 累计最大结束位置之前的区间都已连成一片
+    reach = np.maximum.accumulate(cov_ends)
+    new_block = np.r_[True, cov_starts[1:] > reach[:-1]]
+    block_starts = cov_starts[new_block]
+    block_ends = reach[np.r_[np.flatnonzero(new_block)[1:] - 1, len(reach) - 1]]
+
+    # 缺口: 窗口起点到第一块、块与块之间、最后一块到窗口终点
+    gap_starts = np.r_[start_ms, block_ends]
+    gap_ends = np.r_[block_starts - interval_ms, end_ms]
+    gap_starts = ceil_ms(gap_starts, interval_ms)
+    gap_ends = np.minimum(gap_ends, end_ms)
+    gap_starts = np.maximum(gap_starts, start_ms)
+    keep = gap_ends >= gap_starts
+    return list(zip(gap_starts[keep].tolist(), gap_ends[keep].tolist()))
+
+
+def pack_pages(ranges, interval_ms, page_limit):
+    """
+    将缺失区间切分为单次请求不超过 page_limit 条的闭区间
+
+    Returns:
+        list: [(start_ms, end_ms), ...] 由新到旧排列，与 genearate_history_moments 的顺序一致
+    """
+    if not ranges:
+        return []
+    bounds = np.asarray(ranges, dtype=np.int64)
+    return [tuple(page) for page in page_ranges(bounds[:, 0], bounds[:, 1], interval_ms, page_limit).tolist()]
+
+
+def validate_pages(adapter, pages, interval_ms=None):
+    """
+    检查每个时间段的条数不超过适配器的单页条数，且单页条数不超过接口文档中的上限
+
+    Args:
+        adapter (VenueAdapter): 交易所接口适配器
+        pages (list): [(start_ms, end_ms), ...] 闭区间
+        interval_ms (int): 分页使用的采样间隔，默认为适配器的采样间隔
+
+    Raises:
+        ValueError: 存在超出上限的时间段
+    """
+    if adapter.page_limit > adapter.max_page_limit:
+        raise ValueError(f"{adapter.venue} {adapter.kind}: page_limit {adapter.page_limit} "
+                         f"超过接口上限 {adapter.max_page_limit}")
+    if not pages:
+        return
+    bounds = np.asarray(pages, dtype=np.int64)
+    counts = (bounds[:, 1] - bounds[:, 0]) // (interval_ms or adapter.interval_ms) + 1
+    over = np.flatnonzero(counts > adapter.page_limit)
+    if len(over):
+        start, end = pages[over[0]]
+        raise ValueError(f"{adapter.venue} {adapter.kind}: {len(over)} 个时间段超过单页 {adapter.page_limit} 条, "
+                         f"如 ({start}, {end}) 共 {counts[over[0]]} 条")
+
+
+def plan_segments(adapter, ticker, start_ms, end_ms, root=None, now_ms=None):
+    """
+    规划一个 交易所 × ticker 在 [start_ms, end_ms] 内需要请求的时间段
+
+    Args:
+        adapter (VenueAdapter): 交易所接口适配器，提供数据类型、采样间隔与单页条数
+        ticker (str): 如 'BTC'
+        start_ms (int): 窗口起点
+        end_ms (int): 窗口终点，超过当前时间时截断到最近一个已结束的采样点
+        root (str): 存储根目录
+        now_ms (int): 当前时间，默认为系统时间
+
+    Returns:
+        list: [(start_ms, end_ms), ...]
+    """
+    now_ms = int(time.time() * 1000) if now_ms is None else int(now_ms)
+    interval_ms = adapter.interval_ms
+    # 当前采样周期尚未结束，不请求
+    end_ms = min(int(end_ms), floor_ms(now_ms, interval_ms) - interval_ms)
+    if end_ms < start_ms:
+        return []
+
+    cov_starts, cov_ends, interval_ms = covered_intervals(
+        adapter.kind, adapter.venue, ticker, interval_ms, start_ms, end_ms, root)
+    ranges = missing_ranges(start_ms, end_ms, interval_ms, cov_starts, cov_ends)
+    # 分页按已有数据确定的采样间隔计算(如8小时结算的资金费率)；序列未知时 interval_ms 仍为适配器的最细间隔，
+    # 保证单页不超过交易所的条数上限
+    pages = pack_pages(ranges, interval_ms, adapter.page_limit)
+    validate_pages(adapter, pages, interval_ms)
+    missing = sum((b - a) // interval_ms + 1 for a, b in ranges)
+    logger.info(f"{adapter.venue} {ticker} {adapter.kind}: 缺失 {len(ranges)} 段共 {missing} 条, 规划 {len(pages)} 次请求")
+    return pages
+
+
+def plan_recent(adapter, ticker, days, root=None, now_ms=None):
+    """规划最近 days 天的时间段，替代 genearate_history_moments"""
+    now_ms = int(time.time() * 1000) if now_ms is None else int(now_ms)
+    return plan_segments(adapter, ticker, now_ms - int(days * DAY_MS), now_ms, root, now_ms)
@@ -0,0 +1,347 @@
+"""
+可恢复的时间段工作队列
+
+原获取脚本在 for 循环中用 `i -= 1; continue` 试图重试，但并不会重新请求，
+遇到429或异常的时间段被直接丢弃，只能在下次全量运行时重新下载。
+本模块为每个获取任务(交易所 × ticker × 数据类型)维护:
+    - 日志文件 {task}.journal.jsonl: 每完成一个时间段追加一行(时间段 + 数据行)，
+      中断后重新运行时据此跳过已完成的时间段，并找回尚未写入存储的数据；
+      写入存储期间该批次的日志改名为 {task}.journal.flushing.jsonl，写入完成后删除
+    - 检查点文件 {task}.checkpoint.json: 已写入存储的时间段与最后写入的时间段
+    - 状态文件 {task}.state.json: 重试次数用尽的时间段，下次运行时优先重新请求
+失败的时间段按指数退避加随机抖动重新入队，并遵循交易所返回的 Retry-After / 限速重置时间。
+已完成时间段的数据存放在按列的定长类型数组中，每完成 N 个时间段或累积 M 行写入一次存储，
+内存占用以一次写入的数据量为上限，长时间下载中断时最多丢失未写入日志的在途请求。
+写入存储在线程池中执行，不阻塞事件循环上的其他请求。
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import numpy as np
+import pandas as pd
+from email.utils import parsedate_to_datetime
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
+# 导入日志模块
+from src.logger import setup_logger
+from src.data_fetch.data_gaps import DATA_DIR
+
+# 获取logger实例
+logger = setup_logger('SegmentQueue')
+
+QUEUE_DIR = os.path.join(DATA_DIR, 'fetch_state')
+FLUSH_SEGMENTS = 200  # 每完成多少个时间段写入一次存储
+FLUSH_ROWS = 100_000  # 缓冲区累积多少行写入一次存储
+
+
+class RetryPolicy:
+    """指数退避重试策略(full jitter)"""
+
+    def __init__(self, max_attempts=8, base_delay=1.0, max_delay=60.0):
+        """
+        Args:
+            max_attempts (int): 单个时间段的最大请求次数
+            base_delay (float): 第一次重试的退避上限(秒)
+            max_delay (float): 退避上限(秒)
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        """
+        第 attempt 次失败后的等待时间
+
+        Args:
+            attempt (int): 已失败次数(从1开始)
+            retry_after (float): 交易所要求的等待时间(秒)，优先遵循
+
+        Returns:
+            float: 等待秒数
+        """
+        if retry_after is not None:
+            # 交易所指定了恢复时间，只加少量抖动，避免所有请求同时恢复
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+def retry_after_seconds(headers):
+    """
+    从响应头中解析需要等待的时间
+
+    支持标准的 Retry-After (秒数或HTTP日期，Binance 429/418 返回)，
+    以及 Bybit 的 X-Bapi-Limit-Status / X-Bapi-Limit-Reset-Timestamp。
+
+    Returns:
+        float or None: 等待秒数，无相关响应头时返回None
+    """
+    if not headers:
+        return None
+    value = headers.get('Retry-After')
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    reset = headers.get('X-Bapi-Limit-Reset-Timestamp')
+    if reset and headers.get('X-Bapi-Limit-Status') == '0':
+        return max(0.0, int(reset) / 1000.0 - time.time())
+    return None
+
+
+class RecordBuffer:
+    """
+    按列存放数据行的缓冲区
+
+    timestamp 存为 int64 数组，其余列存为 float64 二维数组，
+    避免以列表/字典形式保存每一行(字符串与Python对象的内存开销是数值的数倍)。
+    """
+
+    def __init__(self, columns):
+        """
+        Args:
+            columns (list): 列名，第一列为timestamp
+        """
+        self.columns = list(columns)
+        self._timestamps = []
+        self._values = []
+        self.rows = 0
+
+    def __len__(self):
+        return self.rows
+
+    def append(self, rows):
+        """追加解析后的数据行 [[timestamp, v1, v2, ...], ...]，非数值转换为NaN"""
+        if not rows:
+            return
+        block = np.asarray(rows, dtype=object).reshape(len(rows), -1)[:, :len(self.columns)]
+        values = np.empty((len(rows), len(self.columns) - 1), dtype=np.float64)
+        for j in range(values.shape[1]):
+            values[:, j] = pd.to_numeric(block[:, j + 1], errors='coerce')
+        self._timestamps.append(block[:, 0].astype(np.int64))
+        self._values.append(values)
+        self.rows += len(rows)
+
+    def frame(self):
+        """
+        转换为DataFrame
+
+        Returns:
+            DataFrame: 按timestamp排序去重，timestamp为int64，其余列为float64
+        """
+        if not self.rows:
+            return pd.DataFrame({c: pd.Series(dtype='int64' if i == 0 else 'float64')
+                                 for i, c in enumerate(self.columns)})
+        values = np.concatenate(self._values)
+        df = pd.DataFrame(values, columns=self.columns[1:])
+        df.insert(0, 'timestamp', np.concatenate(self._timestamps))
+        return df.drop_duplicates(subset=['timestamp'], keep='last').sort_values('timestamp').reset_index(drop=True)
+
+    def clear(self):
+        self._timestamps = []
+        self._values = []
+        self.rows = 0
+
+
+class SegmentQueue:
+    """
+    单个获取任务的时间段队列
+
+    state_dir 为 None 时只在内存中记录(不可恢复)。
+    传入 sink 时，已完成时间段的数据按 flush_segments / flush_rows 分批写入，
+    写入后记录检查点并清空日志；不传时全部保留在缓冲区中，由调用方通过 frame() 取出。
+    mark_done / flush / finish 是协程，需在事件循环中调用，sink 在线程池中执行。
+    """
+
+    def __init__(self, task_key, segments, columns, state_dir=QUEUE_DIR, policy=None, sink=None,
+                 flush_segments=FLUSH_SEGMENTS, flush_rows=FLUSH_ROWS):
+        """
+        Args:
+            task_key (str): 任务标识，如 'bin_BTC_1m'
+            segments (list): 本次请求的时间段 [(start_ms, end_ms), ...]
+            columns (list): 数据列名，第一列为timestamp
+            state_dir (str): 状态目录，None 表示不持久化
+            policy (RetryPolicy): 重试策略
+            sink (callable): sink(df) 将一批数据写入存储(阻塞函数，在线程池中调用)
+            flush_segments (int): 每完成多少个时间段写入一次
+            flush_rows (int): 缓冲区累积多少行写入一次
+        """
+        self.task_key = task_key
+        self.state_dir = state_dir
+        self.policy = policy or RetryPolicy()
+        self.sink = sink
+        self.flush_segments = flush_segments
+        self.flush_rows = flush_rows
+        self.buffer = RecordBuffer(columns)
+        self.done = set()  # 已完成的时间段(含已写入存储的)
+        self.unflushed = []  # 数据仍在缓冲区中的时间段
+        self.flushed = set()
+        self.failed = set()
+        self._flush_lock = asyncio.Lock()
+
+        previous_failed = []
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+            self._load_checkpoint()
+            self._load_journal()
+            previous_failed = self._load_state()
+
+        # 上次重试用尽的时间段优先请求
+        requested = [tuple(s) for s in previous_failed] + [(int(s), int(e)) for s, e in segments]
+        self.pending = list(dict.fromkeys(s for s in requested if s not in self.done))
+        if self.done:
+            logger.info(f"{task_key}: 从上次中断处恢复, 已完成 {len(self.done)} 个时间段"
+                        f"(已写入 {len(self.flushed)} 个), 剩余 {len(self.pending)} 个")
+
+    @property
+    def journal_path(self):
+        return os.path.join(self.state_dir, f"{self.task_key}.journal.jsonl")
+
+    @property
+    def flushing_journal_path(self):
+        return os.path.join(self.state_dir, f"{self.task_key}.journal.flushing.jsonl")
+
+    @property
+    def checkpoint_path(self):
+        return os.path.join(self.state_dir, f"{self.task_key}.checkpoint.json")
+
+    @property
+    def state_path(self):
+        return os.path.join(self.state_dir, f"{self.task_key}.state.json")
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            # 检查点损坏时这些时间段会重新请求，重复写入的数据在存储中去重
+            logger.warning(f"读取检查点失败: {self.checkpoint_path}, {e}")
+            return
+        self.flushed = {tuple(s) for s in checkpoint.get('flushed', [])}
+        self.done |= self.flushed
+
+    def _load_journal(self):
+        # 写入存储时中断的批次在前，之后完成的时间段在后
+        for path in (self.flushing_journal_path, self.journal_path):
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 中断时最后一行可能不完整，丢弃后该时间段会重新请求
+                        continue
+                    segment = tuple(record['segment'])
+                    if segment not in self.done:
+                        self.done.add(segment)
+                        self.unflushed.append(segment)
+                        self.buffer.append(record['rows'])
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return []
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f).get('failed', [])
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"读取队列状态失败: {self.state_path}, {e}")
+            return []
+
+    def _write_json(self, path, obj):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(obj, f)
+        os.replace(tmp_path, path)
+
+    async def mark_done(self, segment, rows):
+        """记录一个已完成的时间段，立即追加到日志，达到阈值时写入存储(已有批次在写入时不重复触发)"""
+        segment = (int(segment[0]), int(segment[1]))
+        if segment in self.done:
+            return
+        self.done.add(segment)
+        self.unflushed.append(segment)
+        self.buffer.append(rows)
+        self.failed.discard(segment)
+        if self.state_dir:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'segment': segment, 'rows': rows}, separators=(',', ':')) + '\n')
+        if (self.sink is not None and not self._flush_lock.locked()
+                and (len(self.unflushed) >= self.flush_segments or len(self.buffer) >= self.flush_rows)):
+            await self.flush()
+
+    def mark_failed(self, segment):
+        """记录一个重试次数用尽的时间段"""
+        self.failed.add((int(segment[0]), int(segment[1])))
+
+    def _rotate_journal(self):
+        """当前日志并入批次日志；上次中断遗留的批次日志中的时间段也在本批次中，需一并保留"""
+        if not os.path.exists(self.journal_path):
+            return
+        if not os.path.exists(self.flushing_journal_path):
+            os.replace(self.journal_path, self.flushing_journal_path)
+            return
+        with open(self.journal_path, encoding='utf-8') as src, \
+                open(self.flushing_journal_path, 'a', encoding='utf-8') as dst:
+            dst.write(src.read())
+        os.remove(self.journal_path)
+
+    async def flush(self):
+        """
+        将缓冲区写入存储，记录检查点后清空该批次的日志
+
+        取出当前批次后缓冲区与日志立即换新，sink 在线程池中执行期间完成的时间段进入下一批次。
+        顺序为 写入存储 -> 检查点 -> 删除批次日志: 任一步之后中断，重新运行时最多重复写入一批数据(存储按timestamp去重)。
+        """
+        async with self._flush_lock:
+            if self.sink is None or not self.unflushed:
+                return
+            segments, batch = self.unflushed, self.buffer
+            self.unflushed, self.buffer = [], RecordBuffer(batch.columns)
+            if self.state_dir:
+                self._rotate_journal()
+
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, lambda: self.sink(batch.frame()))
+            self.flushed.update(segments)
+            if self.state_dir:
+                self._write_json(self.checkpoint_path, {
+                    'flushed': sorted(self.flushed),
+                    'last_segment': segments[-1],
+                    'updated_at': int(time.time() * 1000),
+                })
+                if os.path.exists(self.flushing_journal_path):
+                    os.remove(self.flushing_journal_path)
+            logger.info(f"{self.task_key}: 已写入 {len(segments)} 个时间段 {len(batch)} 行, "
+                        f"累计 {len(self.flushed)} 个时间段")
+
+    def frame(self):
+        """缓冲区中尚未写入存储的数据(未传入 sink 时为全部已完成时间段的数据)"""
+        return self.buffer.frame()
+
+    async def finish(self):
+        """
+        获取结束后调用：写入剩余数据，清除日志与检查点，仅保留重试用尽的时间段供下次运行
+        """
+        await self.flush()
+        if self.failed:
+            logger.warning(f"{self.task_key}: {len(self.failed)} 个时间段重试用尽，已记录到下次运行")
+        if not self.state_dir:
+            return
+        for path in (self.journal_path, self.flushing_journal_path, self.checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+        if self.failed:
+            self._write_json(self.state_path, {'failed': sorted(self.failed)})
+        elif os.path.exists(self.state_path):
+            os.remove(self.state_path)
@@ -0,0 +1,717 @@
+"""
+本地交易所替身服务
+
+实现本项目调用到的 Binance fapi、OKX v5、Bybit v5 与 Hyper Liquid /info、/exchange 接口子集，
+返回录制的响应(fixtures)或由 (symbol, 时间) 确定性生成的合成数据，可配置延迟、抖动、限速与429注入。
+所有交易所共用一个端口(各交易所的接口路径互不冲突)，设置环境变量即可让各模块指向它:
+
+    python src/exchange_standin.py --port 8800 --latency 50 --jitter 20
+    EXCHANGE_STANDIN_URL=http://127.0.0.1:8800 python src/data_fetch/data_merge.py
+
+单独覆盖某个交易所使用 EXCHANGE_{BIN,OKX,BYBIT,HL}_REST_URL(见 utils.rebase_url)。
+录制的响应放在 fixtures 目录下，文件名为 {METHOD}{路径中的/替换为_}.json，
+Hyper Liquid /info 按请求类型区分: POST_info_{type}.json；存在时优先于合成数据。
+签名不做校验；订单以委托价立即全部成交。WebSocket 行情不在本服务范围内。
+"""
+import os
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+import numpy as np
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(__file__)))
+# 导入日志模块
+from src.logger import setup_logger
+from src.time_grid import MINUTE_MS, HOUR_MS, grid
+
+# 获取logger实例
+logger = setup_logger('ExchangeStandin')
+
+DEFAULT_TICKERS = ['BTC', 'ETH', 'SOL', 'DOGE', 'XRP', 'GAS']
+# 各交易所每秒允许的请求数(按请求次数计，不区分权重)，0 表示不限速
+DEFAULT_RATE_LIMITS = {'bin': 40, 'okx': 10, 'bybit': 120, 'hl': 20}
+# 各交易所相对基准价格的偏移与资金费率结算间隔，使交易所之间存在价差与费率差
+VENUE_OFFSETS = {'bin': 0.0, 'okx': 0.0002, 'bybit': -0.0001, 'hl': 0.0003}
+FUNDING_INTERVALS = {'bin': 8 * HOUR_MS, 'okx': 8 * HOUR_MS, 'bybit': 8 * HOUR_MS, 'hl': HOUR_MS}
+START_BALANCE = '10000'
+
+
+def coin_of(symbol):
+    """交易所symbol -> 币种: 'BTCUSDT' / 'BTC-USDT-SWAP' / 'BTC' -> 'BTC'"""
+    symbol = (symbol or 'BTC').upper()
+    if '-' in symbol:
+        return symbol.split('-')[0]
+    for quote in ('USDT', 'USDC'):
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)]
+    return symbol
+
+
+def _fmt(x):
+    return f"{x:.6g}"
+
+
+class SyntheticMarket:
+    """由 (币种, 时间) 确定性生成的行情，同一请求总是返回相同的数据"""
+
+    def __init__(self, seed=0):
+        self.seed = seed
+
+    def _phase(self, coin):
+        return zlib.crc32(f"{coin}:{self.seed}".encode())
+
+    def base_price(self, coin):
+        return 1.0 + self._phase(coin) % 50000
+
+    def prices(self, coin, venue, timestamps):
+        """各时间点(毫秒)的价格"""
+        t = np.asarray(timestamps, dtype=np.int64)
+        phase = self._phase(coin)
+        minutes = t // MINUTE_MS
+        noise = ((minutes * 2654435761 + phase) % 4294967296) / 4294967296.0 - 0.5
+        trend = np.sin(2 * np.pi * minutes / (3 * 24 * 60) + phase % 628 / 100.0)
+        return self.base_price(coin) * (1 + 0.02 * trend + 0.002 * noise) * (1 + VENUE_OFFSETS.get(venue, 0.0))
+
+    def candles(self, coin, venue, start, end, limit):
+        """
+        [start, end] 内按分钟对齐的K线
+
+        Returns:
+            list: [(ts, open, high, low, close, volume), ...] 升序
+        """
+        ts = grid(start, end, MINUTE_MS)[:int(limit)]
+        if not len(ts):
+            return []
+        opens = self.prices(coin, venue, ts)
+        closes = self.prices(coin, venue, ts + MINUTE_MS)
+        spread = np.abs(np.sin(ts / 7.0e5)) * 0.001 + 0.0002
+        highs = np.maximum(opens, closes) * (1 + spread)
+        lows = np.minimum(opens, closes) * (1 - spread)
+        volumes = 100 + (ts // MINUTE_MS * 40503 + self._phase(coin)) % 1000
+        return list(zip(ts.tolist(), opens.tolist(), highs.tolist(), lows.tolist(), closes.tolist(), volumes.tolist()))
+
+    def funding_rate(self, coin, venue, ts):
+        phase = self._phase(coin + venue)
+        return round(0.0001 + 0.0003 * np.sin(ts / (5 * 24 * HOUR_MS) * 2 * np.pi + phase % 628 / 100.0), 8)
+
+    def fundings(self, coin, venue, start, end, limit):
+        """
+        [start, end] 内的资金费率结算
+
+        Returns:
+            list: [(ts, rate), ...] 升序
+        """
+        interval = FUNDING_INTERVALS[venue]
+        ts = grid(start, min(int(end), int(time.time() * 1000)), interval)[:int(limit)]
+        return [(t, self.funding_rate(coin, venue, t)) for t in ts.tolist()]
+
+
+class TokenBucket:
+    """线程安全的令牌桶，令牌不足时返回需要等待的秒数"""
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """
+        Returns:
+            float: 0 表示通过，否则为建议的等待秒数
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class ExchangeStandin:
+    """
+    交易所替身服务
+
+    用法:
+        with ExchangeStandin(latency_ms=50) as standin:
+            os.environ['EXCHANGE_STANDIN_URL'] = standin.url
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0, jitter_ms=0, rate_limits=None, error_rate=0.0,
+                 fixtures_dir=None, tickers=None, seed=0):
+        """
+        Args:
+            host (str): 监听地址
+            port (int): 监听端口，0 表示随机端口
+            latency_ms (float): 每个请求的固定延迟(毫秒)
+            jitter_ms (float): 在固定延迟上叠加的 [0, jitter_ms] 均匀抖动
+            rate_limits (dict): 交易所前缀 -> 每秒请求数，默认 DEFAULT_RATE_LIMITS，超出时返回限速错误
+            error_rate (float): 随机注入限速错误的概率
+            fixtures_dir (str): 录制响应的目录
+            tickers (list): 交易规则与账户接口中返回的币种
+            seed (int): 合成数据与随机注入的种子
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.fixtures_dir = fixtures_dir
+        self.tickers = tickers or DEFAULT_TICKERS
+        self.market = SyntheticMarket(seed)
+        self.random = random.Random(seed)
+        limits = DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits
+        self.buckets = {venue: TokenBucket(rate) for venue, rate in limits.items() if rate}
+        self.stats = {'requests': 0, 'limited': 0, 'injected': 0}
+        self.orders = {}  # (venue, order_id) -> 订单
+        self.positions = {}  # (venue, coin) -> [持仓数量(带方向), 开仓均价]
+        self.lock = threading.Lock()
+        self._next_id = 1000
+        self._server = None
+        self._thread = None
+        self.routes = {
+            # Binance fapi
+            ('GET', '/fapi/v1/time'): ('bin', self.bin_time),
+            ('GET', '/fapi/v1/klines'): ('bin', self.bin_klines),
+            ('GET', '/fapi/v1/fundingRate'): ('bin', self.bin_funding),
+            ('GET', '/fapi/v1/exchangeInfo'): ('bin', self.bin_exchange_info),
+            ('GET', '/fapi/v2/account'): ('bin', self.bin_account),
+            ('GET', '/fapi/v3/positionRisk'): ('bin', self.bin_position_risk),
+            ('POST', '/fapi/v1/leverage'): ('bin', self.bin_leverage),
+            ('POST', '/fapi/v1/order'): ('bin', self.bin_place_order),
+            ('GET', '/fapi/v1/order'): ('bin', self.bin_query_order),
+            ('DELETE', '/fapi/v1/order'): ('bin', self.bin_cancel_order),
+            # OKX v5
+            ('GET', '/api/v5/market/history-candles'): ('okx', self.okx_candles),
+            ('GET', '/api/v5/public/funding-rate-history'): ('okx', self.okx_funding_history),
+            ('GET', '/api/v5/public/funding-rate'): ('okx', self.okx_funding_rate),
+            ('GET', '/api/v5/public/instruments'): ('okx', self.okx_instruments),
+            ('GET', '/api/v5/public/time'): ('okx', self.okx_time),
+            ('GET', '/api/v5/account/balance'): ('okx', self.okx_balance),
+            ('GET', '/api/v5/account/positions'): ('okx', self.okx_positions),
+            ('POST', '/api/v5/account/set-leverage'): ('okx', self.okx_set_leverage),
+            ('POST', '/api/v5/trade/order'): ('okx', self.okx_place_order),
+            ('GET', '/api/v5/trade/order'): ('okx', self.okx_query_order),
+            ('POST', '/api/v5/trade/cancel-order'): ('okx', self.okx_cancel_order),
+            # Bybit v5
+            ('GET', '/v5/market/time'): ('bybit', self.bybit_time),
+            ('GET', '/v5/market/kline'): ('bybit', self.bybit_kline),
+            ('GET', '/v5/market/funding/history'): ('bybit', self.bybit_funding),
+            ('GET', '/v5/market/instruments-info'): ('bybit', self.bybit_instruments),
+            ('GET', '/v5/account/wallet-balance'): ('bybit', self.bybit_wallet_balance),
+            ('GET', '/v5/position/list'): ('bybit', self.bybit_positions),
+            ('GET', '/v5/order/history'): ('bybit', self.bybit_order_history),
+            ('POST', '/v5/position/set-leverage'): ('bybit', self.bybit_set_leverage),
+            ('POST', '/v5/order/create'): ('bybit', self.bybit_place_order),
+            ('POST', '/v5/order/cancel'): ('bybit', self.bybit_cancel_order),
+            # Hyper Liquid
+            ('POST', '/info'): ('hl', self.hl_info),
+            ('POST', '/exchange'): ('hl', self.hl_exchange),
+        }
+
+    # ------------------------------------------------------------------ 服务生命周期
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """在后台线程中启动服务"""
+        standin = self
+
+        class Handler(StandinHandler):
+            pass
+
+        Handler.standin = standin
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='exchange-standin', daemon=True)
+        self._thread.start()
+        logger.info(f"交易所替身服务已启动: {self.url}")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            logger.info(f"交易所替身服务已停止: {self.stats}")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    # ------------------------------------------------------------------ 请求处理
+
+    def handle(self, method, path, query, body):
+        """
+        处理一个请求
+
+        Returns:
+            tuple: (status, payload, headers)
+        """
+        with self.lock:
+            self.stats['requests'] += 1
+        route = self.routes.get((method, path))
+        if route is None:
+            return 404, {'msg': f"替身服务未实现 {method} {path}"}, {}
+        venue, handler = route
+
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+        wait = self.buckets[venue].take() if venue in self.buckets else 0.0
+        injected = not wait and self.error_rate and self.random.random() < self.error_rate
+        if wait or injected:
+            with self.lock:
+                self.stats['injected' if injected else 'limited'] += 1
+            return self.rate_limited(venue, max(wait, 0.05))
+
+        fixture = self.fixture(method, path, body)
+        if fixture is not None:
+            return 200, fixture, {}
+        params = dict(query)
+        if isinstance(body, dict):
+            params.update(body)
+        return handler(params)
+
+    def fixture(self, method, path, body):
+        if not self.fixtures_dir:
+            return None
+        name = f"{method}{path.replace('/', '_')}"
+        if path == '/info' and isinstance(body, dict):
+            name += f"_{body.get('type')}"
+        file_path = os.path.join(self.fixtures_dir, name + '.json')
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def rate_limited(self, venue, wait):
+        """按各交易所的格式返回限速错误"""
+        retry_after = f"{wait:.3f}"
+        if venue == 'bin':
+            return 429, {'code': -1003, 'msg': 'Too many requests.'}, {'Retry-After': retry_after}
+        if venue == 'okx':
+            return 429, {'code': '50011', 'msg': 'Too Many Requests', 'data': []}, {'Retry-After': retry_after}
+        if venue == 'bybit':
+            reset = str(int((time.time() + wait) * 1000))
+            return 200, {'retCode': 10006, 'retMsg': 'Too many visits!', 'result': {}}, {
+                'X-Bapi-Limit-Status': '0', 'X-Bapi-Limit-Reset-Timestamp': reset}
+        return 429, None, {'Retry-After': retry_after}
+
+    # ------------------------------------------------------------------ 订单与持仓
+
+    def new_order(self, venue, coin, is_buy, price, size):
+        """以委托价立即全部成交，并更新持仓"""
+        with self.lock:
+            self._next_id += 1
+            order_id = self._next_id
+            order = {'id': order_id, 'coin': coin, 'is_buy': is_buy, 'price': float(price), 'size': float(size),
+                     'status': 'filled', 'time': int(time.time() * 1000)}
+            self.orders[(venue, str(order_id))] = order
+            position = self.positions.setdefault((venue, coin), [0.0, 0.0])
+            signed = order['size'] if is_buy else -order['size']
+            if position[0] == 0 or (position[0] > 0) == (signed > 0):
+                total = abs(position[0]) + abs(signed)
+                position[1] = (abs(position[0]) * position[1] + abs(signed) * order['price']) / total if total else 0.0
+            position[0] += signed
+            if abs(position[0]) < 1e-12:
+                self.positions[(venue, coin)] = [0.0, 0.0]
+        return order
+
+    def get_order(self, venue, order_id):
+        return self.orders.get((venue, str(order_id)))
+
+    def cancel(self, venue, order_id):
+        order = self.get_order(venue, order_id)
+        if order is not None and order['status'] != 'filled':
+            order['status'] = 'canceled'
+        return order
+
+    def position(self, venue, coin):
+        return self.positions.get((venue, coin), [0.0, 0.0])
+
+    # ------------------------------------------------------------------ Binance
+
+    def bin_time(self, params):
+        return 200, {'serverTime': int(time.time() * 1000)}, {}
+
+    def bin_klines(self, params):
+        coin = coin_of(params.get('symbol'))
+        end = int(params.get('endTime', time.time() * 1000))
+        limit = min(int(params.get('limit', 500)), 1500)
+        start = int(params.get('startTime', end - (limit - 1) * MINUTE_MS))
+        rows = self.market.candles(coin, 'bin', start, end, limit)
+        return 200, [[t, _fmt(o), _fmt(h), _fmt(l), _fmt(c), _fmt(v), t + MINUTE_MS - 1, _fmt(v * c), 100,
+                      _fmt(v / 2), _fmt(v * c / 2), '0'] for t, o, h, l, c, v in rows], {}
+
+    def bin_funding(self, params):
+        coin = coin_of(params.get('symbol'))
+        end = int(params.get('endTime', time.time() * 1000))
+        limit = min(int(params.get('limit', 100)), 1000)
+        start = int(params.get('startTime', end - limit * FUNDING_INTERVALS['bin']))
+        rows = self.market.fundings(coin, 'bin', start, end, limit)
+        return 200, [{'symbol': params.get('symbol'), 'fundingTime': t, 'fundingRate': f"{r:.8f}",
+                      'markPrice': _fmt(self.market.prices(coin, 'bin', [t])[0])} for t, r in rows], {}
+
+    def bin_exchange_info(self, params):
+        symbols = [{'symbol': f"{c}USDT", 'pair': f"{c}USDT", 'baseAsset': c, 'quoteAsset': 'USDT',
+                    'contractType': 'PERPETUAL', 'status': 'TRADING', 'pricePrecision': 2, 'quantityPrecision': 3,
+                    'filters': [{'filterType': 'PRICE_FILTER', 'tickSize': '0.01'},
+                                {'filterType': 'LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001'}]}
+                   for c in self.tickers]
+        return 200, {'timezone': 'UTC', 'serverTime': int(time.time() * 1000), 'symbols': symbols}, {}
+
+    def bin_account(self, params):
+        return 200, {'assets': [{'asset': 'USDT', 'walletBalance': START_BALANCE, 'availableBalance': START_BALANCE}],
+                     'positions': []}, {}
+
+    def bin_position_risk(self, params):
+        coins = [coin_of(params['symbol'])] if params.get('symbol') else self.tickers
+        result = []
+        for coin in coins:
+            size, entry = self.position('bin', coin)
+            result.append({'symbol': f"{coin}USDT", 'positionAmt': _fmt(size), 'entryPrice': _fmt(entry),
+                           'markPrice': _fmt(self.market.prices(coin, 'bin', [time.time() * 1000])[0]),
+                           'unRealizedProfit': '0', 'positionSide': 'BOTH'})
+        return 200, result, {}
+
+    def bin_leverage(self, params):
+        return 200, {'symbol': params.get('symbol'), 'leverage': int(params.get('leverage', 1)),
+                     'maxNotionalValue': '1000000'}, {}
+
+    def _bin_order(self, order, symbol):
+        return {'orderId': order['id'], 'symbol': symbol, 'status': order['status'].upper(),
+                'price': _fmt(order['price']), 'avgPrice': _fmt(order['price']),
+                'origQty': _fmt(order['size']), 'executedQty': _fmt(order['size'] if order['status'] == 'filled' else 0),
+                'side': 'BUY' if order['is_buy'] else 'SELL', 'type': 'LIMIT', 'updateTime': order['time']}
+
+    def bin_place_order(self, params):
+        order = self.new_order('bin', coin_of(params.get('symbol')), params.get('side') == 'BUY',
+                               params.get('price', 0), params.get('quantity', 0))
+        result = self._bin_order(order, params.get('symbol'))
+        result['status'] = 'NEW'
+        return 200, result, {}
+
+    def bin_query_order(self, params):
+        order = self.get_order('bin', params.get('orderId'))
+        if order is None:
+            return 400, {'code': -2013, 'msg': 'Order does not exist.'}, {}
+        return 200, self._bin_order(order, params.get('symbol')), {}
+
+    def bin_cancel_order(self, params):
+        order = self.cancel('bin', params.get('orderId'))
+        if order is None or order['status'] == 'filled':
+            return 400, {'code': -2011, 'msg': 'Unknown order sent.'}, {}
+        return 200, self._bin_order(order, params.get('symbol')), {}
+
+    # ------------------------------------------------------------------ OKX
+
+    @staticmethod
+    def _okx(data, code='0', msg=''):
+        return 200, {'code': code, 'msg': msg, 'data': data}, {}
+
+    def okx_candles(self, params):
+        coin = coin_of(params.get('instId'))
+        limit = min(int(params.get('limit', 100)), 100)
+        # after/before 为开区间，返回由新到旧
+        after = int(params.get('after', time.time() * 1000))
+        before = int(params.get('before', 0))
+        start = max(before + 1, after - limit * MINUTE_MS)
+        rows = self.market.candles(coin, 'okx', start, after - 1, limit)[::-1]
+        return self._okx([[str(t), _fmt(o), _fmt(h), _fmt(l), _fmt(c), _fmt(v), _fmt(v / 100), _fmt(v * c), '1']
+                          for t, o, h, l, c, v in rows])
+
+    def okx_funding_history(self, params):
+        coin = coin_of(params.get('instId'))
+        limit = min(int(params.get('limit', 100)), 100)
+        after = int(params.get('after', time.time() * 1000))
+        before = int(params.get('before', 0))
+        start = max(before + 1, after - limit * FUNDING_INTERVALS['okx'])
+        rows = self.market.fundings(coin, 'okx', start, after - 1, limit)[::-1]
+        return self._okx([{'instId': params.get('instId'), 'instType': 'SWAP', 'fundingTime': str(t),
+                           'fundingRate': f"{r:.8f}", 'realizedRate': f"{r:.8f}"} for t, r in rows])
+
+    def okx_funding_rate(self, params):
+        coin = coin_of(params.get('instId'))
+        interval = FUNDING_INTERVALS['okx']
+        next_time = (int(time.time() * 1000) // interval + 1) * interval
+        rate = self.market.funding_rate(coin, 'okx', next_time)
+        return self._okx([{'instId': params.get('instId'), 'instType': 'SWAP', 'fundingRate': f"{rate:.8f}",
+                           'fundingTime': str(next_time), 'nextFundingTime': str(next_time + interval)}])
+
+    def okx_time(self, params):
+        return self._okx([{'ts': str(int(time.time() * 1000))}])
+
+    def okx_instruments(self, params):
+        coins = [coin_of(params['instId'])] if params.get('instId') else self.tickers
+        return self._okx([{'instId': f"{c}-USDT-SWAP", 'instType': 'SWAP', 'ctVal': '0.01', 'ctMult': '1',
+                           'ctValCcy': c, 'lotSz': '0.01', 'minSz': '0.01', 'tickSz': '0.1', 'state': 'live'}
+                          for c in coins])
+
+    def okx_balance(self, params):
+        return self._okx([{'totalEq': START_BALANCE, 'details': [{'ccy': 'USDT', 'availBal': START_BALANCE,
+                                                                  'cashBal': START_BALANCE, 'eq': START_BALANCE}]}])
+
+    def okx_positions(self, params):
+        coin = coin_of(params.get('instId'))
+        size, entry = self.position('okx', coin)
+        return self._okx([{'instId': params.get('instId'), 'pos': _fmt(size), 'avgPx': _fmt(entry),
+                           'upl': '0', 'lever': '2', 'mgnMode': 'cross'}])
+
+    def okx_set_leverage(self, params):
+        return self._okx([{'instId': params.get('instId'), 'lever': str(params.get('lever')),
+                           'mgnMode': params.get('mgnMode', 'cross')}])
+
+    def okx_place_order(self, params):
+        order = self.new_order('okx', coin_of(params.get('instId')), params.get('side') == 'buy',
+                               params.get('px', 0), params.get('sz', 0))
+        return self._okx([{'ordId': str(order['id']), 'clOrdId': '', 'sCode': '0', 'sMsg': 'Order placed'}])
+
+    def okx_query_order(self, params):
+        order = self.get_order('okx', params.get('ordId'))
+        if order is None:
+            return self._okx([], code='51603', msg='Order does not exist')
+        return self._okx([{'ordId': str(order['id']), 'instId': params.get('instId'), 'state': order['status'],
+                           'sz': _fmt(order['size']), 'fillSz': _fmt(order['size'] if order['status'] == 'filled' else 0),
+                           'px': _fmt(order['price']), 'avgPx': _fmt(order['price'])}])
+
+    def okx_cancel_order(self, params):
+        order = self.cancel('okx', params.get('ordId'))
+        if order is None or order['status'] == 'filled':
+            return self._okx([], code='51400', msg='Order cancellation failed')
+        return self._okx([{'ordId': str(order['id']), 'sCode': '0', 'sMsg': ''}])
+
+    # ------------------------------------------------------------------ Bybit
+
+    @staticmethod
+    def _bybit(result, code=0, msg='OK'):
+        return 200, {'retCode': code, 'retMsg': msg, 'result': result, 'time': int(time.time() * 1000)}, {}
+
+    def bybit_time(self, params):
+        now = time.time()
+        return self._bybit({'timeSecond': str(int(now)), 'timeNano': str(int(now * 1e9))})
+
+    def bybit_kline(self, params):
+        coin = coin_of(params.get('symbol'))
+        end = int(params.get('end', time.time() * 1000))
+        limit = min(int(params.get('limit', 200)), 1000)
+        start = int(params.get('start', end - (limit - 1) * MINUTE_MS))
+        rows = self.market.candles(coin, 'bybit', start, end, limit)[::-1]
+        return self._bybit({'symbol': params.get('symbol'), 'category': 'linear',
+                            'list': [[str(t), _fmt(o), _fmt(h), _fmt(l), _fmt(c), _fmt(v), _fmt(v * c)]
+                                     for t, o, h, l, c, v in rows]})
+
+    def bybit_funding(self, params):
+        coin = coin_of(params.get('symbol'))
+        end = int(params.get('endTime', time.time() * 1000))
+        limit = min(int(params.get('limit', 200)), 200)
+        start = int(params.get('startTime', end - limit * FUNDING_INTERVALS['bybit']))
+        rows = self.market.fundings(coin, 'bybit', start, end, limit)[::-1]
+        return self._bybit({'category': 'linear', 'list': [
+            {'symbol': params.get('symbol'), 'fundingRate': f"{r:.8f}", 'fundingRateTimestamp': str(t)}
+            for t, r in rows]})
+
+    def bybit_instruments(self, params):
+        coins = [coin_of(params['symbol'])] if params.get('symbol') else self.tickers
+        return self._bybit({'category': 'linear', 'list': [
+            {'symbol': f"{c}USDT", 'baseCoin': c, 'quoteCoin': 'USDT', 'status': 'Trading',
+             'lotSizeFilter': {'qtyStep': '0.001', 'minOrderQty': '0.001', 'maxOrderQty': '1000'},
+             'priceFilter': {'tickSize': '0.01'}} for c in coins]})
+
+    def bybit_wallet_balance(self, params):
+        return self._bybit({'list': [{'accountType': 'UNIFIED', 'totalEquity': START_BALANCE, 'coin': [
+            {'coin': 'USDT', 'walletBalance': START_BALANCE, 'equity': START_BALANCE}]}]})
+
+    def bybit_positions(self, params):
+        coin = coin_of(params.get('symbol'))
+        size, entry = self.position('bybit', coin)
+        return self._bybit({'category': 'linear', 'list': [
+            {'symbol': params.get('symbol'), 'side': 'Buy' if size > 0 else ('Sell' if size < 0 else ''),
+             'size': _fmt(abs(size)), 'avgPrice': _fmt(entry), 'unrealisedPnl': '0', 'leverage': '2'}]})
+
+    def bybit_order_history(self, params):
+        order = self.get_order('bybit', params.get('orderId'))
+        if order is None:
+            return self._bybit({'category': 'linear', 'list': []})
+        status = {'filled': 'Filled', 'canceled': 'Cancelled'}.get(order['status'], 'New')
+        return self._bybit({'category': 'linear', 'list': [
+            {'orderId': str(order['id']), 'symbol': params.get('symbol'), 'orderStatus': status,
+             'price': _fmt(order['price']), 'avgPrice': _fmt(order['price']), 'qty': _fmt(order['size']),
+             'cumExecQty': _fmt(order['size'] if order['status'] == 'filled' else 0),
+             'side': 'Buy' if order['is_buy'] else 'Sell'}]})
+
+    def bybit_set_leverage(self, params):
+        return self._bybit({})
+
+    def bybit_place_order(self, params):
+        order = self.new_order('bybit', coin_of(params.get('symbol')), params.get('side') == 'Buy',
+                               params.get('price', 0), params.get('qty', 0))
+        return self._bybit({'orderId': str(order['id']), 'orderLinkId': ''})
+
+    def bybit_cancel_order(self, params):
+        order = self.cancel('bybit', params.get('orderId'))
+        if order is None or order['status'] == 'filled':
+            return self._bybit({}, code=110001, msg='order not exists or too late to cancel')
+        return self._bybit({'orderId': str(order['id']), 'orderLinkId': ''})
+
+    # ------------------------------------------------------------------ Hyper Liquid
+
+    def hl_info(self, params):
+        kind = params.get('type')
+        if kind == 'candleSnapshot':
+            req = params.get('req', {})
+            coin = req.get('coin', 'BTC')
+            rows = self.market.candles(coin, 'hl', req.get('startTime', 0), req.get('endTime', time.time() * 1000), 5000)
+            return 200, [{'t': t, 'T': t + MINUTE_MS - 1, 's': coin, 'i': '1m', 'o': _fmt(o), 'h': _fmt(h),
+                          'l': _fmt(l), 'c': _fmt(c), 'v': _fmt(v), 'n': 100} for t, o, h, l, c, v in rows], {}
+        if kind == 'fundingHistory':
+            coin = params.get('coin', 'BTC')
+            end = params.get('endTime') or int(time.time() * 1000)
+            rows = self.market.fundings(coin, 'hl', params.get('startTime', 0), end, 500)
+            return 200, [{'coin': coin, 'fundingRate': f"{r:.8f}", 'premium': '0', 'time': t} for t, r in rows], {}
+        if kind == 'meta':
+            return 200, {'universe': [{'name': c, 'szDecimals': 3, 'maxLeverage': 20} for c in self.tickers]}, {}
+        if kind == 'spotMeta':
+            return 200, {'universe': [], 'tokens': []}, {}
+        if kind == 'predictedFundings':
+            now = int(time.time() * 1000)
+            result = []
+            for coin in self.tickers:
+                venues = []
+                for venue, name in (('bin', 'BinPerp'), ('hl', 'HlPerp'), ('bybit', 'BybitPerp')):
+                    interval = FUNDING_INTERVALS[venue]
+                    next_time = (now // interval + 1) * interval
+                    venues.append([name, {'fundingRate': f"{self.market.funding_rate(coin, venue, next_time):.8f}",
+                                          'nextFundingTime': next_time}])
+                result.append([coin, venues])
+            return 200, result, {}
+        if kind == 'l2Book':
+            coin = params.get('coin', 'BTC')
+            mid = self.market.prices(coin, 'hl', [time.time() * 1000])[0]
+            levels = [[{'px': _fmt(mid * (1 - 0.0001 * (i + 1))), 'sz': '1', 'n': 1} for i in range(10)],
+                      [{'px': _fmt(mid * (1 + 0.0001 * (i + 1))), 'sz': '1', 'n': 1} for i in range(10)]]
+            return 200, {'coin': coin, 'time': int(time.time() * 1000), 'levels': levels}, {}
+        if kind == 'clearinghouseState':
+            positions = []
+            for (venue, coin), (size, entry) in list(self.positions.items()):
+                if venue == 'hl' and size:
+                    positions.append({'type': 'oneWay', 'position': {
+                        'coin': coin, 'szi': _fmt(size), 'entryPx': _fmt(entry),
+                        'positionValue': _fmt(abs(size) * entry), 'unrealizedPnl': '0'}})
+            return 200, {'assetPositions': positions, 'withdrawable': START_BALANCE,
+                         'marginSummary': {'accountValue': START_BALANCE, 'totalMarginUsed': '0'},
+                         'crossMarginSummary': {'accountValue': START_BALANCE, 'totalMarginUsed': '0'}}, {}
+        if kind == 'orderStatus':
+            order = self.get_order('hl', params.get('oid'))
+            if order is None:
+                return 200, {'status': 'unknownOid'}, {}
+            status = order['status'] if order['status'] != 'canceled' else 'cancelled'
+            return 200, {'status': 'order', 'order': {'status': status, 'order': {'oid': order['id']}},
+                         'statuses': [{status: {'oid': order['id'], 'totalSz': _fmt(order['size']),
+                                                'avgPx': _fmt(order['price'])}}]}, {}
+        return 400, {'error': f"替身服务未实现 info 类型 {kind}"}, {}
+
+    def hl_exchange(self, params):
+        action = params.get('action', {})
+        kind = action.get('type')
+        if kind == 'order':
+            meta = self.tickers
+            statuses = []
+            for o in action.get('orders', []):
+                asset = int(o.get('a', 0))
+                coin = meta[asset] if asset < len(meta) else str(asset)
+                order = self.new_order('hl', coin, bool(o.get('b')), o.get('p', 0), o.get('s', 0))
+                statuses.append({'filled': {'totalSz': _fmt(order['size']), 'avgPx': _fmt(order['price']),
+                                            'oid': order['id']}})
+            return 200, {'status': 'ok', 'response': {'type': 'order', 'data': {'statuses': statuses}}}, {}
+        if kind == 'cancel':
+            statuses = []
+            for c in action.get('cancels', []):
+                order = self.cancel('hl', c.get('o'))
+                statuses.append('success' if order is not None and order['status'] == 'canceled'
+                                else {'error': 'Order was never placed, already canceled, or filled.'})
+            return 200, {'status': 'ok', 'response': {'type': 'cancel', 'data': {'statuses': statuses}}}, {}
+        return 200, {'status': 'ok', 'response': {'type': 'default'}}, {}
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """HTTP请求解析，业务逻辑由 ExchangeStandin.handle 处理"""
+    standin = None
+    protocol_version = 'HTTP/1.1'
+
+    def _dispatch(self, method):
+        parsed = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        body = None
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            raw = self.rfile.read(length)
+            try:
+                body = json.loads(raw)
+            except ValueError:
+                body = {k: v[-1] for k, v in parse_qs(raw.decode('utf-8')).items()}
+        try:
+            status, payload, headers = self.standin.handle(method, parsed.path, query, body)
+        except Exception as e:
+            logger.error(f"处理请求失败: {method} {self.path}, {e}")
+            status, payload, headers = 500, {'msg': str(e)}, {}
+
+        data = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地交易所替身服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency', type=float, default=0, help='固定延迟(毫秒)')
+    parser.add_argument('--jitter', type=float, default=0, help='延迟抖动上限(毫秒)')
+    parser.add_argument('--rate', type=float, default=None, help='所有交易所的每秒请求数上限，0 表示不限速')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='随机注入限速错误的概率')
+    parser.add_argument('--fixtures', default=None, help='录制响应目录')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rate_limits = None if args.rate is None else {venue: args.rate for venue in DEFAULT_RATE_LIMITS}
+    standin = ExchangeStandin(args.host, args.port, args.latency, args.jitter, rate_limits, args.error_rate,
+                              args.fixtures, seed=args.seed).start()
+    print(f"export EXCHANGE_STANDIN_URL={standin.url}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        standin.stop()
@@ -12,6 +12,7 @@ from os import path as os_path
 sys_path.append(os_path.dirname((os_path.dirname(__file__))))
 # 导入日志模块
 from src.logger import setup_logger
+from src.utils import rebase_url
 
 # 获取logger实例
 logger = setup_logger('InfoFetch')
@@ -112,7 +113,7 @@ def fetch_okx_funding_rates(ticker):
 
     # 发送GET请求
     try:
-        response = requests.get(okx_url, params=params)
+        response = requests.get(rebase_url('okx', okx_url), params=params)
 
         # 检查请求是否成功（HTTP状态码200表示成功）
         if response.status_code == 200:
@@ -149,10 +150,10 @@ def fetch_hl_ticker_index(net):
     }
 
     if net:
-        url = HL_MAINNET_URL
+        url = rebase_url('hl', HL_MAINNET_URL)
         csv_path = './data/hl_ticker_index_mainnet.csv'
     else:
-        url = HL_TESTNET_URL
+        url = rebase_url('hl', HL_TESTNET_URL)
         csv_path = './data/hl_ticker_index_testnet.csv'
 
     res = requests.post(
@@ -204,7 +205,7 @@ def fetch_funding_rates():
     # 记录开始时间
     # start_time = time.time()
     
-    response = requests.post(HL_MAINNET_URL, headers=headers, data=json.dumps(body))
+    response = requests.post(rebase_url('hl', HL_MAINNET_URL), headers=headers, data=json.dumps(body))
 
     # 检查请求是否成功
     if response.status_code == 200:
@@ -239,7 +240,7 @@ def fetch_bin_perps():
     获取Binance上所有的perp
     """
      # 正确的API路径
-    url = 'https://fapi.binance.com/fapi/v1/exchangeInfo'
+    url = rebase_url('bin', 'https://fapi.binance.com/fapi/v1/exchangeInfo')
 
     # 使用GET请求而不是POST
     res = requests.get(
@@ -271,7 +272,7 @@ def fetch_bybit_perps():
     """
     获取Bybit上所有的perp
     """
-    url = "https://api.bybit.com/v5/market/instruments-info"
+    url = rebase_url('bybit', "https://api.bybit.com/v5/market/instruments-info")
     body = {
         'category': 'linear',
     }
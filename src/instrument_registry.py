@@ -0,0 +1,354 @@
+"""
+交易标的注册表
+
+各交易所永续合约的交易规则(价格最小变动 tickSize、数量最小变动 stepSize、最小下单量、
+最小名义价值、合约面值 ctVal / 合约乘数 ctMult)在每个进程中按交易所整表加载一次，
+下单路径上的价格/数量取整都是对内存中字典的 O(1) 查询，不再发起网络请求。
+
+    instrument = lookup_instrument('bin', rest_base_url, 'kPEPE')  # -> 1000PEPEUSDT
+    price = instrument.round_price(price)
+    size = instrument.round_size(size)
+
+标的名称统一使用Hyper Liquid的名称(ticker)，'k' 前缀表示1000倍计价单位的标的:
+    Hyper Liquid kPEPE <-> Binance / Bybit 1000PEPEUSDT <-> OKX PEPE-USDT-SWAP(面值由ctVal给出)
+
+同一标的在各交易所的报价单位不同: kPEPE 与 1000PEPEUSDT 按1000个PEPE报价，PEPE-USDT-SWAP 与
+回退的 PEPEUSDT 按1个PEPE报价。跨交易所传递的价格与数量统一以Hyper Liquid名称的计价单位表示，
+与本交易所的价格/数量组合前用 price_from_coin / size_from_coin 换算，返回给其他交易所前用
+price_to_coin / size_to_coin 换算。
+"""
+import re
+import math
+import requests
+from decimal import Decimal
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(__file__)))
+# 导入日志模块
+from src.logger import setup_logger
+from src.utils import resolve_rest_url
+
+# 获取logger实例
+logger = setup_logger('InstrumentRegistry')
+
+REQUEST_TIMEOUT = 10  # 单次请求超时(秒)
+HL_MAX_DECIMALS = 6  # Hyper Liquid 永续合约价格小数位数 + szDecimals 不超过6
+HL_SIG_FIGS = 5  # Hyper Liquid 价格最多5位有效数字(整数价格除外)
+HL_MIN_NOTIONAL = 10.0  # Hyper Liquid 最小下单价值(USD)
+SIZE_EPSILON = 1e-9  # 数量向下取整时的浮点误差容忍
+
+# Binance / Bybit 的1000倍计价标的，如 1000PEPE、1000000MOG
+_SCALED_BASE = re.compile(r'^(10{3,})(.+)$')
+
+
+def step_decimals(step):
+    """最小变动单位的小数位数: '0.0010' -> 3, '1' -> 0, 1e-05 -> 5"""
+    exponent = Decimal(str(step)).normalize().as_tuple().exponent
+    return max(0, -exponent)
+
+
+def coin_scale(name):
+    """Hyper Liquid名称的计价倍数: 'kPEPE' -> 1000, 'BTC' -> 1"""
+    return 1000 if len(name) > 1 and name[0] == 'k' and name[1:].isupper() else 1
+
+
+def base_coin(name):
+    """去掉 'k' 前缀的币种名称: 'kPEPE' -> 'PEPE'"""
+    return name[1:] if coin_scale(name) > 1 else name
+
+
+def venue_symbols(venue, name):
+    """
+    Hyper Liquid名称 -> 该交易所可能的合约名称，按优先级排列
+
+    Returns:
+        list: 如 ('bin', 'kPEPE') -> ['1000PEPEUSDT', 'PEPEUSDT']
+    """
+    base = base_coin(name)
+    if venue in ('bin', 'bybit'):
+        return [f"1000{base}USDT", f"{base}USDT"] if coin_scale(name) > 1 else [f"{base}USDT"]
+    if venue == 'okx':
+        return [f"{base}-USDT-SWAP"]
+    return [name]
+
+
+def hl_name(venue, symbol, hl_names=None):
+    """
+    交易所合约名称 -> Hyper Liquid名称，venue_symbols 的逆运算
+
+    Args:
+        venue (str): 交易所前缀
+        symbol (str): 如 '1000PEPEUSDT'、'PEPE-USDT-SWAP'
+        hl_names (set): Hyper Liquid上的全部名称，OKX合约不带倍数信息，需要据此判断是否为 'k' 前缀标的
+    """
+    if venue == 'okx':
+        base = symbol.split('-')[0]
+        return f"k{base}" if hl_names and base not in hl_names and f"k{base}" in hl_names else base
+    if venue in ('bin', 'bybit'):
+        base = symbol[:-len('USDT')] if symbol.endswith('USDT') else symbol
+        match = _SCALED_BASE.match(base)
+        return f"k{match.group(2)}" if match and match.group(1) == '1000' else base
+    return symbol
+
+
+class Instrument:
+    """单个永续合约的交易规则"""
+
+    def __init__(self, venue, symbol, tick_size, step_size, min_qty=0.0, min_notional=0.0,
+                 ct_val=1.0, ct_mult=1.0, multiplier=1.0, price_unit=1.0, max_leverage=None, sig_figs=None,
+                 index=None):
+        """
+        Args:
+            venue (str): 交易所前缀
+            symbol (str): 交易所合约名称
+            tick_size (str): 价格最小变动单位
+            step_size (str): 数量最小变动单位
+            min_qty (float): 最小下单数量
+            min_notional (float): 最小下单价值
+            ct_val (float): 合约面值(OKX)，其余交易所为1
+            ct_mult (float): 合约乘数(OKX)，其余交易所为1
+            multiplier (float): 每单位下单数量对应的币种数量，如 1000PEPEUSDT 为1000
+            price_unit (float): 报价对应的币种数量，如 1000PEPEUSDT 为1000，PEPE-USDT-SWAP 为1
+            max_leverage (int): 最大杠杆(Hyper Liquid)
+            sig_figs (int): 价格的最大有效数字位数(Hyper Liquid)
+            index (int): 在universe中的序号(Hyper Liquid)
+        """
+        self.venue = venue
+        self.symbol = symbol
+        self.tick_size = float(tick_size)
+        self.step_size = float(step_size)
+        self.price_decimals = step_decimals(tick_size)
+        self.size_decimals = step_decimals(step_size)
+        self.min_qty = float(min_qty or 0)
+        self.min_notional = float(min_notional or 0)
+        self.ct_val = float(ct_val)
+        self.ct_mult = float(ct_mult)
+        self.multiplier = float(multiplier)
+        self.price_unit = float(price_unit)
+        self.max_leverage = max_leverage
+        self.sig_figs = sig_figs
+        self.index = index
+
+    def __repr__(self):
+        return (f"Instrument({self.venue}:{self.symbol}, tick={self.tick_size}, step={self.step_size}, "
+                f"min_qty={self.min_qty}, min_notional={self.min_notional}, ct={self.ct_val}x{self.ct_mult})")
+
+    def price_tick(self, price):
+        """该价格处的最小价格变动: tickSize，Hyper Liquid 受有效数字限制时更大"""
+        if self.sig_figs and price > 0:
+            return max(self.tick_size, 10.0 ** (math.floor(math.log10(price)) - self.sig_figs + 1))
+        return self.tick_size
+
+    def round_price(self, price):
+        """取整到最近的价格最小变动单位(Hyper Liquid 还需满足有效数字限制)"""
+        price = round(round(price / self.tick_size) * self.tick_size, self.price_decimals)
+        if self.sig_figs and price > 0:
+            price = round(price, max(0, min(self.price_decimals, self.sig_figs - 1 - math.floor(math.log10(price)))))
+        return price
+
+    def round_size(self, size):
+        """向下取整到数量最小变动单位，不足最小下单量时返回0"""
+        size = round(math.floor(size / self.step_size + SIZE_EPSILON) * self.step_size, self.size_decimals)
+        return size if size >= self.min_qty else 0.0
+
+    def format_price(self, price):
+        """下单参数中的价格字符串: 按tickSize的小数位数输出定点数，str() 会得到 1.229e-05 这样交易所不接受的科学计数法"""
+        return f"{float(price):.{self.price_decimals}f}"
+
+    def format_size(self, size):
+        """下单参数中的数量字符串: 按stepSize的小数位数输出定点数"""
+        return f"{float(size):.{self.size_decimals}f}"
+
+    def offset_price(self, price, side, ticks):
+        """
+        在最优价基础上偏移若干个最小变动单位: 做多略低，做空略高
+
+        Args:
+            price (float): 当前价格
+            side (bool): True为做多，False为做空
+            ticks (int): 偏移的最小变动单位个数
+        """
+        return self.round_price(price - ticks * self.price_tick(price) * (1 if side else -1))
+
+    def size_for_margin(self, amount, leverage, price):
+        """保证金 × 杠杆可开的下单数量(OKX为张数): 价值 ÷ (价格 × 合约面值 × 合约乘数)"""
+        return self.round_size(amount * leverage / (price * self.ct_val * self.ct_mult))
+
+    def size_from_coin(self, size, name):
+        """以Hyper Liquid名称计价的数量(如套利方开仓数量)换算为本合约的下单数量"""
+        return self.round_size(size * coin_scale(name) / self.multiplier)
+
+    def size_to_coin(self, size, name):
+        """本合约的数量(OKX为张数)换算为以Hyper Liquid名称计价的数量，size_from_coin 的逆运算(不取整)"""
+        return size * self.multiplier / coin_scale(name)
+
+    def price_from_coin(self, price, name):
+        """以Hyper Liquid名称计价的价格(或价差)换算为本合约的报价，如 kPEPE 价格 -> PEPE-USDT-SWAP 价格 ÷1000"""
+        return price * self.price_unit / coin_scale(name)
+
+    def price_to_coin(self, price, name):
+        """本合约的报价换算为以Hyper Liquid名称计价的价格，price_from_coin 的逆运算"""
+        return price * coin_scale(name) / self.price_unit
+
+
+def _filters(symbol_data):
+    return {f['filterType']: f for f in symbol_data.get('filters', [])}
+
+
+def _scale_of(base):
+    """Binance / Bybit 合约的币种倍数: '1000PEPE' -> 1000"""
+    match = _SCALED_BASE.match(base)
+    return int(match.group(1)) if match else 1
+
+
+def _load_bin(base_url):
+    res = requests.get(base_url + '/fapi/v1/exchangeInfo', timeout=REQUEST_TIMEOUT)
+    if res.status_code != 200:
+        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+        return None
+    instruments = []
+    for item in res.json()['symbols']:
+        filters = _filters(item)
+        lot = filters.get('LOT_SIZE', {})
+        instruments.append(Instrument(
+            'bin', item['symbol'],
+            tick_size=filters.get('PRICE_FILTER', {}).get('tickSize', 10.0 ** -item.get('pricePrecision', 8)),
+            step_size=lot.get('stepSize', 10.0 ** -item.get('quantityPrecision', 0)),
+            min_qty=lot.get('minQty', 0),
+            min_notional=filters.get('MIN_NOTIONAL', {}).get('notional', 0),
+            multiplier=_scale_of(item.get('baseAsset', item['symbol'])),
+            price_unit=_scale_of(item.get('baseAsset', item['symbol'])),
+        ))
+    return instruments
+
+
+def _load_okx(base_url):
+    res = requests.get(base_url + '/api/v5/public/instruments', params={'instType': 'SWAP'}, timeout=REQUEST_TIMEOUT)
+    if res.status_code != 200:
+        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+        return None
+    instruments = []
+    for item in res.json()['data']:
+        ct_val, ct_mult = float(item['ctVal']), float(item.get('ctMult') or 1)
+        instruments.append(Instrument(
+            'okx', item['instId'],
+            tick_size=item['tickSz'], step_size=item['lotSz'], min_qty=item.get('minSz', 0),
+            # 按1个币报价，合约面值只影响数量
+            ct_val=ct_val, ct_mult=ct_mult, multiplier=ct_val * ct_mult, price_unit=1,
+        ))
+    return instruments
+
+
+def _load_bybit(base_url):
+    instruments = []
+    params = {'category': 'linear', 'limit': 1000}
+    while True:
+        res = requests.get(base_url + '/v5/market/instruments-info', params=params, timeout=REQUEST_TIMEOUT)
+        data = res.json() if res.status_code == 200 else None
+        if not data or data.get('retCode') != 0:
+            logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+            return None
+        for item in data['result']['list']:
+            lot = item['lotSizeFilter']
+            instruments.append(Instrument(
+                'bybit', item['symbol'],
+                tick_size=item['priceFilter']['tickSize'], step_size=lot['qtyStep'],
+                min_qty=lot.get('minOrderQty', 0), min_notional=lot.get('minNotionalValue', 0),
+                multiplier=_scale_of(item.get('baseCoin', item['symbol'])),
+                price_unit=_scale_of(item.get('baseCoin', item['symbol'])),
+            ))
+        # 合约数量超过单页上限时按游标翻页
+        cursor = data['result'].get('nextPageCursor')
+        if not cursor:
+            return instruments
+        params['cursor'] = cursor
+
+
+def _load_hl(base_url):
+    res = requests.post(base_url + '/info', json={'type': 'meta'}, timeout=REQUEST_TIMEOUT)
+    if res.status_code != 200:
+        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+        return None
+    instruments = []
+    for index, item in enumerate(res.json().get('universe', [])):
+        sz_decimals = int(item.get('szDecimals', 0))
+        instruments.append(Instrument(
+            'hl', item['name'],
+            tick_size=Decimal(1).scaleb(-(HL_MAX_DECIMALS - sz_decimals)),
+            step_size=Decimal(1).scaleb(-sz_decimals),
+            min_notional=HL_MIN_NOTIONAL,
+            multiplier=coin_scale(item['name']),
+            price_unit=coin_scale(item['name']),
+            max_leverage=item.get('maxLeverage'),
+            sig_figs=HL_SIG_FIGS,
+            index=index,
+        ))
+    return instruments
+
+
+LOADERS = {'bin': _load_bin, 'okx': _load_okx, 'bybit': _load_bybit, 'hl': _load_hl}
+
+
+class InstrumentRegistry:
+    """
+    按 (交易所, REST基础URL) 缓存的合约交易规则
+
+    主网、测试网与本地替身服务(exchange_standin)的基础URL不同，分别加载互不影响。
+    """
+
+    def __init__(self):
+        self._tables = {}  # (venue, base_url) -> {symbol: Instrument}
+
+    def load(self, venue, base_url, refresh=False):
+        """
+        加载(或刷新)一个交易所的全部合约
+
+        Returns:
+            dict: {symbol: Instrument}，请求失败时返回None(已加载过的数据保持不变)
+        """
+        key = (venue, base_url)
+        if key in self._tables and not refresh:
+            return self._tables[key]
+        try:
+            instruments = LOADERS[venue](base_url)
+        except (requests.RequestException, KeyError, ValueError) as e:
+            logger.error(f"{venue} 合约信息加载失败: {e}")
+            instruments = None
+        if instruments is None:
+            return self._tables.get(key)
+        self._tables[key] = {i.symbol: i for i in instruments}
+        logger.info(f"{venue} 合约信息加载完成: {len(instruments)} 个合约")
+        return self._tables[key]
+
+    def get(self, venue, base_url, symbol):
+        """按交易所合约名称查询，如 ('bin', url, 'BTCUSDT')"""
+        table = self.load(venue, base_url)
+        instrument = table.get(symbol) if table else None
+        if instrument is None:
+            logger.error(f"未找到 {venue} 合约 {symbol} 的交易规则")
+        return instrument
+
+    def lookup(self, venue, base_url, name):
+        """按Hyper Liquid名称查询，如 ('bin', url, 'kPEPE') -> 1000PEPEUSDT"""
+        table = self.load(venue, base_url) or {}
+        for symbol in venue_symbols(venue, name):
+            if symbol in table:
+                return table[symbol]
+        logger.error(f"未找到 {name} 在 {venue} 上的合约")
+        return None
+
+
+# 进程内共享的注册表
+REGISTRY = InstrumentRegistry()
+load_instruments = REGISTRY.load
+get_instrument = REGISTRY.get
+lookup_instrument = REGISTRY.lookup
+
+
+if __name__ == '__main__':
+    for venue, url in (('bin', 'https://fapi.binance.com'), ('okx', 'https://www.okx.com'),
+                       ('bybit', 'https://api.bybit.com'), ('hl', 'https://api.hyperliquid.xyz')):
+        url = resolve_rest_url(venue, url)
+        print(lookup_instrument(venue, url, 'BTC'), lookup_instrument(venue, url, 'kPEPE'))
@@ -1,14 +1,99 @@
 import logging
 import os
-import traceback
+import sys
+import queue
+import atexit
+import threading
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 
-def setup_logger(name='FundingRatesArbitrage'):
+# 队列模式: 调用方只把日志记录放入队列，文件/控制台写入与异常堆栈格式化在后台线程完成
+# 设置环境变量 LOG_QUEUE=0 时退回同步写入
+QUEUE_LOGGING = os.environ.get('LOG_QUEUE', '1') != '0'
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logs')
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
+
+# 进程内所有logger共用的队列与后台写日志线程，首次以队列模式配置logger时启动
+_listener = None
+_listener_lock = threading.Lock()
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    只在调用线程中合并消息参数的QueueHandler
+
+    标准 QueueHandler.prepare 会在调用线程中完整格式化记录(包括异常堆栈)，
+    这里保留 exc_info，由后台线程中的处理器格式化。队列只在进程内使用，记录无需序列化。
+    记录上标记所属logger的名称(route)，后台线程据此分发给该logger的处理器。
+    """
+
+    def __init__(self, log_queue, route):
+        super().__init__(log_queue)
+        self.route = route
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        record.log_route = self.route
+        return record
+
+
+class RoutingQueueListener(QueueListener):
+    """
+    多个logger共用的后台写日志线程
+
+    每条记录按入队时标记的logger名称分发给该logger自己的文件/控制台处理器。
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue, respect_handler_level=True)
+        self.routes = {}  # logger名称 -> 处理器列表
+
+    def add_route(self, route, *handlers):
+        self.routes[route] = handlers
+
+    def handle(self, record):
+        record = self.prepare(record)
+        for handler in self.routes.get(getattr(record, 'log_route', None), ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def shared_listener():
+    """进程内共用的后台写日志线程，首次调用时启动"""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = RoutingQueueListener(queue.SimpleQueue())
+            _listener.start()
+        return _listener
+
+
+def stop_listener():
+    """停止共用的后台写日志线程，写完队列中剩余的记录(进程退出时调用)"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(stop_listener)
+
+
+def setup_logger(name='FundingRatesArbitrage', queued=None, log_dir=None, listener=None):
     """
     配置并返回logger实例，支持显示错误发生的具体行号
+
+    Args:
+        name (str): logger名称，同时作为日志文件名前缀
+        queued (bool): 是否使用队列模式，默认由环境变量 LOG_QUEUE 决定(默认开启)
+        log_dir (str): 日志目录，默认为项目根目录的上一级下的logs
+        listener (RoutingQueueListener): 队列模式下使用的后台线程，默认为进程内共用的线程
     """
+    queued = QUEUE_LOGGING if queued is None else queued
     # 创建logs文件夹（如果不存在）
-    log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logs')
+    log_dir = log_dir or LOG_DIR
     os.makedirs(log_dir, exist_ok=True)
 
     # 生成日志文件名（包含时间戳）
@@ -16,11 +101,11 @@ def setup_logger(name='FundingRatesArbitrage'):
 
     # 创建logger实例
     logger = logging.getLogger(name)
-    
+
     # 如果logger已经有处理器，说明已经被配置过，直接返回
     if logger.handlers:
         return logger
-        
+
     logger.setLevel(logging.INFO)
 
     # 创建文件处理器
@@ -32,27 +117,97 @@ def setup_logger(name='FundingRatesArbitrage'):
     console_handler.setLevel(logging.INFO)
 
     # 创建格式器
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s')
+    formatter = logging.Formatter(LOG_FORMAT)
     file_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
 
-    # 添加处理器到logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
+    if queued:
+        # 处理器挂在共用的后台线程上，logger上只有入队的QueueHandler
+        listener = listener or shared_listener()
+        listener.add_route(name, file_handler, console_handler)
+        logger.addHandler(DeferredQueueHandler(listener.queue, name))
+    else:
+        # 添加处理器到logger
+        logger.addHandler(file_handler)
+        logger.addHandler(console_handler)
+
     # 添加异常处理方法到logger实例
     def error_with_traceback(self, msg, *args, **kwargs):
-        if kwargs.get('exc_info', False) is True:
+        # 在except块中调用时附带异常信息，堆栈由处理器格式化(队列模式下在后台线程)
+        if not kwargs.get('exc_info') and sys.exc_info()[0] is not None:
             kwargs['exc_info'] = True
-        else:
-            stack_trace = traceback.format_exc()
-            if stack_trace != 'NoneType: None\n':
-                msg = f"{msg}\n{stack_trace}"
+        # 跳过本函数与lambda两层，行号指向实际调用处
+        kwargs.setdefault('stacklevel', 3)
         self._original_error(msg, *args, **kwargs)
-    
+
     # 保存原始error方法
     logger._original_error = logger.error
     # 替换为新的error方法
     logger.error = lambda msg, *args, **kwargs: error_with_traceback(logger, msg, *args, **kwargs)
 
-    return logger
\ No newline at end of file
+    return logger
+
+
+def benchmark_logging(calls=2000):
+    """
+    对比同步写入与队列模式下下单路径上每次日志调用的耗时
+
+    模拟 open_position_* 中的日志: 完整的下单参数/响应(info) 与 except 块中的 error(带堆栈)。
+    只统计调用线程的耗时；队列模式使用基准测试自己的后台线程，结束时只停止该线程(等待其队列写完)，
+    不影响进程内共用的日志线程。
+
+    Returns:
+        dict: {模式: {'info': 微秒/次, 'error': 微秒/次}}
+    """
+    import time
+    import tempfile
+
+    order_res = {'status': 'ok', 'response': {'type': 'order', 'data': {'statuses': [
+        {'resting': {'oid': 77738308}}]}}}
+    params = {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'timeInForce': 'GTC',
+              'quantity': 0.003, 'price': 65432.1, 'recvWindow': 3000, 'timestamp': 1760000000000}
+
+    results = {}
+    stderr = sys.stderr
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull:
+        # 控制台输出重定向到空设备，只保留格式化与写入的开销
+        sys.stderr = devnull
+        try:
+            for mode, queued in (('sync', False), ('queue', True)):
+                listener = RoutingQueueListener(queue.SimpleQueue()) if queued else None
+                if listener is not None:
+                    listener.start()
+                logger = setup_logger(f'LogBench_{mode}', queued=queued, log_dir=tmp, listener=listener)
+                start = time.perf_counter()
+                for i in range(calls):
+                    logger.info(f"下单参数: {params}, 下单结果: {order_res}, 第{i}次")
+                info_us = (time.perf_counter() - start) / calls * 1e6
+
+                start = time.perf_counter()
+                for i in range(calls):
+                    try:
+                        raise ValueError(f"订单状态异常: {order_res}")
+                    except ValueError as e:
+                        logger.error(f"下单过程中发生错误: {str(e)}")
+                error_us = (time.perf_counter() - start) / calls * 1e6
+
+                results[mode] = {'info': info_us, 'error': error_us}
+                if listener is not None:
+                    listener.stop()
+                    for handlers in listener.routes.values():
+                        for handler in handlers:
+                            handler.close()
+                for handler in logger.handlers:
+                    handler.close()
+                logger.handlers.clear()
+        finally:
+            sys.stderr = stderr
+    return results
+
+
+if __name__ == '__main__':
+    results = benchmark_logging()
+    for mode, costs in results.items():
+        print(f"{mode:>6}: info {costs['info']:7.2f} us/次, error(带堆栈) {costs['error']:7.2f} us/次")
+    print(f"队列模式加速: info {results['sync']['info'] / results['queue']['info']:.1f}x, "
+          f"error {results['sync']['error'] / results['queue']['error']:.1f}x")
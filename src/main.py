@@ -22,33 +22,11 @@ def func_manager():
     返回下一个需要执行的时间点列表
     """
     from datetime import datetime, timedelta
+    from src.time_grid import next_schedule_moment, local_utc_offset_minutes
 
-    # 获取当前时间
-    now = datetime.now()
-    
-    # 计算下一个四小时时间点
-    current_hour = now.hour
-    next_four_hour = now.replace(minute=0, second=0, microsecond=0)
-    hours_to_add = 4 - (current_hour % 4) if current_hour % 4 != 0 else 4
-    next_four_hour += timedelta(hours=hours_to_add)
-    
-    # 计算下一个奇数时刻(1,3,5,7)
-    odd_hours = [1, 3, 5, 7]
-    current_hour = now.hour
-    current_day = now.day
-    
-    # 找出今天剩余的奇数时刻
-    next_odd_hours = [h for h in odd_hours if h > current_hour]
-    
-    if next_odd_hours:
-        # 今天还有奇数时刻
-        next_odd_hour = now.replace(hour=next_odd_hours[0], minute=0, second=0, microsecond=0)
-    else:
-        # 今天没有剩余奇数时刻，取明天的第一个
-        next_odd_hour = now.replace(hour=odd_hours[0], minute=0, second=0, microsecond=0) + timedelta(days=1)
-    
-    # 确定下一个执行时间点（取最近的一个）
-    next_execution = min(next_four_hour, next_odd_hour)
+    # 下一个执行时间点（UTC网格上计算，按本机时区判断整点，与main_loop中的datetime.now()比较）
+    next_ms = next_schedule_moment(utc_offset_minutes=local_utc_offset_minutes())
+    next_execution = datetime.fromtimestamp(next_ms / 1000)
     
     # 资金费率信息获取时刻：10min Before
     t_fr_fetch = next_execution - timedelta(minutes=10)
@@ -58,11 +36,28 @@ def func_manager():
     t_close = next_execution + timedelta(seconds=5)
     
     # 记录计算出的下一个执行时间点
-    logger.info(f"计算得到下一个执行时间点: {next_execution}, 类型: {'四小时整点' if next_execution == next_four_hour else '奇数时刻'}")
+    logger.info(f"计算得到下一个执行时间点: {next_execution}, 类型: {'四小时整点' if next_execution.hour % 4 == 0 else '奇数时刻'}")
     logger.debug(f"资金费率获取时间: {t_fr_fetch}, 开仓时间: {t_open}, 平仓时间: {t_close}")
     
     return t_fr_fetch, t_open, t_close, next_execution
 
+def refresh_instruments(net=True):
+    """
+    刷新各交易所的合约交易规则(tickSize/stepSize等)，在资金费率获取时执行，开仓/平仓时只做内存查询
+    """
+    from src.instrument_registry import load_instruments
+
+    configs = {
+        'bin': bin_perp_trade.BinanceApiConfig(net),
+        'okx': okx_perp_trade.OKXApiConfig(net),
+        'bybit': bybit_perp_trade.BybitApiConfig(net),
+        'hl': hl_perp_trade.HyperLiquidApiConfig(net),
+    }
+    for venue, config in configs.items():
+        if load_instruments(venue, config.get_rest_url(), refresh=True) is None:
+            logger.warning(f"{venue} 合约交易规则刷新失败")
+
+
 def main_loop():
     import time
     from datetime import datetime, timedelta
@@ -97,6 +92,7 @@ def main_loop():
             try:
                 fetch_funding_rates()
                 logger.info("资金费率获取成功")
+                refresh_instruments()
             except Exception as e:
                 logger.error(f"资金费率获取失败: {str(e)}")
             
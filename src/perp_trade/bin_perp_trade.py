@@ -14,7 +14,6 @@
 
 import websockets
 import asyncio
-import requests
 import json
 import uuid  # 添加uuid模块用于生成随机字符串
 from sys import path as sys_path
@@ -26,13 +25,16 @@ sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
 # 导入日志模块
 from src.logger import setup_logger
 # 导入工具模块
-from src.utils import set_price, set_size, ExchangeApiConfig, POSITION_RISK, POSITION_LEVERAGE
+from src.utils import set_price, set_size, ExchangeApiConfig, AsyncExchangeClient, POSITION_RISK, POSITION_LEVERAGE
+from src.instrument_registry import lookup_instrument
 
 # 获取logger实例
 logger = setup_logger('BinanceTrading')
 
 # 实现Binance交易平台API配置类
 class BinanceApiConfig(ExchangeApiConfig):
+    venue = 'bin'
+
     def _setup_urls(self):
         """设置Binance的REST和WebSocket URL"""
         if self.type:  # 主网
@@ -43,6 +45,23 @@ class BinanceApiConfig(ExchangeApiConfig):
             self.ws_url = "wss://testnet.binancefuture.com/ws-fapi/v1"
 
 
+class BinanceClient(AsyncExchangeClient, BinanceApiConfig):
+    """Binance U本位合约异步客户端: 长连接会话 + 本地校正时钟签名，私有接口不再先请求 /fapi/v1/time"""
+    time_path = '/fapi/v1/time'
+    recv_window = 3000
+
+    def parse_server_time(self, data):
+        return data['serverTime']
+
+    def sign(self, method, path, params, body, timestamp_ms):
+        """参数(含timestamp/recvWindow)按查询字符串签名，signature追加在末尾"""
+        from urllib.parse import urlencode
+
+        query = urlencode({**(params or {}), **(body or {}), 'recvWindow': self.recv_window, 'timestamp': timestamp_ms})
+        signature = self.sign_digest(query).hex()
+        return f"{query}&signature={signature}", {'X-MBX-APIKEY': self.api_key}, None
+
+
 # 基础全局变量
 # MAIN_REST_BASEURL = "https://fapi.binance.com"
 # TEST_REST_BASEURL = "https://testnet.binancefuture.com"
@@ -50,23 +69,6 @@ class BinanceApiConfig(ExchangeApiConfig):
 # TEST_WS_BASEURL = "wss://testnet.binancefuture.com/ws-fapi/v1"
 
 
-def get_server_time(base_url):
-    """获取币安服务器时间
-    
-    Args:
-        base_url (str): 币安API的基础URL
-        
-    Returns:
-        int: 服务器时间戳(毫秒)，失败时返回本地时间
-    """
-    response = requests.get(f"{base_url}/fapi/v1/time")
-    if response.status_code == 200:
-        return response.json()['serverTime']
-    else:
-        logger.error(f"获取服务器时间失败: {response.text}")
-        return int(time.time() * 1000)  # 失败时返回本地时间
-
-
 def fetch_api_key(net):
     """从config.json文件中获取对应的API Key
     
@@ -92,180 +94,57 @@ def fetch_api_key(net):
     return _api_key, _secret_key
 
 
-def generate_sign(api_secret, params):
-    """
-    生成签名，签名使用HMAC SHA256算法
-    
-    API-KEY所对应的API-Secret作为HMAC SHA256的密钥，
-    其他所有参数作为HMAC SHA256的操作对象，得到的输出即为签名。
-    
-    Args:
-        api_secret (str): API-Secret密钥
-        params (dict): 需要签名的参数字典
-        
-    Returns:
-        str: 生成的签名字符串
-    """
-    import hmac
-    import hashlib
-    from urllib.parse import urlencode
-    
-    # 将参数转换为查询字符串
-    query_string = urlencode(params)
-    
-    # 使用HMAC SHA256算法生成签名
-    signature = hmac.new(
-        api_secret.encode('utf-8'),
-        query_string.encode('utf-8'),
-        hashlib.sha256
-    ).hexdigest()
-    
-    return signature
-
-
-def adjust_lever(base_url, api_key, secret_key, symbol, lever):
+def adjust_lever(client, symbol, lever):
     """调整杠杆倍数
     
     Args:
-        base_url (str): 币安API的基础URL
-        api_key (str): 币安API密钥
-        secret_key (str): 币安API密钥对应的私钥
+        client (BinanceClient): 共享的异步客户端(BinanceClient.shared)
         symbol (str): 交易对名称
         lever (int): 杠杆倍数
         
     Returns:
         int: 操作结果，0表示成功，-1表示失败
     """
-    timestamp = get_server_time(base_url)
-
-    url = base_url + '/fapi/v1/leverage'
-
-    headers = {
-        'X-MBX-APIKEY': api_key,
-    }
-
     body = {
         'symbol': symbol,
         'leverage': lever,
-        'recWindow': 3000,
-        'timestamp': timestamp,
     }
 
-    sign = generate_sign(secret_key, body)
-    body['signature'] = sign
-
-    res = requests.post(
-        url,  
-        headers=headers,
-        data=body
-    )
-
-    if res.status_code == 200:
-        data = res.json()
-        return 0
-    else:
-        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+    data = client.call('POST', '/fapi/v1/leverage', body=body)
+    if data is None:
         return -1
+    return 0
 
 
-def query_user_data(base_url, api_key, secret_key):
+def query_user_data(client):
     """
     查询用户数据，获取可用的保证金
     
     Args:
-        base_url (str): 币安API的基础URL
-        api_key (str): 币安API密钥
-        secret_key (str): 币安API密钥对应的私钥
+        client (BinanceClient): 共享的异步客户端(BinanceClient.shared)
         
     Returns:
         float: 可用的USDT保证金余额，失败时返回-1
     """
-    timestamp = get_server_time(base_url)
-
-    # 正确的API路径
-    url = base_url + '/fapi/v2/account'
-
-    headers = {
-        'X-MBX-APIKEY': api_key,
-    }
-
-    # 查询参数
-    params = {
-        'timestamp': timestamp,
-        'recvWindow': 3000,  # 增加接收窗口时间
-    }
-
-    # 生成签名
-    sign = generate_sign(secret_key, params)
-    params['signature'] = sign
-
-    # 使用GET请求而不是POST
-    res = requests.get(
-        url,  
-        headers=headers,
-        params=params  # 使用params而不是data
-    )
-    
-    if res.status_code == 200:
-        data = res.json()
-        # 查找asset为USDT的元素
-        usdt_data = next((item for item in data['assets'] if item['asset'] == 'USDT'), None)
-        if usdt_data:
-            _available_balance = float(usdt_data['availableBalance'])
-            return _available_balance
-        else:
-            logger.warning("未找到USDT资产信息")
-            return -1
-    else:
-        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+    data = client.call('GET', '/fapi/v2/account')
+    if data is None:
         return -1
 
-
-def query_symbol_size(base_url, symbol):
-    """查询标的的最小价格变动和最小数量变动
-    
-    Args:
-        base_url (str): 币安API的基础URL
-        symbol (str): 交易对名称
-        
-    Returns:
-        int: 交易对数量精度，失败时返回-1
-    """
-    # 正确的API路径
-    url = base_url + '/fapi/v1/exchangeInfo'
-
-    # 使用GET请求而不是POST
-    res = requests.get(
-        url,  
-        params={}  # 使用params而不是data
-    )
-    
-    if res.status_code == 200:
-        data = res.json()
-        symbols = data['symbols']
-        # 查找目标symbol的元素
-        symbol_data = next((item for item in symbols if item['symbol'] == symbol), None)
-        if symbol_data:
-            # min_size_step = symbol_data['filters'][1]['stepSize']
-            size_decimals = symbol_data['quantityPrecision']
-            # logger.info(f"{symbol}最小数量变动: {size_decimals}")
-            return size_decimals
-        else:
-            logger.warning("未找到交易对信息")
-            return -1
-        # logger.info(f"API请求成功: {data[0]}, \n{data[1]}")
+    # 查找asset为USDT的元素
+    usdt_data = next((item for item in data['assets'] if item['asset'] == 'USDT'), None)
+    if usdt_data:
+        _available_balance = float(usdt_data['availableBalance'])
+        return _available_balance
     else:
-        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+        logger.warning("未找到USDT资产信息")
         return -1
 
 
-def query_position(base_url, api_key, secret_key, symbol):
+def query_position(client, symbol):
     """查询用户持仓信息
     
     Args:
-        base_url (str): 币安API的基础URL
-        api_key (str): 币安API密钥
-        secret_key (str): 币安API密钥对应的私钥
+        client (BinanceClient): 共享的异步客户端(BinanceClient.shared)
         symbol (str): 交易对名称
         
     Returns:
@@ -274,61 +153,23 @@ def query_position(base_url, api_key, secret_key, symbol):
             - position_size (float): 持仓数量
             失败时返回(-1, -1)
     """
-    timestamp = get_server_time(base_url)
-
-    # 正确的API路径
-    url = base_url + '/fapi/v3/positionRisk'
-
-    headers = {
-        'X-MBX-APIKEY': api_key,
-    }
-
-    # 查询参数
-    params = {
-        'symbol': symbol,
-        'timestamp': timestamp,
-        'recvWindow': 3000,  # 增加接收窗口时间
-    }
-
-    # 生成签名
-    sign = generate_sign(secret_key, params)
-    params['signature'] = sign
-
-    # 使用GET请求而不是POST
-    res = requests.get(
-        url,  
-        headers=headers,
-        params=params  # 使用params而不是data
-    )
-    
-    if res.status_code == 200:
-        data = res.json()
-        logger.info(f"仓位信息: {data}")
-        open_price = float(data[0]['entryPrice'])
-        position_size = float(data[0]['positionAmt'])
-        logger.info(f"开仓价格: {open_price}, 持仓张数：{position_size}")
-        return open_price, position_size
-        # 查找asset为USDT的元素
-        # position = next((item for item in data['positions'] if item['symbol'] == symbol), None)
-        # if position:
-        #     size = position['positionAmt']
-        #     logger.info(f"仓位信息: {position}, 持仓张数：{size}")
-        #     return size
-        # else:
-        #     logger.warning("未找到仓位信息")
-        #     return -1
-    else:
-        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+    data = client.call('GET', '/fapi/v3/positionRisk', {'symbol': symbol})
+    if data is None:
         return -1, -1
-    # 查询参数
+
+    logger.info(f"仓位信息: {data}")
+    open_price = float(data[0]['entryPrice'])
+    position_size = float(data[0]['positionAmt'])
+    logger.info(f"开仓价格: {open_price}, 持仓张数：{position_size}")
+    return open_price, position_size
 
 
-async def retrieve_price(base_url, symbol, side):
+async def retrieve_price(base_url, instrument, side):
     """获取标的当前价格并计算目标价格
     
     Args:
         base_url (str): WebSocket API的基础URL
-        symbol (str): 交易对名称
+        instrument (Instrument): 标的交易规则，提供交易对名称与tickSize
         side (bool): 交易方向，True为买入，False为卖出
         
     Returns:
@@ -341,7 +182,7 @@ async def retrieve_price(base_url, symbol, side):
             "id": str(uuid.uuid4()),  # 使用uuid生成随机字符串作为id
             "method": "ticker.price",
             "params": {
-                "symbol": symbol,
+                "symbol": instrument.symbol,
             }
         }
         await websocket.send(json.dumps(subscribe_message))
@@ -353,22 +194,10 @@ async def retrieve_price(base_url, symbol, side):
                 data = json.loads(message)  # 假设消息是JSON格式
 
                 if data['status'] == 200:
-                    price_str = data['result']['price']  # 获取价格字符串
-                    price = float(price_str)  # 标记价格
-
-                    # 计算小数位数
-                    decimal_places = 0
-                    if '.' in price_str:
-                        # 去除尾随零后再计算小数位数
-                        decimal_part = price_str.split('.')[1].rstrip('0')
-                        decimal_places = len(decimal_part)
-                    
-                    # 计算最小价格变动
-                    min_price_movement = 10 ** (-decimal_places)
-                    logger.info(f"最小价格变动: {min_price_movement}")
-                    # 计算目标价格
-                    target_price = set_price(price, side, min_price_movement)
-                    target_price = round(target_price, decimal_places)
+                    price = float(data['result']['price'])  # 标记价格
+
+                    # 按标的的tickSize计算目标价格
+                    target_price = set_price(price, side, instrument)
                     logger.info(f"当前价格: {price}; 目标价格: {target_price}")
                 else:
                     logger.error(f"API请求失败: 状态码 {data['status']}, 响应: {data}")
@@ -381,16 +210,14 @@ async def retrieve_price(base_url, symbol, side):
     return target_price
 
 
-def place_trade(base_url, api_key, secret_key, price, side, symbol, size):
+def place_trade(client, price, side, instrument, size):
     """下单交易
     
     Args:
-        base_url (str): 币安API的基础URL
-        api_key (str): 币安API密钥
-        secret_key (str): 币安API密钥对应的私钥
+        client (BinanceClient): 共享的异步客户端(BinanceClient.shared)
         price (float): 下单价格
         side (bool): 交易方向，True为买入，False为卖出
-        symbol (str): 交易对名称
+        instrument (Instrument): 标的交易规则，提供交易对名称与价格/数量的小数位数
         size (float): 下单数量
         
     Returns:
@@ -398,151 +225,78 @@ def place_trade(base_url, api_key, secret_key, price, side, symbol, size):
     """
     side_enum = "BUY" if side else "SELL"
 
-    timestamp = get_server_time(base_url)
-
-     # 正确的API路径
-    url = base_url + '/fapi/v1/order'
-
-    headers = {
-        'X-MBX-APIKEY': api_key,
-    }
-
     params = {
-        "symbol": symbol,
+        "symbol": instrument.symbol,
         "side": side_enum,
         "type": "LIMIT",
-        "quantity": size,
-        "price": price,
+        "quantity": instrument.format_size(size),
+        "price": instrument.format_price(price),
         "timeInForce": "GTC",
-        "timestamp": timestamp,
     }
-
-    # 生成签名
-    signature = generate_sign(secret_key, params)
-    # 将签名添加到参数中
-    params["signature"] = signature
     logger.info(f"下单参数: {params}")
 
     try:
-        response = requests.post(url, headers=headers, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            logger.info(f"下单成功: {data}")
-            return data  # 返回订单信息
-        else:
-            logger.error(f"API请求失败: 状态码 {response.status_code}, 响应: {response.text}")
+        data = client.call('POST', '/fapi/v1/order', params)
+        if data is None:
             return -1
+        logger.info(f"下单成功: {data}")
+        return data  # 返回订单信息
     except Exception as e:
         logger.error(f"下单异常: {str(e)}")
         return -1
 
 
-def query_order_status(base_url, api_key, secret_key, symbol, order_id):
+def query_order_status(client, symbol, order_id):
     """查询订单状态
     
     Args:
-        base_url (str): 币安API的基础URL
-        api_key (str): 币安API密钥
-        secret_key (str): 币安API密钥对应的私钥
+        client (BinanceClient): 共享的异步客户端(BinanceClient.shared)
         symbol (str): 交易对名称
         order_id (int): 订单ID
         
     Returns:
         dict: 订单信息，失败时返回None
     """
-    timestamp = get_server_time(base_url)
-
-    # 正确的API路径
-    url = base_url + '/fapi/v1/order'
-
-    headers = {
-        'X-MBX-APIKEY': api_key,
-    }
-
-    # 查询参数
     params = {
         'symbol': symbol,
         'orderId': order_id,
-        'timestamp': timestamp,
-        'recvWindow': 3000,  # 增加接收窗口时间
     }
 
-    # 生成签名
-    sign = generate_sign(secret_key, params)
-    params['signature'] = sign
-
-    # 使用GET请求
     try:
-        res = requests.get(
-            url,  
-            headers=headers,
-            params=params
-        )
-        
-        if res.status_code == 200:
-            data = res.json()
+        data = client.call('GET', '/fapi/v1/order', params)
+        if data is not None:
             logger.info(f"订单状态: {data}")
-            return data
-        else:
-            logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
-            return None
+        return data
     except Exception as e:
         logger.error(f"查询订单状态异常: {str(e)}")
         return None
 
 
-def cancel_order(base_url, api_key, secret_key, symbol, order_id):
-        """取消订单
-        
-        Args:
-            base_url (str): 币安API的基础URL
-            api_key (str): 币安API密钥
-            secret_key (str): 币安API密钥对应的私钥
-            symbol (str): 交易对名称
-            order_id (int): 订单ID
-            
-        Returns:
-            int: 操作结果，0表示成功，-1表示失败
-        """
-        timestamp = get_server_time(base_url)
-    
-        # 正确的API路径
-        url = base_url + '/fapi/v1/order'
-    
-        headers = {
-            'X-MBX-APIKEY': api_key,
-        }
+def cancel_order(client, symbol, order_id):
+    """取消订单
     
-        # 查询参数
-        params = {
-            'symbol': symbol,
-            'orderId': order_id,
-            'timestamp': timestamp,
-            'recvWindow': 3000,  # 增加接收窗口时间
-        }
-    
-        # 生成签名
-        sign = generate_sign(secret_key, params)
-        params['signature'] = sign
-    
-        # 使用DELETE请求
-        try:
-            res = requests.delete(
-                url,  
-                headers=headers,
-                params=params
-            )
-            
-            if res.status_code == 200:
-                data = res.json()
-                logger.info(f"取消订单成功: {data}")
-                return 0
-            else:
-                logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
-                return -1
-        except Exception as e:
-            logger.error(f"取消订单异常: {str(e)}")
+    Args:
+        client (BinanceClient): 共享的异步客户端(BinanceClient.shared)
+        symbol (str): 交易对名称
+        order_id (int): 订单ID
+        
+    Returns:
+        int: 操作结果，0表示成功，-1表示失败
+    """
+    params = {
+        'symbol': symbol,
+        'orderId': order_id,
+    }
+
+    try:
+        data = client.call('DELETE', '/fapi/v1/order', params)
+        if data is None:
             return -1
+        logger.info(f"取消订单成功: {data}")
+        return 0
+    except Exception as e:
+        logger.error(f"取消订单异常: {str(e)}")
+        return -1
 
 
 def open_position_arb(net, side, ticker, max_retries=5, check_interval=5):
@@ -557,22 +311,20 @@ def open_position_arb(net, side, ticker, max_retries=5, check_interval=5):
         
     Returns:
         tuple: 包含开仓价格和开仓数量的元组
-            - target_price (float): 套利方开仓价格
-            - target_size (float): 套利方开仓张数
+            - target_price (float): 套利方开仓价格(以Hyper Liquid名称的计价单位)
+            - target_size (float): 套利方开仓数量(以Hyper Liquid名称的计价单位)
     """
-    config = BinanceApiConfig(net)  # 构建对应网络的API配置
-    rest_base_url = config.get_rest_url()  # 获取REST API的基础URL
-    ws_base_url = config.get_ws_url()  # 获取WebSocket的基础URL
+    client = BinanceClient.shared(net, *fetch_api_key(net))  # 进程内共享的客户端(长连接、本地校正时钟签名)
+    rest_base_url = client.get_rest_url()  # 获取REST API的基础URL
+    ws_base_url = client.get_ws_url()  # 获取WebSocket的基础URL
 
-    target_perp = ticker+"USDT"  # 根据ticker构建出目标perp的币对
-    
-    api_key, secret_key = fetch_api_key(net)
+    instrument = lookup_instrument('bin', rest_base_url, ticker)  # 标的交易规则(进程内只加载一次)
+    if instrument is None:
+        return -1, -1
+    target_perp = instrument.symbol  # 根据ticker得到目标perp的币对(kPEPE -> 1000PEPE...)
 
     # 查询账户余额
-    fund = query_user_data(
-        rest_base_url,
-        api_key, secret_key
-    )
+    fund = query_user_data(client)
 
     # 计算保证金
     logger.info(f"账户可用保证金余额: {fund}")
@@ -580,11 +332,7 @@ def open_position_arb(net, side, ticker, max_retries=5, check_interval=5):
     logger.info(f"仓位保证金: {position_fund}")
 
     # 调整目标标的杠杆
-    adjust_lever(
-        rest_base_url, 
-        api_key, secret_key, 
-        target_perp, POSITION_LEVERAGE
-    )
+    adjust_lever(client, target_perp, POSITION_LEVERAGE)
     
     # 初始化重试计数器
     retry_count = 0
@@ -596,28 +344,23 @@ def open_position_arb(net, side, ticker, max_retries=5, check_interval=5):
     while not order_filled and retry_count < max_retries:
         # 计算开仓价格 
         target_price = asyncio.run(
-            retrieve_price(ws_base_url, target_perp, side)
+            retrieve_price(ws_base_url, instrument, side)
         )
 
-        size_decimals = query_symbol_size(
-            rest_base_url,
-            target_perp
-        )
         # 根据账户数据获取目标标的张数
         target_size = set_size(
             amount=position_fund, 
             leverage=POSITION_LEVERAGE, 
             price=target_price, 
-            decimals=size_decimals
+            instrument=instrument
         )
         logger.info(f"目标标的张数: {target_size}")
 
         # 下单
         order_result = place_trade(
-            base_url=rest_base_url,
-            api_key=api_key, secret_key=secret_key,
+            client,
             price=target_price, side=side,
-            symbol=target_perp, size=target_size
+            instrument=instrument, size=target_size
         )
         
         if order_result == -1:
@@ -635,11 +378,7 @@ def open_position_arb(net, side, ticker, max_retries=5, check_interval=5):
         max_check_attempts = 10  # 最多检查10次订单状态
         
         while check_attempts < max_check_attempts:
-            order_info = query_order_status(
-                rest_base_url,
-                api_key, secret_key,
-                target_perp, order_id
-            )
+            order_info = query_order_status(client, target_perp, order_id)
             
             if order_info is None:
                 logger.error("查询订单状态失败")
@@ -664,7 +403,7 @@ def open_position_arb(net, side, ticker, max_retries=5, check_interval=5):
         if not order_filled and order_info and order_info['status'] not in ['REJECTED', 'EXPIRED', 'CANCELED']:
             # 这里可以添加取消订单的逻辑
             logger.info(f"尝试取消订单: {order_id}")
-            cancel_order(rest_base_url, api_key, secret_key, target_perp, order_id)
+            cancel_order(client, target_perp, order_id)
             
         retry_count += 1
         
@@ -679,8 +418,9 @@ def open_position_arb(net, side, ticker, max_retries=5, check_interval=5):
             logger.info(f"使用实际成交均价: {target_price}")
     else:
         logger.error(f"达到最大重试次数({max_retries})，开仓失败")
-    
-    return target_price, target_size
+
+    # 以Hyper Liquid名称的计价单位返回，其他交易所的对冲方可直接使用
+    return instrument.price_to_coin(target_price, ticker), instrument.size_to_coin(target_size, ticker)
 
 
 def open_position_hedge(net, side, ticker, arb_size, max_retries=5, check_interval=5):
@@ -698,19 +438,20 @@ def open_position_hedge(net, side, ticker, arb_size, max_retries=5, check_interv
         float: 对冲方开仓价格
     """
     # 获取基础信息
-    config = BinanceApiConfig(net)  # 构建对应网络的API配置
-    rest_base_url = config.get_rest_url()  # 获取REST API的基础URL
-    ws_base_url = config.get_ws_url()  # 获取WebSocket的基础URL
-    target_perp = ticker+"USDT"  # 根据ticker构建出目标perp的币对
-    api_key, secret_key = fetch_api_key(net)
+    client = BinanceClient.shared(net, *fetch_api_key(net))  # 进程内共享的客户端(长连接、本地校正时钟签名)
+    rest_base_url = client.get_rest_url()  # 获取REST API的基础URL
+    ws_base_url = client.get_ws_url()  # 获取WebSocket的基础URL
+    instrument = lookup_instrument('bin', rest_base_url, ticker)  # 标的交易规则(进程内只加载一次)
+    if instrument is None:
+        return -1
+    target_perp = instrument.symbol  # 根据ticker得到目标perp的币对(kPEPE -> 1000PEPE...)
 
     # 调整目标标的杠杆
-    adjust_lever(
-        rest_base_url, 
-        api_key, secret_key, 
-        target_perp, POSITION_LEVERAGE
-    )
+    adjust_lever(client, target_perp, POSITION_LEVERAGE)
     
+    # 套利方数量换算为本合约的下单数量(stepSize取整)
+    hedge_size = instrument.size_from_coin(arb_size, ticker)
+
     # 初始化重试计数器
     retry_count = 0
     order_filled = False
@@ -720,21 +461,20 @@ def open_position_hedge(net, side, ticker, arb_size, max_retries=5, check_interv
     while not order_filled and retry_count < max_retries:
         # 计算价格
         target_price = asyncio.run(
-            retrieve_price(ws_base_url, target_perp, side)
+            retrieve_price(ws_base_url, instrument, side)
         )
 
         logger.info(
             f"对冲方开仓价格: {target_price}, "
-            f"对冲方开仓数量: {arb_size}, "
+            f"对冲方开仓数量: {hedge_size}, "
             f"对冲方开仓杠杆: {POSITION_LEVERAGE}"
         )
 
         # 下单
         order_result = place_trade(
-            base_url=rest_base_url,
-            api_key=api_key, secret_key=secret_key,
+            client,
             price=target_price, side=side,
-            symbol=target_perp, size=arb_size
+            instrument=instrument, size=hedge_size
         )
         
         if order_result == -1:
@@ -752,11 +492,7 @@ def open_position_hedge(net, side, ticker, arb_size, max_retries=5, check_interv
         max_check_attempts = 10  # 最多检查10次订单状态
         
         while check_attempts < max_check_attempts:
-            order_info = query_order_status(
-                rest_base_url,
-                api_key, secret_key,
-                target_perp, order_id
-            )
+            order_info = query_order_status(client, target_perp, order_id)
             
             if order_info is None:
                 logger.error("查询订单状态失败")
@@ -780,7 +516,7 @@ def open_position_hedge(net, side, ticker, arb_size, max_retries=5, check_interv
         # 如果订单未完全成交且未被拒绝，尝试取消订单
         if not order_filled and order_info and order_info['status'] not in ['REJECTED', 'EXPIRED', 'CANCELED']:
             logger.info(f"尝试取消订单: {order_id}")
-            cancel_order(rest_base_url, api_key, secret_key, target_perp, order_id)
+            cancel_order(client, target_perp, order_id)
             
         retry_count += 1
         
@@ -789,7 +525,7 @@ def open_position_hedge(net, side, ticker, arb_size, max_retries=5, check_interv
             time.sleep(check_interval)
     
     if order_filled:
-        logger.info(f"成功开仓: 价格={target_price}, 数量={arb_size}")
+        logger.info(f"成功开仓: 价格={target_price}, 数量={hedge_size}")
         # 如果订单已成交，使用实际成交价格
         if order_info and 'avgPrice' in order_info and float(order_info['avgPrice']) > 0:
             target_price = float(order_info['avgPrice'])
@@ -814,18 +550,16 @@ def close_position_arb(net, side, ticker, max_retries=5, check_interval=5):
         int: 操作结果，0表示成功，-1表示失败
     """
     # 获取基础信息
-    config = BinanceApiConfig(net)  # 构建对应网络的API配置
-    rest_base_url = config.get_rest_url()  # 获取REST API的基础URL
-    ws_base_url = config.get_ws_url()  # 获取WebSocket的基础URL
-    target_perp = ticker+"USDT"  # 根据ticker构建出目标perp的币对
-    api_key, secret_key = fetch_api_key(net)
+    client = BinanceClient.shared(net, *fetch_api_key(net))  # 进程内共享的客户端(长连接、本地校正时钟签名)
+    rest_base_url = client.get_rest_url()  # 获取REST API的基础URL
+    ws_base_url = client.get_ws_url()  # 获取WebSocket的基础URL
+    instrument = lookup_instrument('bin', rest_base_url, ticker)  # 标的交易规则(进程内只加载一次)
+    if instrument is None:
+        return -1
+    target_perp = instrument.symbol  # 根据ticker得到目标perp的币对(kPEPE -> 1000PEPE...)
 
     # 获取仓位信息（仓位大小）
-    open_price, size = query_position(
-        rest_base_url,
-        api_key, secret_key,
-        target_perp
-    )
+    open_price, size = query_position(client, target_perp)
     
     if size == -1 or open_price == -1:
         logger.error("获取仓位信息失败")
@@ -840,15 +574,14 @@ def close_position_arb(net, side, ticker, max_retries=5, check_interval=5):
     while not order_filled and retry_count < max_retries:
         # 计算平仓价格
         target_price = asyncio.run(
-            retrieve_price(ws_base_url, target_perp, side)
+            retrieve_price(ws_base_url, instrument, side)
         )
         
         # 下单平仓
         order_result = place_trade(
-            base_url=rest_base_url,
-            api_key=api_key, secret_key=secret_key,
+            client,
             price=target_price, side=side,
-            symbol=target_perp, size=abs(size)
+            instrument=instrument, size=abs(size)
         )
         
         if order_result == -1:
@@ -866,11 +599,7 @@ def close_position_arb(net, side, ticker, max_retries=5, check_interval=5):
         max_check_attempts = 10  # 最多检查10次订单状态
         
         while check_attempts < max_check_attempts:
-            order_info = query_order_status(
-                rest_base_url,
-                api_key, secret_key,
-                target_perp, order_id
-            )
+            order_info = query_order_status(client, target_perp, order_id)
             
             if order_info is None:
                 logger.error("查询订单状态失败")
@@ -894,7 +623,7 @@ def close_position_arb(net, side, ticker, max_retries=5, check_interval=5):
         # 如果订单未完全成交且未被拒绝，尝试取消订单
         if not order_filled and order_info and order_info['status'] not in ['REJECTED', 'EXPIRED', 'CANCELED']:
             logger.info(f"尝试取消订单: {order_id}")
-            cancel_order(rest_base_url, api_key, secret_key, target_perp, order_id)
+            cancel_order(client, target_perp, order_id)
             
         retry_count += 1
         
@@ -917,8 +646,8 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
         net (bool): Binance的API URL类型，True为主网，False为测试网
         side (bool): 平仓方向，True为买入平仓，False为卖出平仓
         ticker (str): 目标标的，如"BTC"
-        arb_open_price (float): 套利方开仓价格
-        arb_close_price (float): 套利方平仓价格
+        arb_open_price (float): 套利方开仓价格(以Hyper Liquid名称的计价单位，如 kPEPE 为每1000个PEPE)
+        arb_close_price (float): 套利方平仓价格(同上)
         max_retries (int, optional): 最大重试次数，默认为5次
         check_interval (int, optional): 检查订单状态的间隔时间(秒)，默认为5秒
         
@@ -926,18 +655,16 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
         int: 操作结果，0表示成功，-1表示失败
     """
     # 获取基础信息
-    config = BinanceApiConfig(net)  # 构建对应网络的API配置
-    rest_base_url = config.get_rest_url()  # 获取REST API的基础URL
-    ws_base_url = config.get_ws_url()  # 获取WebSocket的基础URL
-    target_perp = ticker+"USDT"  # 根据ticker构建出目标perp的币对
-    api_key, secret_key = fetch_api_key(net)
+    client = BinanceClient.shared(net, *fetch_api_key(net))  # 进程内共享的客户端(长连接、本地校正时钟签名)
+    rest_base_url = client.get_rest_url()  # 获取REST API的基础URL
+    ws_base_url = client.get_ws_url()  # 获取WebSocket的基础URL
+    instrument = lookup_instrument('bin', rest_base_url, ticker)  # 标的交易规则(进程内只加载一次)
+    if instrument is None:
+        return -1
+    target_perp = instrument.symbol  # 根据ticker得到目标perp的币对(kPEPE -> 1000PEPE...)
 
     # 获取当前账户的仓位/开仓价格
-    hedge_open_price, hedge_size = query_position(
-        rest_base_url,
-        api_key, secret_key,
-        target_perp
-    )
+    hedge_open_price, hedge_size = query_position(client, target_perp)
     
     if hedge_open_price == -1 or hedge_size == -1:
         logger.error("获取仓位信息失败")
@@ -952,10 +679,12 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
     while not order_filled and retry_count < max_retries:
         # 计算当前市场价下的平仓价格
         current_market_price = asyncio.run(
-            retrieve_price(ws_base_url, target_perp, side)
+            retrieve_price(ws_base_url, instrument, side)
         )
         # 计算价格风险完全对冲的平仓价格
-        hedge_price = arb_close_price + hedge_open_price - arb_open_price
+        # 套利方价差以Hyper Liquid名称的计价单位给出，换算为本合约的报价单位后再与对冲方开仓价相加
+        hedge_price = instrument.round_price(
+            hedge_open_price + instrument.price_from_coin(arb_close_price - arb_open_price, ticker))
 
         # 计算最终的平仓价格
         if side:
@@ -975,10 +704,9 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
         
         # 下单平仓
         order_result = place_trade(
-            base_url=rest_base_url,
-            api_key=api_key, secret_key=secret_key,
+            client,
             price=target_price, side=side,
-            symbol=target_perp, size=abs(hedge_size)
+            instrument=instrument, size=abs(hedge_size)
         )
         
         if order_result == -1:
@@ -996,11 +724,7 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
         max_check_attempts = 10  # 最多检查10次订单状态
         
         while check_attempts < max_check_attempts:
-            order_info = query_order_status(
-                rest_base_url,
-                api_key, secret_key,
-                target_perp, order_id
-            )
+            order_info = query_order_status(client, target_perp, order_id)
             
             if order_info is None:
                 logger.error("查询订单状态失败")
@@ -1024,7 +748,7 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
         # 如果订单未完全成交且未被拒绝，尝试取消订单
         if not order_filled and order_info and order_info['status'] not in ['REJECTED', 'EXPIRED', 'CANCELED']:
             logger.info(f"尝试取消订单: {order_id}")
-            cancel_order(rest_base_url, api_key, secret_key, target_perp, order_id)
+            cancel_order(client, target_perp, order_id)
             
         retry_count += 1
         
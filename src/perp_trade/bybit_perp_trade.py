@@ -13,7 +13,6 @@
 """
 import websockets
 import asyncio
-import requests
 import json
 import uuid  # 添加uuid模块用于生成随机字符串
 from sys import path as sys_path
@@ -25,13 +24,16 @@ sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
 # 导入日志模块
 from src.logger import setup_logger
 # 导入工具模块
-from src.utils import set_price, set_size, ExchangeApiConfig, POSITION_RISK, POSITION_LEVERAGE
+from src.utils import set_price, set_size, ExchangeApiConfig, AsyncExchangeClient, POSITION_RISK, POSITION_LEVERAGE
+from src.instrument_registry import lookup_instrument
 
 # 获取logger实例
 logger = setup_logger('BybitTrading')
 
 # 实现Binance交易平台API配置类
 class BybitApiConfig(ExchangeApiConfig):
+    venue = 'bybit'
+
     def _setup_urls(self):
         """设置Bybit的REST和WebSocket URL"""
         if self.type:  # 主网
@@ -42,6 +44,37 @@ class BybitApiConfig(ExchangeApiConfig):
             self.ws_url = "wss://stream.bybit.com/v5"
 
 
+class BybitClient(AsyncExchangeClient, BybitApiConfig):
+    """Bybit v5 异步客户端: 长连接会话 + 本地校正时钟签名，私有接口不再先请求 /v5/market/time"""
+    time_path = '/v5/market/time'
+
+    def parse_server_time(self, data):
+        return int(data['result']['timeNano']) // 1_000_000
+
+    def sign(self, method, path, params, body, timestamp_ms):
+        """
+        签名串为 timestamp + API Key + 查询字符串(GET) / JSON请求体(POST)
+
+        签名与发送使用同一个已编码的查询字符串(request 原样拼入URL)
+        """
+        from urllib.parse import urlencode
+
+        timestamp = str(timestamp_ms)
+        query = urlencode(params or {})
+        if method == 'GET':
+            payload, data = query, None
+        else:
+            data = json.dumps(body or {})
+            payload = data
+        headers = {
+            'Content-Type': "application/json",
+            'X-BAPI-API-KEY': self.api_key,
+            'X-BAPI-SIGN': self.sign_digest(timestamp + self.api_key + payload).hex(),
+            'X-BAPI-TIMESTAMP': timestamp,
+        }
+        return query or None, headers, data
+
+
 def fetch_api_key(net):
     """
     从config.json文件中获取对应的API Key等信息
@@ -69,87 +102,17 @@ def fetch_api_key(net):
     return _api_key, _secret_key
 
 
-def get_server_time(base_url):
-    """获取Bybit服务器时间
-    
-    Args:
-        base_url (str): Bybit API的基础URL
-        
-    Returns:
-        int: 服务器时间戳(毫秒)，失败时返回本地时间
-    """
-    response = requests.get(f"{base_url}/v5/market/time")
-    if response.status_code == 200:
-        # 服务器返回的是秒
-        bybit_sec = response.json()['result']['timeSecond']
-        # 转换成毫秒返回
-        return str(int(bybit_sec) * 1000)
-    else:
-        logger.error(f"获取服务器时间失败: {response.text}")
-        return str(int(time.time() * 1000))  # 失败时返回本地时间
-
-
-def generate_sign(api_key, secret_key, timestamp, method, body):
-    """
-    生成签名
-
-    BYBIT-SIGN的请求头是对timestamp + API Key + body字符串（+表示字符串连接），
-    使用HMAC_SHA256算法對第1步中拼接的string簽名，
-    並轉換為16進製字符串(HMAC_SHA256)，得出sign參數
-
-    Args:
-        secret_key (str): API密钥对应的私钥
-        timestamp (str): 时间戳，格式为ISO 8601标准格式，如2020-12-08T09:08:57.715Z
-        method (str): 请求方法，如GET、POST等
-    Returns:
-        str: 签名
-    """
-    import hmac
-    import base64
-    import hashlib
-
-    # 构建待签名的字符串
-    message = timestamp + api_key
-    
-    # 根据请求方法不同，处理body的方式不同
-    if method == 'GET':
-        # GET请求：将body参数转换为查询字符串格式
-        if body:
-            query_string = '&'.join([f"{key}={value}" for key, value in body.items()])
-            message += query_string
-    else:
-        message += body
-    
-    # 使用HMAC SHA256算法进行加密
-    mac = hmac.new(
-        bytes(secret_key, encoding='utf8'),
-        message.encode('utf8'),
-        digestmod=hashlib.sha256
-    )
-    
-    # 对加密结果转换为16进制字符串(HMAC_SHA256)
-    sign = mac.hexdigest()
-    return sign
-
-
-def adjust_lever(base_url, api_key, secret_key, symbol, lever):
+def adjust_lever(client, symbol, lever):
     """调整杠杆倍数
     
     Args:
-        base_url (str): 币安API的基础URL
-        api_key (str): 币安API密钥
-        secret_key (str): 币安API密钥对应的私钥
+        client (BybitClient): 共享的异步客户端(BybitClient.shared)
         symbol (str): 交易对名称
         lever (int): 杠杆倍数
         
     Returns:
         int: 操作结果，0表示成功，-1表示失败
     """
-    timestamp = get_server_time(base_url)
-
-     # 正确的API路径
-    url = base_url + '/v5/position/set-leverage'
-
     body = {
         "category": "linear",
         "symbol": symbol,
@@ -157,215 +120,108 @@ def adjust_lever(base_url, api_key, secret_key, symbol, lever):
         "sellLeverage": lever,
     }
 
-    json_body = json.dumps(body)
-
-    # 生成签名
-    sign = generate_sign(
-        timestamp=timestamp, api_key=api_key, secret_key=secret_key, 
-        method='POST', body=json_body
-    )
-
-    headers = {
-        'Content-Type': "application/json",
-        'X-BAPI-API-KEY': api_key,
-        'X-BAPI-SIGN': sign,
-        'X-BAPI-TIMESTAMP': timestamp,
-    }
-
     try:
-        response = requests.post(url, headers=headers, data=json_body)
-        if response.status_code == 200:
-            data = response.json()
-            if data['retCode'] == 0:
-                logger.info(f"调整杠杆成功: {data}")
-                return 0
-            else:
-                logger.error(f"调整杠杆失败: {data}")
-                return -1
+        data = client.call('POST', '/v5/position/set-leverage', body=body)
+        if data is None:
+            return -1
+        if data['retCode'] == 0:
+            logger.info(f"调整杠杆成功: {data}")
+            return 0
         else:
-            logger.error(f"API请求失败: 状态码 {response.status_code}, 响应: {response.text}")
+            logger.error(f"调整杠杆失败: {data}")
             return -1
     except Exception as e:
         logger.error(f"下单异常: {str(e)}")
         return -1
 
 
-def query_balance(base_url, api_key, secret_key):
+def query_balance(client):
     """
     查询用户数据，获取可用的保证金
     
     Args:
-        base_url (str): OKX API的基础URL
-        api_key (str): OKX API密钥
-        secret_key (str): OKX API密钥对应的私钥
-        passphrase (str): OKX API密钥对应的Passphrase
+        client (BybitClient): 共享的异步客户端(BybitClient.shared)
         
     Returns:
         float: 可用的USDT保证金余额，失败时返回-1
     """
-    method = 'GET'
-    request_path = '/v5/account/wallet-balance'
-    timestamp = get_server_time(base_url)
-    body = {
+    params = {
         'accountType': 'UNIFIED',
         'coin': "USDT"
     }
 
-    sign = generate_sign(api_key, secret_key, timestamp, method, body)
-
-    url = base_url + request_path
-    
-    headers = {
-        'Content-Type': "application/json",
-        'X-BAPI-API-KEY': api_key,
-        'X-BAPI-SIGN': sign,
-        'X-BAPI-TIMESTAMP': timestamp,
-    }
-    
-    # 使用GET请求而不是POST
-    res = requests.get(
-        url,
-        headers=headers,
-        params=body  # 使用params而不是data
-    )
-    
-    if res.status_code == 200:
-        data = res.json()
-        if data['retCode'] == 0:
-            balance = data['result']['list'][0]['coin'][0]['walletBalance']
-            logger.info(f"API请求成功，账户余额: {balance}")
-            return balance
-        else:
-            logger.error(f"API请求失败: {data}")
-            return -1
-    else:
-        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+    data = client.call('GET', '/v5/account/wallet-balance', params)
+    if data is None:
         return -1
-
-
-def query_symbol_size(base_url, symbol):
-    """查询标的的最小价格变动和最小数量变动
-    
-    Args:
-        base_url (str): 币安API的基础URL
-        symbol (str): 交易对名称
-        
-    Returns:
-        int: 交易对数量精度，失败时返回-1
-    """
-    # 正确的API路径
-    url = base_url + '/v5/market/instruments-info'
-
-    # 使用GET请求而不是POST
-    res = requests.get(
-        url,  
-        params={
-            'category': 'linear',
-            'symbol': symbol
-        }  # 使用params而不是data
-    )
-    
-    if res.status_code == 200:
-        data = res.json()
-        if data['retCode'] == 0:
-            quantity_step = data['result']['list'][0]['lotSizeFilter']['qtyStep']
-            # 计算qtyStep是10的几次幂
-            qty_step_float = float(quantity_step)
-            # 使用对数计算
-            import math
-            if qty_step_float > 0:
-                decimal_places = abs(int(math.log10(qty_step_float)))
-                logger.info(f"当前币种最小下单数目: {quantity_step}, 精度为小数点后{decimal_places}位")
-                return decimal_places
-            else:
-                logger.error(f"无效的qtyStep值: {quantity_step}")
-                return -1
-        else:
-            logger.error(f"API请求失败: {data}")
-            return -1
+    if data['retCode'] == 0:
+        balance = data['result']['list'][0]['coin'][0]['walletBalance']
+        logger.info(f"API请求成功，账户余额: {balance}")
+        return balance
     else:
-        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+        logger.error(f"API请求失败: {data}")
         return -1
 
 
-def query_position(base_url, api_key, secret_key, symbol):
+def query_position(client, symbol):
     """
     查询标的的当前仓位
+
+    Args:
+        client (BybitClient): 共享的异步客户端(BybitClient.shared)
+        symbol (str): 交易对名称
     """
-    method = 'GET'
-    request_path = '/v5/position/list'
-    timestamp = get_server_time(base_url)
-    body = {
+    params = {
         'category': 'linear',
         'symbol': symbol
     }
 
-    sign = generate_sign(api_key, secret_key, timestamp, method, body)
-
-    url = base_url + request_path
-    
-    headers = {
-        'Content-Type': "application/json",
-        'X-BAPI-API-KEY': api_key,
-        'X-BAPI-SIGN': sign,
-        'X-BAPI-TIMESTAMP': timestamp,
-    }
-    
-    # 使用GET请求而不是POST
-    res = requests.get(
-        url,
-        headers=headers,
-        params=body  # 使用params而不是data
-    )
-    
-    if res.status_code == 200:
-        data = res.json()
-        if data['retCode'] == 0:
-            position = data['result']['list'][0]
-            # {
-            #     'symbol': 'BTCUSDT', 
-            #     'leverage': '5', 
-            #     'autoAddMargin': 0, 
-            #     'avgPrice': '74939.5', 
-            #     'liqPrice': '60326.3', 
-            #     'riskLimitValue': '2000000', 
-            #     'positionValue': '2473.0035', 
-            #     'unrealisedPnl': '7.0422', 
-            #     'markPrice': '75152.9', 
-            #     'adlRankIndicator': 2, 
-            #     'cumRealisedPnl': '-0.4946007', 
-            #     'positionMM': '13.45313904', 
-            #     'createdTime': '1743946509221', 
-            #     'positionIdx': 0, 
-            #     'positionIM': '495.68882154', 
-            #     'seq': 140710062434461, 
-            #     'updatedTime': '1744011345134', 
-            #     'side': 'Buy', 
-            #     'bustPrice': '', 
-            #     'positionBalance': '495.68882154', 
-            #     'curRealisedPnl': '-0.4946007', 
-            #     'size': '0.033', 
-            #     'positionStatus': 'Normal', 
-            #     'tradeMode': 0, 
-            # }
-            open_price = position['avgPrice']
-            size = position['size']
-            logger.info(f"API请求成功，持仓信息: {position}")
-            return open_price, size
-        else:
-            logger.error(f"API请求失败: {data}")
-            return -1, -1
+    data = client.call('GET', '/v5/position/list', params)
+    if data is None:
+        return -1, -1
+    if data['retCode'] == 0:
+        position = data['result']['list'][0]
+        position = data['result']['list'][0]
+        # {
+        #     'symbol': 'BTCUSDT', 
+        #     'leverage': '5', 
+        #     'autoAddMargin': 0, 
+        #     'avgPrice': '74939.5', 
+        #     'liqPrice': '60326.3', 
+        #     'riskLimitValue': '2000000', 
+        #     'positionValue': '2473.0035', 
+        #     'unrealisedPnl': '7.0422', 
+        #     'markPrice': '75152.9', 
+        #     'adlRankIndicator': 2, 
+        #     'cumRealisedPnl': '-0.4946007', 
+        #     'positionMM': '13.45313904', 
+        #     'createdTime': '1743946509221', 
+        #     'positionIdx': 0, 
+        #     'positionIM': '495.68882154', 
+        #     'seq': 140710062434461, 
+        #     'updatedTime': '1744011345134', 
+        #     'side': 'Buy', 
+        #     'bustPrice': '', 
+        #     'positionBalance': '495.68882154', 
+        #     'curRealisedPnl': '-0.4946007', 
+        #     'size': '0.033', 
+        #     'positionStatus': 'Normal', 
+        #     'tradeMode': 0, 
+        # }
+        open_price = position['avgPrice']
+        size = position['size']
+        logger.info(f"API请求成功，持仓信息: {position}")
+        return open_price, size
     else:
-        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+        logger.error(f"API请求失败: {data}")
         return -1, -1
 
 
-async def retrieve_price(base_url, symbol, side):
+async def retrieve_price(base_url, instrument, side):
     """获取标的当前价格并计算目标价格
     
     Args:
         base_url (str): WebSocket API的基础URL
-        symbol (str): 交易对名称
+        instrument (Instrument): 标的交易规则，提供交易对名称与tickSize
         side (bool): 交易方向，True为买入，False为卖出
         
     Returns:
@@ -379,7 +235,7 @@ async def retrieve_price(base_url, symbol, side):
         subscribe_message = {
             "op": "subscribe",
             "args": [
-                f"tickers.{symbol}"
+                f"tickers.{instrument.symbol}"
             ]
         }
         await websocket.send(json.dumps(subscribe_message))
@@ -391,20 +247,10 @@ async def retrieve_price(base_url, symbol, side):
                 data = json.loads(message)  # 解析JSON消息
                 
                 data = data['data']
-                price_str = data["lastPrice"]
-                price = float(price_str)  # 标记价格
-                # 计算小数位数
-                decimal_places = 0
-                if '.' in price_str:
-                    # 去除尾随零后再计算小数位数
-                    decimal_part = price_str.split('.')[1].rstrip('0')
-                    decimal_places = len(decimal_part)
-                        
-                # 计算最小价格变动
-                min_price_movement = 10 ** (-decimal_places)
-                        
-                # 计算目标价格
-                target_price = set_price(price, side, min_price_movement)
+                price = float(data["lastPrice"])  # 标记价格
+
+                # 按标的的tickSize计算目标价格
+                target_price = set_price(price, side, instrument)
                 logger.info(f"当前价格: {price}; 目标开仓价格: {target_price}")
                 break
                 
@@ -415,125 +261,75 @@ async def retrieve_price(base_url, symbol, side):
     return target_price
 
 
-def query_order_status(base_url, api_key, secret_key, order_id):
+def query_order_status(client, order_id):
     """查询订单状态
     
     Args:
-        base_url (str): Bybit API的基础URL
-        api_key (str): Bybit API密钥
-        secret_key (str): Bybit API密钥对应的私钥
+        client (BybitClient): 共享的异步客户端(BybitClient.shared)
         order_id (str): 订单ID
         
     Returns:
         str: 订单状态，如"Filled"、"PartiallyFilled"、"New"等，失败时返回None
     """
-    method = 'GET'
-    request_path = '/v5/order/history'
-    timestamp = get_server_time(base_url)
-    body = {
+    params = {
         'category': 'linear',
         'orderId': order_id
     }
 
-    sign = generate_sign(api_key, secret_key, timestamp, method, body)
-
-    url = base_url + request_path
-    
-    headers = {
-        'Content-Type': "application/json",
-        'X-BAPI-API-KEY': api_key,
-        'X-BAPI-SIGN': sign,
-        'X-BAPI-TIMESTAMP': timestamp,
-    }
-    
     try:
-        res = requests.get(
-            url,
-            headers=headers,
-            params=body
-        )
-        
-        if res.status_code == 200:
-            data = res.json()
-            if data['retCode'] == 0 and data['result']['list']:
-                order_status = data['result']['list'][0]['orderStatus']
-                logger.info(f"订单状态: {order_status}")
-                return order_status
-            else:
-                logger.error(f"查询订单状态失败: {data}")
-                return None
+        data = client.call('GET', '/v5/order/history', params)
+        if data is None:
+            return None
+        if data['retCode'] == 0 and data['result']['list']:
+            order_status = data['result']['list'][0]['orderStatus']
+            logger.info(f"订单状态: {order_status}")
+            return order_status
         else:
-            logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+            logger.error(f"查询订单状态失败: {data}")
             return None
     except Exception as e:
         logger.error(f"查询订单状态异常: {str(e)}")
         return None
 
 
-def cancel_order(base_url, api_key, secret_key, order_id):
+def cancel_order(client, order_id):
     """取消订单
     
     Args:
-        base_url (str): Bybit API的基础URL
-        api_key (str): Bybit API密钥
-        secret_key (str): Bybit API密钥对应的私钥
+        client (BybitClient): 共享的异步客户端(BybitClient.shared)
         order_id (str): 订单ID
         
     Returns:
         bool: 操作结果，True表示成功，False表示失败
     """
-    timestamp = get_server_time(base_url)
-
-    # 正确的API路径
-    url = base_url + '/v5/order/cancel'
-
     body = {
         "category": "linear",
         "orderId": order_id
     }
-    json_body = json.dumps(body)
-
-    # 生成签名
-    sign = generate_sign(
-        timestamp=timestamp, api_key=api_key, secret_key=secret_key, 
-        method='POST', body=json_body
-    )
-
-    headers = {
-        'Content-Type': "application/json",
-        'X-BAPI-API-KEY': api_key,
-        'X-BAPI-SIGN': sign,
-        'X-BAPI-TIMESTAMP': timestamp,
-    }
 
     try:
-        response = requests.post(url, headers=headers, data=json_body)
-        if response.status_code == 200:
-            data = response.json()
-            if data['retCode'] == 0:
-                logger.info(f"取消订单成功: {data}")
-                return True
-            else:
-                logger.error(f"取消订单失败: {data}")
-                return False
+        data = client.call('POST', '/v5/order/cancel', body=body)
+        if data is None:
+            return False
+        if data['retCode'] == 0:
+            logger.info(f"取消订单成功: {data}")
+            return True
         else:
-            logger.error(f"API请求失败: 状态码 {response.status_code}, 响应: {response.text}")
+            logger.error(f"取消订单失败: {data}")
             return False
     except Exception as e:
         logger.error(f"取消订单异常: {str(e)}")
         return False
 
 
-def place_trade(base_url, api_key, secret_key, price, side, symbol, size):
+def place_trade(client, price, side, instrument, size):
     """下单交易
     
     Args:
-        base_url (str): Bybit API的基础URL
-        api_key (str): Bybit API密钥
-        secret_key (str): Bybit API密钥对应的私钥
+        client (BybitClient): 共享的异步客户端(BybitClient.shared)
         price (float): 下单价格
         side (bool): 交易方向，True为买入，False为卖出
-        symbol (str): 交易对名称
+        instrument (Instrument): 标的交易规则，提供交易对名称与价格/数量的小数位数
         size (float): 下单数量
         
     Returns:
@@ -541,47 +337,25 @@ def place_trade(base_url, api_key, secret_key, price, side, symbol, size):
     """
     side_enum = "Buy" if side else "Sell"
 
-    timestamp = get_server_time(base_url)
-
-     # 正确的API路径
-    url = base_url + '/v5/order/create'
-
     body = {
         "category": "linear",
-        "symbol": symbol,
+        "symbol": instrument.symbol,
         "side": side_enum,
         "orderType": "Limit",
-        "qty": str(size),
-        "price": str(price)
-    }
-    json_body = json.dumps(body)
-
-    # 生成签名
-    sign = generate_sign(
-        timestamp=timestamp, api_key=api_key, secret_key=secret_key, 
-        method='POST', body=json_body
-    )
-
-    headers = {
-        'Content-Type': "application/json",
-        'X-BAPI-API-KEY': api_key,
-        'X-BAPI-SIGN': sign,
-        'X-BAPI-TIMESTAMP': timestamp,
+        "qty": instrument.format_size(size),
+        "price": instrument.format_price(price)
     }
 
     try:
-        response = requests.post(url, headers=headers, data=json_body)
-        if response.status_code == 200:
-            data = response.json()
-            if data['retCode'] == 0:
-                order_id = data['result']['orderId']
-                logger.info(f"下单成功: {data}")
-                return order_id
-            else:
-                logger.error(f"下单失败: {data}")
-                return None
+        data = client.call('POST', '/v5/order/create', body=body)
+        if data is None:
+            return None
+        if data['retCode'] == 0:
+            order_id = data['result']['orderId']
+            logger.info(f"下单成功: {data}")
+            return order_id
         else:
-            logger.error(f"API请求失败: 状态码 {response.status_code}, 响应: {response.text}")
+            logger.error(f"下单失败: {data}")
             return None
     except Exception as e:
         logger.error(f"下单异常: {str(e)}")
@@ -601,41 +375,37 @@ def open_position_arb(net, side, ticker, max_retries=5, retry_interval=5):
         
     Returns:
         tuple: 包含开仓价格和开仓数量的元组
-            - target_price (float): 套利方开仓价格
-            - target_size (float): 套利方开仓张数
+            - target_price (float): 套利方开仓价格(以Hyper Liquid名称的计价单位)
+            - target_size (float): 套利方开仓数量(以Hyper Liquid名称的计价单位)
     """
     # 获取配置信息
-    config = BybitApiConfig(net)  # 初始化网络信息
-    rest_base_url = config.get_rest_url()  # 获取REST API的基础URL
-    ws_base_url = config.get_ws_url()  # 获取WebSocket的基础URL
-    api_key, secret_key = fetch_api_key(net)  # 获取API Key和Secret Key
-    target_perp = ticker+"USDT"  # 根据ticker构建出目标perp的币对
+    client = BybitClient.shared(net, *fetch_api_key(net))  # 进程内共享的客户端(长连接、本地校正时钟签名)
+    rest_base_url = client.get_rest_url()  # 获取REST API的基础URL
+    ws_base_url = client.get_ws_url()  # 获取WebSocket的基础URL
+    instrument = lookup_instrument('bybit', rest_base_url, ticker)  # 标的交易规则(进程内只加载一次)
+    if instrument is None:
+        return -1, -1
+    target_perp = instrument.symbol  # 根据ticker得到目标perp的币对(kPEPE -> 1000PEPE...)
 
     # 查询账户余额
-    fund = query_balance(rest_base_url, api_key, secret_key)  # 查询账户余额
+    fund = query_balance(client)  # 查询账户余额
     # 计算保证金
     logger.info(f"账户可用保证金余额: {fund}")
     position_fund = float(fund) * POSITION_RISK
     logger.info(f"仓位保证金: {position_fund}")
 
     # 调整杠杆
-    adjust_lever(
-        rest_base_url, api_key, secret_key, 
-        target_perp, str(POSITION_LEVERAGE)
-    )
+    adjust_lever(client, target_perp, str(POSITION_LEVERAGE))
 
-    # 计算开仓数量
-    size_decimals = query_symbol_size(rest_base_url, target_perp)  # 获取标的的最小价格变动和最小数量变动
-    
     # 尝试下单，直到成功或达到最大重试次数
     for attempt in range(max_retries):
         # 计算开仓价格（每次重试都重新获取价格）
         target_price = asyncio.run(
-            retrieve_price(ws_base_url, target_perp, side)
+            retrieve_price(ws_base_url, instrument, side)
         )  # 获取目标价格
         
         # 计算开仓数量
-        target_size = set_size(position_fund, POSITION_LEVERAGE, target_price, size_decimals)  # 计算开仓数量
+        target_size = set_size(position_fund, POSITION_LEVERAGE, target_price, instrument)  # 计算开仓数量
         
         logger.info(
             f"套利方开仓尝试 #{attempt+1}: "
@@ -646,8 +416,8 @@ def open_position_arb(net, side, ticker, max_retries=5, retry_interval=5):
 
         # 下单
         order_id = place_trade(
-            rest_base_url, api_key, secret_key, 
-            target_price, side, target_perp, target_size
+            client,
+            target_price, side, instrument, target_size
         )
         
         if not order_id:
@@ -659,7 +429,7 @@ def open_position_arb(net, side, ticker, max_retries=5, retry_interval=5):
         filled = False
         check_attempts = 10  # 检查订单状态的次数
         for check in range(check_attempts):
-            order_status = query_order_status(rest_base_url, api_key, secret_key, order_id)
+            order_status = query_order_status(client, order_id)
             
             if order_status == "Filled":
                 logger.info(f"订单已完全成交")
@@ -677,11 +447,12 @@ def open_position_arb(net, side, ticker, max_retries=5, retry_interval=5):
         
         if filled:
             logger.info(f"套利方开仓成功: 价格={target_price}, 数量={target_size}")
-            return target_price, target_size
+            # 以Hyper Liquid名称的计价单位返回，其他交易所的对冲方可直接使用
+            return instrument.price_to_coin(target_price, ticker), instrument.size_to_coin(target_size, ticker)
         else:
             logger.warning(f"订单未完全成交，尝试取消订单并重新下单...")
             # 这里可以添加取消订单的逻辑
-            # cancel_order(rest_base_url, api_key, secret_key, order_id)
+            # cancel_order(client, order_id)
             time.sleep(retry_interval)
     
     # 如果所有尝试都失败
@@ -705,38 +476,39 @@ def open_position_hedge(net, side, ticker, arb_size, max_retries=5, retry_interv
         float: 对冲方开仓价格，失败时返回-1
     """
     # 获取配置信息
-    config = BybitApiConfig(net)  # 初始化网络信息
-    rest_base_url = config.get_rest_url()  # 获取REST API的基础URL
-    ws_base_url = config.get_ws_url()  # 获取WebSocket的基础URL
-    api_key, secret_key = fetch_api_key(net)  # 获取API Key和Secret Key
-    target_perp = ticker+"USDT"  # 根据ticker构建出目标perp的币对
+    client = BybitClient.shared(net, *fetch_api_key(net))  # 进程内共享的客户端(长连接、本地校正时钟签名)
+    rest_base_url = client.get_rest_url()  # 获取REST API的基础URL
+    ws_base_url = client.get_ws_url()  # 获取WebSocket的基础URL
+    instrument = lookup_instrument('bybit', rest_base_url, ticker)  # 标的交易规则(进程内只加载一次)
+    if instrument is None:
+        return -1
+    target_perp = instrument.symbol  # 根据ticker得到目标perp的币对(kPEPE -> 1000PEPE...)
 
     # 调整杠杆
-    adjust_lever(
-        rest_base_url, api_key, secret_key, 
-        target_perp, str(POSITION_LEVERAGE)
-    )
+    adjust_lever(client, target_perp, str(POSITION_LEVERAGE))
     
+    # 套利方数量换算为本合约的下单数量(qtyStep取整)
+    hedge_size = instrument.size_from_coin(arb_size, ticker)
+
     # 尝试下单，直到成功或达到最大重试次数
     for attempt in range(max_retries):
         # 计算价格（每次重试都重新获取价格）
         target_price = asyncio.run(
-            retrieve_price(ws_base_url, target_perp, side)
+            retrieve_price(ws_base_url, instrument, side)
         )
         
         logger.info(
             f"对冲方开仓尝试 #{attempt+1}: "
             f"开仓价格: {target_price}, "
-            f"开仓数量: {arb_size}, "
+            f"开仓数量: {hedge_size}, "
             f"开仓杠杆: {POSITION_LEVERAGE}"
         )
 
         # 下单
         order_id = place_trade(
-            base_url=rest_base_url,
-            api_key=api_key, secret_key=secret_key,
+            client,
             price=target_price, side=side,
-            symbol=target_perp, size=arb_size
+            instrument=instrument, size=hedge_size
         )
         
         if not order_id:
@@ -748,7 +520,7 @@ def open_position_hedge(net, side, ticker, arb_size, max_retries=5, retry_interv
         filled = False
         check_attempts = 10  # 检查订单状态的次数
         for check in range(check_attempts):
-            order_status = query_order_status(rest_base_url, api_key, secret_key, order_id)
+            order_status = query_order_status(client, order_id)
             
             if order_status == "Filled":
                 logger.info(f"订单已完全成交")
@@ -765,12 +537,12 @@ def open_position_hedge(net, side, ticker, arb_size, max_retries=5, retry_interv
             time.sleep(retry_interval)
         
         if filled:
-            logger.info(f"对冲方开仓成功: 价格={target_price}, 数量={arb_size}")
+            logger.info(f"对冲方开仓成功: 价格={target_price}, 数量={hedge_size}")
             return target_price
         else:
             logger.warning(f"订单未完全成交，尝试取消订单并重新下单...")
             # 取消订单
-            cancel_order(rest_base_url, api_key, secret_key, order_id)
+            cancel_order(client, order_id)
             time.sleep(retry_interval)
     
     # 如果所有尝试都失败
@@ -792,21 +564,19 @@ def close_position_arb(net, side, ticker, max_retries=5, retry_interval=5):
     Returns:
         tuple: 包含操作结果和平仓价格的元组
             - result (int): 操作结果，0表示成功，-1表示失败
-            - close_price (float): 平仓价格，失败时返回-1
+            - close_price (float): 平仓价格(以Hyper Liquid名称的计价单位)，失败时返回-1
     """
     # 获取配置信息
-    config = BybitApiConfig(net)  # 初始化网络信息
-    rest_base_url = config.get_rest_url()  # 获取REST API的基础URL
-    ws_base_url = config.get_ws_url()  # 获取WebSocket的基础URL
-    api_key, secret_key = fetch_api_key(net)  # 获取API Key和Secret Key
-    target_perp = ticker+"USDT"  # 根据ticker构建出目标perp的币对
+    client = BybitClient.shared(net, *fetch_api_key(net))  # 进程内共享的客户端(长连接、本地校正时钟签名)
+    rest_base_url = client.get_rest_url()  # 获取REST API的基础URL
+    ws_base_url = client.get_ws_url()  # 获取WebSocket的基础URL
+    instrument = lookup_instrument('bybit', rest_base_url, ticker)  # 标的交易规则(进程内只加载一次)
+    if instrument is None:
+        return -1, -1
+    target_perp = instrument.symbol  # 根据ticker得到目标perp的币对(kPEPE -> 1000PEPE...)
 
     # 获取当前仓位信息
-    open_price, size = query_position(
-        base_url=rest_base_url,
-        api_key=api_key, secret_key=secret_key,
-        symbol=target_perp
-    )
+    open_price, size = query_position(client, target_perp)
     
     if float(size) <= 0 or open_price == -1:
         logger.error(f"获取仓位信息失败或无仓位")
@@ -816,7 +586,7 @@ def close_position_arb(net, side, ticker, max_retries=5, retry_interval=5):
     for attempt in range(max_retries):
         # 计算平仓价格（每次重试都重新获取价格）
         target_price = asyncio.run(
-            retrieve_price(ws_base_url, target_perp, side)
+            retrieve_price(ws_base_url, instrument, side)
         )
         
         logger.info(
@@ -828,10 +598,9 @@ def close_position_arb(net, side, ticker, max_retries=5, retry_interval=5):
         
         # 下单平仓
         order_id = place_trade(
-            base_url=rest_base_url,
-            api_key=api_key, secret_key=secret_key,
+            client,
             price=target_price, side=side,
-            symbol=target_perp, size=size
+            instrument=instrument, size=size
         )
         
         if not order_id:
@@ -843,7 +612,7 @@ def close_position_arb(net, side, ticker, max_retries=5, retry_interval=5):
         filled = False
         check_attempts = 10  # 检查订单状态的次数
         for check in range(check_attempts):
-            order_status = query_order_status(rest_base_url, api_key, secret_key, order_id)
+            order_status = query_order_status(client, order_id)
             
             if order_status == "Filled":
                 logger.info(f"平仓订单已完全成交")
@@ -861,11 +630,11 @@ def close_position_arb(net, side, ticker, max_retries=5, retry_interval=5):
         
         if filled:
             logger.info(f"套利方平仓成功: 价格={target_price}")
-            return 0, target_price
+            return 0, instrument.price_to_coin(target_price, ticker)
         else:
             logger.warning(f"平仓订单未完全成交，尝试取消订单并重新下单...")
             # 取消订单
-            cancel_order(rest_base_url, api_key, secret_key, order_id)
+            cancel_order(client, order_id)
             time.sleep(retry_interval)
     
     # 如果所有尝试都失败
@@ -880,8 +649,8 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
         net (bool): Bybit的API URL类型，True为主网，False为测试网
         side (bool): 平仓方向，True为买入平仓，False为卖出平仓
         ticker (str): 目标标的，如"BTC"
-        arb_open_price (float): 套利方开仓价格
-        arb_close_price (float): 套利方平仓价格
+        arb_open_price (float): 套利方开仓价格(以Hyper Liquid名称的计价单位，如 kPEPE 为每1000个PEPE)
+        arb_close_price (float): 套利方平仓价格(同上)
         max_retries (int, optional): 最大重试次数，默认为5次
         retry_interval (int, optional): 重试间隔时间(秒)，默认为5秒
         
@@ -889,32 +658,33 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
         int: 操作结果，0表示成功，-1表示失败
     """
     # 获取配置信息
-    config = BybitApiConfig(net)  # 初始化网络信息
-    rest_base_url = config.get_rest_url()  # 获取REST API的基础URL
-    ws_base_url = config.get_ws_url()  # 获取WebSocket的基础URL
-    api_key, secret_key = fetch_api_key(net)  # 获取API Key和Secret Key
-    target_perp = ticker+"USDT"  # 根据ticker构建出目标perp的币对
+    client = BybitClient.shared(net, *fetch_api_key(net))  # 进程内共享的客户端(长连接、本地校正时钟签名)
+    rest_base_url = client.get_rest_url()  # 获取REST API的基础URL
+    ws_base_url = client.get_ws_url()  # 获取WebSocket的基础URL
+    instrument = lookup_instrument('bybit', rest_base_url, ticker)  # 标的交易规则(进程内只加载一次)
+    if instrument is None:
+        return -1
+    target_perp = instrument.symbol  # 根据ticker得到目标perp的币对(kPEPE -> 1000PEPE...)
 
     # 获取当前账户的仓位/开仓价格
-    hedge_open_price, hedge_size = query_position(
-        rest_base_url,
-        api_key, secret_key,
-        target_perp
-    )
+    hedge_open_price, hedge_size = query_position(client, target_perp)
     
-    if float(hedge_size) <= 0 or hedge_open_price == -1:
+    if hedge_open_price == -1 or float(hedge_size) <= 0:
         logger.error(f"获取仓位信息失败或无仓位")
         return -1
+    hedge_open_price = float(hedge_open_price)  # 接口返回字符串
     
     # 尝试平仓，直到成功或达到最大重试次数
     for attempt in range(max_retries):
         # 计算当前市场价下的平仓价格
         current_market_price = asyncio.run(
-            retrieve_price(ws_base_url, target_perp, side)
+            retrieve_price(ws_base_url, instrument, side)
         )
         
         # 计算价格风险完全对冲的平仓价格
-        hedge_price = arb_close_price + hedge_open_price - arb_open_price
+        # 套利方价差以Hyper Liquid名称的计价单位给出，换算为本合约的报价单位后再与对冲方开仓价相加
+        hedge_price = instrument.round_price(
+            hedge_open_price + instrument.price_from_coin(arb_close_price - arb_open_price, ticker))
 
         # 计算最终的平仓价格
         if side:
@@ -935,10 +705,9 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
         
         # 下单平仓
         order_id = place_trade(
-            base_url=rest_base_url,
-            api_key=api_key, secret_key=secret_key,
+            client,
             price=target_price, side=side,
-            symbol=target_perp, size=hedge_size
+            instrument=instrument, size=hedge_size
         )
         
         if not order_id:
@@ -950,7 +719,7 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
         filled = False
         check_attempts = 10  # 检查订单状态的次数
         for check in range(check_attempts):
-            order_status = query_order_status(rest_base_url, api_key, secret_key, order_id)
+            order_status = query_order_status(client, order_id)
             
             if order_status == "Filled":
                 logger.info(f"平仓订单已完全成交")
@@ -972,7 +741,7 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
         else:
             logger.warning(f"平仓订单未完全成交，尝试取消订单并重新下单...")
             # 取消订单
-            cancel_order(rest_base_url, api_key, secret_key, order_id)
+            cancel_order(client, order_id)
             time.sleep(retry_interval)
     
     # 如果所有尝试都失败
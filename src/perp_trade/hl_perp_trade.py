@@ -16,11 +16,9 @@ import requests
 import json
 from sys import path as sys_path
 from os import path as os_path
-import pandas as pd
 from hyperliquid.exchange import Exchange
 from hyperliquid.info import Info
 from hyperliquid.utils import signing
-from hyperliquid.utils import constants
 import time
 import eth_account
 from eth_account.signers.local import LocalAccount
@@ -31,12 +29,15 @@ sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
 from src.logger import setup_logger
 # 导入工具模块
 from src.utils import set_price, set_size, ExchangeApiConfig, POSITION_RISK, POSITION_LEVERAGE
+from src.instrument_registry import lookup_instrument
 
 # 获取logger实例
 logger = setup_logger('HyperliquidTrading')
 
 # 实现Binance交易平台API配置类
 class HyperLiquidApiConfig(ExchangeApiConfig):
+    venue = 'hl'
+
     def _setup_urls(self):
         """设置Binance的REST和WebSocket URL"""
         if self.type:  # 主网
@@ -47,7 +48,6 @@ class HyperLiquidApiConfig(ExchangeApiConfig):
             self.ws_url = None
 
 # Hyperliquid中涉及的一些无需获取的全局常量
-MAX_DECIMALS = 6
 # MAINNET_API_URL = "https://api.hyperliquid.xyz"
 # TESTNET_API_URL = "https://api.hyperliquid-testnet.xyz"
 
@@ -73,30 +73,13 @@ def fetch_account_address():
     return _account, _address
 
 
-def cal_min_price_move(mark_price, decimals):
-    """计算最小价格变动单位
-    
-    Args:
-        mark_price (float): 标记价格
-        decimals (int): 数量精度
-        
-    Returns:
-        float: 最小价格变动单位
-    """
-    # 根据获取的mark price, 以及szDecimals, 计算最小价格变动单位
-    available_decimal = MAX_DECIMALS - decimals
-    # 计算最小价格变动单位
-    return 10.0 ** (-available_decimal)
-
-
-def retrieve_price(ticker, base_url, side, decimals):
+def retrieve_price(instrument, base_url, side):
     """获取Hyper Liquid上的永续合约信息和目标价格
     
     Args:
-        ticker (str): 用于获取对应合约价格的目标标的
+        instrument (Instrument): 标的交易规则，提供合约名称与最小价格变动单位
         base_url (str): Hyper Liquid的API URL(Mainnet/Testnet)
         side (bool): 交易方向，True为买入，False为卖出
-        decimals (int): 数量精度
         
     Returns:
         float: 计算后的目标价格，失败时返回-1
@@ -107,7 +90,7 @@ def retrieve_price(ticker, base_url, side, decimals):
     }
     body = {
         'type': "l2Book",
-        'coin': ticker,
+        'coin': instrument.symbol,
     }
     res = requests.post(
         url, 
@@ -118,11 +101,7 @@ def retrieve_price(ticker, base_url, side, decimals):
     if res.status_code == 200:
         data = res.json()
         # 获取当前最优买价
-        _bid_price = data['levels'][0][0]["px"]
-        # 计算最小价格变动单位
-        _min_price_movement = cal_min_price_move(_bid_price, decimals)
-        logger.info(f"最小价格变动单位: {_min_price_movement}")
-        _bid_price = float(_bid_price)
+        _bid_price = float(data['levels'][0][0]["px"])
         logger.info(f"当前最优买价: {_bid_price}")
 
         # _mark_price = data[1][index]['markPx']
@@ -132,7 +111,7 @@ def retrieve_price(ticker, base_url, side, decimals):
         _target_price = set_price(
             price=_bid_price,
             side=side,
-            min_base_price=_min_price_movement
+            instrument=instrument
         )
         return _target_price
     else:
@@ -160,7 +139,7 @@ def open_position_arb(net, side, ticker, max_retries=5, retry_interval=3):
     base_url = HyperLiquidApiConfig(net).get_rest_url()
 
     # 获取账户信息
-    _info = Info(constants.MAINNET_API_URL if net else constants.TESTNET_API_URL, skip_ws=True)
+    _info = Info(base_url, skip_ws=True)
     _user_state = _info.user_state(_address)
 
     # 计算保证金
@@ -168,14 +147,11 @@ def open_position_arb(net, side, ticker, max_retries=5, retry_interval=3):
     _vault_fund = _vault_fund * POSITION_RISK  # 保证金(取整)
     logger.info(f"总保证金USD: {_vault_fund}")
 
-    # 根据Ticker获取Hyper Liquid Token Index
-    df = pd.read_csv('./data/hl_ticker_index.csv') if net else pd.read_csv('./data/hl_ticker_index_testnet.csv')
-    # 根据ticker获取index/decimals/maxLeverage
-    _target_record = df[df['name'] == ticker]
-    
-    _index = _target_record.iloc[0]['index']  # 获取index
-    _decimals = _target_record.iloc[0]['szDecimals']  # 获取该标的的小数位信息
-    _max_leverage = _target_record.iloc[0]['maxLeverage']  # 获取当前标的最大可支持杠杆
+    # 根据Ticker获取标的交易规则(index/szDecimals/maxLeverage，进程内只加载一次)
+    instrument = lookup_instrument('hl', base_url, ticker)
+    if instrument is None:
+        return -1, -1, False
+    _max_leverage = instrument.max_leverage  # 获取当前标的最大可支持杠杆
     # 获取目标杠杆，取5和最大可支持杠杆中的最小值
     _target_leverage = min(_max_leverage, POSITION_LEVERAGE)
 
@@ -195,17 +171,16 @@ def open_position_arb(net, side, ticker, max_retries=5, retry_interval=3):
         try:
             # 计算开仓价格/张数 (每次重试都重新获取价格)
             _target_price = retrieve_price(
-                ticker=ticker, 
+                instrument=instrument,
                 base_url=base_url,
-                side=side,
-                decimals=_decimals
+                side=side
             )
 
             _target_size = set_size(
                 amount=float(_vault_fund),
                 leverage=_target_leverage,
                 price=_target_price,
-                decimals=_decimals
+                instrument=instrument
             )
 
             logger.info(
@@ -299,17 +274,16 @@ def open_position_hedge(net, side, ticker, arb_size, max_retries=5, retry_interv
             - success (bool): 订单是否成功填充
     """
     _account, _address = fetch_account_address()
-    _info = Info(constants.MAINNET_API_URL if net else constants.TESTNET_API_URL, skip_ws=True)
     base_url = HyperLiquidApiConfig(net).get_rest_url()
+    _info = Info(base_url, skip_ws=True)
 
-    # 根据Ticker获取Hyper Liquid Token Index
-    df = pd.read_csv('./data/hl_ticker_index.csv')
-    # 根据ticker获取index/decimals/maxLeverage
-    _target_record = df[df['name'] == ticker]
-    
-    _index = _target_record.iloc[0]['index']  # 获取index
-    _decimals = _target_record.iloc[0]['szDecimals']  # 获取该标的的小数位信息
-    _max_leverage = _target_record.iloc[0]['maxLeverage']  # 获取当前标的最大可支持杠杆
+    # 根据Ticker获取标的交易规则(index/szDecimals/maxLeverage，进程内只加载一次)
+    instrument = lookup_instrument('hl', base_url, ticker)
+    if instrument is None:
+        return -1, False
+    _max_leverage = instrument.max_leverage  # 获取当前标的最大可支持杠杆
+    # 套利方数量换算为本合约的下单数量(szDecimals取整)
+    hedge_size = instrument.size_from_coin(arb_size, ticker)
     # 获取目标杠杆，取5和最大可支持杠杆中的最小值
     _target_leverage = min(_max_leverage, POSITION_LEVERAGE)
 
@@ -331,16 +305,15 @@ def open_position_hedge(net, side, ticker, arb_size, max_retries=5, retry_interv
         try:
             # 计算开仓价格 (每次重试都重新获取价格)
             _target_price = retrieve_price(
-                ticker=ticker, 
-                base_url=base_url, 
-                side=side,
-                decimals=_decimals
+                instrument=instrument,
+                base_url=base_url,
+                side=side
             )
 
             logger.info(
                 f"尝试 #{retry_count+1}: "
                 f"对冲方开仓价格: {_target_price}, "
-                f"对冲方开仓数量: {arb_size}, "
+                f"对冲方开仓数量: {hedge_size}, "
                 f"对冲方开仓杠杆: {_target_leverage}"
             )
 
@@ -348,7 +321,7 @@ def open_position_hedge(net, side, ticker, arb_size, max_retries=5, retry_interv
             order_res = exchange.order(
                 ticker,
                 side,
-                arb_size,
+                hedge_size,
                 _target_price,
                 {"limit": {"tif": "Gtc"}}
             )
@@ -427,8 +400,8 @@ def close_position_arb(net, side, ticker, max_retries=5, retry_interval=3):
             - success (bool): 订单是否成功填充
     """
     _account, _address = fetch_account_address()
-    _info = Info(constants.MAINNET_API_URL if net else constants.TESTNET_API_URL, skip_ws=True)
     base_url = HyperLiquidApiConfig(net).get_rest_url()
+    _info = Info(base_url, skip_ws=True)
 
     url = base_url + '/info'
     headers = {
@@ -457,11 +430,10 @@ def close_position_arb(net, side, ticker, max_retries=5, retry_interval=3):
         #     'unrealizedPnl': '-0.00024',   # 利润
         # }
 
-        # 根据Ticker获取Hyper Liquid Token Index
-        df = pd.read_csv('./data/hl_ticker_index.csv')
-        # 根据ticker获取decimals
-        _target_record = df[df['name'] == ticker]
-        _decimals = _target_record.iloc[0]['szDecimals']  # 获取该标的的小数位信息
+        # 根据Ticker获取标的交易规则(进程内只加载一次)
+        instrument = lookup_instrument('hl', base_url, ticker)
+        if instrument is None:
+            return -1, False
 
         # 创建Exchange类
         exchange = Exchange(_account, base_url, account_address=_address)
@@ -479,10 +451,9 @@ def close_position_arb(net, side, ticker, max_retries=5, retry_interval=3):
             try:
                 # 计算平仓价格 (每次重试都重新获取价格)
                 _target_price = retrieve_price(
-                    ticker=ticker, 
+                    instrument=instrument,
                     base_url=base_url,
-                    side=side,
-                    decimals=_decimals
+                    side=side
                 )
 
                 logger.info(
@@ -570,8 +541,8 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
         net (bool): Hyper Liquid的API URL类型，True为主网，False为测试网
         side (bool): 平仓方向，True为买入平仓，False为卖出平仓
         ticker (str): 目标标的，如"BTC"
-        arb_open_price (float): 套利方开仓价格
-        arb_close_price (float): 套利方平仓价格
+        arb_open_price (float): 套利方开仓价格(以Hyper Liquid名称的计价单位，如 kPEPE 为每1000个PEPE)
+        arb_close_price (float): 套利方平仓价格(同上)
         max_retries (int, optional): 最大重试次数，默认为5次
         retry_interval (int, optional): 重试间隔时间(秒)，默认为3秒
         
@@ -581,8 +552,8 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
             - success (bool): 订单是否成功填充
     """
     _account, _address = fetch_account_address()
-    _info = Info(constants.MAINNET_API_URL if net else constants.TESTNET_API_URL, skip_ws=True)
     base_url = HyperLiquidApiConfig(net).get_rest_url()
+    _info = Info(base_url, skip_ws=True)
 
     url = base_url + '/info'
     headers = {
@@ -612,11 +583,10 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
         #     'unrealizedPnl': '-0.00024',   # 利润
         # }
 
-        # 根据Ticker获取Hyper Liquid Token Index
-        df = pd.read_csv('./data/hl_ticker_index.csv')
-        # 根据ticker获取decimals
-        _target_record = df[df['name'] == ticker]
-        _decimals = _target_record.iloc[0]['szDecimals']  # 获取该标的的小数位信息
+        # 根据Ticker获取标的交易规则(进程内只加载一次)
+        instrument = lookup_instrument('hl', base_url, ticker)
+        if instrument is None:
+            return -1, False
 
         # 创建Exchange类
         exchange = Exchange(_account, base_url, account_address=_address)
@@ -634,14 +604,15 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price, max
             try:
                 # 计算当前市场价下的平仓价格
                 current_market_price = retrieve_price(
-                    ticker=ticker, 
+                    instrument=instrument,
                     base_url=base_url,
-                    side=side,
-                    decimals=_decimals
+                    side=side
                 )
 
                 # 计算价格风险完全对冲的平仓价格
-                hedge_price = arb_close_price + hedge_open_price - arb_open_price
+                # 套利方价差以Hyper Liquid名称的计价单位给出，换算为本合约的报价单位后再与对冲方开仓价相加
+                hedge_price = instrument.round_price(
+                    hedge_open_price + instrument.price_from_coin(arb_close_price - arb_open_price, ticker))
                 
                 # 计算最终的平仓价格
                 if side:
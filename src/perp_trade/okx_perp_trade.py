@@ -13,7 +13,6 @@
 """
 
 import websockets
-import requests
 import json
 import asyncio
 import time  # 添加time模块导入
@@ -25,7 +24,8 @@ sys_path.append(os_path.dirname(os_path.dirname(os_path.dirname(__file__))))
 # 导入日志模块
 from src.logger import setup_logger
 # 导入工具模块
-from src.utils import set_price, set_size, ExchangeApiConfig, POSITION_RISK, POSITION_LEVERAGE
+from src.utils import set_price, set_size, ExchangeApiConfig, AsyncExchangeClient, hmac_sha256, POSITION_RISK, POSITION_LEVERAGE
+from src.instrument_registry import lookup_instrument
 
 # 获取logger实例
 logger = setup_logger('OKXTrading')
@@ -33,6 +33,8 @@ logger = setup_logger('OKXTrading')
 # 实现okx交易平台API配置类
 # 注意：模拟盘的请求的header里面需要添加 "x-simulated-trading: 1"。
 class OKXApiConfig(ExchangeApiConfig):
+    venue = 'okx'
+
     def _setup_urls(self):
         """设置Binance的REST和WebSocket URL"""
         if self.type:  # 主网
@@ -49,6 +51,40 @@ class OKXApiConfig(ExchangeApiConfig):
 # OK-ACCESS-TIMESTAMP: 2020-03-28T12:21:41.274Z
 # x-simulated-trading: 1
 
+
+class OKXClient(AsyncExchangeClient, OKXApiConfig):
+    """OKX v5 异步客户端: 长连接会话 + 本地校正时钟签名"""
+    time_path = '/api/v5/public/time'
+
+    def parse_server_time(self, data):
+        return int(data['data'][0]['ts'])
+
+    def sign(self, method, path, params, body, timestamp_ms):
+        """
+        签名串为 timestamp + method + requestPath + body
+
+        requestPath包含查询字符串，签名与发送使用同一个已编码的字符串(request 原样拼入URL)
+        """
+        import base64
+        from urllib.parse import urlencode
+
+        timestamp = generate_timestamp(timestamp_ms)
+        query = urlencode(params or {})
+        request_path = path + (f"?{query}" if query else '')
+        data = None if method == 'GET' else json.dumps(body or {})
+        message = timestamp + method + request_path + (data or '')
+        headers = {
+            'Content-Type': "application/json",
+            'OK-ACCESS-KEY': self.api_key,
+            'OK-ACCESS-SIGN': base64.b64encode(self.sign_digest(message)).decode('utf8'),
+            'OK-ACCESS-PASSPHRASE': self.passphrase,
+            'OK-ACCESS-TIMESTAMP': timestamp,
+        }
+        if not self.is_mainnet():
+            headers['x-simulated-trading'] = "1"  # 模拟盘
+        return query or None, headers, data
+
+
 def fetch_api_key(net):
     """
     从config.json文件中获取对应的API Key等信息
@@ -77,14 +113,20 @@ def fetch_api_key(net):
     return _api_key, _secret_key, passphrase
 
 
-def generate_timestamp():
+def generate_timestamp(timestamp_ms=None):
     """
     生成时间戳，为ISO格式，如2020-12-08T09:08:57.715Z
+
+    Args:
+        timestamp_ms (int): 毫秒时间戳(如异步客户端校正后的时间)，默认为本地当前时间
     """
     from datetime import datetime, timezone
     
     # 使用 datetime.now(timezone.utc) 替代已弃用的 datetime.utcnow()
-    dt = datetime.now(timezone.utc)
+    if timestamp_ms is None:
+        dt = datetime.now(timezone.utc)
+    else:
+        dt = datetime.fromtimestamp(timestamp_ms / 1000, timezone.utc)
     # 格式化为ISO 8601标准格式
     timestamp = dt.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
     
@@ -105,9 +147,7 @@ def generate_sign(secret_key, timestamp, method, request_path, body):
     Returns:
         str: 签名
     """
-    import hmac
     import base64
-    import hashlib
 
     # 构建待签名的字符串
     message = timestamp + method + request_path
@@ -121,225 +161,80 @@ def generate_sign(secret_key, timestamp, method, request_path, body):
     else:
         message += body
     
-    # 使用HMAC SHA256算法进行加密
-    mac = hmac.new(
-        bytes(secret_key, encoding='utf8'),
-        bytes(message, encoding='utf8'),
-        digestmod=hashlib.sha256
-    )
-    
-    # 对加密结果进行Base64编码
-    signature = base64.b64encode(mac.digest()).decode('utf8')
+    # 使用HMAC SHA256算法进行加密(密钥对象按secret缓存)，结果进行Base64编码
+    signature = base64.b64encode(hmac_sha256(secret_key, message)).decode('utf8')
     
     return signature
 
 
-def query_balance(base_url, api_key, secret_key, passphrase):
+def query_balance(client):
     """
     查询用户数据，获取可用的保证金
     
     Args:
-        base_url (str): OKX API的基础URL
-        api_key (str): OKX API密钥
-        secret_key (str): OKX API密钥对应的私钥
-        passphrase (str): OKX API密钥对应的Passphrase
+        client (OKXClient): 共享的异步客户端(OKXClient.shared)
         
     Returns:
         float: 可用的USDT保证金余额，失败时返回-1
     """
-    method = 'GET'
-    request_path = '/api/v5/account/balance'
-    timestamp = generate_timestamp()
-    body = {
-        'ccy': 'USDT'
-    }
-
-    sign = generate_sign(secret_key, timestamp, method, request_path, body)
-
-    url = base_url + request_path
-    
-    headers = {
-        'Content-Type': "application/json",
-        'OK-ACCESS-KEY': api_key,
-        'OK-ACCESS-SIGN': sign,
-        'OK-ACCESS-PASSPHRASE': passphrase,
-        'OK-ACCESS-TIMESTAMP': timestamp,
-        'x-simulated-trading': "1"  # 代表使用测试网进行测试
-    }
-    
-    # 使用GET请求而不是POST
-    res = requests.get(
-        url,
-        headers=headers,
-        params=body  # 使用params而不是data
-    )
-    
-    if res.status_code == 200:
-        data = res.json()
-        # 查找asset为USDT的元素
-        data = data['data'][0]['details'][0]
-        balance = float(data['availBal'])
-        logger.info(f"API请求成功，账户余额: {balance}")
-        return balance
-    else:
-        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+    data = client.call('GET', '/api/v5/account/balance', {'ccy': 'USDT'})
+    if data is None:
         return -1
 
+    # 查找asset为USDT的元素
+    data = data['data'][0]['details'][0]
+    balance = float(data['availBal'])
+    logger.info(f"API请求成功，账户余额: {balance}")
+    return balance
 
-def query_contract_specs(base_url, symbol):
-    """
-    获取交易合约的最小下单数量/合约面值/合约乘数数据
-    
-    Args:
-        base_url (str): OKX API的基础URL
-        api_key (str): OKX API密钥
-        secret_key (str): OKX API密钥对应的私钥
-        passphrase (str): OKX API密钥对应的Passphrase
-        
-    Returns:
-        tuple: 包含合约面值和合约乘数的元组
-            - decimal_places (int): 小数位数
-            - ctVal (float): 合约面值
-            - ctMult (float): 合约乘数
-    """
-
-    method = 'GET'
-    request_path = '/api/v5/public/instruments'
-
-    body = {
-        'instType': 'SWAP',
-        'instId': symbol
-    }
 
-    url = base_url + request_path
-    
-    # 使用GET请求而不是POST
-    res = requests.get(
-        url,  
-        params=body  # 使用params而不是data
-    )
-    
-    if res.status_code == 200:
-        data = res.json()
-        contract_data = data['data'][0]
-
-        min_size = contract_data['lotSz']
-        ct_val = float(contract_data['ctVal'])
-        ct_mult = float(contract_data.get('ctMult', 1))  # 默认为1如果不存在
-
-        decimal_part = min_size.split('.')
-        decimal_places = len(decimal_part[1]) if len(decimal_part) > 1 else 0
-        return decimal_places, ct_val, ct_mult      
-    else:
-        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
-        return -1, -1, -1
-
-
-def query_position(base_url, api_key, secret_key, passphrase, symbol):
+def query_position(client, symbol):
     """
     获取当前持仓信息
 
     Args:
-        base_url (str): OKX API的基础URL
-        api_key (str): OKX API密钥
-        secret_key (str): OKX API密钥对应的私钥
+        client (OKXClient): 共享的异步客户端(OKXClient.shared)
+        symbol (str): 交易对
     Returns:
-        tuple: 包含当前持仓数量和开仓均价的元组
-            - pos_size (float): 当前持仓数量
+        tuple: 包含开仓均价和当前持仓数量的元组
             - entry_price (float): 开仓均价
+            - pos_size (float): 当前持仓数量
     """
-    method = 'GET'
-    request_path = '/api/v5/account/positions'
-    timestamp = generate_timestamp()
-
-    body = {
-        'instId': symbol
-    }
-
-    sign = generate_sign(secret_key, timestamp, method, request_path, body)
-
-    url = base_url + request_path
-    
-    headers = {
-        'Content-Type': "application/json",
-        'OK-ACCESS-KEY': api_key,
-        'OK-ACCESS-SIGN': sign,
-        'OK-ACCESS-PASSPHRASE': passphrase,
-        'OK-ACCESS-TIMESTAMP': timestamp,
-        'x-simulated-trading': "1"  # 代表使用测试网进行测试
-    }
-    
-    # 使用GET请求而不是POST
-    res = requests.get(
-        url,
-        headers=headers,
-        params=body  # 使用params而不是data
-    )
-    
-    if res.status_code == 200:
-        data = res.json()
-        
-        position = data['data'][0]
-        pos_size = float(position['pos'])
-        entry_price = float(position['avgPx'])
-        return entry_price, pos_size
-    else:
-        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
+    data = client.call('GET', '/api/v5/account/positions', {'instId': symbol})
+    if data is None:
         return -1, -1
 
+    position = data['data'][0]
+    pos_size = float(position['pos'])
+    entry_price = float(position['avgPx'])
+    return entry_price, pos_size
+
 
-def adjust_leverage(base_url, api_key, secret_key, passphrase, symbol, leverage):
+def adjust_leverage(client, symbol, leverage):
     """
     调整杠杆
 
     Args:
-        base_url (str): OKX API的基础URL
-        api_key (str): OKX API密钥
-        secret_key (str): OKX API密钥对应的私钥
+        client (OKXClient): 共享的异步客户端(OKXClient.shared)
+        symbol (str): 交易对
+        leverage (int): 杠杆倍数
     """
-    method = 'POST'
-    request_path = '/api/v5/account/set-leverage'
-    timestamp = generate_timestamp()
     body = {
         'instId': symbol,
         'lever': str(leverage),
         'mgnMode': 'cross',
     }
-    # 将字典转换为JSON字符串
-    json_body = json.dumps(body)
 
-    sign = generate_sign(secret_key, timestamp, method, request_path, json_body)
-
-    url = base_url + request_path
-
-    headers = {
-        'Content-Type': "application/json",
-        'OK-ACCESS-KEY': api_key,
-        'OK-ACCESS-SIGN': sign,
-        'OK-ACCESS-PASSPHRASE': passphrase,
-        'OK-ACCESS-TIMESTAMP': timestamp,
-        'x-simulated-trading': "1"  # 代表使用测试网进行测试
-    }
-
-    res = requests.post(
-        url,
-        headers=headers,
-        data=json_body
-    )
-
-    if res.status_code == 200:
-        data = res.json()
+    if client.call('POST', '/api/v5/account/set-leverage', body=body) is not None:
         logger.info(f"API请求成功，调整杠杆成功")
-    else:
-        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
 
 
-async def retrieve_price(base_url, symbol, side):
+async def retrieve_price(base_url, instrument, side):
     """获取标的当前价格并计算目标价格
     
     Args:
         base_url (str): WebSocket API的基础URL
-        symbol (str): 交易对名称
+        instrument (Instrument): 标的交易规则，提供交易对名称与tickSize
         side (bool): 交易方向，True为买入，False为卖出
         
     Returns:
@@ -353,7 +248,7 @@ async def retrieve_price(base_url, symbol, side):
             "op": "subscribe",
             "args": [{
                 "channel": "tickers",
-                "instId": symbol,
+                "instId": instrument.symbol,
             }]
         }
         await websocket.send(json.dumps(subscribe_message))
@@ -372,21 +267,10 @@ async def retrieve_price(base_url, symbol, side):
                         break
                 elif 'data' in data:
                     # 这是推送数据
-                    price_str = data['data'][0]["last"]  # 提取最新价格
-                    price = float(price_str)  # 标记价格
-                    
-                    # 计算小数位数
-                    decimal_places = 0
-                    if '.' in price_str:
-                        # 去除尾随零后再计算小数位数
-                        decimal_part = price_str.split('.')[1].rstrip('0')
-                        decimal_places = len(decimal_part)
-                        
-                    # 计算最小价格变动
-                    min_price_movement = 10 ** (-decimal_places)
-                        
-                    # 计算目标价格
-                    target_price = set_price(price, side, min_price_movement)
+                    price = float(data['data'][0]["last"])  # 提取最新价格
+
+                    # 按标的的tickSz计算目标价格
+                    target_price = set_price(price, side, instrument)
                     logger.info(f"当前价格: {price}; 目标开仓价格: {target_price}")
                     break
             except json.JSONDecodeError:
@@ -396,140 +280,78 @@ async def retrieve_price(base_url, symbol, side):
     return target_price
 
 
-def check_order_filled(base_url, api_key, secret_key, passphrase, order_id, symbol):
+def check_order_filled(client, order_id, symbol):
     """
     检查订单是否已经成功填充
     
     Args:
-        base_url (str): OKX API的基础URL
-        api_key (str): OKX API密钥
-        secret_key (str): OKX API密钥对应的私钥
-        passphrase (str): OKX API密钥对应的Passphrase
+        client (OKXClient): 共享的异步客户端(OKXClient.shared)
         order_id (str): 订单ID
+        symbol (str): 交易对
         
     Returns:
         bool: 订单是否已填充
     """
     if order_id == -1:
         return False
-        
-    method = 'GET'
-    request_path = '/api/v5/trade/order'
-    timestamp = generate_timestamp()
-    
-    body = {
+
+    params = {
         'instId': symbol,
         'ordId': order_id
     }
-    
-    sign = generate_sign(secret_key, timestamp, method, request_path, body)
-    
-    url = base_url + request_path
-    
-    headers = {
-        'Content-Type': "application/json",
-        'OK-ACCESS-KEY': api_key,
-        'OK-ACCESS-SIGN': sign,
-        'OK-ACCESS-PASSPHRASE': passphrase,
-        'OK-ACCESS-TIMESTAMP': timestamp,
-        'x-simulated-trading': "1"  # 代表使用测试网进行测试
-    }
-    
-    res = requests.get(
-        url,
-        headers=headers,
-        params=body
-    )
-    
-    if res.status_code == 200:
-        data = res.json()
-        if 'data' in data and len(data['data']) > 0:
-            order_status = data['data'][0]['state']
-            # 订单状态：canceled-已撤销，live-等待成交，partially_filled-部分成交，filled-完全成交
-            if order_status == 'filled':
+
+    data = client.call('GET', '/api/v5/trade/order', params)
+    if data is not None and 'data' in data and len(data['data']) > 0:
+        order_status = data['data'][0]['state']
+        # 订单状态：canceled-已撤销，live-等待成交，partially_filled-部分成交，filled-完全成交
+        if order_status == 'filled':
+            return True
+        elif order_status == 'partially_filled':
+            # 部分成交也可以视为成功，具体取决于您的策略
+            fill_ratio = float(data['data'][0]['fillSz']) / float(data['data'][0]['sz'])
+            logger.info(f"订单部分成交，成交比例: {fill_ratio:.2%}")
+            # 如果成交比例超过某个阈值，也可以视为成功
+            if fill_ratio > 0.9:  # 例如90%以上视为成功
                 return True
-            elif order_status == 'partially_filled':
-                # 部分成交也可以视为成功，具体取决于您的策略
-                fill_ratio = float(data['data'][0]['fillSz']) / float(data['data'][0]['sz'])
-                logger.info(f"订单部分成交，成交比例: {fill_ratio:.2%}")
-                # 如果成交比例超过某个阈值，也可以视为成功
-                if fill_ratio > 0.9:  # 例如90%以上视为成功
-                    return True
-    else:
-        logger.error(f"查询订单状态失败: 状态码 {res.status_code}, 响应: {res.text}")
     
     return False
 
 
-def cancel_order(base_url, api_key, secret_key, passphrase, order_id, symbol):
+def cancel_order(client, order_id, symbol):
     """
     取消未成交的订单
     
     Args:
-        base_url (str): OKX API的基础URL
-        api_key (str): OKX API密钥
-        secret_key (str): OKX API密钥对应的私钥
-        passphrase (str): OKX API密钥对应的Passphrase
+        client (OKXClient): 共享的异步客户端(OKXClient.shared)
         order_id (str): 订单ID
         symbol (str): 交易对
         
     Returns:
         bool: 是否成功取消订单
     """
-    method = 'POST'
-    request_path = '/api/v5/trade/cancel-order'
-    timestamp = generate_timestamp()
-    
     body = {
         'instId': symbol,
         'ordId': order_id
     }
-    
-    # 将字典转换为JSON字符串
-    json_body = json.dumps(body)
-    
-    sign = generate_sign(secret_key, timestamp, method, request_path, json_body)
-    
-    url = base_url + request_path
-    
-    headers = {
-        'Content-Type': "application/json",
-        'OK-ACCESS-KEY': api_key,
-        'OK-ACCESS-SIGN': sign,
-        'OK-ACCESS-PASSPHRASE': passphrase,
-        'OK-ACCESS-TIMESTAMP': timestamp,
-        'x-simulated-trading': "1"  # 代表使用测试网进行测试
-    }
-    
-    res = requests.post(
-        url,
-        headers=headers,
-        data=json_body
-    )
-    
-    if res.status_code == 200:
-        data = res.json()
+
+    data = client.call('POST', '/api/v5/trade/cancel-order', body=body)
+    if data is not None:
         if data.get('code') == '0':
             logger.info(f"成功取消订单: {order_id}")
             return True
         else:
             logger.error(f"取消订单失败: {data.get('msg')}")
-    else:
-        logger.error(f"取消订单请求失败: 状态码 {res.status_code}, 响应: {res.text}")
     
     return False
 
 
-def place_trade(base_url, api_key, secret_key, passphrase, symbol, side, price, size):
+def place_trade(client, instrument, side, price, size):
     """
     下单
 
     Args:
-        base_url (str): OKX API的基础URL
-        api_key (str): OKX API密钥
-        secret_key (str): OKX API密钥对应的私钥
-        passphrase (str): OKX API密钥对应的Passphrase
-        symbol (str): 交易对
+        client (OKXClient): 共享的异步客户端(OKXClient.shared)
+        instrument (Instrument): 标的交易规则，提供交易对名称与价格/数量的小数位数
         side (bool): 交易方向，True为买入，False为卖出
         price (float): 下单价格
         size (float): 下单数量
@@ -537,10 +359,6 @@ def place_trade(base_url, api_key, secret_key, passphrase, symbol, side, price,
     Returns:
         str: 订单ID，失败时返回-1
     """
-    method = 'POST'
-    request_path = '/api/v5/trade/order'
-    timestamp = generate_timestamp()
-
     # posSide
     # 持仓方向，买卖模式下此参数非必填，如果填写仅可以选择net；在开平仓模式下必填，且仅可选择 long 或 short。
     # 开平仓模式下，side和posSide需要进行组合
@@ -550,47 +368,23 @@ def place_trade(base_url, api_key, secret_key, passphrase, symbol, side, price,
     # 平空：买入平空（side 填写 buy； posSide 填写 short ）
     # 组合保证金模式：交割和永续仅支持买卖模式
     body = {
-        'instId': symbol,
+        'instId': instrument.symbol,
         'tdMode': 'isolated',
         'ccy': 'USDT',
         'side': 'buy' if side else 'sell',
         'posSide': 'long' if side else'short',
         'ordType': 'limit',
-        'px': str(price),
-        'sz': str(size),
-    }
-    # 将字典转换为JSON字符串
-    json_body = json.dumps(body)
-
-    sign = generate_sign(secret_key, timestamp, method, request_path, json_body)
-
-    url = base_url + request_path
-
-    headers = {
-        'Content-Type': "application/json",
-        'OK-ACCESS-KEY': api_key,
-        'OK-ACCESS-SIGN': sign,
-        'OK-ACCESS-PASSPHRASE': passphrase,
-        'OK-ACCESS-TIMESTAMP': timestamp,
-        'x-simulated-trading': "1"  # 代表使用测试网进行测试
+        'px': instrument.format_price(price),
+        'sz': instrument.format_size(size),
     }
-
-    res = requests.post(
-        url,
-        headers=headers,
-        data=json_body
-    )
-
-    if res.status_code == 200:
-        data = res.json()
+    data = client.call('POST', '/api/v5/trade/order', body=body)
+    if data is not None:
         if data.get('code') == '0' and 'data' in data and len(data['data']) > 0:
             order_id = data['data'][0]['ordId']
             logger.info(f"下单成功，订单ID: {order_id}")
             return order_id
         else:
             logger.error(f"下单失败: {data.get('msg')}")
-    else:
-        logger.error(f"API请求失败: 状态码 {res.status_code}, 响应: {res.text}")
     return -1
 
 
@@ -605,35 +399,33 @@ def open_position_arb(net, side, ticker):
         
     Returns:
         tuple: 包含开仓价格和开仓数量的元组
-            - target_price (float): 套利方开仓价格
-            - target_size (float): 套利方开仓张数
+            - target_price (float): 套利方开仓价格(以Hyper Liquid名称的计价单位)
+            - target_size (float): 套利方开仓数量(以Hyper Liquid名称的计价单位)
     """
-    config = OKXApiConfig(net)  # 初始化网络信息
-    rest_base_url = config.get_rest_url()  # 获取REST API的基础URL
-    ws_base_url = config.get_ws_url()  # 获取WebSocket的基础URL
+    client = OKXClient.shared(net, *fetch_api_key(net))  # 进程内共享的客户端(长连接、本地校正时钟签名)
+    rest_base_url = client.get_rest_url()  # 获取REST API的基础URL
+    ws_base_url = client.get_ws_url()  # 获取WebSocket的基础URL
 
-    target_perp = ticker+"-USDT-SWAP"  # 根据ticker构建出目标perp的币对
-    
-    api_key, secret_key, passphrase = fetch_api_key(net)
+    instrument = lookup_instrument('okx', rest_base_url, ticker)  # 标的交易规则(进程内只加载一次)
+    if instrument is None:
+        return -1, -1
+    target_perp = instrument.symbol  # 根据ticker得到目标perp的币对(kPEPE -> PEPE-USDT-SWAP)
 
     # 查询账户余额
-    balance = query_balance(rest_base_url, api_key, secret_key, passphrase)
+    balance = query_balance(client)
     # 计算保证金
     position_fund = int(balance * POSITION_RISK)
     logger.info(f"保证金: {position_fund}")
 
     # 调整杠杆
-    adjust_leverage(rest_base_url, api_key, secret_key, passphrase, target_perp, POSITION_LEVERAGE)
+    adjust_leverage(client, target_perp, POSITION_LEVERAGE)
     
-    # 获取合约规格信息
     # 计算开仓价值
     # 每个合约张数对应的币种数目不同，需要根据合约张数对应的币种数目计算开仓张数
     # 例如，目前使用的是BTC合约，每个合约张数对应的币种数目为0.01
     # 仓位价值 = 合约张数 * 合约面值 * 限价
     # 可开仓价值 = 保证金 × 杠杆倍数
-    # 可开仓张数 = 可开仓价值 ÷ (合约面值 × 价格 × 合约乘数)
-    size_decimals, ct_val, ct_mult = query_contract_specs(rest_base_url, target_perp)
-    position_fund = position_fund / (ct_val * ct_mult)
+    # 可开仓张数 = 可开仓价值 ÷ (合约面值 × 价格 × 合约乘数)，合约面值与乘数由注册表提供(set_size)
     
     # 实现订单填充检查和重试逻辑
     max_retries = 10  # 最大重试次数
@@ -647,30 +439,29 @@ def open_position_arb(net, side, ticker):
         
         # 计算开仓价格
         target_price = asyncio.run(
-            retrieve_price(ws_base_url, target_perp, side)
+            retrieve_price(ws_base_url, instrument, side)
         )
 
         # 计算开仓张数
         target_size = set_size(
             amount=position_fund, 
             price=target_price, 
-            decimals=size_decimals, 
+            instrument=instrument, 
             leverage=POSITION_LEVERAGE
         )
         logger.info(f"开仓张数: {target_size}")
 
         # 下单
         order_id = place_trade(
-            rest_base_url, 
-            api_key, secret_key, passphrase, 
-            target_perp, side, target_price, target_size
+            client,
+            instrument, side, target_price, target_size
         )
 
         # 留出fill订单的时间
         time.sleep(10)
         
         # 检查订单是否成功填充
-        filled = check_order_filled(rest_base_url, api_key, secret_key, passphrase, order_id, target_perp)
+        filled = check_order_filled(client, order_id, target_perp)
         
         if filled:
             logger.info(f"订单已成功填充，订单ID: {order_id}")
@@ -678,7 +469,7 @@ def open_position_arb(net, side, ticker):
         
         # 如果订单未填充，取消订单
         if order_id != -1:
-            cancel_order(rest_base_url, api_key, secret_key, passphrase, order_id, target_perp)
+            cancel_order(client, order_id, target_perp)
             logger.info(f"订单未填充，已取消订单ID: {order_id}")
         
         # 等待一段时间后重试
@@ -691,10 +482,11 @@ def open_position_arb(net, side, ticker):
         return -1, -1
 
     # 获取实际成交价格和数量
-    entry_price, pos_size = query_position(rest_base_url, api_key, secret_key, passphrase, target_perp)
+    entry_price, pos_size = query_position(client, target_perp)
     logger.info(f"成功开仓，价格: {entry_price}, 数量: {pos_size}")
 
-    return entry_price, pos_size
+    # 以Hyper Liquid名称的计价单位返回，其他交易所的对冲方可直接使用
+    return instrument.price_to_coin(entry_price, ticker), instrument.size_to_coin(abs(pos_size), ticker)
 
 
 def open_position_hedge(net, side, ticker, arb_size):
@@ -710,20 +502,20 @@ def open_position_hedge(net, side, ticker, arb_size):
         float: 对冲方开仓价格
     """
     # 获取基础信息
-    config = OKXApiConfig(net)  # 初始化网络信息
-    rest_base_url = config.get_rest_url()  # 获取REST API的基础URL
-    ws_base_url = config.get_ws_url()  # 获取WebSocket的基础URL
+    client = OKXClient.shared(net, *fetch_api_key(net))  # 进程内共享的客户端(长连接、本地校正时钟签名)
+    rest_base_url = client.get_rest_url()  # 获取REST API的基础URL
+    ws_base_url = client.get_ws_url()  # 获取WebSocket的基础URL
 
-    target_perp = ticker+"-USDT-SWAP"  # 根据ticker构建出目标perp的币对
-    
-    api_key, secret_key, passphrase = fetch_api_key(net)
+    instrument = lookup_instrument('okx', rest_base_url, ticker)  # 标的交易规则(进程内只加载一次)
+    if instrument is None:
+        return -1, -1
+    target_perp = instrument.symbol  # 根据ticker得到目标perp的币对(kPEPE -> PEPE-USDT-SWAP)
 
     # 调整目标标的杠杆
-    adjust_leverage(rest_base_url, api_key, secret_key, passphrase, target_perp, POSITION_LEVERAGE)
+    adjust_leverage(client, target_perp, POSITION_LEVERAGE)
 
     # 转换OKX张数
-    size_decimals, ct_val, ct_mult = query_contract_specs(rest_base_url, target_perp)
-    okx_size = arb_size / (ct_val*ct_mult)
+    okx_size = instrument.size_from_coin(arb_size, ticker)
     logger.info(f"OKX张数: {okx_size}")
 
     # 实现订单填充检查和重试逻辑
@@ -738,21 +530,20 @@ def open_position_hedge(net, side, ticker, arb_size):
         
         # 计算开仓价格
         target_price = asyncio.run(
-            retrieve_price(ws_base_url, target_perp, side)
+            retrieve_price(ws_base_url, instrument, side)
         )
 
         # 下单
         order_id = place_trade(
-            rest_base_url, 
-            api_key, secret_key, passphrase, 
-            target_perp, side, target_price, okx_size
+            client,
+            instrument, side, target_price, okx_size
         )
 
         # 留出fill订单的时间
         time.sleep(10)
         
         # 检查订单是否成功填充
-        filled = check_order_filled(rest_base_url, api_key, secret_key, passphrase, order_id, target_perp)
+        filled = check_order_filled(client, order_id, target_perp)
         
         if filled:
             logger.info(f"订单已成功填充，订单ID: {order_id}")
@@ -760,7 +551,7 @@ def open_position_hedge(net, side, ticker, arb_size):
         
         # 如果订单未填充，取消订单
         if order_id != -1:
-            cancel_order(rest_base_url, api_key, secret_key, passphrase, order_id, target_perp)
+            cancel_order(client, order_id, target_perp)
             logger.info(f"订单未填充，已取消订单ID: {order_id}")
         
         # 等待一段时间后重试
@@ -773,7 +564,7 @@ def open_position_hedge(net, side, ticker, arb_size):
         return -1, -1
 
     # 获取实际成交价格和数量
-    entry_price, pos_size = query_position(rest_base_url, api_key, secret_key, passphrase, target_perp)
+    entry_price, pos_size = query_position(client, target_perp)
     logger.info(f"成功开仓，价格: {entry_price}, 数量: {pos_size}")
 
     return entry_price, pos_size
@@ -788,20 +579,17 @@ def close_position_arb(net, side, ticker):
         ticker (str): 目标标的，如"BTC"
     """
     # 获取基础信息
-    config = OKXApiConfig(net)  # 初始化网络信息
-    rest_base_url = config.get_rest_url()  # 获取REST API的基础URL
-    ws_base_url = config.get_ws_url()  # 获取WebSocket的基础URL
+    client = OKXClient.shared(net, *fetch_api_key(net))  # 进程内共享的客户端(长连接、本地校正时钟签名)
+    rest_base_url = client.get_rest_url()  # 获取REST API的基础URL
+    ws_base_url = client.get_ws_url()  # 获取WebSocket的基础URL
 
-    target_perp = ticker+"-USDT-SWAP"  # 根据ticker构建出目标perp的币对
-    
-    api_key, secret_key, passphrase = fetch_api_key(net)
+    instrument = lookup_instrument('okx', rest_base_url, ticker)  # 标的交易规则(进程内只加载一次)
+    if instrument is None:
+        return -1
+    target_perp = instrument.symbol  # 根据ticker得到目标perp的币对(kPEPE -> PEPE-USDT-SWAP)
 
     # 获取仓位信息
-    entry_price, pos_size = query_position(
-        rest_base_url, 
-        api_key, secret_key, passphrase, 
-        target_perp
-    )
+    entry_price, pos_size = query_position(client, target_perp)
 
     # 实现订单填充检查和重试逻辑
     max_retries = 10  # 最大重试次数
@@ -815,21 +603,20 @@ def close_position_arb(net, side, ticker):
         
         # 计算开仓价格
         target_price = asyncio.run(
-            retrieve_price(ws_base_url, target_perp, side)
+            retrieve_price(ws_base_url, instrument, side)
         )
 
         # 下单
         order_id = place_trade(
-            rest_base_url, 
-            api_key, secret_key, passphrase, 
-            target_perp, side, target_price, pos_size
+            client,
+            instrument, side, target_price, pos_size
         )
 
         # 留出fill订单的时间
         time.sleep(10)
         
         # 检查订单是否成功填充
-        filled = check_order_filled(rest_base_url, api_key, secret_key, passphrase, order_id, target_perp)
+        filled = check_order_filled(client, order_id, target_perp)
         
         if filled:
             logger.info(f"订单已成功成交，订单ID: {order_id}")
@@ -837,7 +624,7 @@ def close_position_arb(net, side, ticker):
         
         # 如果订单未填充，取消订单
         if order_id != -1:
-            cancel_order(rest_base_url, api_key, secret_key, passphrase, order_id, target_perp)
+            cancel_order(client, order_id, target_perp)
             logger.info(f"订单未成交，已取消订单ID: {order_id}")
         
         # 等待一段时间后重试
@@ -860,20 +647,20 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price):
         side (bool): 平仓方向，True为平多，False为平空
     """
     # 获取基础信息
-    config = OKXApiConfig(net)  # 初始化网络信息
-    rest_base_url = config.get_rest_url()  # 获取REST API的基础URL
-    ws_base_url = config.get_ws_url()  # 获取WebSocket的基础URL
+    client = OKXClient.shared(net, *fetch_api_key(net))  # 进程内共享的客户端(长连接、本地校正时钟签名)
+    rest_base_url = client.get_rest_url()  # 获取REST API的基础URL
+    ws_base_url = client.get_ws_url()  # 获取WebSocket的基础URL
 
-    target_perp = ticker+"-USDT-SWAP"  # 根据ticker构建出目标perp的币对
-    
-    api_key, secret_key, passphrase = fetch_api_key(net)
+    instrument = lookup_instrument('okx', rest_base_url, ticker)  # 标的交易规则(进程内只加载一次)
+    if instrument is None:
+        return -1
+    target_perp = instrument.symbol  # 根据ticker得到目标perp的币对(kPEPE -> PEPE-USDT-SWAP)
 
     # 获取仓位信息
-    hedge_entry_price, hedge_size = query_position(
-        rest_base_url, 
-        api_key, secret_key, passphrase, 
-        target_perp
-    )
+    hedge_open_price, hedge_size = query_position(client, target_perp)
+    if hedge_open_price == -1:
+        logger.error("获取仓位信息失败")
+        return -1
 
     # 实现订单填充检查和重试逻辑
     max_retries = 10  # 最大重试次数
@@ -887,10 +674,12 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price):
         
         # 计算开仓价格
         current_market_price = asyncio.run(
-            retrieve_price(ws_base_url, target_perp, side)
+            retrieve_price(ws_base_url, instrument, side)
         )
         # 计算价格风险完全对冲的平仓价格
-        hedge_price = arb_close_price + hedge_open_price - arb_open_price
+        # 套利方价差以Hyper Liquid名称的计价单位给出，换算为本合约的报价单位后再与对冲方开仓价相加
+        hedge_price = instrument.round_price(
+            hedge_open_price + instrument.price_from_coin(arb_close_price - arb_open_price, ticker))
 
         # 计算最终的平仓价格
         if side:
@@ -910,17 +699,16 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price):
 
         # 下单
         order_id = place_trade(
-            base_url=rest_base_url,
-            api_key=api_key, secret_key=secret_key, passphrase=passphrase,
+            client,
             price=target_price, side=side,
-            symbol=target_perp, size=hedge_size
+            instrument=instrument, size=hedge_size
         )
 
         # 留出fill订单的时间
         time.sleep(10)
         
         # 检查订单是否成功填充
-        filled = check_order_filled(rest_base_url, api_key, secret_key, passphrase, order_id, target_perp)
+        filled = check_order_filled(client, order_id, target_perp)
         
         if filled:
             logger.info(f"订单已成功填充，订单ID: {order_id}")
@@ -928,7 +716,7 @@ def close_position_hedge(net, side, ticker, arb_open_price, arb_close_price):
         
         # 如果订单未填充，取消订单
         if order_id != -1:
-            cancel_order(rest_base_url, api_key, secret_key, passphrase, order_id, target_perp)
+            cancel_order(client, order_id, target_perp)
             logger.info(f"订单未填充，已取消订单ID: {order_id}")
         
         # 等待一段时间后重试
@@ -0,0 +1,178 @@
+"""
+回测运行结果存储
+
+每次回测写成一个压缩的列式文件 results/runs/{run_id}.npz，包含:
+    - equity_curve / trades / funding_spreads 各列
+    - 绩效指标(metrics)与回测参数(params)
+同时在 results/runs_index.jsonl 中追加一行索引(参数 + 指标)，
+比较多次回测时只需读取索引即可完成查询，例如:
+    best_run('sharpe_ratio', where='threshold < 0.001')
+"""
+import json
+import os
+import uuid
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'results')
+INDEX_FILENAME = 'runs_index.jsonl'
+RUNS_DIRNAME = 'runs'
+
+
+def _encode_column(series):
+    """
+    将DataFrame的一列编码为无需pickle即可保存的numpy数组
+
+    返回:
+    (np.ndarray, str): 数组及其类型标记
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = series.dt.tz_localize(None) if getattr(series.dt, 'tz', None) is not None else series
+        return values.to_numpy(dtype='datetime64[ms]').astype(np.int64), 'datetime'
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(), 'numeric'
+    # 字符串等其他类型统一转为定长字符串，空值编码为空串
+    return series.where(series.notna(), '').astype(str).to_numpy(dtype=np.str_), 'str'
+
+
+def _decode_column(values, kind):
+    """_encode_column 的逆过程"""
+    if kind == 'datetime':
+        return pd.to_datetime(values, unit='ms')
+    if kind == 'str':
+        return pd.Series(values, dtype=object).replace('', np.nan)
+    return values
+
+
+def _to_jsonable(value):
+    """将numpy标量等转换为可JSON序列化的Python对象"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.isoformat()
+    return value
+
+
+def save_run(tables, metrics, params, results_dir=None, run_id=None):
+    """
+    保存一次回测运行并追加索引
+
+    Args:
+        tables (dict): 表名 -> DataFrame，如 {'equity_curve': ..., 'trades': ...}
+        metrics (dict): calculate_metrics 的输出
+        params (dict): 回测参数，如 threshold / position_size
+        results_dir (str): 结果目录，默认为项目根目录下的results
+        run_id (str): 运行ID，默认按时间生成
+
+    Returns:
+        str: run_id
+    """
+    results_dir = results_dir or DEFAULT_RESULTS_DIR
+    runs_dir = os.path.join(results_dir, RUNS_DIRNAME)
+    os.makedirs(runs_dir, exist_ok=True)
+
+    created_at = datetime.now()
+    run_id = run_id or f"{created_at.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+    arrays = {}
+    schema = {}
+    for table_name, df in tables.items():
+        if df is None:
+            continue
+        df = pd.DataFrame(df)
+        columns = {}
+        for column in df.columns:
+            values, kind = _encode_column(df[column])
+            arrays[f"{table_name}/{column}"] = values
+            columns[str(column)] = kind
+        schema[table_name] = {'columns': columns, 'rows': len(df)}
+
+    metrics = {k: _to_jsonable(v) for k, v in metrics.items()}
+    params = {k: _to_jsonable(v) for k, v in params.items()}
+    meta = {'run_id': run_id, 'created_at': created_at.isoformat(), 'schema': schema,
+            'metrics': metrics, 'params': params}
+    arrays['__meta__'] = np.array(json.dumps(meta, ensure_ascii=False))
+
+    artifact = os.path.join(runs_dir, f"{run_id}.npz")
+    np.savez_compressed(artifact, **arrays)
+
+    # 追加索引：一行一个运行，参数与指标平铺，便于直接筛选
+    record = {'run_id': run_id, 'created_at': meta['created_at'],
+              'artifact': os.path.relpath(artifact, results_dir)}
+    record.update(params)
+    record.update(metrics)
+    with open(os.path.join(results_dir, INDEX_FILENAME), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    return run_id
+
+
+def load_index(results_dir=None):
+    """
+    读取运行索引
+
+    Returns:
+        DataFrame: 每行一个运行，不存在索引时返回空表
+    """
+    index_path = os.path.join(results_dir or DEFAULT_RESULTS_DIR, INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        return pd.DataFrame(columns=['run_id', 'created_at', 'artifact'])
+    with open(index_path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return pd.DataFrame.from_records(records)
+
+
+def query_runs(where=None, sort_by=None, ascending=False, limit=None, results_dir=None):
+    """
+    基于索引查询运行记录，无需打开任何结果文件
+
+    Args:
+        where (str): pandas query 表达式，如 "threshold < 0.001 and position_size == 0.3"
+        sort_by (str): 排序字段，如 'sharpe_ratio'
+        ascending (bool): 是否升序
+        limit (int): 返回条数
+
+    Returns:
+        DataFrame: 满足条件的运行记录
+    """
+    index = load_index(results_dir)
+    if where and len(index) > 0:
+        index = index.query(where)
+    if sort_by and sort_by in index.columns:
+        index = index.sort_values(sort_by, ascending=ascending)
+    if limit is not None:
+        index = index.head(limit)
+    return index.reset_index(drop=True)
+
+
+def best_run(metric='sharpe_ratio', where=None, results_dir=None):
+    """
+    查询指标最优的运行，例如 best_run('sharpe_ratio', where='threshold < 0.001')
+
+    Returns:
+        Series or None: 最优运行的索引记录
+    """
+    runs = query_runs(where=where, sort_by=metric, ascending=(metric == 'max_drawdown'),
+                      limit=1, results_dir=results_dir)
+    return runs.iloc[0] if len(runs) > 0 else None
+
+
+def load_run(run_id, results_dir=None):
+    """
+    读取单个运行的完整结果
+
+    Returns:
+        dict: 表名 -> DataFrame，另含 'metrics' 与 'params'
+    """
+    results_dir = results_dir or DEFAULT_RESULTS_DIR
+    artifact = os.path.join(results_dir, RUNS_DIRNAME, f"{run_id}.npz")
+    with np.load(artifact, allow_pickle=False) as data:
+        meta = json.loads(str(data['__meta__']))
+        result = {'metrics': meta['metrics'], 'params': meta['params']}
+        for table_name, table_schema in meta['schema'].items():
+            result[table_name] = pd.DataFrame({
+                column: _decode_column(data[f"{table_name}/{column}"], kind)
+                for column, kind in table_schema['columns'].items()
+            })
+    return result
@@ -0,0 +1,242 @@
+"""
+按实盘 main_loop 时间表回放历史数据的向量化回测
+
+实盘流程 (main.func_manager):
+    - T-10min 获取资金费率
+    - T-1min  开仓
+    - T+5s    平仓
+其中 T 为四小时整点或奇数时刻(1,3,5,7)。
+
+本模块基于1分钟合并K线 (data/candles/{ticker}_candles.csv) 与合并资金费率
+(data/fundingRates/{ticker}_fr.csv)，对历史上所有结算时刻一次性向量化计算，
+得到包含持仓约1分钟内基差变动的实际收益。
+"""
+import numpy as np
+import pandas as pd
+import os
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(__file__)))
+from src.back_test import FundingRateArbitrageBacktest
+from src.calculate_staff import Platform
+from src.data_fetch.schema import read_merged
+from src.time_grid import MINUTE_MS, ODD_HOURS, floor_ms, schedule_moments
+
+# 相对结算时刻 T 的操作偏移(毫秒)，与 main.func_manager 保持一致
+FETCH_OFFSET_MS = -10 * MINUTE_MS  # 资金费率获取时刻：10min Before
+OPEN_OFFSET_MS = -1 * MINUTE_MS  # 开仓时刻：1min Before
+CLOSE_OFFSET_MS = 5 * 1000  # 平仓时刻：5s After
+
+# 参与回放的交易平台，数据列前缀为平台code的小写形式(hl/bin/okx/bybit)
+REPLAY_PLATFORMS = [Platform.HYPERLIQUID, Platform.BINANCE, Platform.OKX, Platform.BYBIT]
+
+
+def settlement_moments(start_ms, end_ms, utc_offset_minutes=0, odd_hours=ODD_HOURS):
+    """
+    生成 [start_ms, end_ms] 内所有的执行时刻 T (四小时整点 + 奇数时刻)
+
+    Args:
+        start_ms (int): 起始时间戳(毫秒)
+        end_ms (int): 结束时间戳(毫秒)
+        utc_offset_minutes (int): 实盘机器本地时间相对UTC的偏移(分钟)，main_loop 使用本地时间判断整点
+        odd_hours (tuple): 奇数执行时刻
+
+    Returns:
+        np.ndarray: int64 毫秒时间戳数组
+    """
+    return schedule_moments(start_ms, end_ms, utc_offset_minutes, odd_hours=odd_hours)
+
+
+def _lookup_rows(timestamps, values, targets):
+    """
+    按时间戳精确匹配取值，未匹配到的行填充NaN
+
+    Args:
+        timestamps (np.ndarray): 已排序的时间戳
+        values (np.ndarray): 二维数组，行与timestamps对应
+        targets (np.ndarray): 需要查询的时间戳
+
+    Returns:
+        np.ndarray: 形状为 (len(targets), values.shape[1]) 的数组
+    """
+    if len(timestamps) == 0:
+        return np.full((len(targets), values.shape[1]), np.nan)
+    idx = np.searchsorted(timestamps, targets)
+    idx_clip = np.minimum(idx, len(timestamps) - 1)
+    hit = (idx < len(timestamps)) & (timestamps[idx_clip] == targets)
+    return np.where(hit[:, None], values[idx_clip], np.nan)
+
+
+class ScheduleReplayBacktest(FundingRateArbitrageBacktest):
+    """
+    按实盘时间表回放的回测：每个执行时刻选择净收益最高的交易所对，
+    T-1min 开仓、T+5s 平仓，收益 = 资金费率差 + 基差变动 - 手续费 - 滑点
+    """
+
+    def load_replay_data(self, candles_file, funding_file):
+        """
+        加载合并后的1分钟K线与资金费率数据
+
+        参数:
+        candles_file: merge_exchange_data 生成的 {ticker}_candles.csv
+        funding_file: merge_exchange_data 生成的 {ticker}_fr.csv
+        """
+        prefixes = [p.code.lower() for p in REPLAY_PLATFORMS]
+        # 紧凑列类型读取，K线只需要各交易所的开盘价
+        candles = read_merged(candles_file, columns=[f'{pre}Open' for pre in prefixes])
+        funding = read_merged(funding_file)
+        candles = candles.sort_values('timestamp').drop_duplicates(subset=['timestamp'])
+        funding = funding.sort_values('timestamp').drop_duplicates(subset=['timestamp'])
+
+        self.candle_ts = candles['timestamp'].to_numpy(dtype=np.int64)
+        self.open_prices = np.column_stack([
+            pd.to_numeric(candles[f'{pre}Open'], errors='coerce').to_numpy(dtype=np.float64)
+            if f'{pre}Open' in candles.columns else np.full(len(candles), np.nan)
+            for pre in prefixes
+        ])
+        self.funding_ts = funding['timestamp'].to_numpy(dtype=np.int64)
+        self.funding_matrix = np.column_stack([
+            pd.to_numeric(funding[f'{pre}FR'], errors='coerce').to_numpy(dtype=np.float64)
+            if f'{pre}FR' in funding.columns else np.full(len(funding), np.nan)
+            for pre in prefixes
+        ])
+
+        # 父类 calculate_metrics/plot_results 依赖 price_data 与 funding_rates
+        self.price_data = pd.DataFrame({'timestamp': pd.to_datetime(self.candle_ts, unit='ms')})
+        self.funding_rates = funding
+
+        print(f"数据加载完成: K线数据 {len(self.candle_ts)} 条, 资金费率数据 {len(self.funding_ts)} 条")
+
+    def _prices_at(self, moments_ms):
+        """取时刻所在分钟K线的开盘价作为成交价"""
+        candle_ts = floor_ms(moments_ms, MINUTE_MS)
+        return _lookup_rows(self.candle_ts, self.open_prices, candle_ts)
+
+    def run_schedule_replay(self, position_size=0.2, min_edge=0.0, utc_offset_minutes=0, odd_hours=ODD_HOURS):
+        """
+        在所有历史执行时刻上向量化回放实盘时间表
+
+        参数:
+        position_size: 每次交易使用的资金比例
+        min_edge: T-10min 时预期净资金费率(扣除手续费和滑点)需超过该值才开仓
+        utc_offset_minutes: 实盘机器本地时间相对UTC的偏移(分钟)
+        odd_hours: 奇数执行时刻
+
+        返回:
+        (equity_curve, trades)
+        """
+        if not hasattr(self, 'candle_ts'):
+            raise ValueError("请先调用 load_replay_data 加载数据")
+        self.params.update({
+            'position_size': position_size,
+            'threshold': min_edge,
+            'utc_offset_minutes': utc_offset_minutes,
+            'odd_hours': ','.join(str(h) for h in odd_hours),
+        })
+
+        start_ms = max(self.candle_ts[0] - OPEN_OFFSET_MS, self.funding_ts[0])
+        end_ms = min(self.candle_ts[-1] - CLOSE_OFFSET_MS, self.funding_ts[-1])
+        moments = settlement_moments(start_ms, end_ms, utc_offset_minutes, odd_hours)
+
+        # 历史数据中T时刻已结算的费率，即为实盘 T-10min 时获取到的当期费率
+        fr = _lookup_rows(self.funding_ts, self.funding_matrix, moments)
+        open_px = self._prices_at(moments + OPEN_OFFSET_MS)
+        close_px = self._prices_at(moments + CLOSE_OFFSET_MS)
+
+        fees = np.array([p.fee for p in REPLAY_PLATFORMS])
+        pair_i, pair_j = np.triu_indices(len(REPLAY_PLATFORMS), k=1)
+
+        # 未在T时刻结算的平台资金费率视为0 (仅作对冲方)
+        fr_filled = np.nan_to_num(fr, nan=0.0)
+        diff = fr_filled[:, pair_i] - fr_filled[:, pair_j]
+        slippage_cost = self.slippage * 4  # 两边交易 × 开平仓
+        edge = np.abs(diff) - fees[pair_i] - fees[pair_j] - slippage_cost
+
+        priced = np.isfinite(open_px) & np.isfinite(close_px) & (open_px > 0)
+        settled = np.isfinite(fr)
+        valid = (priced[:, pair_i] & priced[:, pair_j]
+                 & (settled[:, pair_i] | settled[:, pair_j]))
+        edge = np.where(valid, edge, -np.inf)
+
+        rows = np.arange(len(moments))
+        best = np.argmax(edge, axis=1) if len(moments) else np.array([], dtype=np.int64)
+        best_edge = edge[rows, best]
+        best_diff = diff[rows, best]
+
+        # 资金费率高的一方做空，低的一方做多
+        short_idx = np.where(best_diff > 0, pair_i[best], pair_j[best])
+        long_idx = np.where(best_diff > 0, pair_j[best], pair_i[best])
+
+        traded = np.isfinite(best_edge) & (best_edge > min_edge)
+
+        funding_profit = np.abs(best_diff)
+        long_ret = close_px[rows, long_idx] / open_px[rows, long_idx] - 1
+        short_ret = close_px[rows, short_idx] / open_px[rows, short_idx] - 1
+        basis_profit = long_ret - short_ret
+        cost = fees[long_idx] + fees[short_idx] + slippage_cost
+        trade_return = funding_profit + basis_profit - cost
+
+        step_return = np.where(traded, position_size * trade_return, 0.0)
+        equity = self.initial_capital * np.cumprod(1 + step_return)
+
+        codes = np.array([p.code for p in REPLAY_PLATFORMS])
+        self.funding_spreads = pd.DataFrame({
+            'timestamp': pd.to_datetime(moments, unit='ms'),
+            'spread': np.where(np.isfinite(best_edge), funding_profit, np.nan),
+            'net_edge': best_edge,
+            'long_exchange': codes[long_idx],
+            'short_exchange': codes[short_idx],
+        })
+
+        capital_before = np.concatenate(([self.initial_capital], equity[:-1]))
+        amount = capital_before * position_size
+        self.trades = pd.DataFrame({
+            'timestamp': pd.to_datetime(moments, unit='ms'),
+            'action': 'ROUND_TRIP',
+            'long_exchange': codes[long_idx],
+            'short_exchange': codes[short_idx],
+            'amount': amount,
+            'long_open': open_px[rows, long_idx],
+            'long_close': close_px[rows, long_idx],
+            'short_open': open_px[rows, short_idx],
+            'short_close': close_px[rows, short_idx],
+            'funding_profit': funding_profit * amount,
+            'basis_profit': basis_profit * amount,
+            'cost': cost * amount,
+            'profit': trade_return * amount,
+        })[traded].reset_index(drop=True)
+
+        first_ts = pd.to_datetime(self.candle_ts[0], unit='ms')
+        self.equity_curve = pd.concat([
+            pd.DataFrame({'timestamp': [first_ts], 'equity': [self.initial_capital]}),
+            pd.DataFrame({
+                'timestamp': pd.to_datetime(moments[traded] + CLOSE_OFFSET_MS, unit='ms'),
+                'equity': equity[traded],
+            }),
+        ], ignore_index=True)
+        self.capital = float(equity[-1]) if len(equity) else self.initial_capital
+
+        return self.equity_curve, self.trades
+
+
+# 使用示例
+if __name__ == "__main__":
+    ticker = 'BTC'
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+
+    backtest = ScheduleReplayBacktest(initial_capital=10000, slippage=0.0001)
+    backtest.load_replay_data(
+        candles_file=os.path.join(data_dir, 'candles', f'{ticker}_candles.csv'),
+        funding_file=os.path.join(data_dir, 'fundingRates', f'{ticker}_fr.csv')
+    )
+    equity_curve, trades = backtest.run_schedule_replay(position_size=0.3)
+    print(f"回放 {len(backtest.funding_spreads)} 个执行时刻, 成交 {len(trades)} 次")
+
+    metrics = backtest.calculate_metrics()
+    print("\n回测绩效指标:")
+    for key, value in metrics.items():
+        print(f"{key}: {value:.4f}")
+
+    backtest.save_results()
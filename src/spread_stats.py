@@ -0,0 +1,250 @@
+"""
+全历史资金费率差分布的流式统计
+
+analyze.max_analyze_funding_rate 只分析一个快照并找出单个最大值。
+本模块分块遍历 data/fundingRates 下每个 ticker 的合并资金费率文件({ticker}_fr.csv)，
+在固定内存预算内计算每个交易所对的:
+    - 资金费率差直方图(固定分箱，可直接相加合并)
+    - 分位数(可合并的 t-digest 草图)
+    - 资金费率差超过双方手续费之和的频率
+不需要把多年的数据一次性读入内存。
+"""
+import os
+import re
+import numpy as np
+import pandas as pd
+from itertools import combinations
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(__file__)))
+from src.calculate_staff import Platform
+
+FUNDING_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'fundingRates')
+MERGED_FR_PATTERN = re.compile(r'^(.+)_fr\.csv$')
+VENUE_PREFIXES = ('hl', 'bin', 'okx', 'bybit')
+
+STATS_PLATFORMS = [Platform.HYPERLIQUID, Platform.BINANCE, Platform.OKX, Platform.BYBIT]
+# 资金费率差直方图分箱：0 ~ 1%，步长0.005%，最后一个箱收纳所有更大的值
+DEFAULT_BIN_EDGES = np.append(np.arange(0, 0.01 + 1e-12, 0.00005), np.inf)
+QUANTILES = (0.5, 0.9, 0.95, 0.99, 0.999)
+
+
+class TDigest:
+    """
+    可合并的 t-digest 分位数草图
+
+    质心按 k1 尺度函数 k(q) = δ/(2π)·asin(2q-1) 分组，同一整数 k 区间内的点合并为一个质心，
+    质心数量与数据量无关，约为 compression 的量级。两个草图可以直接合并。
+    """
+
+    def __init__(self, compression=200, buffer_size=None):
+        self.compression = compression
+        self.buffer_size = buffer_size or 50 * compression
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+        self.min = np.inf
+        self.max = -np.inf
+        self._buffer = []
+        self._buffered = 0
+
+    @property
+    def count(self):
+        """已加入的样本总权重"""
+        return float(self.weights.sum()) + sum(float(w.sum()) for _, w in self._buffer)
+
+    def update(self, values, weights=None):
+        """
+        批量加入样本
+
+        Args:
+            values (np.ndarray): 样本值，NaN会被忽略
+            weights (np.ndarray): 样本权重，默认为1
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+        mask = np.isfinite(values)
+        values, weights = values[mask], weights[mask]
+        if len(values) == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._buffer.append((values, weights))
+        self._buffered += len(values)
+        if self._buffered >= self.buffer_size:
+            self.compress()
+
+    def merge(self, other):
+        """合并另一个草图"""
+        other.compress()
+        if len(other.means):
+            self.update(other.means, other.weights)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+
+    def compress(self):
+        """将缓冲区的样本与现有质心重新分组压缩"""
+        if not self._buffer:
+            return
+        means = np.concatenate([self.means] + [v for v, _ in self._buffer])
+        weights = np.concatenate([self.weights] + [w for _, w in self._buffer])
+        self._buffer, self._buffered = [], 0
+
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        q_mid = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(np.clip(2 * q_mid - 1, -1, 1))
+        group = np.floor(k - k.min()).astype(np.int64)
+
+        starts = np.flatnonzero(np.diff(group, prepend=group[0] - 1))
+        w_sum = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / w_sum
+        self.weights = w_sum
+
+    def quantile(self, q):
+        """
+        估计分位数
+
+        Args:
+            q (float or array): 0~1 之间的分位点
+
+        Returns:
+            float or np.ndarray: 分位数估计值
+        """
+        self.compress()
+        if len(self.means) == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        total = self.weights.sum()
+        cum_mid = np.cumsum(self.weights) - self.weights / 2
+        xp = np.concatenate(([0.0], cum_mid, [total]))
+        fp = np.concatenate(([self.min], self.means, [self.max]))
+        return np.interp(np.asarray(q) * total, xp, fp)
+
+
+class PairSpreadStats:
+    """单个交易所对的流式统计量：直方图、t-digest、超过手续费阈值的次数"""
+
+    def __init__(self, fee_threshold, bin_edges, compression):
+        self.fee_threshold = fee_threshold
+        self.bin_edges = bin_edges
+        self.histogram = np.zeros(len(bin_edges) - 1, dtype=np.int64)
+        self.digest = TDigest(compression)
+        self.count = 0
+        self.above_fee = 0
+        self.total = 0.0
+
+    def update(self, spreads):
+        spreads = spreads[np.isfinite(spreads)]
+        if len(spreads) == 0:
+            return
+        self.histogram += np.histogram(spreads, bins=self.bin_edges)[0]
+        self.digest.update(spreads)
+        self.count += len(spreads)
+        self.above_fee += int((spreads > self.fee_threshold).sum())
+        self.total += float(spreads.sum())
+
+    def merge(self, other):
+        self.histogram += other.histogram
+        self.digest.merge(other.digest)
+        self.count += other.count
+        self.above_fee += other.above_fee
+        self.total += other.total
+
+
+def list_merged_funding_files(funding_dir=None):
+    """列出所有 ticker 的合并资金费率文件 {ticker}_fr.csv"""
+    funding_dir = funding_dir or FUNDING_DIR
+    if not os.path.isdir(funding_dir):
+        return []
+    files = []
+    for name in sorted(os.listdir(funding_dir)):
+        match = MERGED_FR_PATTERN.match(name)
+        # 排除单交易所文件 bin_BTC_fr.csv 等
+        if match and not name.startswith(tuple(f'{p}_' for p in VENUE_PREFIXES)):
+            files.append((match.group(1), os.path.join(funding_dir, name)))
+    return files
+
+
+def _chunk_rows_for_budget(memory_budget_mb, n_columns):
+    """根据内存预算估算每块读取的行数(按每个单元格约64字节的解析开销估算)"""
+    return max(1000, int(memory_budget_mb * 1024 * 1024 / (64 * max(n_columns, 1))))
+
+
+def stream_spread_distribution(funding_dir=None, memory_budget_mb=64, bin_edges=None,
+                               compression=200, quantiles=QUANTILES):
+    """
+    分块遍历所有 ticker 的资金费率文件，统计各交易所对的资金费率差分布
+
+    Args:
+        funding_dir (str): 资金费率目录，默认为 data/fundingRates
+        memory_budget_mb (int): 单个数据块的内存预算(MB)
+        bin_edges (np.ndarray): 直方图分箱边界
+        compression (int): t-digest 压缩参数
+        quantiles (tuple): 需要输出的分位点
+
+    Returns:
+        tuple: (summary, per_ticker, histograms)
+            summary: 每个交易所对一行，含样本数、均值、分位数、超过手续费阈值的频率
+            per_ticker: 每个 ticker × 交易所对 一行的样本数与超阈值频率
+            histograms: 交易所对 -> (bin_edges, counts)
+    """
+    bin_edges = DEFAULT_BIN_EDGES if bin_edges is None else np.asarray(bin_edges)
+    pairs = list(combinations(STATS_PLATFORMS, 2))
+    pair_names = {pair: f"{pair[0].code}-{pair[1].code}" for pair in pairs}
+
+    overall = {pair: PairSpreadStats(pair[0].fee + pair[1].fee, bin_edges, compression) for pair in pairs}
+    per_ticker_rows = []
+
+    for ticker, file_path in list_merged_funding_files(funding_dir):
+        header = pd.read_csv(file_path, nrows=0).columns
+        columns = {p: f"{p.code.lower()}FR" for p in STATS_PLATFORMS if f"{p.code.lower()}FR" in header}
+        ticker_pairs = [pair for pair in pairs if pair[0] in columns and pair[1] in columns]
+        if not ticker_pairs:
+            continue
+
+        ticker_counts = {pair: [0, 0] for pair in ticker_pairs}
+        chunk_rows = _chunk_rows_for_budget(memory_budget_mb, len(columns))
+        reader = pd.read_csv(file_path, usecols=list(columns.values()), chunksize=chunk_rows, dtype=np.float64)
+        for chunk in reader:
+            values = {p: chunk[col].to_numpy() for p, col in columns.items()}
+            for pair in ticker_pairs:
+                # 仅统计双方在同一时刻都有结算的资金费率差
+                spreads = np.abs(values[pair[0]] - values[pair[1]])
+                spreads = spreads[np.isfinite(spreads)]
+                overall[pair].update(spreads)
+                ticker_counts[pair][0] += len(spreads)
+                ticker_counts[pair][1] += int((spreads > overall[pair].fee_threshold).sum())
+
+        for pair, (count, above) in ticker_counts.items():
+            per_ticker_rows.append({
+                'ticker': ticker, 'pair': pair_names[pair], 'count': count,
+                'above_fee': above, 'above_fee_freq': above / count if count else np.nan,
+            })
+
+    summary_rows = []
+    for pair, stats in overall.items():
+        row = {
+            'pair': pair_names[pair],
+            'fee_threshold': stats.fee_threshold,
+            'count': stats.count,
+            'mean': stats.total / stats.count if stats.count else np.nan,
+            'above_fee': stats.above_fee,
+            'above_fee_freq': stats.above_fee / stats.count if stats.count else np.nan,
+        }
+        for q, value in zip(quantiles, np.atleast_1d(stats.digest.quantile(np.asarray(quantiles)))):
+            row[f'p{q * 100:g}'] = value
+        summary_rows.append(row)
+
+    histograms = {pair_names[pair]: (bin_edges, stats.histogram) for pair, stats in overall.items()}
+    return pd.DataFrame(summary_rows), pd.DataFrame(per_ticker_rows), histograms
+
+
+if __name__ == '__main__':
+    summary, per_ticker, histograms = stream_spread_distribution()
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(summary)
+        if len(per_ticker) > 0:
+            print("\n超过手续费阈值频率最高的 ticker × 交易所对:")
+            print(per_ticker.sort_values('above_fee_freq', ascending=False).head(20).to_string(index=False))
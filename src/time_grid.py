@@ -0,0 +1,166 @@
+"""
+基于UTC的时间网格
+
+调度(main.func_manager)、历史数据获取(时间段、分钟对齐)与回放(结算时刻)共用的时间计算。
+所有函数以毫秒时间戳为单位，标量与 np.ndarray 均可传入；大网格由 np.arange 与广播生成，不使用Python循环。
+
+    - floor_ms / ceil_ms / floor_to_minute: 对齐到网格
+    - grid: [start, end] 内的网格时刻
+    - funding_settlements / settlement_mask: 各交易所按币种结算周期的资金费率结算时刻
+    - schedule_moments / next_schedule_moment: 实盘执行时刻(四小时整点 + 奇数时刻)
+    - page_ranges / history_pages: 按单页条数切分的请求时间段
+"""
+import time
+import numpy as np
+
+SECOND_MS = 1000
+MINUTE_MS = 60 * SECOND_MS
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+
+# 各交易所的默认资金费率结算周期(小时)，个别币种为1h/4h时按币种传入
+FUNDING_INTERVAL_HOURS = {'hl': 1, 'bin': 8, 'okx': 8, 'bybit': 8}
+
+SCHEDULE_EVERY_HOURS = 4  # 每四小时整点执行
+ODD_HOURS = (1, 3, 5, 7)  # 奇数执行时刻
+
+
+def now_ms():
+    """当前UTC时间戳(毫秒)"""
+    return int(time.time() * 1000)
+
+
+def local_utc_offset_minutes():
+    """本机时区相对UTC的偏移(分钟)，半小时/45分钟时区(如UTC+5:30、UTC-3:30)不取整"""
+    return time.localtime().tm_gmtoff // 60
+
+
+def floor_ms(timestamps, step_ms):
+    """向下对齐到 step_ms 的整数倍"""
+    if isinstance(timestamps, np.ndarray):
+        return timestamps - timestamps % step_ms
+    timestamps = int(timestamps)
+    return timestamps - timestamps % step_ms
+
+
+def ceil_ms(timestamps, step_ms):
+    """向上对齐到 step_ms 的整数倍"""
+    if isinstance(timestamps, np.ndarray):
+        return -(-timestamps // step_ms) * step_ms
+    return -(-int(timestamps) // step_ms) * step_ms
+
+
+def floor_to_minute(timestamp_ms):
+    """将毫秒时间戳调整为分钟级别(去除秒和毫秒部分)"""
+    return floor_ms(timestamp_ms, MINUTE_MS)
+
+
+def grid(start_ms, end_ms, step_ms, offset_ms=0):
+    """
+    [start_ms, end_ms] 内所有满足 (t - offset_ms) % step_ms == 0 的时刻
+
+    Returns:
+        np.ndarray: int64 毫秒时间戳，升序
+    """
+    first = ceil_ms(int(start_ms) - offset_ms, step_ms) + offset_ms
+    return np.arange(first, int(end_ms) + 1, step_ms, dtype=np.int64)
+
+
+def funding_settlements(start_ms, end_ms, venue=None, interval_hours=None):
+    """
+    [start_ms, end_ms] 内的资金费率结算时刻(按UTC零点对齐)
+
+    Args:
+        venue (str): 交易所前缀，用于取默认结算周期
+        interval_hours (int): 币种的结算周期，传入时覆盖交易所默认值
+
+    Returns:
+        np.ndarray: int64 毫秒时间戳
+    """
+    hours = interval_hours or FUNDING_INTERVAL_HOURS[venue]
+    return grid(start_ms, end_ms, int(hours) * HOUR_MS)
+
+
+def settlement_mask(start_ms, end_ms, interval_hours):
+    """
+    多个币种(结算周期各不相同)在整点网格上的结算标记
+
+    Args:
+        interval_hours (array-like): 每个币种的结算周期(小时)
+
+    Returns:
+        tuple: (hours, mask) hours 为整点时刻数组，mask 形状为 (len(hours), len(interval_hours))，
+            mask[i, j] 表示币种 j 在 hours[i] 结算
+    """
+    hours = grid(start_ms, end_ms, HOUR_MS)
+    intervals = np.asarray(interval_hours, dtype=np.int64)
+    return hours, (hours // HOUR_MS)[:, None] % intervals[None, :] == 0
+
+
+def schedule_moments(start_ms, end_ms, utc_offset_minutes=0, every_hours=SCHEDULE_EVERY_HOURS, odd_hours=ODD_HOURS):
+    """
+    生成 [start_ms, end_ms] 内所有的执行时刻 T (四小时整点 + 奇数时刻)
+
+    Args:
+        start_ms (int): 起始时间戳(毫秒)
+        end_ms (int): 结束时间戳(毫秒)
+        utc_offset_minutes (int): 执行时间表所用时区相对UTC的偏移(分钟)，main_loop 按本机时间判断整点，
+            执行时刻为该时区的整点
+        every_hours (int): 整点执行的间隔
+        odd_hours (tuple): 奇数执行时刻
+
+    Returns:
+        np.ndarray: int64 毫秒时间戳数组
+    """
+    offset_ms = int(utc_offset_minutes) * MINUTE_MS
+    moments = grid(start_ms, end_ms, HOUR_MS, offset_ms=-offset_ms)
+    local_hour = (moments + offset_ms) // HOUR_MS % 24
+    mask = (local_hour % every_hours == 0) | np.isin(local_hour, odd_hours)
+    return moments[mask]
+
+
+def next_schedule_moment(after_ms=None, utc_offset_minutes=0, every_hours=SCHEDULE_EVERY_HOURS, odd_hours=ODD_HOURS):
+    """晚于 after_ms (默认当前时间) 的下一个执行时刻"""
+    after_ms = now_ms() if after_ms is None else int(after_ms)
+    return int(schedule_moments(after_ms + 1, after_ms + DAY_MS, utc_offset_minutes, every_hours, odd_hours)[0])
+
+
+def page_ranges(starts, ends, step_ms, page_limit, newest_first=True):
+    """
+    将闭区间 [starts[i], ends[i]] 切分为每页不超过 page_limit 个采样点的闭区间
+
+    Args:
+        starts, ends (array-like): 已对齐到网格的区间端点
+        step_ms (int): 采样间隔
+        page_limit (int): 单页条数
+        newest_first (bool): 是否由新到旧排列
+
+    Returns:
+        np.ndarray: 形状为 (n, 2) 的 int64 数组
+    """
+    starts = np.atleast_1d(np.asarray(starts, dtype=np.int64))
+    ends = np.atleast_1d(np.asarray(ends, dtype=np.int64))
+    page_span = step_ms * page_limit
+    counts = np.where(ends >= starts, (ends - starts) // page_span + 1, 0)
+    # 每页在所属区间内的序号: 总序号 - 所属区间第一页的总序号
+    owner = np.repeat(np.arange(len(starts)), counts)
+    first_page = np.repeat(np.cumsum(counts) - counts, counts)
+    page_starts = starts[owner] + (np.arange(len(owner)) - first_page) * page_span
+    pages = np.column_stack([page_starts, np.minimum(page_starts + page_span - step_ms, ends[owner])])
+    return pages[::-1] if newest_first else pages
+
+
+def history_pages(interval_minutes, batch, days, end_ms=None):
+    """
+    以当前分钟(或 end_ms)为终点，向前 days 天按 interval_minutes × batch 分钟一段生成请求时间段
+
+    相邻时间段共用端点(前一段的起点即后一段的终点)，与交易所接口的开区间/闭区间参数均可配合。
+
+    Returns:
+        np.ndarray: 形状为 (n, 2) 的 int64 数组，由新到旧排列
+    """
+    end_ms = floor_to_minute(now_ms() if end_ms is None else end_ms)
+    span = interval_minutes * batch * MINUTE_MS
+    total = int(-(-days * DAY_MS // span))
+    ends = end_ms - np.arange(total, dtype=np.int64) * span
+    return np.column_stack([ends - span, ends])
@@ -1,10 +1,70 @@
+import os
+import json
+import hmac
+import time
+import asyncio
+import atexit
+import hashlib
+import threading
 from abc import ABC, abstractmethod
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit
+from src.logger import setup_logger
+
+logger = setup_logger('ExchangeClient')
 
 POSITION_RISK = 0.5  # 风险度，每次开仓的保证金占比
 POSITION_LEVERAGE = 2  # 开仓杠杆
+PRICE_OFFSET_TICKS = 5  # 挂单价相对最优价偏移的最小变动单位个数
+
+# 本地交易所替身服务(src/exchange_standin.py)的地址，设置后所有交易所的REST请求都发往该地址
+STANDIN_URL_ENV = 'EXCHANGE_STANDIN_URL'
+
+REQUEST_TIMEOUT = 10  # 单次请求超时(秒)
+CLOCK_SYNC_INTERVAL = 60  # 后台校时间隔(秒)
+CLOCK_SYNC_SAMPLES = 3  # 每次校时的采样次数，取往返时间最短的一次
+
+
+def resolve_rest_url(venue, default):
+    """
+    交易所REST基础URL，可由环境变量覆盖
+
+    优先级: EXCHANGE_{VENUE}_REST_URL > EXCHANGE_STANDIN_URL > default
+
+    Args:
+        venue (str): 交易所前缀，如 'bin'、'okx'、'bybit'、'hl'
+        default (str): 未设置环境变量时使用的URL
+    """
+    return os.environ.get(f"EXCHANGE_{venue.upper()}_REST_URL") or os.environ.get(STANDIN_URL_ENV) or default
+
+
+def resolve_ws_url(venue, default):
+    """交易所WebSocket基础URL，可由环境变量 EXCHANGE_{VENUE}_WS_URL 覆盖"""
+    return os.environ.get(f"EXCHANGE_{venue.upper()}_WS_URL") or default
+
+
+def rebase_url(venue, url):
+    """
+    将完整的REST URL的协议与主机替换为环境变量中的覆盖地址，路径与查询参数不变
+
+    Args:
+        venue (str): 交易所前缀
+        url (str): 如 'https://fapi.binance.com/fapi/v1/klines'
+
+    Returns:
+        str: 未设置覆盖时原样返回
+    """
+    override = resolve_rest_url(venue, None)
+    if not override:
+        return url
+    base, parts = urlsplit(override), urlsplit(url)
+    return urlunsplit((base.scheme, base.netloc, base.path.rstrip('/') + parts.path, parts.query, parts.fragment))
+
 
 # 创建交易平台API配置的抽象基类
 class ExchangeApiConfig(ABC):
+    venue = None  # 交易所前缀，子类设置，用于环境变量覆盖URL
+
     def __init__(self, is_mainnet=True):
         """
         初始化交易平台API配置
@@ -14,6 +74,9 @@ class ExchangeApiConfig(ABC):
         """
         self.type = is_mainnet
         self._setup_urls()
+        if self.venue:
+            self.rest_url = resolve_rest_url(self.venue, self.rest_url)
+            self.ws_url = resolve_ws_url(self.venue, self.ws_url)
     
     @abstractmethod
     def _setup_urls(self):
@@ -33,27 +96,304 @@ class ExchangeApiConfig(ABC):
         return self.type
 
 
+@lru_cache(maxsize=None)
+def hmac_key(secret_key):
+    """
+    以secret_key初始化的HMAC SHA256对象
+
+    hmac.new 会对密钥做填充与内外两次哈希的预处理，缓存后每次签名只需 copy + update。
+    """
+    return hmac.new(secret_key.encode('utf-8'), digestmod=hashlib.sha256)
+
+
+def hmac_sha256(secret_key, message):
+    """
+    HMAC SHA256签名
+
+    Args:
+        secret_key (str): API密钥对应的私钥
+        message (str): 待签名的字符串
+
+    Returns:
+        bytes: 签名摘要，调用方按交易所要求转为16进制或Base64
+    """
+    mac = hmac_key(secret_key).copy()
+    mac.update(message.encode('utf-8'))
+    return mac.digest()
+
+
+class AsyncExchangeClient(ExchangeApiConfig):
+    """
+    交易所异步REST客户端基类
+
+    在 ExchangeApiConfig 的URL配置之上提供:
+        - 长连接的HTTP会话(aiohttp.ClientSession)，复用TCP/TLS连接
+        - 缓存的HMAC密钥对象(hmac_key)
+        - 后台估计服务器时钟偏移，签名时间戳直接由本地时间加偏移得到，不再每次请求前查询服务器时间
+        - 可等待的 signed_request，以及供同步下单流程使用的 call
+
+    子类与对应的 ApiConfig 一起继承(如 class BinanceClient(AsyncExchangeClient, BinanceApiConfig))，
+    并实现 parse_server_time 与 sign。
+
+    下单流程(open_position_* / close_position_*)是同步代码，通过 shared 取得进程内共享的实例，
+    所有请求都在同一个后台事件循环(client_loop)中执行，会话与时钟偏移在调用之间保持:
+
+        client = BinanceClient.shared(True, api_key, secret_key)
+        data = client.call('GET', '/fapi/v3/positionRisk', {'symbol': 'BTCUSDT'})
+    """
+    time_path = None  # 服务器时间接口路径，子类设置
+    _shared = {}  # (客户端类, 主网/测试网, api_key) -> 共享实例
+    _shared_lock = threading.Lock()
+
+    def __init__(self, is_mainnet=True, api_key=None, secret_key=None, passphrase=None,
+                 timeout=REQUEST_TIMEOUT, sync_interval=CLOCK_SYNC_INTERVAL):
+        """
+        Args:
+            is_mainnet (bool): 是否使用主网
+            api_key (str): API密钥
+            secret_key (str): API密钥对应的私钥
+            passphrase (str): API密钥对应的Passphrase(OKX)
+            timeout (float): 单次请求超时(秒)
+            sync_interval (float): 后台校时间隔(秒)，None 表示只在启动时校时一次
+        """
+        super().__init__(is_mainnet)
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.passphrase = passphrase
+        self.timeout = timeout
+        self.sync_interval = sync_interval
+        self.clock_offset_ms = 0  # 服务器时间 - 本地时间
+        self.clock_rtt_ms = None  # 最近一次校时的往返时间
+        self._session = None
+        self._sync_task = None
+
+    @classmethod
+    def shared(cls, is_mainnet=True, api_key=None, secret_key=None, passphrase=None):
+        """
+        进程内共享的客户端实例，首次调用时创建，HTTP会话在首个请求时于后台事件循环中建立
+
+        Returns:
+            AsyncExchangeClient: 同一 (类, 网络, api_key) 总是返回同一个实例
+        """
+        key = (cls, is_mainnet, api_key)
+        with cls._shared_lock:
+            client = cls._shared.get(key)
+            if client is None:
+                client = cls._shared[key] = cls(is_mainnet, api_key, secret_key, passphrase)
+        return client
+
+    def call(self, method, path, params=None, body=None):
+        """
+        同步调用 signed_request: 在后台事件循环中执行并等待结果
+
+        Returns:
+            dict or list: 响应内容，失败时返回None
+        """
+        return run_in_client_loop(self.signed_request(method, path, params, body))
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """建立HTTP会话，完成首次校时并启动后台校时任务"""
+        import aiohttp
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(keepalive_timeout=60),
+            )
+        if self.time_path:
+            await self.sync_clock()
+            if self.sync_interval and self._sync_task is None:
+                self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def close(self):
+        """停止后台校时并关闭HTTP会话"""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def timestamp_ms(self):
+        """按服务器时钟校正后的当前时间戳(毫秒)"""
+        return int(time.time() * 1000) + self.clock_offset_ms
+
+    def sign_digest(self, message):
+        """使用缓存的密钥对象计算HMAC SHA256摘要"""
+        return hmac_sha256(self.secret_key, message)
+
+    def parse_server_time(self, data):
+        """服务器时间接口的响应 -> 毫秒时间戳，由子类实现"""
+        raise NotImplementedError
+
+    def sign(self, method, path, params, body, timestamp_ms):
+        """
+        为私有接口签名，由子类实现
+
+        Args:
+            method (str): 'GET' / 'POST' / 'DELETE'
+            path (str): 接口路径
+            params (dict): 查询参数
+            body (dict): 请求体
+            timestamp_ms (int): 校正后的时间戳
+
+        Returns:
+            tuple: (query, headers, data) query 为参与签名的已编码查询字符串(原样发送)，
+                data 为已序列化的请求体，没有时为None
+        """
+        raise NotImplementedError
+
+    async def sync_clock(self, samples=CLOCK_SYNC_SAMPLES):
+        """
+        估计服务器时钟偏移: 偏移 = 服务器时间 - 请求发出与收到响应的中点，取往返时间最短的一次采样
+
+        Returns:
+            int: 时钟偏移(毫秒)，全部采样失败时保持原值
+        """
+        best = None
+        for _ in range(samples):
+            sent = time.time() * 1000
+            data = await self.request('GET', self.time_path)
+            received = time.time() * 1000
+            if data is None:
+                continue
+            try:
+                server_ms = int(self.parse_server_time(data))
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                logger.error(f"{self.venue} 服务器时间解析失败: {e}, 响应: {data}")
+                continue
+            rtt = received - sent
+            if best is None or rtt < best[0]:
+                best = (rtt, server_ms - (sent + received) / 2)
+        if best is None:
+            logger.warning(f"{self.venue} 校时失败，沿用时钟偏移 {self.clock_offset_ms} ms")
+            return self.clock_offset_ms
+        self.clock_rtt_ms = best[0]
+        self.clock_offset_ms = int(round(best[1]))
+        logger.debug(f"{self.venue} 时钟偏移 {self.clock_offset_ms} ms, 往返 {self.clock_rtt_ms:.1f} ms")
+        return self.clock_offset_ms
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync_clock()
+            except Exception as e:
+                logger.error(f"{self.venue} 后台校时异常: {e}")
+
+    async def request(self, method, path, query=None, data=None, headers=None):
+        """
+        发送请求并解析JSON响应
+
+        Args:
+            query (str): 已编码的查询字符串，按原样拼入URL，不再经过aiohttp重新编码(签名串与实际请求一致)
+
+        Returns:
+            dict or list: 响应内容，HTTP错误或网络异常时返回None
+        """
+        import aiohttp
+        from yarl import URL
+
+        if self._session is None:
+            await self.start()
+        url = URL(self.rest_url + path + (f"?{query}" if query else ''), encoded=True)
+        try:
+            async with self._session.request(method, url, data=data, headers=headers) as res:
+                text = await res.text()
+                if res.status != 200:
+                    logger.error(f"API请求失败: {method} {path} 状态码 {res.status}, 响应: {text}")
+                    return None
+                return json.loads(text)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"API请求异常: {method} {path} {e}")
+            return None
+
+    async def signed_request(self, method, path, params=None, body=None):
+        """
+        签名后发送私有接口请求，时间戳取自本地校正时钟，不额外请求服务器时间
+
+        Returns:
+            dict or list: 响应内容，失败时返回None
+        """
+        if self._session is None:
+            # 首次调用先建立会话并校时，否则第一笔签名的时间戳未经校正
+            await self.start()
+        query, headers, data = self.sign(method, path, params, body, self.timestamp_ms())
+        return await self.request(method, path, query=query, data=data, headers=headers)
+
+
+_client_loop = None
+_client_loop_lock = threading.Lock()
+
+
+def client_loop():
+    """
+    共享客户端所在的后台事件循环(守护线程)，首次调用时启动
+
+    aiohttp会话与后台校时任务都绑定在创建它们的事件循环上，
+    同步代码每次 asyncio.run 都会新建并关闭循环，因此统一提交到这一个常驻循环中执行。
+    """
+    global _client_loop
+    with _client_loop_lock:
+        if _client_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='exchange-client-loop', daemon=True).start()
+            _client_loop = loop
+    return _client_loop
+
+
+def run_in_client_loop(coro):
+    """在后台事件循环中执行协程并阻塞等待结果"""
+    return asyncio.run_coroutine_threadsafe(coro, client_loop()).result()
+
+
+def close_shared_clients():
+    """关闭所有共享客户端的HTTP会话与后台校时任务(进程退出时自动调用)"""
+    with AsyncExchangeClient._shared_lock:
+        clients = list(AsyncExchangeClient._shared.values())
+        AsyncExchangeClient._shared.clear()
+    if _client_loop is None:
+        return
+    for client in clients:
+        try:
+            run_in_client_loop(client.close())
+        except Exception as e:
+            logger.error(f"{client.venue} 关闭客户端异常: {e}")
+
+
+atexit.register(close_shared_clients)
+
+
 # 该文件为常用的辅助函数
-def set_price(price, side, min_base_price):
+def set_price(price, side, instrument):
     """
-    根据当前获取的价格，开单方向以及最小i多的最小价格变动单位，计算开单价格
+    根据当前获取的价格，开单方向以及标的的最小价格变动单位，计算开单价格
     做多 需要 价格略低; 做空 需要 价格略高
     side为布尔值: True表示做多(相当于1), False表示做空(相当于-1)
     
     Args:
-        price (str): 当前市场订单簿最优价格
+        price (float): 当前市场订单簿最优价格
         side (bool): 开仓方向
-        min_base_price (str): 最小价格变动单位
+        instrument (Instrument): 标的的交易规则(instrument_registry)，提供tickSize
         
     Returns:
-        float: 目标价格
+        float: 取整到tickSize的目标价格
     """
-    # 将布尔值side转换为1或-1
-    side_value = 1 if side else -1
-    return price - 5*min_base_price*side_value
+    return instrument.offset_price(float(price), side, PRICE_OFFSET_TICKS)
 
 
-def set_size(amount, leverage, price, decimals):
+def set_size(amount, leverage, price, instrument):
     """
     获取目标开仓张数
 
@@ -61,20 +401,13 @@ def set_size(amount, leverage, price, decimals):
         amount (float): 保证金额
         leverage (int): 开仓杠杆
         price (float): 开仓价格
-        decimal (int): szDecimals
+        instrument (Instrument): 标的的交易规则(instrument_registry)，提供stepSize与合约面值
 
     Returns:
-        target_size (float): 开仓张数
+        target_size (float): 开仓张数，向下取整到stepSize
     """
-    # 获取目标开仓张数
-    _target_size = (amount*leverage) / price  # 张数 = （保证金*杠杆）/开仓价格
-    # 根据szDecimals规范化大小
-    _target_size = round(_target_size, int(decimals))
-    # 转换为字符串，确保精度正确
-    _target_size_str = f"{{:.{decimals}f}}".format(_target_size)
-    # 转回浮点数，去除多余的0
-    _target_size = float(_target_size_str)
-    return _target_size
+    # 张数 = （保证金*杠杆）/（开仓价格*合约面值*合约乘数）
+    return instrument.size_for_margin(amount, leverage, price)
 
 
 def genearate_history_moments(interval, batch, days):
@@ -91,39 +424,6 @@ def genearate_history_moments(interval, batch, days):
         batch (int): 每次API请求获取的记录数
         days (int): 持续天数
     """
-    import time
-    from datetime import datetime, timedelta
-    
-    # 设置参数
-    max_records_per_request = interval * batch  # 每次API请求获取60条记录
-    
-    # 计算当前时间并对齐到最近的分钟边界
-    current_time = datetime.now().replace(second=0, microsecond=0)
-    end_time = current_time
-    time_segments = []
-    
-    # 计算总共需要获取的时间段数量
-    total_minutes = days * 24 * 60
-    total_segments = total_minutes // max_records_per_request
-    if total_minutes % max_records_per_request > 0:
-        total_segments += 1
-    
-    # 生成每个时间段的起始和结束时间戳
-    for i in range(total_segments):
-        # 计算当前段的结束时间
-        if i == 0:
-            segment_end_time = end_time
-        else:
-            segment_end_time = segment_start_time
-        
-        # 计算当前段的起始时间（确保对齐到分钟边界）
-        segment_start_time = segment_end_time - timedelta(minutes=max_records_per_request)
-        
-        # 转换为时间戳（毫秒）
-        start_timestamp = int(segment_start_time.timestamp() * 1000)
-        end_timestamp = int(segment_end_time.timestamp() * 1000)
-        
-        # 添加到结果列表
-        time_segments.append((start_timestamp, end_timestamp))
-    
-    return time_segments
\ No newline at end of file
+    from src.time_grid import history_pages
+
+    return [tuple(segment) for segment in history_pages(interval, batch, days).tolist()]
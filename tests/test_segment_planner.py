@@ -0,0 +1,80 @@
+"""
+segment_planner 分页上限测试
+
+对每个历史数据适配器规划一个跨多天的空窗口，检查每个时间段的条数与适配器的 page_limit
+均不超过各接口文档给出的单次请求上限。上限在此处单独写死，不引用 history_engine.MAX_PAGE_LIMITS，
+避免与被测代码使用同一份数据。
+"""
+import pytest
+import numpy as np
+import pandas as pd
+from sys import path as sys_path
+from os import path as os_path
+
+# 添加项目根目录到系统路径，确保可以导入src目录下的模块
+sys_path.append(os_path.dirname(os_path.dirname(__file__)))
+from src.time_grid import DAY_MS
+from src.data_fetch.segment_planner import plan_segments
+from src.data_fetch.partition_store import append_rows
+from src.data_fetch.bin_history_fetch import BinanceKlineAdapter, BinanceFundingAdapter
+from src.data_fetch.bybit_history_fetch import BybitKlineAdapter, BybitFundingAdapter
+from src.data_fetch.okx_history_fetch import OKXKlineAdapter, OKXFundingAdapter
+from src.data_fetch.hl_history_fetch import HyperliquidKlineAdapter, HyperliquidFundingAdapter
+
+# 接口文档中的单次请求最大条数
+DOC_MAX_ROWS = {
+    BinanceKlineAdapter: 1500,  # GET /fapi/v1/klines
+    BinanceFundingAdapter: 1000,  # GET /fapi/v1/fundingRate
+    BybitKlineAdapter: 1000,  # GET /v5/market/kline
+    BybitFundingAdapter: 200,  # GET /v5/market/funding/history
+    OKXKlineAdapter: 100,  # GET /api/v5/market/history-candles
+    OKXFundingAdapter: 100,  # GET /api/v5/public/funding-rate-history
+    HyperliquidKlineAdapter: 5000,  # POST /info candleSnapshot
+    HyperliquidFundingAdapter: 500,  # POST /info fundingHistory
+}
+
+NOW_MS = 1_700_000_000_000
+# 窗口足够长，每个适配器都需要分多页: K线 10天 = 14400 条，资金费率(按1小时网格) 90天 = 2160 条
+WINDOW_DAYS = {'candles': 10, 'fr': 90}
+
+
+@pytest.mark.parametrize('adapter_cls', list(DOC_MAX_ROWS), ids=lambda cls: cls.__name__)
+def test_pages_within_documented_limits(adapter_cls, tmp_path):
+    adapter = adapter_cls()
+    limit = DOC_MAX_ROWS[adapter_cls]
+    assert adapter.page_limit <= limit
+
+    start_ms = NOW_MS - WINDOW_DAYS[adapter.kind] * DAY_MS
+    pages = plan_segments(adapter, 'BTC', start_ms, NOW_MS, root=str(tmp_path), now_ms=NOW_MS)
+    assert len(pages) > 1
+
+    interval = adapter.interval_ms
+    for start, end in pages:
+        rows = (end - start) // interval + 1
+        assert 0 < rows <= adapter.page_limit <= limit
+
+    # 各页首尾相接，覆盖整个窗口且不重叠
+    ordered = sorted(pages)
+    assert all(prev_end + interval == start for (_, prev_end), (start, _) in zip(ordered, ordered[1:]))
+    assert ordered[0][0] <= start_ms + interval
+    assert ordered[-1][1] >= NOW_MS - 2 * interval
+
+
+@pytest.mark.parametrize('adapter_cls', [BybitFundingAdapter, OKXFundingAdapter], ids=lambda cls: cls.__name__)
+def test_funding_pages_use_stored_interval(adapter_cls, tmp_path):
+    """已有8小时结算的数据时，缺失区间按8小时网格分页，而不是1小时"""
+    adapter = adapter_cls()
+    interval = 8 * 3600 * 1000
+    stored_end = NOW_MS - 90 * DAY_MS
+    stored = np.arange(stored_end - 30 * DAY_MS, stored_end, interval, dtype=np.int64)
+    append_rows('fr', adapter.venue, 'BTC', pd.DataFrame({'timestamp': stored, f'{adapter.venue}FR': 1e-4}),
+                root=str(tmp_path))
+
+    start_ms = stored[0]
+    pages = plan_segments(adapter, 'BTC', start_ms, NOW_MS, root=str(tmp_path), now_ms=NOW_MS)
+    rows = sum((end - start) // interval + 1 for start, end in pages)
+    assert all((end - start) // interval + 1 <= adapter.page_limit for start, end in pages)
+    # 90天缺口按8小时网格为270条，按1小时网格会多出8倍的请求
+    assert 260 <= rows <= 275
+    assert len(pages) == -(-rows // adapter.page_limit)
+    assert min(start for start, _ in pages) > stored[-1]